@@ -4,7 +4,6 @@ from gomill import ascii_tables
 from gomill import game_jobs
 from gomill import competitions
 from gomill import tournaments
-from gomill import tournament_results
 from gomill.competitions import (
     Competition, CompetitionError, ControlFileError)
 from gomill.settings import *
@@ -106,6 +105,7 @@ class Allplayall(tournaments.Tournament):
             specials = load_settings(self.special_settings, config)
         except ValueError, e:
             raise ControlFileError(str(e))
+        self.load_scheduling_settings(config)
 
         if not specials['competitors']:
             raise ControlFileError("competitors: empty list")
@@ -230,15 +230,19 @@ class Allplayall(tournaments.Tournament):
                     matchup = self.matchups[matchup_id]
                     player_x = matchup.player_2
                     player_y = matchup.player_1
-                ms = tournament_results.Matchup_stats(
-                    self.results[matchup.id],
-                    player_x, player_y)
+                ms = self._get_matchup_stats(matchup.id, player_x, player_y)
                 column_values.append(
                     "%s-%s" % (format_float(ms.wins_1),
                                format_float(ms.wins_2)))
             t.set_column_values(i, column_values)
         print >>out, "\n".join(t.render())
 
+    def write_ratings_report(self, out):
+        """Write Elo ratings for the competitors to 'out'."""
+        tournament_ratings = self.get_tournament_results().get_ratings()
+        print >>out, "ratings:"
+        tournament_ratings.write_report(out)
+
     def write_short_report(self, out):
         def p(s):
             print >>out, s
@@ -248,6 +252,9 @@ class Allplayall(tournaments.Tournament):
         p('')
         self.write_screen_report(out)
         p('')
+        if self.count_games_played():
+            self.write_ratings_report(out)
+            p('')
         self.write_matchup_reports(out)
         p('')
         self.write_player_descriptions(out)
@@ -3,7 +3,12 @@
 from __future__ import division
 
 from random import gauss as random_gauss
-from math import sqrt
+from math import log, sqrt
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 from gomill import compact_tracebacks
 from gomill import game_jobs
@@ -35,13 +40,16 @@ class Distribution(object):
         self.gaussian_params = [(mean, sqrt(variance))
                                 for (mean, variance) in parameters]
 
-    def get_sample(self):
+    def get_sample(self, rng=None):
         """Return a random sample from the distribution.
 
+        rng -- random.Random (default: the random module)
+
         Returns a list of floats
 
         """
-        return [random_gauss(mean, stddev)
+        gauss = random_gauss if rng is None else rng.gauss
+        return [gauss(mean, stddev)
                 for (mean, stddev) in self.gaussian_params]
 
     def get_means(self):
@@ -59,16 +67,152 @@ class Distribution(object):
     def __str__(self):
         return "<distribution %s>" % self.format()
 
+
+def cholesky(matrix):
+    """Find the Cholesky factor of a symmetric positive semidefinite matrix.
+
+    matrix -- list of lists of floats
+
+    Returns a lower-triangular matrix L (list of lists of floats) such that
+    L L^T is the matrix.
+
+    Where the matrix is singular, the corresponding columns of L are zero.
+
+    """
+    n = len(matrix)
+    if numpy is not None:
+        try:
+            return numpy.linalg.cholesky(numpy.array(matrix)).tolist()
+        except numpy.linalg.LinAlgError:
+            pass
+    result = [[0.0] * n for _ in xrange(n)]
+    for j in xrange(n):
+        row_j = result[j]
+        d = matrix[j][j] - sum(v*v for v in row_j[:j])
+        if d <= 1e-12 * max(1.0, abs(matrix[j][j])):
+            continue
+        pivot = sqrt(d)
+        row_j[j] = pivot
+        for i in xrange(j+1, n):
+            row_i = result[i]
+            row_i[j] = (matrix[i][j] -
+                        sum(a*b for (a, b) in zip(row_i[:j], row_j[:j]))
+                        ) / pivot
+    return result
+
+class Covariance_distribution(object):
+    """A multi-dimensional Gaussian distribution with a full covariance matrix.
+
+    Instantiate with
+      means      -- list of floats
+      covariance -- list of lists of floats (symmetric, positive
+                    semidefinite)
+
+    Public attributes:
+      parameters -- pair (means, covariance)
+
+    This has the same interface as Distribution.
+
+    """
+    def __init__(self, means, covariance):
+        self.dimension = len(means)
+        if self.dimension == 0 or len(covariance) != self.dimension:
+            raise ValueError
+        self.parameters = (means, covariance)
+        self.means = means
+        self.covariance = covariance
+        self._cholesky_factor = cholesky(covariance)
+
+    def get_sample(self, rng=None):
+        """Return a random sample from the distribution.
+
+        rng -- random.Random (default: the random module)
+
+        Returns a list of floats
+
+        """
+        gauss = random_gauss if rng is None else rng.gauss
+        z = [gauss(0.0, 1.0) for _ in xrange(self.dimension)]
+        return [mean + sum(a*b for (a, b) in zip(row, z))
+                for (mean, row) in zip(self.means, self._cholesky_factor)]
+
+    def get_means(self):
+        """Return just the mean from each dimension.
+
+        Returns a list of floats.
+
+        """
+        return list(self.means)
+
+    def get_variances(self):
+        """Return the variance of each dimension.
+
+        Returns a list of floats.
+
+        """
+        return [self.covariance[i][i] for i in xrange(self.dimension)]
+
+    def get_correlations(self):
+        """Return the correlation matrix.
+
+        Returns a list of lists of floats. Correlations involving a dimension
+        with zero variance are given as 0.0.
+
+        """
+        stddevs = [sqrt(max(0.0, v)) for v in self.get_variances()]
+        result = []
+        for i, row in enumerate(self.covariance):
+            result.append([
+                (v / (stddevs[i] * stddevs[j])
+                 if stddevs[i] and stddevs[j] else 0.0)
+                for (j, v) in enumerate(row)])
+        return result
+
+    def format(self):
+        return " ".join("%5.2f~%4.2f" % (mean, variance)
+                        for (mean, variance)
+                        in zip(self.means, self.get_variances()))
+
+    def __str__(self):
+        return "<distribution %s>" % self.format()
+
+def make_distribution(means, variances, full_covariance):
+    """Make a distribution with independent dimensions.
+
+    full_covariance -- bool: make a Covariance_distribution rather than a
+                       Distribution
+
+    """
+    if not full_covariance:
+        return Distribution(zip(means, variances))
+    n = len(means)
+    return Covariance_distribution(
+        list(means),
+        [[(variances[i] if i == j else 0.0) for j in xrange(n)]
+         for i in xrange(n)])
+
 def update_distribution(distribution, elites, step_size):
     """Update a distribution based on the given elites.
 
-    distribution -- Distribution
+    distribution -- Distribution or Covariance_distribution
     elites       -- list of optimiser parameter vectors
     step_size    -- float between 0.0 and 1.0 ('alpha')
 
-    Returns a new distribution
+    Returns a new distribution (of the same type)
+
+    For a Distribution, each dimension's new mean and variance are a weighted
+    average of the old ones and the elites' mean and variance.
+
+    For a Covariance_distribution, the new covariance is a weighted average of
+    the old covariance and the average outer product of the elites'
+    deviations from the old mean (the 'rank-mu' update from CMA-ES). So the
+    distribution can stretch along directions in which the elites lie,
+    including directions which aren't parallel to an axis.
 
     """
+    if isinstance(distribution, Covariance_distribution):
+        return _update_covariance_distribution(
+            distribution, elites, step_size)
     n = len(elites)
     new_distribution_parameters = []
     for i in range(distribution.dimension):
@@ -83,6 +227,55 @@ def update_distribution(distribution, elites, step_size):
         new_distribution_parameters.append((new_mean, new_var))
     return Distribution(new_distribution_parameters)
 
+def _update_covariance_distribution(distribution, elites, step_size):
+    n = len(elites)
+    dimension = distribution.dimension
+    old_means = distribution.means
+    deviations = [[v - m for (v, m) in zip(e, old_means)] for e in elites]
+    new_means = [
+        (sum(e[i] for e in elites) / n) * step_size +
+        old_means[i] * (1.0 - step_size)
+        for i in xrange(dimension)]
+    new_covariance = []
+    for i in xrange(dimension):
+        row = []
+        for j in xrange(dimension):
+            if j < i:
+                row.append(new_covariance[j][i])
+                continue
+            elite_cov = sum(d[i] * d[j] for d in deviations) / n
+            row.append(elite_cov * step_size +
+                       distribution.covariance[i][j] * (1.0 - step_size))
+        new_covariance.append(row)
+    return Covariance_distribution(new_means, new_covariance)
+
+def score_bounds(wins, games, delta, method):
+    """Return a confidence interval for a candidate's expected score.
+
+    wins   -- float (counting jigos as half a win)
+    games  -- int
+    delta  -- float: permitted probability of the interval being wrong
+    method -- 'hoeffding' or 'bernstein'
+
+    Returns a pair of floats (lower, upper), within 0.0 to 1.0.
+
+    The Bernstein interval is the 'empirical Bernstein' bound, using
+    p(1-p) as the variance (this is an upper bound on the variance of a
+    score between 0 and 1 with mean p). It's much narrower than the
+    Hoeffding interval when the score is near 0 or 1.
+
+    """
+    if games == 0:
+        return 0.0, 1.0
+    mean = wins / games
+    if method == 'hoeffding':
+        radius = sqrt(log(2 / delta) / (2 * games))
+    else:
+        l = log(3 / delta)
+        radius = (sqrt(2 * mean * (1 - mean) * l / games) +
+                  3 * l / games)
+    return max(0.0, mean - radius), min(1.0, mean + radius)
+
 
 parameter_settings = [
     Setting('code', interpret_identifier),
@@ -118,6 +311,10 @@ class Cem_tuner(Competition):
     The game ids are like 'g0#1r3', where 0 is the generation number, 1 is the
     candidate number and 3 is the round number.
 
+    In steady-state mode the candidate numbers count up through the whole
+    event, and the generation number is the generation whose distribution the
+    candidate was drawn from.
+
     """
     def __init__(self, competition_code, **kwargs):
         Competition.__init__(self, competition_code, **kwargs)
@@ -137,10 +334,21 @@ class Cem_tuner(Competition):
         Setting('number_of_generations', interpret_positive_int),
         Setting('elite_proportion', interpret_float),
         Setting('step_size', interpret_float),
+        Setting('steady_state', interpret_bool, default=False),
+        Setting('covariance', interpret_enum('diagonal', 'full'),
+                default='diagonal'),
+        Setting('racing', allow_none(interpret_enum('hoeffding', 'bernstein')),
+                default=None),
+        Setting('racing_confidence', interpret_float, default=0.95),
+        Setting('seed', allow_none(interpret_int), default=None),
         ])
 
     special_settings = [
-        Setting('opponent', interpret_identifier),
+        Setting('opponent', allow_none(interpret_identifier), default=None),
+        Setting('opponents',
+                allow_none(interpret_map_of(interpret_identifier,
+                                            interpret_positive_int)),
+                default=None),
         Setting('parameters',
                 interpret_sequence_of_quiet_configs(Parameter_config)),
         Setting('make_candidate', interpret_callable),
@@ -188,17 +396,26 @@ class Cem_tuner(Competition):
             raise ControlFileError("elite_proportion out of range (0.0 to 1.0)")
         if not 0.0 < self.step_size < 1.0:
             raise ControlFileError("step_size out of range (0.0 to 1.0)")
+        if self.racing is not None and self.steady_state:
+            raise ControlFileError("racing: not supported in steady-state mode")
+        if not 0.0 < self.racing_confidence < 1.0:
+            raise ControlFileError(
+                "racing_confidence out of range (0.0 to 1.0)")
 
         try:
             specials = load_settings(self.special_settings, config)
         except ValueError, e:
             raise ControlFileError(str(e))
 
-        try:
-            self.opponent = self.players[specials['opponent']]
-        except KeyError:
+        self.opponent_pool = competitions.make_opponent_pool(
+            self.players, specials['opponent'], specials['opponents'])
+        # Candidates are ranked on their plain number of wins, which is a
+        # fair measure only if each candidate plays every opponent in
+        # proportion to its weight.
+        if self.batch_size % self.opponent_pool.cycle_length:
             raise ControlFileError(
-                "opponent: unknown player %s" % specials['opponent'])
+                "batch_size: must be a multiple of %d when using these "
+                "opponents" % self.opponent_pool.cycle_length)
 
         self.parameter_specs = []
         if not specials['parameters']:
@@ -220,14 +437,16 @@ class Cem_tuner(Competition):
 
         self.candidate_maker_fn = specials['make_candidate']
 
-        self.initial_distribution = Distribution(
-            [(pspec.initial_mean, pspec.initial_variance)
-             for pspec in self.parameter_specs])
+        self.initial_distribution = make_distribution(
+            [pspec.initial_mean for pspec in self.parameter_specs],
+            [pspec.initial_variance for pspec in self.parameter_specs],
+            full_covariance=(self.covariance == 'full'))
 
 
     # State attributes (*: in persistent state):
     #  *generation        -- current generation (0-based int)
-    #  *distribution      -- Distribution for current generation
+    #  *distribution      -- Distribution or Covariance_distribution for
+    #                        current generation
     #  *sample_parameters -- optimiser_params
     #                        (list indexed by candidate number)
     #  *wins              -- number of games won
@@ -236,49 +455,132 @@ class Cem_tuner(Competition):
     #   candidates        -- Players (code attribute is the candidate code)
     #                        (list indexed by candidate number)
     #  *scheduler         -- Group_scheduler (group codes are candidate numbers)
+    #  *stopped           -- map candidate number -> game limit
+    #                        for candidates stopped early by racing
     #
     # These are all reset for each new generation.
     #
     #   seen_successful_game -- bool (per-run state)
+    #
+    # In steady-state mode, sample_parameters, wins, and candidates are maps
+    # keyed by candidate number, holding only the candidates which are still
+    # playing, and there are additionally:
+    #  *sample_generations    -- map candidate number -> generation the sample
+    #                            was drawn from
+    #  *finished_samples      -- list of tuples
+    #                            (wins, candidate code, optimiser_params)
+    #                            for candidates which have finished playing
+    #                            since the distribution was last updated
+    #  *next_candidate_number -- int
 
     def set_clean_status(self):
         self.generation = 0
         self.distribution = self.initial_distribution
-        self.reset_for_new_generation()
+        if self.steady_state:
+            self.sample_parameters = {}
+            self.sample_generations = {}
+            self.wins = {}
+            self.finished_samples = []
+            self.next_candidate_number = 0
+            self.candidates = {}
+            self.stopped = {}
+            self.scheduler = competition_schedulers.Group_scheduler()
+        else:
+            self.reset_for_new_generation()
 
     def _set_scheduler_groups(self):
+        if self.steady_state:
+            candidate_numbers = self.sample_parameters.iterkeys()
+        else:
+            candidate_numbers = xrange(self.samples_per_generation)
         self.scheduler.set_groups(
-            (i, self.batch_size) for i in xrange(self.samples_per_generation)
-            )
+            (i, self.stopped.get(i, self.batch_size))
+            for i in candidate_numbers)
 
     # Can bump this to prevent people loading incompatible .status files.
     status_format_version = 0
 
     def get_status(self):
-        return {
+        result = {
             'generation'         : self.generation,
             'distribution'       : self.distribution.parameters,
             'sample_parameters'  : self.sample_parameters,
             'wins'               : self.wins,
             'scheduler'          : self.scheduler,
             }
+        if self.covariance == 'full':
+            result['covariance'] = 'full'
+        if self.stopped:
+            result['stopped'] = self.stopped
+        if self.seed is not None:
+            result['seed'] = self.seed
+        if self.steady_state:
+            result['steady_state'] = True
+            result['sample_generations'] = self.sample_generations
+            result['finished_samples'] = self.finished_samples
+            result['next_candidate_number'] = self.next_candidate_number
+        return result
 
     def set_status(self, status):
+        if status.get('steady_state', False) != self.steady_state:
+            raise CompetitionError(
+                "status file is inconsistent with control file "
+                "(steady_state has changed)")
+        if status.get('seed') != self.seed:
+            raise CompetitionError(
+                "status file is inconsistent with control file "
+                "(seed has changed)")
         self.generation = status['generation']
-        self.distribution = Distribution(status['distribution'])
+        self.distribution = self._distribution_from_status(
+            status['distribution'], status.get('covariance', 'diagonal'))
         self.sample_parameters = status['sample_parameters']
         self.wins = status['wins']
-        self.prepare_candidates()
+        self.stopped = status.get('stopped', {})
+        if self.racing is None:
+            # Play the stopped candidates' remaining games
+            self.stopped = {}
+        if self.steady_state:
+            self.sample_generations = status['sample_generations']
+            self.finished_samples = status['finished_samples']
+            self.next_candidate_number = status['next_candidate_number']
+            self.candidates = {}
+            for candidate_number in self.sample_parameters:
+                self._prepare_steady_state_candidate(candidate_number)
+        else:
+            self.prepare_candidates()
         self.scheduler = status['scheduler']
         # Might as well notice if they changed the batch_size
         self._set_scheduler_groups()
         self.scheduler.rollback()
 
+    def _distribution_from_status(self, parameters, stored_covariance):
+        """Make the current distribution from its stored parameters.
+
+        If the covariance setting has changed, converts the distribution
+        (dropping the correlations if necessary).
+
+        """
+        if stored_covariance == 'full':
+            distribution = Covariance_distribution(*parameters)
+        else:
+            distribution = Distribution(parameters)
+        if stored_covariance == self.covariance:
+            return distribution
+        if stored_covariance == 'full':
+            variances = distribution.get_variances()
+        else:
+            variances = [variance for (mean, variance) in parameters]
+        return make_distribution(
+            distribution.get_means(), variances,
+            full_covariance=(self.covariance == 'full'))
+
     def reset_for_new_generation(self):
         get_sample = self.distribution.get_sample
-        self.sample_parameters = [get_sample()
-                                  for _ in xrange(self.samples_per_generation)]
+        self.sample_parameters = [
+            get_sample(competitions.make_rng(self.seed, self.generation, i))
+            for i in xrange(self.samples_per_generation)]
         self.wins = [0] * self.samples_per_generation
+        self.stopped = {}
         self.prepare_candidates()
         self.scheduler = competition_schedulers.Group_scheduler()
         self._set_scheduler_groups()
@@ -357,6 +659,97 @@ class Cem_tuner(Competition):
             self.candidates.append(
                 self.make_candidate(candidate_code, engine_parameters))
 
+    def _prepare_steady_state_candidate(self, candidate_number):
+        candidate_code = self.make_candidate_code(
+            self.sample_generations[candidate_number], candidate_number)
+        engine_parameters = self.transform_parameters(
+            self.sample_parameters[candidate_number])
+        self.candidates[candidate_number] = self.make_candidate(
+            candidate_code, engine_parameters)
+
+    def start_sample(self):
+        """Draw a new candidate from the current distribution (steady-state).
+
+        Returns the new candidate number.
+
+        """
+        candidate_number = self.next_candidate_number
+        self.next_candidate_number += 1
+        self.sample_parameters[candidate_number] = \
+            self.distribution.get_sample(
+                competitions.make_rng(self.seed, candidate_number))
+        self.sample_generations[candidate_number] = self.generation
+        self.wins[candidate_number] = 0
+        self._prepare_steady_state_candidate(candidate_number)
+        self._set_scheduler_groups()
+        return candidate_number
+
+    def finish_sample(self, candidate_number):
+        """Retire a candidate which has finished playing (steady-state).
+
+        Moves it to finished_samples. Once there are samples_per_generation
+        finished samples, updates the distribution from them and empties
+        finished_samples, so each update uses a fresh batch of samples.
+
+        Candidates which finish after the final update are left in
+        finished_samples, unused.
+
+        """
+        self.finished_samples.append(
+            (self.wins.pop(candidate_number),
+             self.candidates.pop(candidate_number).code,
+             self.sample_parameters.pop(candidate_number)))
+        del self.sample_generations[candidate_number]
+        self._set_scheduler_groups()
+        if (len(self.finished_samples) >= self.samples_per_generation and
+            self.generation != self.number_of_generations):
+            ordered_results = sorted(self.finished_samples,
+                                     key=lambda t: t[0], reverse=True)
+            self.finished_samples = []
+            self._finish_generation(ordered_results)
+            self.generation += 1
+            if self.generation != self.number_of_generations:
+                self.log_event("\nstarting generation %d" % self.generation)
+
+    def get_elite_count(self, sample_count):
+        """Return the number of elite samples from a generation."""
+        return max(1, int(self.elite_proportion * sample_count + 0.5))
+
+    def update_racing(self):
+        """Stop candidates which can no longer reach the elite.
+
+        A candidate is stopped when at least elite-count other candidates
+        have a lower confidence bound above its upper confidence bound.
+        Its scheduler limit is cut to the number of games already issued. The
+        games it would have played are not given to anyone else (the
+        contenders are still limited to batch_size games), so the generation
+        ends after fewer games.
+
+        The racing_confidence is shared out (by a union bound) over each
+        check of each candidate, so it holds for the generation as a whole.
+
+        """
+        n = self.samples_per_generation
+        delta = (1.0 - self.racing_confidence) / (n * self.batch_size)
+        bounds = [score_bounds(self.wins[i], self.scheduler.get_counts(i)[1],
+                               delta, self.racing)
+                  for i in xrange(n)]
+        elite_count = self.get_elite_count(n)
+        newly_stopped = False
+        for i, (_, upper) in enumerate(bounds):
+            if i in self.stopped:
+                continue
+            issued, _ = self.scheduler.get_counts(i)
+            if issued >= self.batch_size:
+                continue
+            better_count = sum(1 for (j, (lower, _)) in enumerate(bounds)
+                               if j != i and lower > upper)
+            if better_count >= elite_count:
+                self.stopped[i] = issued
+                newly_stopped = True
+        if newly_stopped:
+            self._set_scheduler_groups()
+
     def finish_generation(self):
         """Process a generation's results and calculate the new distribution.
 
@@ -364,19 +757,41 @@ class Cem_tuner(Competition):
 
         Updates self.distribution.
 
+        When racing, candidates are ranked by their average score, as those
+        which were stopped early have played fewer games.
+
         """
-        sorter = [(wins, candidate_number)
-                  for (candidate_number, wins) in enumerate(self.wins)]
+        if self.racing is None:
+            sorter = [(wins, candidate_number)
+                      for (candidate_number, wins) in enumerate(self.wins)]
+        else:
+            sorter = [(wins / max(1, self.scheduler.get_counts(i)[1]), i)
+                      for (i, wins) in enumerate(self.wins)]
         sorter.sort(reverse=True)
-        elite_count = max(1,
-            int(self.elite_proportion * self.samples_per_generation + 0.5))
+        self._finish_generation(
+            [(self.wins[index],
+              self.make_candidate_code(self.generation, index),
+              self.sample_parameters[index])
+             for (_, index) in sorter],
+            stopped_codes=set(
+                self.make_candidate_code(self.generation, index)
+                for index in self.stopped))
+
+    def _finish_generation(self, ordered_results, stopped_codes=()):
+        # ordered_results -- list of tuples
+        #                    (wins, candidate code, optimiser_params),
+        #                    best first
+        # stopped_codes   -- set of codes of candidates stopped by racing
+        elite_count = self.get_elite_count(len(ordered_results))
         self.log_history("Generation %s" % self.generation)
         self.log_history("Distribution\n%s" %
                          self.format_distribution(self.distribution))
-        self.log_history(self.format_generation_results(sorter, elite_count))
+        self.log_history(self.format_generation_results(
+            ordered_results, elite_count, stopped_codes))
         self.log_history("")
-        elite_samples = [self.sample_parameters[index]
-                         for (wins, index) in sorter[:elite_count]]
+        elite_samples = [optimiser_params
+                         for (wins, candidate_code, optimiser_params)
+                         in ordered_results[:elite_count]]
         self.distribution = update_distribution(
             self.distribution, elite_samples, self.step_size)
 
@@ -385,7 +800,7 @@ class Cem_tuner(Competition):
             self.initial_distribution.get_sample())
         candidate = self.make_candidate('candidate', engine_parameters)
         result = []
-        for player in [candidate, self.opponent]:
+        for player in [candidate] + self.opponent_pool.players:
             check = game_jobs.Player_check()
             check.player = player
             check.board_size = self.board_size
@@ -394,12 +809,21 @@ class Cem_tuner(Competition):
         return result
 
     def get_game(self):
-        if self.scheduler.nothing_issued_yet():
-            self.log_event("\nstarting generation %d" % self.generation)
-
-        candidate_number, round_id = self.scheduler.issue()
-        if candidate_number is None:
-            return NoGameAvailable
+        if self.steady_state:
+            # After the last update, finish the candidates which have already
+            # started, but don't start any more.
+            candidate_number, round_id = self.scheduler.issue()
+            if candidate_number is None:
+                if self.generation == self.number_of_generations:
+                    return NoGameAvailable
+                self.start_sample()
+                candidate_number, round_id = self.scheduler.issue()
+        else:
+            if self.scheduler.nothing_issued_yet():
+                self.log_event("\nstarting generation %d" % self.generation)
+            candidate_number, round_id = self.scheduler.issue()
+            if candidate_number is None:
+                return NoGameAvailable
 
         candidate = self.candidates[candidate_number]
 
@@ -407,13 +831,17 @@ class Cem_tuner(Competition):
         job.game_id = "%sr%d" % (candidate.code, round_id)
         job.game_data = (candidate_number, candidate.code, round_id)
         job.player_b = candidate
-        job.player_w = self.opponent
+        # Each candidate's games take a consecutive run of the pool's cycle,
+        # so they are spread across the opponents in proportion to the weights
+        job.player_w = self.opponent_pool.get_opponent(
+            candidate_number * self.batch_size + round_id)
         job.board_size = self.board_size
         job.komi = self.komi
         job.move_limit = self.move_limit
         job.handicap = self.handicap
         job.handicap_is_free = (self.handicap_style == 'free')
         job.use_internal_scorer = (self.scorer == 'internal')
+        job.adjudication = self.adjudication
         job.internal_scorer_handicap_compensation = \
             self.internal_scorer_handicap_compensation
         job.sgf_event = self.competition_code
@@ -435,6 +863,12 @@ class Cem_tuner(Competition):
         elif gr.winning_player is None:
             self.wins[candidate_number] += 0.5
 
+        if self.steady_state:
+            if self.scheduler.is_group_fixed(candidate_number):
+                self.finish_sample(candidate_number)
+            return
+        if self.racing is not None:
+            self.update_racing()
         if self.scheduler.all_fixed():
             self.finish_generation()
             self.generation += 1
@@ -459,24 +893,38 @@ class Cem_tuner(Competition):
         Returns a string.
 
         """
-        return "%s\n%s" % (
+        result = "%s\n%s" % (
             self.format_optimiser_parameters(distribution.get_means()),
             distribution.format())
+        if isinstance(distribution, Covariance_distribution):
+            result += "\ncorrelations:\n" + "\n".join(
+                " ".join("%5.2f" % v for v in row)
+                for row in distribution.get_correlations())
+        return result
 
-    def format_generation_results(self, ordered_samples, elite_count):
+    def format_generation_results(self, ordered_results, elite_count,
+                                  stopped_codes=()):
         """Pretty-print the results of a single generation.
 
-        ordered_samples -- list of pairs (wins, candidate number)
+        ordered_results -- list of tuples
+                           (wins, candidate code, optimiser_params)
         elite_count     -- number of samples to mark as elite
+        stopped_codes   -- codes of candidates to mark as stopped early
 
         """
         result = []
-        for i, (wins, candidate_number) in enumerate(ordered_samples):
-            opt_parameters = self.sample_parameters[candidate_number]
+        for i, (wins, candidate_code, opt_parameters) in \
+                enumerate(ordered_results):
+            if i < elite_count:
+                marker = "*"
+            elif candidate_code in stopped_codes:
+                marker = "-"
+            else:
+                marker = " "
             result.append(
                 "%s%s %s %3d" %
-                (self.make_candidate_code(self.generation, candidate_number),
-                 "*" if i < elite_count else " ",
+                (candidate_code,
+                 marker,
                  self.format_optimiser_parameters(opt_parameters),
                  wins))
         return "\n".join(result)
@@ -493,7 +941,21 @@ class Cem_tuner(Competition):
     def write_screen_report(self, out):
         print >>out, "generation %d" % self.generation
         print >>out
-        print >>out, "wins from current samples:\n%s" % self.wins
+        if self.steady_state:
+            if self.generation == self.number_of_generations:
+                print >>out, ("samples finished after the final update "
+                              "(not used): %d" % len(self.finished_samples))
+            else:
+                print >>out, "samples finished since last update: %d/%d" % (
+                    len(self.finished_samples), self.samples_per_generation)
+            print >>out, "wins from samples in progress:\n%s" % (
+                [wins for (candidate_number, wins)
+                 in sorted(self.wins.iteritems())])
+        else:
+            print >>out, "wins from current samples:\n%s" % self.wins
+            if self.stopped:
+                print >>out, "stopped early: %s" % (
+                    " ".join(map(str, sorted(self.stopped))))
         print >>out
         if self.generation == self.number_of_generations:
             print >>out, "final distribution:"
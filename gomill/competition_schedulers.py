@@ -10,36 +10,100 @@ All scheduler classes are suitable for pickling.
 
 """
 
+import heapq
+
+def count_shard_tokens(limit, stride, offset, block_size=1):
+    """Count the tokens below a limit which belong to a shard.
+
+    limit      -- int or None
+    stride     -- int
+    offset     -- int
+    block_size -- int (default 1)
+
+    Returns the number of integers n with 0 <= n < limit and
+    (n // block_size) % stride == offset (or None if limit is None).
+
+    """
+    if limit is None:
+        return None
+    cycles, remainder = divmod(limit, stride * block_size)
+    return (cycles * block_size +
+            min(block_size, max(0, remainder - offset * block_size)))
+
+
 class Simple_scheduler(object):
     """Schedule a single sequence of games.
 
     The issued tokens are integers counting up from zero.
 
+    Instantiate with
+      stride     -- int (default 1)
+      offset     -- int (default 0)
+      block_size -- int (default 1)
+
+    If stride and offset are specified, the issued tokens are offset,
+    offset + stride, offset + 2*stride, and so on. This is used to share out a
+    sequence of games between several schedulers (shards).
+
+    If block_size is specified, the tokens are shared out in blocks of that
+    many consecutive integers, rather than one at a time: the issued tokens
+    are those n with (n // block_size) % stride == offset.
+
     Public attributes (treat as read-only):
-      issued -- int
-      fixed  -- int
+      issued     -- int
+      fixed      -- int
+      stride     -- int
+      offset     -- int
+      block_size -- int
+
+    Tokens waiting to be reissued are kept in a heap (they're pickled as a
+    set, as in earlier versions).
 
     """
-    def __init__(self):
-        self.next_new = 0
+    def __init__(self, stride=1, offset=0, block_size=1):
+        if stride == 1:
+            block_size = 1
+        self.stride = stride
+        self.offset = offset
+        self.block_size = block_size
+        self.next_new = offset * block_size
         self.outstanding = set()
-        self.to_reissue = set()
+        self.to_reissue = []
         self.issued = 0
         self.fixed = 0
         #self._check_consistent()
 
+    def _new_count(self):
+        return count_shard_tokens(
+            self.next_new, self.stride, self.offset, self.block_size)
+
     def _check_consistent(self):
         assert self.issued == \
-            self.next_new - len(self.to_reissue)
+            self._new_count() - len(self.to_reissue)
         assert self.fixed == \
-            self.next_new - len(self.outstanding) - len(self.to_reissue)
+            self._new_count() - len(self.outstanding) - len(self.to_reissue)
 
     def __getstate__(self):
-        return (self.next_new, self.outstanding, self.to_reissue)
+        to_reissue = set(self.to_reissue)
+        if self.stride == 1 and self.offset == 0:
+            # Same as the format used before sharding was supported
+            return (self.next_new, self.outstanding, to_reissue)
+        return (self.next_new, self.outstanding, to_reissue,
+                self.stride, self.offset, self.block_size)
 
     def __setstate__(self, state):
-        (self.next_new, self.outstanding, self.to_reissue) = state
-        self.issued = self.next_new - len(self.to_reissue)
+        if len(state) == 3:
+            (self.next_new, self.outstanding, to_reissue) = state
+            self.stride, self.offset, self.block_size = 1, 0, 1
+        elif len(state) == 5:
+            (self.next_new, self.outstanding, to_reissue,
+             self.stride, self.offset) = state
+            self.block_size = 1
+        else:
+            (self.next_new, self.outstanding, to_reissue,
+             self.stride, self.offset, self.block_size) = state
+        self.to_reissue = sorted(to_reissue)
+        self.issued = self._new_count() - len(self.to_reissue)
         self.fixed = self.issued - len(self.outstanding)
         #self._check_consistent()
 
@@ -50,11 +114,12 @@ class Simple_scheduler(object):
 
         """
         if self.to_reissue:
-            result = min(self.to_reissue)
-            self.to_reissue.discard(result)
+            result = heapq.heappop(self.to_reissue)
         else:
             result = self.next_new
             self.next_new += 1
+            if self.next_new % self.block_size == 0:
+                self.next_new += (self.stride - 1) * self.block_size
         self.outstanding.add(result)
         self.issued += 1
         #self._check_consistent()
@@ -69,7 +134,8 @@ class Simple_scheduler(object):
     def rollback(self):
         """Make issued-but-not-fixed tokens available again."""
         self.issued -= len(self.outstanding)
-        self.to_reissue.update(self.outstanding)
+        self.to_reissue.extend(self.outstanding)
+        heapq.heapify(self.to_reissue)
         self.outstanding = set()
         #self._check_consistent()
 
@@ -82,22 +148,78 @@ class Group_scheduler(object):
     haven't reached their limit) with the fewest issued games, with smallest
     group code breaking ties.
 
+    Groups can also be given a weight (see set_weight()). Then the issued
+    games are shared out in proportion to the weights: the scheduler chooses
+    the group with the smallest ratio of issued games to weight. Groups with
+    zero weight are used only when no other group is available. Weights aren't
+    part of the pickled state; the default weight is 1.0.
+
     group codes might be ints or short strings
     (any sortable, pickleable and hashable object should do).
 
     The issued tokens are pairs (group code, game number), with game numbers
     counting up from 0 independently for each group code.
 
+    Instantiate with
+      stride     -- int (default 1)
+      offset     -- int (default 0)
+      block_size -- int (default 1)
+
+    If stride and offset are specified, only game numbers n with
+    (n // block_size) % stride == offset are issued, and the limits are
+    interpreted accordingly (a group's limit is reached when all such game
+    numbers below the limit have been issued). Running 'stride' schedulers,
+    with offsets 0 to stride-1, shares out each group's games between them.
+    See Simple_scheduler for block_size.
+
+    Public attributes (treat as read-only):
+      stride     -- int
+      offset     -- int
+      block_size -- int
+
+    The groups are kept in a priority queue, so issue() doesn't have to
+    examine every group. Queue entries aren't removed when a group's priority
+    changes; instead, issue() discards entries which are out of date.
+
     """
-    def __init__(self):
+    def __init__(self, stride=1, offset=0, block_size=1):
+        if stride == 1:
+            block_size = 1
         self.allocators = {}
         self.limits = {}
+        self.weights = {}
+        self.stride = stride
+        self.offset = offset
+        self.block_size = block_size
+        # Heap of (key, group code) pairs; see _get_key().
+        # None means it needs to be rebuilt.
+        self._queue = None
 
     def __getstate__(self):
-        return (self.allocators, self.limits)
+        if self.stride == 1 and self.offset == 0:
+            # Same as the format used before sharding was supported
+            return (self.allocators, self.limits)
+        return (self.allocators, self.limits, self.stride, self.offset,
+                self.block_size)
 
     def __setstate__(self, state):
-        (self.allocators, self.limits) = state
+        if len(state) == 2:
+            (self.allocators, self.limits) = state
+            self.stride, self.offset, self.block_size = 1, 0, 1
+        elif len(state) == 4:
+            (self.allocators, self.limits, self.stride, self.offset) = state
+            self.block_size = 1
+        else:
+            (self.allocators, self.limits, self.stride, self.offset,
+             self.block_size) = state
+        self.weights = {}
+        self._queue = None
+
+    def _get_limit(self, group_code):
+        """Return the limit on issued games for the specified group."""
+        return count_shard_tokens(
+            self.limits[group_code], self.stride, self.offset,
+            self.block_size)
 
     def set_groups(self, group_specs):
         """Set the groups to be scheduled.
@@ -115,10 +237,57 @@ class Group_scheduler(object):
             if group_code in self.allocators:
                 new_allocators[group_code] = self.allocators[group_code]
             else:
-                new_allocators[group_code] = Simple_scheduler()
+                new_allocators[group_code] = Simple_scheduler(
+                    self.stride, self.offset, self.block_size)
             new_limits[group_code] = limit
         self.allocators = new_allocators
         self.limits = new_limits
+        self.weights = dict((group_code, weight)
+                            for (group_code, weight) in self.weights.iteritems()
+                            if group_code in new_allocators)
+        self._queue = None
+
+    def set_weight(self, group_code, weight):
+        """Set the scheduling weight for a group.
+
+        weight -- nonnegative float, or None to restore the default
+
+        """
+        if weight is None:
+            self.weights.pop(group_code, None)
+        else:
+            self.weights[group_code] = weight
+        self._enqueue(group_code)
+
+    def _get_key(self, group_code):
+        # Sort key for choosing the next group (smallest first)
+        issue_count = self.allocators[group_code].issued
+        weight = self.weights.get(group_code, 1.0)
+        if weight <= 0:
+            return (True, issue_count)
+        return (False, float(issue_count) / weight)
+
+    def _is_available(self, group_code):
+        limit = self._get_limit(group_code)
+        return limit is None or self.allocators[group_code].issued < limit
+
+    def _enqueue(self, group_code):
+        # Add a queue entry for a group whose key may have changed.
+        if self._queue is None or group_code not in self.allocators:
+            return
+        if len(self._queue) > 2 * len(self.allocators) + 16:
+            # Too many out-of-date entries
+            self._queue = None
+            return
+        if self._is_available(group_code):
+            heapq.heappush(self._queue,
+                           (self._get_key(group_code), group_code))
+
+    def _rebuild_queue(self):
+        self._queue = [(self._get_key(group_code), group_code)
+                       for group_code in self.allocators
+                       if self._is_available(group_code)]
+        heapq.heapify(self._queue)
 
     def issue(self):
         """Choose the next game to start.
@@ -128,19 +297,25 @@ class Group_scheduler(object):
         Returns (None, None) if all groups have reached their limit.
 
         """
-        groups = [
-            (group_code, allocator.issued, self.limits[group_code])
-            for (group_code, allocator) in self.allocators.iteritems()
-            ]
-        available = [
-            (issue_count, group_code)
-            for (group_code, issue_count, limit) in groups
-            if limit is None or issue_count < limit
-            ]
-        if not available:
+        if self._queue is None:
+            self._rebuild_queue()
+        queue = self._queue
+        while queue:
+            key, group_code = queue[0]
+            if (group_code in self.allocators and
+                self._is_available(group_code) and
+                key == self._get_key(group_code)):
+                break
+            # out of date; a current entry is present if needed
+            heapq.heappop(queue)
+        else:
             return None, None
-        _, group_code = min(available)
-        return group_code, self.allocators[group_code].issue()
+        token = self.allocators[group_code].issue()
+        if self._is_available(group_code):
+            heapq.heapreplace(queue, (self._get_key(group_code), group_code))
+        else:
+            heapq.heappop(queue)
+        return group_code, token
 
     def fix(self, group_code, game_number):
         """Note that a game's result has been reliably stored."""
@@ -150,12 +325,33 @@ class Group_scheduler(object):
         """Make issued-but-not-fixed tokens available again."""
         for allocator in self.allocators.itervalues():
             allocator.rollback()
+        self._queue = None
 
     def nothing_issued_yet(self):
         """Say whether nothing has been issued yet."""
         return all(allocator.issued == 0
                    for allocator in self.allocators.itervalues())
 
+    def get_counts(self, group_code):
+        """Return the numbers of issued and fixed tokens for a group.
+
+        Returns a pair of ints (issued, fixed).
+
+        """
+        allocator = self.allocators[group_code]
+        return allocator.issued, allocator.fixed
+
+    def is_group_fixed(self, group_code):
+        """Check whether a group has reached its limit.
+
+        This returns true if the group has a limit, and has as many _fixed_
+        tokens as its limit.
+
+        """
+        limit = self._get_limit(group_code)
+        return (limit is not None and
+                self.allocators[group_code].fixed >= limit)
+
     def all_fixed(self):
         """Check whether all groups have reached their limits.
 
@@ -163,5 +359,5 @@ class Group_scheduler(object):
         _fixed_ tokens as its limit.
 
         """
-        return all(allocator.fixed >= self.limits[g]
+        return all(allocator.fixed >= self._get_limit(g)
                    for (g, allocator) in self.allocators.iteritems())
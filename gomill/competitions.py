@@ -1,7 +1,10 @@
 """Organise processing jobs based around playing many GTP games."""
 
 import os
+import random
+from hashlib import sha1
 
+from gomill import gameplay
 from gomill import game_jobs
 from gomill import gtp_controller
 from gomill import handicap_layout
@@ -67,6 +70,12 @@ class Competition(object):
 
     """
 
+    # Set this true if write_screen_report() describes games which have been
+    # started but not completed (so the ringmaster knows it has to regenerate
+    # the screen report when a new game starts, as well as when a game result
+    # comes in).
+    screen_report_shows_games_in_progress = False
+
     def __init__(self, competition_code):
         self.competition_code = competition_code
         self.base_directory = None
@@ -81,6 +90,7 @@ class Competition(object):
         """
         return {
             'Player' : Player_config,
+            'Adjudicate' : Adjudication_config,
             }
 
     def set_base_directory(self, pathname):
@@ -92,6 +102,35 @@ class Competition(object):
         """
         self.base_directory = pathname
 
+    def set_shard(self, shard_index, shard_count):
+        """Play only a share of the competition's games.
+
+        shard_index -- int (0 <= shard_index < shard_count)
+        shard_count -- int
+
+        This is used to split a competition between several ringmasters, each
+        with its own state; the shards' games should not overlap.
+
+        Call this before setting the competition status.
+
+        Raises CompetitionError if the competition type doesn't support
+        sharding.
+
+        """
+        raise CompetitionError("competition type does not support sharding")
+
+    def merge_shard(self, shard):
+        """Add the results from a shard to this competition.
+
+        shard -- Competition of the same type, with status set
+
+        This is used to report on a sharded competition as a whole. The
+        competition should have its status set (normally with
+        set_clean_status()), and not be a shard itself.
+
+        """
+        raise NotImplementedError
+
     def resolve_pathname(self, pathname):
         """Resolve a pathname relative to the competition's base directory.
 
@@ -353,6 +392,32 @@ class Competition(object):
         """
         raise NotImplementedError
 
+    def get_matchup_id(self, response):
+        """Say which matchup a completed game belongs to.
+
+        response -- game_jobs.Game_job_result
+
+        Returns a string.
+
+        This is used to group results in the ringmaster's live status.
+
+        The default implementation uses the two players' codes.
+
+        """
+        result = response.game_result
+        return " v ".join(sorted([result.player_b, result.player_w]))
+
+    def get_game_results(self):
+        """Return results of all games played so far, for the game index.
+
+        Returns a list of pairs (matchup id, gtp_games.Game_result), or None
+        if the competition doesn't keep its game results.
+
+        The matchup ids should be the same as those from get_matchup_id().
+
+        """
+        return None
+
     def process_game_error(self, job, previous_error_count):
         """Process a report that a job failed.
 
@@ -426,9 +491,11 @@ class Competition(object):
         """
         raise NotImplementedError
 
-    def get_tournament_results(self):
+    def get_tournament_results(self, game_index=None):
         """Return a Tournament_results object for this competition.
 
+        game_index -- game_index.Game_index or None
+
         The competition status must be set before you call this.
 
         (The returned object is 'live', in that it will see new results as they
@@ -497,9 +564,156 @@ def leading_zero_template(ceiling):
         zeros = len(str(ceiling-1))
         return "%%0%dd" % zeros
 
+def make_rng(seed, *keys):
+    """Return a random number generator determined by a seed and some keys.
+
+    seed -- int or None
+    keys -- ints or strings (eg a game number)
+
+    Returns a random.Random, or None if seed is None.
+
+    The same seed and keys always give the same sequence, on any platform
+    (the generator's seed is a SHA-1 hash of the seed and keys, rather than
+    anything involving Python's hash()). This lets tuners make reproducible
+    random choices for each game, whatever order the games are played in.
+
+    """
+    if seed is None:
+        return None
+    material = "/".join(str(v) for v in (seed,) + keys)
+    return random.Random(int(sha1(material).hexdigest(), 16))
+
+
+def _gcd(a, b):
+    # fractions.gcd isn't available before Python 2.6
+    while b:
+        a, b = b, a % b
+    return a
+
+class Opponent_pool(object):
+    """A weighted pool of opponents for a tuning event.
+
+    Instantiate with a list of pairs (game_jobs.Player, weight), where the
+    weights are positive integers.
+
+    Public attributes:
+      players      -- list of game_jobs.Players
+      weights      -- list of ints, parallel to players
+      cycle_length -- int
+
+    Games are shared between the opponents in proportion to their weights,
+    following a fixed cycle (built by smooth weighted round-robin), so any run
+    of consecutive games is spread across the opponents as evenly as the
+    weights allow. The cycle's length is the total of the weights, after
+    dividing them by any common factor. Any run of a multiple of cycle_length
+    consecutive games plays each opponent in exact proportion to the weights,
+    so a candidate's plain win rate over such a run is its win rate against
+    the pool, weighted by the opponents' weights.
+
+    """
+    def __init__(self, players_and_weights):
+        if not players_and_weights:
+            raise ValueError
+        self.players = [player for (player, _) in players_and_weights]
+        self.weights = [weight for (_, weight) in players_and_weights]
+        divisor = reduce(_gcd, self.weights)
+        weights = [weight // divisor for weight in self.weights]
+        total = sum(weights)
+        current = [0] * len(weights)
+        self._cycle = []
+        for _ in xrange(total):
+            for i, weight in enumerate(weights):
+                current[i] += weight
+            chosen = current.index(max(current))
+            current[chosen] -= total
+            self._cycle.append(chosen)
+        self.cycle_length = total
+
+    def __len__(self):
+        return len(self.players)
+
+    def get_opponent(self, index):
+        """Return the opponent to use for the game with the specified index.
+
+        index -- nonnegative int (eg a game number)
+
+        Returns a game_jobs.Player.
+
+        """
+        return self.players[self._cycle[index % len(self._cycle)]]
+
+    def get_player(self, code):
+        """Return the opponent with the specified player code, or None."""
+        for player in self.players:
+            if player.code == code:
+                return player
+        return None
+
+def make_opponent_pool(players, opponent, opponents):
+    """Make an Opponent_pool from the tuners' opponent settings.
+
+    players   -- map player code -> game_jobs.Player
+    opponent  -- player code, or None
+    opponents -- list of pairs (player code, weight), or None
+
+    Exactly one of 'opponent' and 'opponents' must be set.
+
+    Raises ControlFileError if the settings are invalid.
+
+    Returns an Opponent_pool.
+
+    """
+    if opponent is None:
+        if opponents is None:
+            raise ControlFileError("'opponent' not specified")
+        if not opponents:
+            raise ControlFileError("opponents: empty map")
+        setting_name = "opponents"
+        codes_and_weights = opponents
+    else:
+        if opponents is not None:
+            raise ControlFileError(
+                "opponent: can't be used together with 'opponents'")
+        setting_name = "opponent"
+        codes_and_weights = [(opponent, 1)]
+    players_and_weights = []
+    for code, weight in codes_and_weights:
+        try:
+            players_and_weights.append((players[code], weight))
+        except KeyError:
+            raise ControlFileError(
+                "%s: unknown player %s" % (setting_name, code))
+    return Opponent_pool(players_and_weights)
+
 
 ## Common settings
 
+class Adjudication_config(Quiet_config):
+    """Adjudication description for use in control files."""
+    # positional or keyword
+    positional_arguments = ('margin',)
+    # keyword-only
+    keyword_arguments = ('min_moves', 'interval', 'checks')
+    type_name = "Adjudicate"
+
+_adjudication_settings = [
+    Setting('margin', interpret_float),
+    Setting('min_moves', interpret_int, default=100),
+    Setting('interval', interpret_positive_int, default=10),
+    Setting('checks', interpret_positive_int, default=3),
+    ]
+
+def interpret_adjudication(v):
+    """Interpreter for the 'adjudication' game setting.
+
+    Accepts an Adjudicate config object, and returns a gameplay.Adjudication.
+
+    """
+    if not isinstance(v, Adjudication_config):
+        raise ValueError("not an Adjudicate")
+    interpreted = load_settings(_adjudication_settings, v.resolve_arguments())
+    return gameplay.Adjudication(**interpreted)
+
 game_settings = [
     Setting('board_size', interpret_board_size),
     Setting('komi', interpret_float),
@@ -509,5 +723,6 @@ game_settings = [
     Setting('scorer', interpret_enum('internal', 'players'), default='players'),
     Setting('internal_scorer_handicap_compensation',
             interpret_enum('no', 'full', 'short'), default='full'),
+    Setting('adjudication', allow_none(interpret_adjudication), default=None),
     ]
 
@@ -0,0 +1,273 @@
+"""On-disk index of a competition's game results.
+
+The ringmaster maintains the index as games finish, so that tools can find
+particular games without unpickling the competition state or scanning the game
+record directory.
+
+This uses sqlite3 from the standard library. If it isn't available,
+is_supported() returns False and the index isn't maintained.
+
+"""
+
+from __future__ import with_statement
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+# Bump this if the schema changes; older indexes are discarded and rebuilt.
+schema_version = 1
+
+_schema = """\
+CREATE TABLE games (
+  game_id        TEXT PRIMARY KEY,
+  matchup_id     TEXT,
+  player_b       TEXT,
+  player_w       TEXT,
+  winning_player TEXT,
+  losing_player  TEXT,
+  sgf_result     TEXT,
+  detail         TEXT,
+  is_forfeit     INTEGER,
+  sgf_filename   TEXT,
+  cpu_time_b     REAL,
+  cpu_time_w     REAL
+);
+CREATE INDEX games_matchup_id ON games (matchup_id);
+CREATE INDEX games_player_b ON games (player_b);
+CREATE INDEX games_player_w ON games (player_w);
+"""
+
+_columns = ("game_id, matchup_id, player_b, player_w, winning_player, "
+            "losing_player, sgf_result, detail, is_forfeit, sgf_filename, "
+            "cpu_time_b, cpu_time_w")
+
+
+class GameIndexError(StandardError):
+    """Error reading or writing a game index."""
+
+
+def is_supported():
+    """Say whether game indexes are available (ie, sqlite3 is present)."""
+    return sqlite3 is not None
+
+
+class Indexed_game(object):
+    """Description of a game, as recorded in the index.
+
+    Public attributes:
+      game_id        -- string
+      matchup_id     -- string
+      player_b       -- player code
+      player_w       -- player code
+      winning_player -- player code or None
+      losing_player  -- player code or None
+      sgf_result     -- string describing the game's result (for sgf RE)
+      detail         -- additional information (string or None)
+      is_forfeit     -- bool
+      sgf_filename   -- string or None
+      cpu_times      -- map player code -> float or None
+
+    sgf_filename is the filename (without directory) of the game record, or
+    None if the game wasn't recorded.
+
+    Winning/losing player are None for a jigo or unknown result.
+
+    """
+    def __repr__(self):
+        return "<Indexed_game: %s>" % self.game_id
+
+    @classmethod
+    def from_game_result(cls, matchup_id, game_result, sgf_filename=None):
+        """Make an Indexed_game from a gtp_games.Game_result.
+
+        The Game_result must have game_id set.
+
+        """
+        result = cls()
+        result.game_id = game_result.game_id
+        result.matchup_id = matchup_id
+        result.player_b = game_result.player_b
+        result.player_w = game_result.player_w
+        result.winning_player = game_result.winning_player
+        result.losing_player = game_result.losing_player
+        result.sgf_result = game_result.sgf_result
+        result.detail = game_result.detail
+        result.is_forfeit = game_result.is_forfeit
+        result.sgf_filename = sgf_filename
+        result.cpu_times = game_result.cpu_times.copy()
+        return result
+
+    @classmethod
+    def _from_row(cls, row):
+        result = cls()
+        (result.game_id, result.matchup_id,
+         result.player_b, result.player_w,
+         result.winning_player, result.losing_player,
+         result.sgf_result, result.detail, is_forfeit,
+         result.sgf_filename, cpu_time_b, cpu_time_w) = row
+        result.is_forfeit = bool(is_forfeit)
+        result.cpu_times = {result.player_b : cpu_time_b,
+                            result.player_w : cpu_time_w}
+        return result
+
+    def _as_row(self):
+        return (self.game_id, self.matchup_id,
+                self.player_b, self.player_w,
+                self.winning_player, self.losing_player,
+                self.sgf_result, self.detail, int(self.is_forfeit),
+                self.sgf_filename,
+                self.cpu_times.get(self.player_b),
+                self.cpu_times.get(self.player_w))
+
+
+class Game_index(object):
+    """An on-disk index of game results.
+
+    Instantiate with the index pathname (or ':memory:').
+
+    Call open() before using any other methods.
+
+    All methods which access the database can raise GameIndexError.
+
+    """
+    def __init__(self, pathname):
+        self.pathname = pathname
+        self.connection = None
+
+    def open(self, create=True):
+        """Open the index.
+
+        create -- bool
+
+        If 'create' is true, creates the index if necessary; if the index was
+        created by an incompatible version of gomill, its contents are
+        discarded.
+
+        If 'create' is false, raises GameIndexError if the index doesn't exist
+        or is incompatible.
+
+        """
+        if sqlite3 is None:
+            raise GameIndexError("sqlite3 is not available")
+        try:
+            self.connection = sqlite3.connect(self.pathname)
+            self.connection.text_factory = str
+            version, = self.connection.execute(
+                "PRAGMA user_version").fetchone()
+            if version != schema_version:
+                if not create:
+                    self.connection.close()
+                    self.connection = None
+                    raise GameIndexError("incompatible game index")
+                self.connection.execute("DROP TABLE IF EXISTS games")
+                self.connection.executescript(_schema)
+                self.connection.execute(
+                    "PRAGMA user_version = %d" % schema_version)
+                self.connection.commit()
+        except sqlite3.Error, e:
+            self.connection = None
+            raise GameIndexError(str(e))
+
+    def close(self):
+        """Close the index."""
+        if self.connection is None:
+            return
+        try:
+            self.connection.close()
+        except sqlite3.Error, e:
+            raise GameIndexError(str(e))
+        finally:
+            self.connection = None
+
+    def add_game(self, indexed_game):
+        """Add a game to the index, replacing any entry with the same game id.
+
+        indexed_game -- Indexed_game
+
+        """
+        try:
+            with self.connection:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO games VALUES "
+                    "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    indexed_game._as_row())
+        except sqlite3.Error, e:
+            raise GameIndexError(str(e))
+
+    def replace_all(self, indexed_games):
+        """Replace the contents of the index.
+
+        indexed_games -- iterable of Indexed_games
+
+        """
+        try:
+            with self.connection:
+                self.connection.execute("DELETE FROM games")
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO games VALUES "
+                    "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (game._as_row() for game in indexed_games))
+        except sqlite3.Error, e:
+            raise GameIndexError(str(e))
+
+    def count_games(self):
+        """Return the number of games in the index."""
+        try:
+            count, = self.connection.execute(
+                "SELECT COUNT(*) FROM games").fetchone()
+        except sqlite3.Error, e:
+            raise GameIndexError(str(e))
+        return count
+
+    def get_game(self, game_id):
+        """Find the game with the specified id.
+
+        Returns an Indexed_game, or None if there's no such game.
+
+        """
+        try:
+            row = self.connection.execute(
+                "SELECT %s FROM games WHERE game_id = ?" % _columns,
+                (game_id,)).fetchone()
+        except sqlite3.Error, e:
+            raise GameIndexError(str(e))
+        if row is None:
+            return None
+        return Indexed_game._from_row(row)
+
+    def find_games(self, matchup_id=None, player=None, winner=None,
+                   forfeits_only=False):
+        """Find games matching the specified criteria.
+
+        matchup_id    -- only games from this matchup
+        player        -- only games in which this player took part
+        winner        -- only games won by this player
+        forfeits_only -- bool: only forfeited games
+
+        Returns a list of Indexed_games, in the order they were added.
+
+        """
+        conditions = []
+        params = []
+        if matchup_id is not None:
+            conditions.append("matchup_id = ?")
+            params.append(matchup_id)
+        if player is not None:
+            conditions.append("(player_b = ? OR player_w = ?)")
+            params += [player, player]
+        if winner is not None:
+            conditions.append("winning_player = ?")
+            params.append(winner)
+        if forfeits_only:
+            conditions.append("is_forfeit")
+        sql = "SELECT %s FROM games" % _columns
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY rowid"
+        try:
+            rows = self.connection.execute(sql, params).fetchall()
+        except sqlite3.Error, e:
+            raise GameIndexError(str(e))
+        return [Indexed_game._from_row(row) for row in rows]
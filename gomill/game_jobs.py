@@ -112,6 +112,8 @@ class Game_job(object):
       game_data           -- arbitrary pickleable data
       handicap            -- int
       handicap_is_free    -- bool (default False)
+      opening             -- openings.Opening
+      adjudication        -- gameplay.Adjudication
       use_internal_scorer -- bool (default True)
       internal_scorer_handicap_compensation -- 'no' , 'short', or 'full'
                              (default 'no')
@@ -131,6 +133,9 @@ class Game_job(object):
     game_data is returned in the job result. It's provided as a convenient way
     to pass a small amount of information from get_job() to process_response().
 
+    If opening is set, the game starts from the opening's position (handicap
+    must not be set as well).
+
     If use_internal_scorer is False, the Players' is_reliable_scorer attributes
     are used to determine who scores the game (see errors.rst).
 
@@ -156,6 +161,8 @@ class Game_job(object):
     def __init__(self):
         self.handicap = None
         self.handicap_is_free = False
+        self.opening = None
+        self.adjudication = None
         self.sgf_filename = None
         self.sgf_dirname = None
         self.void_sgf_dirname = None
@@ -237,6 +244,7 @@ class Game_job(object):
             raise job_manager.JobFailed("error creating game: %s" % e)
         if self.use_internal_scorer:
             game.use_internal_scorer(self.internal_scorer_handicap_compensation)
+        game.set_adjudication(self.adjudication)
 
         if self.gtp_log_pathname is not None:
             gtp_log_file = open(self.gtp_log_pathname, "w")
@@ -255,6 +263,11 @@ class Game_job(object):
                     game.set_handicap(self.handicap, self.handicap_is_free)
                 except ValueError:
                     raise BadGtpResponse("invalid handicap")
+            elif self.opening is not None:
+                try:
+                    game.set_opening(self.opening)
+                except ValueError, e:
+                    raise BadGtpResponse("invalid opening: %s" % e)
             game.run()
         except (GtpChannelError, BadGtpResponse), e:
             game_controller.close_players()
@@ -300,6 +313,7 @@ class Game_job(object):
           game id
           date and time
           result description (except in zero-move games)
+          opening name
           sgf_note
           cpu times
           engine descriptions
@@ -326,6 +340,8 @@ class Game_job(object):
             ]
         if game.result is not None and root is not last_node:
             notes.append("Result %s" % game.result.describe())
+        if self.opening is not None:
+            notes.append("Opening %s" % self.opening.name)
         if self.sgf_note is not None:
             notes.append(self.sgf_note)
         if game.result is not None:
@@ -43,13 +43,14 @@ class Game(object):
       seen_resignation -- bool
       seen_claim       -- bool
       seen_forfeit     -- bool
+      seen_adjudication -- bool
       hit_move_limit   -- bool
       winner           -- colour or None
       forfeit_reason   -- string or None
 
     When is_over is true, exactly one of the other boolean attributes is true.
-    winner is set for seen_resignation, seen_claim, and seen_forfeit, but not
-    for passed_out or hit_move_limit.
+    winner is set for seen_resignation, seen_claim, seen_forfeit, and
+    seen_adjudication, but not for passed_out or hit_move_limit.
 
     move_count is the number of moves already played. Passes are included;
     illegal moves are not.
@@ -70,6 +71,7 @@ class Game(object):
         self.seen_resignation = False
         self.seen_claim = False
         self.seen_forfeit = False
+        self.seen_adjudication = False
         self.hit_move_limit = False
         self.winner = None
         self.forfeit_reason = None
@@ -142,6 +144,18 @@ class Game(object):
         self.forfeit_reason = reason
         self._set_over()
 
+    def record_adjudication(self, winner):
+        """Record that the game has been adjudicated as a win.
+
+        winner -- colour
+
+        """
+        if self.is_over:
+            raise GameStateError("game is already over")
+        self.winner = winner
+        self.seen_adjudication = True
+        self._set_over()
+
     def record_move(self, colour, move):
         """Record that a move or pass has been played.
 
@@ -305,16 +319,21 @@ class Result(object):
       losing_colour  -- 'b', 'w', or None
       is_jigo        -- bool
       is_forfeit     -- bool
+      is_adjudicated -- bool
       is_unknown     -- bool
       sgf_result     -- string describing the game's result (for sgf RE)
       detail         -- additional information (string or None)
 
     Winning/losing colour are None for a jigo, unknown result, or void game.
 
+    is_adjudicated means the game was ended early by adjudication (see
+    Game_runner.set_adjudication()).
+
     """
     def __init__(self):
         self.is_jigo = False
         self.is_forfeit = False
+        self.is_adjudicated = False
         self.detail = None
 
     def _set_winning_colour(self, colour):
@@ -406,11 +425,59 @@ class Result(object):
             result.sgf_result += "F"
             result.is_forfeit = True
             result.detail = game.forfeit_reason
+        elif game.seen_adjudication:
+            # Leave SGF result in form 'B+'
+            result.is_adjudicated = True
+            result.detail = "adjudicated"
         else:
             raise AssertionError
         return result
 
 
+class Adjudication(object):
+    """Settings for ending decided games early.
+
+    Public attributes:
+      margin    -- int or float
+      min_moves -- int
+      interval  -- int
+      checks    -- int
+
+    Instantiate with margin, and optionally the other attributes as keyword
+    arguments (defaults: min_moves 100, interval 10, checks 3).
+
+    Once min_moves moves have been played, the game is scored after every
+    'interval' moves (see Backend.estimate_score()). If the same player has
+    been ahead by at least 'margin' points at 'checks' successive scorings,
+    that player wins the game by adjudication.
+
+    Adjudications are suitable for pickling.
+
+    """
+    def __init__(self, margin, min_moves=100, interval=10, checks=3):
+        if margin <= 0:
+            raise ValueError("margin must be positive")
+        if min_moves < 0:
+            raise ValueError("min_moves must not be negative")
+        if interval < 1:
+            raise ValueError("interval must be positive")
+        if checks < 1:
+            raise ValueError("checks must be positive")
+        self.margin = margin
+        self.min_moves = min_moves
+        self.interval = interval
+        self.checks = checks
+
+    def __repr__(self):
+        return ("<Adjudication: margin=%s min_moves=%d interval=%d checks=%d>"
+                % (self.margin, self.min_moves, self.interval, self.checks))
+
+    def is_check_due(self, move_count):
+        """Say whether the game should be scored after this many moves."""
+        return (move_count >= self.min_moves and
+                (move_count - self.min_moves) % self.interval == 0)
+
+
 class Diagnostics(object):
     """Message text received from a player."""
     def __init__(self, colour, message):
@@ -488,6 +555,19 @@ class Backend(object):
         """
         raise NotImplementedError
 
+    def notify_opening(self, colour, plays):
+        """Inform one player of the opening position.
+
+        colour -- player to inform
+        plays  -- list of pairs (colour, move)
+                  moves are (row, col), or None for a pass
+
+        The plays include the opening's setup stones, followed by its moves
+        (see openings.Opening.get_plays()).
+
+        """
+        raise NotImplementedError
+
     def get_move(self, colour):
         """Ask a player for its move.
 
@@ -535,6 +615,22 @@ class Backend(object):
         """
         raise NotImplementedError
 
+    def estimate_score(self, board):
+        """Score an unfinished game, for adjudication.
+
+        board -- boards.Board
+
+        Returns a Game_score, or None if no score is available.
+
+        This is called during the game (between moves), only if adjudication
+        has been requested.
+
+        There is a default implementation, which always returns None (so games
+        are never adjudicated).
+
+        """
+        return None
+
     def get_last_move_comment(self, colour):
         """Retrieve any comment a player has about its most recent move.
 
@@ -566,8 +662,9 @@ class Game_runner(object):
       runner = Game_runner(...)
       runner.set_move_callback(...) [optional]
       runner.set_result_class(...) [optional]
+      runner.set_adjudication(...) [optional]
       runner.prepare()
-      runner.set_handicap(...) [optional]
+      runner.set_handicap(...) or runner.set_opening(...) [optional]
       runner.run()
       runner.make_sgf()
 
@@ -584,6 +681,9 @@ class Game_runner(object):
     If a player rejects its opponent's move as illegal, we assume it is correct
     and the opponent forfeits the game.
 
+    If adjudication is set, the game may also end with a win for a player who
+    is far enough ahead (see Adjudication).
+
     """
 
     def __init__(self, backend, board_size, komi=0, move_limit=None):
@@ -595,6 +695,10 @@ class Game_runner(object):
         self.result_class = Result
         self.additional_sgf_props = []
         self.handicap_stones = None
+        self.opening = None
+        self.adjudication = None
+        self._adjudication_leader = None
+        self._adjudication_count = 0
         self.moves = []
         self.final_diagnostics = None
         self.game_score = None
@@ -633,6 +737,19 @@ class Game_runner(object):
         """
         self.result_class = cls
 
+    def set_adjudication(self, adjudication):
+        """Specify settings for ending decided games early.
+
+        adjudication -- Adjudication or None
+
+        The scores come from the backend's estimate_score() method. The move
+        counts don't include any moves from an opening (see set_opening()).
+
+        """
+        if self._state > 2:
+            raise GameRunnerStateError
+        self.adjudication = adjudication
+
     def prepare(self):
         """Perform any initialisation needed by the backend.
 
@@ -677,16 +794,40 @@ class Game_runner(object):
         self.additional_sgf_props.append(('HA', handicap))
         self.handicap_stones = points
 
+    def set_opening(self, opening):
+        """Arrange for the game to start from a given position.
+
+        opening -- openings.Opening
+
+        Raises ValueError if the opening is for a different board size.
+
+        Propagates any exceptions from the backend notify_opening() method.
+
+        """
+        if self._state != 1:
+            raise GameRunnerStateError
+        if opening.board_size != self.board_size:
+            raise ValueError("opening is for the wrong board size")
+        self._state = 2
+        plays = opening.get_plays()
+        for colour in "b", "w":
+            self.backend.notify_opening(colour, plays)
+        self.opening = opening
+
     def _set_final_diagnostics(self, colour, comment):
         if comment is not None:
             self.final_diagnostics = Diagnostics(colour, comment)
 
     def _make_game(self):
-        board = boards.Board(self.board_size)
-        if self.handicap_stones:
+        if self.opening is not None:
+            board = self.opening.make_board()
+            first_player = self.opening.get_next_player()
+        elif self.handicap_stones:
+            board = boards.Board(self.board_size)
             board.apply_setup(self.handicap_stones, [], [])
             first_player = 'w'
         else:
+            board = boards.Board(self.board_size)
             first_player = 'b'
         game = Game(board, first_player)
         game.set_move_limit(self.move_limit)
@@ -742,6 +883,25 @@ class Game_runner(object):
         if self.after_move_callback:
             self.after_move_callback(colour=colour, move=move, board=game.board)
 
+        if (self.adjudication is not None and not game.is_over and
+            self.adjudication.is_check_due(game.move_count)):
+            self._check_adjudication(game)
+
+    def _check_adjudication(self, game):
+        score = self.backend.estimate_score(game.board)
+        if (score is None or score.winner is None or score.margin is None or
+            score.margin < self.adjudication.margin):
+            self._adjudication_leader = None
+            self._adjudication_count = 0
+            return
+        if score.winner == self._adjudication_leader:
+            self._adjudication_count += 1
+        else:
+            self._adjudication_leader = score.winner
+            self._adjudication_count = 1
+        if self._adjudication_count >= self.adjudication.checks:
+            game.record_adjudication(score.winner)
+
     def _set_result(self, game):
         if game.passed_out:
             self.game_score = self.backend.score_game(game.board)
@@ -758,6 +918,7 @@ class Game_runner(object):
           get_move()
           notify_move()
           score_game()
+          estimate_score()
           get_last_move_comment()
           end_game()
 
@@ -819,10 +980,12 @@ class Game_runner(object):
           DT AP SZ KM
           HA (if there was a handicap)
           RE (if the result is known)
+          AB AW (if there was a handicap or opening)
 
         Doesn't set a root node comment. Doesn't put result.detail anywhere.
 
-        The moves described are the same as those from get_moves().
+        The moves described are the same as those from get_moves(), preceded by
+        any opening moves.
 
         Anything returned by backend.get_last_move_comment() is used as a
         comment on the corresponding move (in the final node for comments on
@@ -840,6 +1003,15 @@ class Game_runner(object):
         sgf_game.set_date()
         if self.handicap_stones:
             root.set_setup_stones(black=self.handicap_stones, white=[])
+        if self.opening is not None:
+            if self.opening.black_points or self.opening.white_points:
+                root.set_setup_stones(black=self.opening.black_points,
+                                      white=self.opening.white_points)
+            for colour, move in self.opening.moves:
+                sgf_game.extend_main_sequence().set_move(colour, move)
+            if self.opening.moves:
+                sgf_game.get_last_node().set(
+                    "C", "end of opening %s" % self.opening.name)
         for colour, move, comment in self.moves:
             node = sgf_game.extend_main_sequence()
             node.set_move(colour, move)
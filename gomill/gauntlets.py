@@ -0,0 +1,339 @@
+"""Competitions for gauntlet tournaments."""
+
+import errno
+
+from gomill import ascii_tables
+from gomill import game_jobs
+from gomill import competitions
+from gomill import ratings
+from gomill import results_tables
+from gomill import stopping_rules
+from gomill import tournaments
+from gomill.competitions import (
+    Competition, CompetitionError, ControlFileError)
+from gomill.settings import *
+from gomill.utils import format_float
+
+
+class Gauntlet_player(object):
+    """Internal description of a candidate or reference player.
+
+    Public attributes:
+      player      -- player code
+      short_code  -- eg 'A' or 'ZZ' for candidates, '1' for references
+
+    """
+    def __init__(self, player, short_code):
+        self.player = player
+        self.short_code = short_code
+
+
+def _candidate_short_code(i):
+    def let(n):
+        return chr(ord('A') + n)
+    if i < 26:
+        return let(i)
+    elif i < 26*27:
+        n, m = divmod(i, 26)
+        return let(n-1) + let(m)
+    else:
+        raise ValueError("too many candidates")
+
+
+class Gauntlet(tournaments.Tournament):
+    """A Tournament in which candidates play each member of a reference pool.
+
+    The game ids are like Av2_5, where A is the candidate's short code, 2 is
+    the reference's short code, and 5 is the game number between them. Games
+    between two references (if any are needed) have ids like 1v2_5.
+
+    Results between references are taken from the reference_results files
+    where possible; only the shortfall from reference_games is played.
+
+    """
+
+    # Gauntlets are mostly run with early stopping, so share out games by
+    # default.
+    default_adaptive_scheduling = True
+
+    def control_file_globals(self):
+        result = Competition.control_file_globals(self)
+        result.update(stopping_rules.control_file_globals)
+        return result
+
+    special_settings = [
+        Setting('candidates', interpret_sequence),
+        Setting('references', interpret_sequence),
+        Setting('reference_results',
+                interpret_sequence_of(interpret_8bit_string), default=[]),
+        Setting('reference_games', interpret_int, default=0),
+        ]
+
+    def _load_player_list(self, setting_name, codes, make_short_code, seen):
+        result = []
+        if not codes:
+            raise ControlFileError("%s: empty list" % setting_name)
+        for i, player in enumerate(codes):
+            if player not in self.players:
+                raise ControlFileError(
+                    "%s: unknown player %s" % (setting_name, player))
+            if player in seen:
+                raise ControlFileError("duplicate player: %s" % player)
+            seen.add(player)
+            try:
+                short_code = make_short_code(i)
+            except ValueError, e:
+                raise ControlFileError("%s: %s" % (setting_name, e))
+            result.append(Gauntlet_player(player, short_code))
+        return result
+
+    def _load_reference_results(self, pathnames):
+        """Read the reference-vs-reference games from the results files.
+
+        Files which don't exist are treated as empty.
+
+        Sets stored_results (a Results_table) and stored_game_counts (map
+        pair of player codes -> int).
+
+        """
+        references = set(r.player for r in self.references)
+        table = results_tables.Results_table([], [])
+        for pathname in pathnames:
+            try:
+                f = open(self.resolve_pathname(pathname))
+            except EnvironmentError, e:
+                if e.errno == errno.ENOENT:
+                    continue
+                raise ControlFileError(
+                    "reference_results: can't open %s: %s" %
+                    (pathname, e.strerror))
+            try:
+                try:
+                    table.read_jsonl(f)
+                except EnvironmentError, e:
+                    raise ControlFileError(
+                        "reference_results: error reading %s: %s" %
+                        (pathname, e.strerror))
+                except ValueError, e:
+                    raise ControlFileError(
+                        "reference_results: %s: %s" % (pathname, e))
+            finally:
+                f.close()
+        players = table.players
+        rows = [i for i in xrange(len(table))
+                if players[table.player_b[i]] in references and
+                   players[table.player_w[i]] in references and
+                   table.outcome[i] != results_tables.UNKNOWN]
+        self.stored_results = table.take(rows)
+        self.stored_game_counts = {}
+        for i in rows:
+            pair = tuple(sorted((players[table.player_b[i]],
+                                 players[table.player_w[i]])))
+            self.stored_game_counts[pair] = \
+                self.stored_game_counts.get(pair, 0) + 1
+
+    @staticmethod
+    def _get_matchup_id(p1, p2):
+        return "%sv%s" % (p1.short_code, p2.short_code)
+
+    def initialise_from_control_file(self, config):
+        Competition.initialise_from_control_file(self, config)
+
+        matchup_settings = [
+            setting for setting in competitions.game_settings
+            if setting.name not in ('handicap', 'handicap_style')
+            ] + [
+            Setting('games_per_opponent', allow_none(interpret_int),
+                    default=None),
+            Setting('stopping_rule',
+                    allow_none(stopping_rules.interpret_stopping_rule),
+                    default=None),
+            Setting('opening_book',
+                    allow_none(interpret_sequence_of(interpret_8bit_string)),
+                    default=None),
+            Setting('paired_games', interpret_bool, default=False),
+            ]
+        try:
+            matchup_parameters = load_settings(matchup_settings, config)
+        except ValueError, e:
+            raise ControlFileError(str(e))
+        matchup_parameters['alternating'] = True
+        matchup_parameters['number_of_games'] = \
+            matchup_parameters.pop('games_per_opponent')
+
+        try:
+            specials = load_settings(self.special_settings, config)
+        except ValueError, e:
+            raise ControlFileError(str(e))
+        if specials['reference_games'] < 0:
+            raise ControlFileError("reference_games: must not be negative")
+        self.load_scheduling_settings(config)
+
+        seen = set()
+        # lists of Gauntlet_players
+        self.candidates = self._load_player_list(
+            'candidates', specials['candidates'], _candidate_short_code, seen)
+        self.references = self._load_player_list(
+            'references', specials['references'], lambda i: str(i+1), seen)
+        self.reference_games = specials['reference_games']
+        self._load_reference_results(specials['reference_results'])
+
+        # map matchup_id -> Matchup
+        self.matchups = {}
+        # Matchups in order of definition
+        self.matchup_list = []
+        def add_matchup(p1, p2, parameters):
+            try:
+                m = self.make_matchup(
+                    self._get_matchup_id(p1, p2),
+                    p1.player, p2.player, parameters)
+            except StandardError, e:
+                raise ControlFileError("%s v %s: %s" %
+                                       (p1.player, p2.player, e))
+            self.matchups[m.id] = m
+            self.matchup_list.append(m)
+        for candidate in self.candidates:
+            for reference in self.references:
+                add_matchup(candidate, reference, matchup_parameters)
+        if self.reference_games:
+            reference_parameters = matchup_parameters.copy()
+            reference_parameters['stopping_rule'] = None
+            for r1_i, r1 in enumerate(self.references):
+                for r2 in self.references[r1_i+1:]:
+                    stored = self.stored_game_counts.get(
+                        tuple(sorted((r1.player, r2.player))), 0)
+                    reference_parameters['number_of_games'] = max(
+                        0, self.reference_games - stored)
+                    add_matchup(r1, r2, reference_parameters)
+
+
+    # Can bump this to prevent people loading incompatible .status files.
+    status_format_version = 1
+
+    def get_status(self):
+        result = tournaments.Tournament.get_status(self)
+        result['candidates'] = [c.player for c in self.candidates]
+        result['references'] = [r.player for r in self.references]
+        return result
+
+    def set_status(self, status):
+        for name, current in (('candidates', self.candidates),
+                              ('references', self.references)):
+            seen = status[name]
+            if [p.player for p in current[:len(seen)]] != seen:
+                raise CompetitionError(
+                    "%s have changed in the control file" % name)
+        tournaments.Tournament.set_status(self, status)
+
+
+    def get_player_checks(self):
+        result = []
+        matchup = self.matchup_list[0]
+        for p in self.candidates + self.references:
+            check = game_jobs.Player_check()
+            check.player = self.players[p.player]
+            check.board_size = matchup.board_size
+            check.komi = matchup.komi
+            result.append(check)
+        return result
+
+
+    def count_games_played(self):
+        """Return the total number of games completed."""
+        return sum(len(l) for l in self.results.values())
+
+    def count_games_expected(self):
+        """Return the total number of games required.
+
+        Matchups which have been stopped early count as the number of games
+        they played.
+
+        Returns None if no limit has been set.
+
+        """
+        total = 0
+        for matchup in self.matchup_list:
+            if matchup.id in self.stopped_matchups:
+                total += len(self.results[matchup.id])
+            elif matchup.number_of_games is None:
+                return None
+            else:
+                total += matchup.number_of_games
+        return total
+
+    def get_ratings(self):
+        """Fit Elo ratings to this gauntlet's results and the stored results.
+
+        Returns a ratings.Ratings object.
+
+        """
+        fitter = ratings.Rating_fitter()
+        for accumulator in self.stats_accumulators.itervalues():
+            accumulator.add_to_rating_fitter(fitter)
+        self.stored_results.add_to_rating_fitter(fitter)
+        return fitter.fit()
+
+    def write_screen_report(self, out):
+        expected = self.count_games_expected()
+        if expected is not None:
+            print >>out, "%d/%d games played" % (
+                self.count_games_played(), expected)
+        else:
+            print >>out, "%d games played" % self.count_games_played()
+        if len(self.stored_results):
+            print >>out, "%d reference games from stored results" % (
+                len(self.stored_results))
+        print >>out
+
+        t = ascii_tables.Table(row_count=len(self.candidates))
+        t.add_heading("") # candidate short_code
+        i = t.add_column(align='left')
+        t.set_column_values(i, (c.short_code for c in self.candidates))
+
+        t.add_heading("") # candidate player code
+        i = t.add_column(align='left')
+        t.set_column_values(i, (c.player for c in self.candidates))
+
+        any_stopped = False
+        for reference in self.references:
+            t.add_heading(" " + reference.short_code)
+            i = t.add_column(align='left')
+            column_values = []
+            for candidate in self.candidates:
+                matchup_id = self._get_matchup_id(candidate, reference)
+                ms = self._get_matchup_stats(
+                    matchup_id, candidate.player, reference.player)
+                s = "%s-%s" % (format_float(ms.wins_1),
+                               format_float(ms.wins_2))
+                if matchup_id in self.stopped_matchups:
+                    s += "*"
+                    any_stopped = True
+                column_values.append(s)
+            t.set_column_values(i, column_values)
+        print >>out, "\n".join(t.render())
+        print >>out
+        for reference in self.references:
+            print >>out, "%s %s" % (reference.short_code, reference.player)
+        if any_stopped:
+            print >>out, "* stopped early"
+
+    def write_short_report(self, out):
+        def p(s):
+            print >>out, s
+        p("gauntlet: %s" % self.competition_code)
+        if self.description:
+            p(self.description)
+        p('')
+        self.write_screen_report(out)
+        p('')
+        if self.count_games_played() or len(self.stored_results):
+            p("ratings:")
+            self.get_ratings().write_report(out)
+            p('')
+        self.write_matchup_reports(out)
+        self.write_ghost_matchup_reports(out)
+        p('')
+        self.write_player_descriptions(out)
+        p('')
+
+    write_full_report = write_short_report
@@ -539,53 +539,126 @@ class Gtp_controller(object):
         """
         if self.channel_is_closed:
             raise StandardError("channel is closed")
-
-        def fix_argument(argument):
-            if isinstance(argument, unicode):
-                return argument.encode("utf-8")
-            else:
-                return argument
-
-        fixed_command = fix_argument(command)
-        fixed_arguments = map(fix_argument, arguments)
-        translated_command = self.gtp_aliases.get(fixed_command, fixed_command)
-        is_first_command = self.is_first_command
-        self.is_first_command = False
-
-        def format_command():
-            desc = "%s" % (" ".join([translated_command] + fixed_arguments))
-            if is_first_command:
-                return "first command (%s)" % desc
-            else:
-                return "'%s'" % desc
-
+        translated_command, fixed_arguments, description = \
+            self._prepare_command(command, arguments)
         try:
             is_sending = True
             self.channel.send_command(translated_command, fixed_arguments)
             is_sending = False
             is_failure, response = self.channel.get_response()
         except GtpChannelError, e:
-            self.channel_is_bad = True
-            if isinstance(e, GtpTransportError):
-                error_label = "transport error"
-            elif isinstance(e, GtpProtocolError):
-                error_label = "GTP protocol error"
-            else:
-                error_label = "error"
-            if is_sending:
-                msg = "%s sending %s to %s:\n%s"
-            else:
-                msg = "%s reading response to %s from %s:\n%s"
-            e.args = (msg % (error_label, format_command(), self.name, e),)
+            self._note_channel_error(e, is_sending, description)
             raise
         if is_failure:
             raise BadGtpResponse(
                 "failure response from %s to %s:\n%s" %
-                (format_command(), self.name, response),
+                (description, self.name, response),
                 gtp_command=translated_command, gtp_arguments=fixed_arguments,
                 gtp_error_message=response)
         return response
 
+    def do_commands(self, commands):
+        """Send several commands to the engine, then read the responses.
+
+        commands -- list of sequences (command, argument, argument, ...)
+                    (command and arguments as for do_command)
+
+        Returns a list of the result texts (as for do_command), in the same
+        order as the commands.
+
+        This sends all the commands before reading any of the responses (GTP
+        permits this), so it waits for only one round trip to the engine. It's
+        intended for sequences of commands with short responses (eg, a series
+        of 'play' commands): if the responses filled the channel's buffer
+        before the commands had all been sent, the engine and controller could
+        deadlock.
+
+        If any of the engine's responses is a failure response, raises
+        BadGtpResponse describing the first of them (after reading all the
+        responses, so the channel is left ready for another command).
+
+        Raises ValueError, without sending anything, if any command or argument
+        contains a character forbidden in GTP.
+
+        Raises GtpChannelError variants as for do_command().
+
+        """
+        if self.channel_is_closed:
+            raise StandardError("channel is closed")
+        prepared = []
+        for command in commands:
+            translated_command, fixed_arguments, description = \
+                self._prepare_command(command[0], command[1:])
+            for word in [translated_command] + fixed_arguments:
+                if not is_well_formed_gtp_word(word):
+                    raise ValueError("bad command or argument: %r" % word)
+            prepared.append(
+                (translated_command, fixed_arguments, description))
+        responses = []
+        failure = None
+        try:
+            is_sending = True
+            for translated_command, fixed_arguments, description in prepared:
+                self.channel.send_command(translated_command, fixed_arguments)
+            is_sending = False
+            for translated_command, fixed_arguments, description in prepared:
+                is_failure, response = self.channel.get_response()
+                if is_failure and failure is None:
+                    failure = BadGtpResponse(
+                        "failure response from %s to %s:\n%s" %
+                        (description, self.name, response),
+                        gtp_command=translated_command,
+                        gtp_arguments=fixed_arguments,
+                        gtp_error_message=response)
+                responses.append(response)
+        except GtpChannelError, e:
+            # 'description' is for the command being sent or read
+            self._note_channel_error(e, is_sending, description)
+            raise
+        if failure is not None:
+            raise failure
+        return responses
+
+    def _prepare_command(self, command, arguments):
+        """Apply argument encoding and gtp aliases to a command.
+
+        Returns a tuple (translated command, arguments, description), where
+        description is a string identifying the command for use in error
+        messages.
+
+        """
+        def fix_argument(argument):
+            if isinstance(argument, unicode):
+                return argument.encode("utf-8")
+            else:
+                return argument
+
+        fixed_command = fix_argument(command)
+        fixed_arguments = map(fix_argument, arguments)
+        translated_command = self.gtp_aliases.get(fixed_command, fixed_command)
+        desc = "%s" % (" ".join([translated_command] + fixed_arguments))
+        if self.is_first_command:
+            description = "first command (%s)" % desc
+        else:
+            description = "'%s'" % desc
+        self.is_first_command = False
+        return translated_command, fixed_arguments, description
+
+    def _note_channel_error(self, e, is_sending, description):
+        """Mark the channel bad, and add context to a GtpChannelError."""
+        self.channel_is_bad = True
+        if isinstance(e, GtpTransportError):
+            error_label = "transport error"
+        elif isinstance(e, GtpProtocolError):
+            error_label = "GTP protocol error"
+        else:
+            error_label = "error"
+        if is_sending:
+            msg = "%s sending %s to %s:\n%s"
+        else:
+            msg = "%s reading response to %s from %s:\n%s"
+        e.args = (msg % (error_label, description, self.name, e),)
+
     def _known_command(self, command, do_command):
         """Common implementation for known_command and safe_known_command."""
         result = self.known_commands.get(command)
@@ -898,6 +971,7 @@ class Game_controller(object):
       gc.set_player_subprocess('w', ...) or set_player_controller('w', ...)
       Any combination of:
         gc.send_command(...)
+        gc.send_commands(...)
         gc.maybe_send_command(...)
         gc.known_command(...)
         higher-level helpers
@@ -1038,6 +1112,29 @@ class Game_controller(object):
         else:
             return controller.do_command(command, *arguments)
 
+    def send_commands(self, colour, commands):
+        """Send several GTP commands to one of the players.
+
+        colour   -- player to talk to ('b' or 'w')
+        commands -- list of sequences (command, argument, argument, ...)
+
+        Returns a list of the responses.
+
+        The commands are sent without waiting for each response (see
+        Gtp_controller.do_commands()), except in cautious mode, where they are
+        sent one at a time.
+
+        Raises BadGtpResponse as for send_command(), for the first command
+        which failed.
+
+        """
+        controller = self.controllers[colour]
+        if self.in_cautious_mode:
+            return [self.send_command(colour, *command)
+                    for command in commands]
+        else:
+            return controller.do_commands(commands)
+
     def maybe_send_command(self, colour, command, *arguments):
         """Send the specified GTP command, if supported.
 
@@ -62,6 +62,7 @@ class Game_result(gameplay.Result):
             self.is_forfeit,
             self.game_id,
             self.cpu_times,
+            self.is_adjudicated,
             )
 
     def __setstate__(self, state):
@@ -73,7 +74,12 @@ class Game_result(gameplay.Result):
          self.is_forfeit,
          self.game_id,
          cpu_times,
-         ) = state
+         ) = state[:8]
+        # Gomill 0.8 and earlier didn't have is_adjudicated
+        if len(state) > 8:
+            self.is_adjudicated = state[8]
+        else:
+            self.is_adjudicated = False
         # In gomill 0.7 and earlier, cpu_time could be '?'; treat this as None
         for colour, cpu_time in cpu_times.items():
             if cpu_time == '?':
@@ -236,6 +242,11 @@ class _Gtp_backend(gameplay.Backend):
                 "bad response from fixed_handicap command "
                 "to %s: %s" % (self.gc.players[colour], vertices))
 
+    def notify_opening(self, colour, plays):
+        self.gc.send_commands(
+            colour, [("play", move_colour, format_vertex(move))
+                     for move_colour, move in plays])
+
     def get_move(self, colour):
         if (self.claim_allowed[colour] and
             self.gc.known_command(colour, "gomill-genmove_ex")):
@@ -280,7 +291,10 @@ class _Gtp_backend(gameplay.Backend):
                 return 'error', str(e)
         return 'accept', None
 
-    def _score_game_gtp(self):
+    def _score_game_gtp(self, use_smallest_margin=False):
+        # If use_smallest_margin is true and the scorers agree on the winner
+        # but not the margin, the score has the smallest margin (if all the
+        # margins are known).
         winners = []
         margins = []
         raw_scores = []
@@ -312,6 +326,8 @@ class _Gtp_backend(gameplay.Backend):
             winner = winners[0]
             if len(set(margins)) == 1:
                 margin = margins[0]
+            elif use_smallest_margin and None not in margins:
+                margin = min(margins)
             else:
                 margin = None
         else:
@@ -325,6 +341,17 @@ class _Gtp_backend(gameplay.Backend):
             score.player_scores[colour] = raw_score
         return score
 
+    def estimate_score(self, board):
+        # Uses the same method as for scoring the finished game. The players
+        # are asked even if they're in the middle of the game.
+        if self.internal_scorer:
+            return Gtp_game_score.from_position(
+                board, self.komi, self.handicap_compensation, self.handicap)
+        elif self.allowed_scorers:
+            return self._score_game_gtp(use_smallest_margin=True)
+        else:
+            return None
+
     def score_game(self, board):
         if self.internal_scorer:
             game_score = Gtp_game_score.from_position(
@@ -350,8 +377,9 @@ class Gtp_game(object):
         game.use_internal_scorer() or game.allow_scorer(...)
         game.set_claim_allowed(...)
         game.set_move_callback(...)
+        game.set_adjudication(...)
       game.prepare()
-      game.set_handicap(...) [optional]
+      game.set_handicap(...) or game.set_opening(...) [optional]
       game.run()
       Any combination of:
         game.get_moves()
@@ -449,6 +477,25 @@ class Gtp_game(object):
         self.game_runner.set_move_callback(fn)
 
 
+    def set_adjudication(self, adjudication):
+        """Specify settings for ending decided games early.
+
+        adjudication -- gameplay.Adjudication or None
+
+        The game is scored during play using the same method as for the end
+        of the game (see use_internal_scorer() and allow_scorer()): either the
+        internal scorer, or 'final_score' commands sent to the allowed
+        scorers. If the game won't be scored, it is never adjudicated.
+
+        Adjudicated games have result.is_adjudicated set, and the detail
+        'adjudicated'; the SGF result is in the form 'B+'.
+
+        See gameplay.Adjudication for details.
+
+        """
+        self.game_runner.set_adjudication(adjudication)
+
+
     ## Game-running API
 
     def prepare(self):
@@ -483,6 +530,25 @@ class Gtp_game(object):
         self.backend.handicap = handicap
         self.game_runner.set_handicap(handicap, is_free)
 
+    def set_opening(self, opening):
+        """Arrange for the game to start from a given position.
+
+        opening -- openings.Opening
+
+        The opening's setup stones and moves are sent to both engines as 'play'
+        commands.
+
+        Raises ValueError if the opening is for a different board size.
+
+        Propagates BadGtpResponse if an engine returns a failure response to
+        any of the 'play' commands.
+
+        Propagates GtpChannelError if there is trouble communicating with an
+        engine.
+
+        """
+        self.game_runner.set_opening(opening)
+
     def run(self):
         """Run a complete game between the two players.
 
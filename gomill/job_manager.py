@@ -1,6 +1,7 @@
 """Job system supporting multiprocessing."""
 
 import sys
+from Queue import Empty
 
 from gomill import compact_tracebacks
 
@@ -63,10 +64,28 @@ def worker_run_jobs(job_queue, response_queue, worker_id):
 class Job_manager(object):
     def __init__(self):
         self.passed_exceptions = []
+        self.idle_interval = None
 
     def pass_exception(self, cls):
         self.passed_exceptions.append(cls)
 
+    def set_idle_interval(self, interval):
+        """Ask for the job source's process_idle() method to be called.
+
+        interval -- float (seconds), or None
+
+        If this is set, the job source's process_idle() method is called (with
+        no arguments) at roughly this interval while the job manager is waiting
+        for responses.
+
+        If process_idle() returns a true value, the job manager calls get_job()
+        again (if it has a free worker).
+
+        (In-process job managers never wait, so they ignore this.)
+
+        """
+        self.idle_interval = interval
+
 class Multiprocessing_job_manager(Job_manager):
     def __init__(self, number_of_workers):
         Job_manager.__init__(self)
@@ -110,7 +129,9 @@ class Multiprocessing_job_manager(Job_manager):
             if active_jobs == 0:
                 break
 
-            response = self.response_queue.get()
+            response = self._wait_for_response(job_source)
+            if response is None:
+                continue
             if isinstance(response, JobError):
                 try:
                     job_source.process_error_response(
@@ -135,6 +156,25 @@ class Multiprocessing_job_manager(Job_manager):
             active_jobs -= 1
             #sys.stderr.write("MGR: received response %s\n" % repr(response))
 
+    def _wait_for_response(self, job_source):
+        if self.idle_interval is None:
+            return self.response_queue.get()
+        while True:
+            try:
+                return self.response_queue.get(True, self.idle_interval)
+            except Empty:
+                pass
+            try:
+                if job_source.process_idle():
+                    return None
+            except Exception, e:
+                for cls in self.passed_exceptions:
+                    if isinstance(e, cls):
+                        raise
+                raise JobSourceError(
+                    "error from process_idle()\n%s" %
+                    compact_tracebacks.format_traceback(skip=1))
+
     def finish(self):
         for _ in range(self.number_of_workers):
             self.job_queue.put(worker_finish_signal)
@@ -191,7 +231,7 @@ class In_process_job_manager(Job_manager):
         pass
 
 def run_jobs(job_source, max_workers=None, allow_mp=True,
-             passed_exceptions=None):
+             passed_exceptions=None, idle_interval=None):
     if allow_mp:
         _initialise_multiprocessing()
         if multiprocessing is None:
@@ -205,6 +245,7 @@ def run_jobs(job_source, max_workers=None, allow_mp=True,
     if passed_exceptions:
         for cls in passed_exceptions:
             job_manager.pass_exception(cls)
+    job_manager.set_idle_interval(idle_interval)
     job_manager.start_workers()
     try:
         job_manager.run_jobs(job_source)
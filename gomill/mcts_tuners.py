@@ -4,7 +4,10 @@ from __future__ import division
 
 import operator
 import random
+import sys
+from array import array
 from heapq import nlargest
+from itertools import chain, izip
 from math import exp, log, sqrt
 
 from gomill import compact_tracebacks
@@ -18,45 +21,76 @@ from gomill.settings import *
 
 
 class Node(object):
-    """A MCTS node.
+    """A view of one node of a Tree.
 
-    Public attributes:
-      children     -- list of Nodes, or None for unexpanded
+    Public attributes (read-only):
+      index          -- the node's index in the Tree's arrays
+      children       -- list of Nodes, or None for unexpanded
       wins
       visits
-      value        -- wins / visits
-      rsqrt_visits -- 1 / sqrt(visits)
+      virtual_visits -- visits from simulations which haven't finished
+      value          -- wins / (visits + virtual_visits)
+      rsqrt_visits   -- 1 / sqrt(visits + virtual_visits)
+
+    Nodes don't hold any state of their own; all the statistics live in the
+    Tree.
 
     """
-    def count_tree_size(self):
-        if self.children is None:
-            return 1
-        return sum(child.count_tree_size() for child in self.children) + 1
-
-    def recalculate(self):
-        """Update value and rsqrt_visits from changed wins and visits."""
-        self.value = self.wins / self.visits
-        self.rsqrt_visits = sqrt(1/self.visits)
-
-    def __getstate__(self):
-        return (self.children, self.wins, self.visits)
-
-    def __setstate__(self, state):
-        self.children, self.wins, self.visits = state
-        self.recalculate()
-
-    __slots__ = (
-        'children',
-        'wins',
-        'visits',
-        'value',
-        'rsqrt_visits',
-        )
+    __slots__ = ('tree', 'index')
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def children(self):
+        first = self.tree._first_child[self.index]
+        if first < 0:
+            return None
+        return [Node(self.tree, i)
+                for i in xrange(first, first + self.tree.branching_factor)]
+
+    @property
+    def wins(self):
+        return self.tree._wins[self.index]
+
+    @property
+    def visits(self):
+        return self.tree._visits[self.index]
+
+    @property
+    def virtual_visits(self):
+        return self.tree._virtual_visits[self.index]
+
+    @property
+    def value(self):
+        return self.tree.get_value(self.index)
+
+    @property
+    def rsqrt_visits(self):
+        return sqrt(1/(self.visits + self.virtual_visits))
 
     def __repr__(self):
         return "<Node:%.2f{%s}>" % (self.value, repr(self.children))
 
 
+def _little_endian_bytes(a):
+    if sys.byteorder != 'little':
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tostring()
+
+def _array_from_little_endian_bytes(typecode, s):
+    a = array(typecode)
+    try:
+        a.fromstring(s)
+    except ValueError:
+        raise ValueError("bad array length")
+    if sys.byteorder != 'little':
+        a.byteswap()
+    return a
+
+
 class Tree(object):
     """A tree of MCTS nodes representing N-dimensional parameter space.
 
@@ -67,12 +101,23 @@ class Tree(object):
       initial_visits   -- visit count for newly-created nodes
       initial_wins     -- win count for newly-created nodes
       exploration_coefficient -- constant for UCT formula (float)
+      virtual_loss     -- visits to add for each simulation in progress
+                          (float, default 0)
 
     Public attributes:
       root             -- Node
       dimensions       -- number of dimensions in the parameter space
+      branching_factor -- number of children of each expanded node
+      node_count       -- number of nodes in the tree
+
+    Nodes are identified by their index in a set of parallel arrays (wins,
+    visits, virtual visits, and the index of the node's first child, or -1
+    for an unexpanded node). The root has index 0. Each expanded node's
+    children have consecutive indices, in order of child index.
 
-    All changing state is in the tree of Node objects started at 'root'.
+    While a simulation is in progress, each node on its path (and the root)
+    has virtual_loss added to its virtual visits, which makes other
+    simulations less likely to choose the same path.
 
     References to 'optimiser_parameters' below mean a sequence of length
     'dimensions', whose values are floats in the range 0.0..1.0 representing
@@ -86,12 +131,14 @@ class Tree(object):
     Instantiate with:
       all parameters listed above
       parameter_formatter -- function optimiser_parameters -> string
+      rng                 -- random.Random used to break ties
+                             (default: the random module)
 
     """
     def __init__(self, splits, max_depth,
                  exploration_coefficient,
                  initial_visits, initial_wins,
-                 parameter_formatter):
+                 parameter_formatter, virtual_loss=0, rng=None):
         self.splits = splits
         self.dimensions = len(splits)
         self.branching_factor = reduce(operator.mul, splits)
@@ -99,9 +146,18 @@ class Tree(object):
         self.exploration_coefficient = exploration_coefficient
         self.initial_visits = initial_visits
         self.initial_wins = initial_wins
-        self._initial_value = initial_wins / initial_visits
-        self._initial_rsqrt_visits = 1/sqrt(initial_visits)
+        self.virtual_loss = virtual_loss
         self.format_parameters = parameter_formatter
+        if rng is None:
+            rng = random
+        self.rng = rng
+
+        # Array contents for a newly-expanded node's children
+        self._new_wins = array('d', [initial_wins]) * self.branching_factor
+        self._new_visits = (array('d', [initial_visits]) *
+                            self.branching_factor)
+        self._new_virtual_visits = array('d', [0]) * self.branching_factor
+        self._new_first_child = array('i', [-1]) * self.branching_factor
 
         # map child index -> coordinate vector
         # coordinate vector -- tuple length 'dimensions' with values in
@@ -119,47 +175,136 @@ class Tree(object):
 
     def new_root(self):
         """Initialise the tree with an expanded root node."""
-        self.node_count = 1 # For description only
-        self.root = Node()
-        self.root.children = None
-        self.root.wins = self.initial_wins
-        self.root.visits = self.initial_visits
-        self.root.value = self.initial_wins / self.initial_visits
-        self.root.rsqrt_visits = self._initial_rsqrt_visits
-        self.expand(self.root)
-
-    def set_root(self, node):
-        """Use the specified node as the tree's root.
+        self._wins = array('d', [self.initial_wins])
+        self._visits = array('d', [self.initial_visits])
+        self._virtual_visits = array('d', [0])
+        self._first_child = array('i', [-1])
+        self.expand(0)
+
+    @property
+    def root(self):
+        return Node(self, 0)
+
+    @property
+    def node_count(self):
+        return len(self._visits)
+
+    def get_state(self):
+        """Return a compact representation of the tree's statistics.
+
+        Returns a tuple (branching_factor, wins, visits, first_child), where
+        the last three are binary strings holding the tree's arrays
+        (little-endian doubles, doubles, and 32-bit signed integers).
+
+        Virtual visits aren't included.
+
+        """
+        return (self.branching_factor,
+                _little_endian_bytes(self._wins),
+                _little_endian_bytes(self._visits),
+                _little_endian_bytes(self._first_child))
+
+    def set_state(self, state):
+        """Restore the tree's statistics from get_state()'s representation.
 
         This is used when restoring serialised state.
 
-        Raises ValueError if the node doesn't have the expected number of
-        children.
+        Raises ValueError if the state doesn't have the expected branching
+        factor, or isn't well-formed.
 
         """
-        if not node.children or len(node.children) != self.branching_factor:
-            raise ValueError
-        self.root = node
-        self.node_count = node.count_tree_size()
+        try:
+            branching_factor, wins_s, visits_s, first_child_s = state
+        except (TypeError, ValueError):
+            raise ValueError("bad tree state")
+        if branching_factor != self.branching_factor:
+            raise ValueError("wrong branching factor")
+        if array('i').itemsize != 4:
+            raise ValueError("unsupported integer size")
+        wins = _array_from_little_endian_bytes('d', wins_s)
+        visits = _array_from_little_endian_bytes('d', visits_s)
+        first_child = _array_from_little_endian_bytes('i', first_child_s)
+        if not (len(wins) == len(visits) == len(first_child) and
+                len(first_child) % branching_factor == 1 and
+                first_child[0] >= 0 and
+                max(first_child) + branching_factor <= len(first_child)):
+            raise ValueError("inconsistent arrays")
+        self._wins = wins
+        self._visits = visits
+        self._first_child = first_child
+        self._virtual_visits = array('d', [0]) * len(visits)
 
     def expand(self, node):
-        """Add children to the specified node."""
-        assert node.children is None
-        node.children = []
-        child_count = self.branching_factor
-        for _ in xrange(child_count):
-            child = Node()
-            child.children = None
-            child.wins = self.initial_wins
-            child.visits = self.initial_visits
-            child.value = self._initial_value
-            child.rsqrt_visits = self._initial_rsqrt_visits
-            node.children.append(child)
-        self.node_count += child_count
+        """Add children to the specified node (a node index)."""
+        assert self._first_child[node] < 0
+        self._first_child[node] = len(self._visits)
+        self._wins.extend(self._new_wins)
+        self._visits.extend(self._new_visits)
+        self._virtual_visits.extend(self._new_virtual_visits)
+        self._first_child.extend(self._new_first_child)
+
+    def is_expanded(self, node):
+        """Say whether a node (a node index) has children."""
+        return self._first_child[node] >= 0
 
     def is_ripe(self, node):
         """Say whether a node has been visted enough times to be expanded."""
-        return node.visits != self.initial_visits
+        return self._visits[node] != self.initial_visits
+
+    def get_value(self, node):
+        """Return a node's win rate, including virtual visits."""
+        return self._wins[node] / (self._visits[node] +
+                                   self._virtual_visits[node])
+
+    def update_node(self, node, visits, wins, virtual_visits):
+        """Add to a node's statistics."""
+        self._visits[node] += visits
+        self._wins[node] += wins
+        self._virtual_visits[node] += virtual_visits
+
+    def choose_uct(self, node, rng=None):
+        """Choose the child with the highest UCT urgency.
+
+        node -- index of an expanded node
+        rng  -- random.Random used to break ties (default: the tree's)
+
+        Returns a pair (child index, node index)
+
+        Ties are broken at random.
+
+        """
+        if rng is None:
+            rng = self.rng
+        first = self._first_child[node]
+        last = first + self.branching_factor
+        uct_numerator = (self.exploration_coefficient *
+                         sqrt(log(self._visits[node] +
+                                  self._virtual_visits[node])))
+        urgencies = [w/v + uct_numerator*sqrt(1/v)
+                     for (w, v) in izip(
+                         self._wins[first:last],
+                         map(operator.add, self._visits[first:last],
+                             self._virtual_visits[first:last]))]
+        start = rng.randrange(self.branching_factor)
+        choice = max(chain(xrange(start, self.branching_factor),
+                           xrange(start)),
+                     key=urgencies.__getitem__)
+        return choice, first + choice
+
+    def choose_most_wins(self, node):
+        """Choose the child with the most wins.
+
+        node -- index of an expanded node
+
+        Returns a pair (child index, node index)
+
+        Ties are broken in favour of the lowest child index.
+
+        """
+        first = self._first_child[node]
+        wins = self._wins[first:first + self.branching_factor]
+        choice = wins.index(max(wins))
+        return choice, first + choice
 
     def parameters_for_path(self, choice_path):
         """Retrieve the point in parameter space given by a node.
@@ -207,6 +352,11 @@ class Tree(object):
         """Return a string describing a child's coordinates in its parent."""
         return str(self._cube_coordinates[choice]).replace(" ", "")
 
+    def _children_with_paths(self, node, choice_path):
+        first = self._first_child[node]
+        return [(choice_path + [choice], first + choice)
+                for choice in xrange(self.branching_factor)]
+
     def describe(self):
         """Return a text description of the current state of the tree.
 
@@ -219,12 +369,11 @@ class Tree(object):
                 self.parameters_for_path(choice_path))
             choice_s = self.describe_choice(choice_path[-1])
             return "%s %s %.3f %3d" % (
-                choice_s, parameters, node.value,
-                node.visits - self.initial_visits)
+                choice_s, parameters, self.get_value(node),
+                self._visits[node] - self.initial_visits)
 
-        root = self.root
-        wins = root.wins - self.initial_wins
-        visits = root.visits - self.initial_visits
+        wins = self._wins[0] - self.initial_wins
+        visits = self._visits[0] - self.initial_visits
         try:
             win_rate = "%.3f" % (wins/visits)
         except ZeroDivisionError:
@@ -234,12 +383,12 @@ class Tree(object):
             "Win rate %d/%d = %s" % (wins, visits, win_rate)
             ]
 
-        for choice, node in enumerate(self.root.children):
-            result.append("  " + describe_node(node, [choice]))
-            if node.children is None:
+        for path, node in self._children_with_paths(0, []):
+            result.append("  " + describe_node(node, path))
+            if not self.is_expanded(node):
                 continue
-            for choice2, node2 in enumerate(node.children):
-                result.append("    " + describe_node(node2, [choice, choice2]))
+            for path2, node2 in self._children_with_paths(node, path):
+                result.append("    " + describe_node(node2, path2))
         return "\n".join(result)
 
     def summarise(self, out, summary_spec):
@@ -260,23 +409,21 @@ class Tree(object):
                 self.parameters_for_path(choice_path))
             choice_s = " ".join(map(self.describe_choice, choice_path))
             return "%s %-40s %.3f %3d" % (
-                choice_s, parameters, node.value,
-                node.visits - self.initial_visits)
+                choice_s, parameters, self.get_value(node),
+                self._visits[node] - self.initial_visits)
 
-        def most_visits((child_index, node)):
-            return node.visits
+        def most_visits((path, node)):
+            return self._visits[node]
 
-        last_generation = [([], self.root)]
+        last_generation = [([], 0)]
         for i, n in enumerate(summary_spec):
             depth = i + 1
             p("most visited at depth %s" % (depth))
 
             this_generation = []
             for path, node in last_generation:
-                if node.children is not None:
-                    this_generation += [
-                        (path + [child_index], child)
-                        for (child_index, child) in enumerate(node.children)]
+                if self.is_expanded(node):
+                    this_generation += self._children_with_paths(node, path)
 
             for path, node in sorted(
                 nlargest(n, this_generation, key=most_visits)):
@@ -288,42 +435,40 @@ class Tree(object):
 class Simulation(object):
     """A single monte-carlo simulation.
 
-    Instantiate with the Tree the simulation will run in.
+    Instantiate with the Tree the simulation will run in, and optionally a
+    random.Random to use in place of the tree's own generator.
 
     Use the methods in the following order:
       run()
       get_parameters()
-      update_stats(b)
+      update_stats(b) or abandon()
       describe()
 
     """
-    def __init__(self, tree):
+    def __init__(self, tree, rng=None):
         self.tree = tree
-        # list of Nodes
+        self.rng = rng
+        # list of node indices
         self.node_path = []
         # corresponding list of child indices
         self.choice_path = []
         # bool
         self.candidate_won = None
+        # virtual visits added to the nodes in node_path and the root
+        self.virtual_visits = 0
 
     def _choose_action(self, node):
         """Choose the best action from the specified node.
 
-        Returns a pair (child index, node)
+        Returns a pair (child index, node index)
 
         """
-        uct_numerator = (self.tree.exploration_coefficient *
-                         sqrt(log(node.visits)))
-        def urgency((i, child)):
-            return child.value + uct_numerator * child.rsqrt_visits
-        start = random.randrange(len(node.children))
-        children = list(enumerate(node.children))
-        return max(children[start:] + children[:start], key=urgency)
+        return self.tree.choose_uct(node, self.rng)
 
     def walk(self):
         """Choose a node sequence, without expansion."""
-        node = self.tree.root
-        while node.children is not None:
+        node = 0
+        while self.tree.is_expanded(node):
             choice, node = self._choose_action(node)
             self.node_path.append(node)
             self.choice_path.append(choice)
@@ -335,6 +480,8 @@ class Simulation(object):
         until it reaches a leaf; if the leaf has already been visited, this
         expands it and chooses one more action.
 
+        Adds the tree's virtual_loss to the virtual visits of the chosen nodes.
+
         """
         self.walk()
         node = self.node_path[-1]
@@ -344,6 +491,22 @@ class Simulation(object):
             choice, child = self._choose_action(node)
             self.node_path.append(child)
             self.choice_path.append(choice)
+        if self.tree.virtual_loss:
+            self._add_virtual_visits(self.tree.virtual_loss)
+
+    def _add_virtual_visits(self, n):
+        self.virtual_visits += n
+        for node in self.node_path + [0]:
+            self.tree.update_node(node, 0, 0, n)
+
+    def abandon(self):
+        """Remove the simulation's virtual visits without updating stats.
+
+        Use this if the simulation's game fails.
+
+        """
+        if self.virtual_visits:
+            self._add_virtual_visits(-self.virtual_visits)
 
     def get_parameters(self):
         """Retrieve the parameters corresponding to the simulation's leaf node.
@@ -357,19 +520,18 @@ class Simulation(object):
         """Update the tree's node statistics with the simulation's results.
 
         This updates visits (and wins, if appropriate) for each node in the
-        simulation's node sequence.
+        simulation's node sequence, and removes the simulation's virtual
+        visits.
+
+        The root's wins are updated too, for description only.
 
         """
+        self.abandon()
         self.candidate_won = candidate_won
-        for node in self.node_path:
-            node.visits += 1
-            if candidate_won:
-                node.wins += 1
-            node.recalculate()
-        self.tree.root.visits += 1
-        if candidate_won:
-            self.tree.root.wins += 1 # For description only
-        self.tree.root.recalculate()
+        wins = 1 if candidate_won else 0
+        for node in self.node_path + [0]:
+            self.tree.update_node(node, 1, wins, 0)
+
 
     def describe_steps(self):
         """Return a text description of the simulation's node sequence."""
@@ -397,9 +559,7 @@ class Greedy_simulation(Simulation):
 
     """
     def _choose_action(self, node):
-        def wins((i, node)):
-            return node.wins
-        return max(enumerate(node.children), key=wins)
+        return self.tree.choose_most_wins(node)
 
 
 parameter_settings = [
@@ -513,7 +673,14 @@ class Mcts_tuner(Competition):
 
     The game ids are strings containing integers starting from zero.
 
+    If number_of_trees is greater than 1, there are several independent
+    trees, and each game's simulation is run in the tree whose root has the
+    highest UCB urgency (see choose_tree()).
+
     """
+    # The screen report shows outstanding simulations
+    screen_report_shows_games_in_progress = True
+
     def __init__(self, competition_code, **kwargs):
         Competition.__init__(self, competition_code, **kwargs)
         self.outstanding_simulations = {}
@@ -539,10 +706,16 @@ class Mcts_tuner(Competition):
                 default=(30,)),
         Setting('number_of_running_simulations_to_show', interpret_int,
                 default=12),
+        Setting('number_of_trees', interpret_positive_int, default=1),
+        Setting('seed', allow_none(interpret_int), default=None),
         ])
 
     special_settings = [
-        Setting('opponent', interpret_identifier),
+        Setting('opponent', allow_none(interpret_identifier), default=None),
+        Setting('opponents',
+                allow_none(interpret_map_of(interpret_identifier,
+                                            interpret_positive_int)),
+                default=None),
         Setting('parameters',
                 interpret_sequence_of_quiet_configs(Parameter_config)),
         Setting('make_candidate', interpret_callable),
@@ -555,6 +728,7 @@ class Mcts_tuner(Competition):
         Setting('exploration_coefficient', interpret_float),
         Setting('initial_visits', interpret_positive_int),
         Setting('initial_wins', interpret_positive_int),
+        Setting('virtual_loss', interpret_float, default=0.0),
         ]
 
     def parameter_spec_from_config(self, parameter_config):
@@ -599,11 +773,8 @@ class Mcts_tuner(Competition):
         except ValueError, e:
             raise ControlFileError(str(e))
 
-        try:
-            self.opponent = self.players[specials['opponent']]
-        except KeyError:
-            raise ControlFileError(
-                "opponent: unknown player %s" % specials['opponent'])
+        self.opponent_pool = competitions.make_opponent_pool(
+            self.players, specials['opponent'], specials['opponents'])
 
         self.parameter_specs = []
         if not specials['parameters']:
@@ -629,42 +800,80 @@ class Mcts_tuner(Competition):
             tree_arguments = load_settings(self.tree_settings, config)
         except ValueError, e:
             raise ControlFileError(str(e))
-        self.tree = Tree(splits=[pspec.split for pspec in self.parameter_specs],
-                         parameter_formatter=self.format_optimiser_parameters,
-                         **tree_arguments)
+        if tree_arguments['virtual_loss'] < 0:
+            raise ControlFileError("virtual_loss: must not be negative")
+        splits = [pspec.split for pspec in self.parameter_specs]
+        if self.number_of_trees == 1:
+            self.trees = [
+                Tree(splits=splits,
+                     parameter_formatter=self.format_optimiser_parameters,
+                     **tree_arguments)]
+        else:
+            # Each tree breaks ties using its own generator, seeded
+            # independently.
+            self.trees = [
+                Tree(splits=splits,
+                     parameter_formatter=self.format_optimiser_parameters,
+                     rng=random.Random(),
+                     **tree_arguments)
+                for _ in xrange(self.number_of_trees)]
+        self.tree = self.trees[0]
 
 
     # State attributes (*: in persistent state):
     #  *scheduler               -- Simple_scheduler
-    #  *tree                    -- Tree (root node is persisted)
+    #  *trees                   -- list of Trees (see Tree.get_state())
+    #   tree                    -- the first Tree
+    #                              (the only one, unless number_of_trees > 1)
     #   outstanding_simulations -- map game_number -> Simulation
     #   halt_on_next_failure    -- bool
-    #  *opponent_description    -- string (or None)
+    #  *opponent_descriptions   -- map player code -> string
+    #
+    # The first tree's state is stored as 'tree', and any others as a list
+    # 'other_trees'.
 
     def set_clean_status(self):
         self.scheduler = competition_schedulers.Simple_scheduler()
-        self.tree.new_root()
-        self.opponent_description = None
+        for tree in self.trees:
+            tree.new_root()
+        self.opponent_descriptions = {}
 
     # Can bump this to prevent people loading incompatible .status files.
-    status_format_version = 0
+    status_format_version = 1
 
     def get_status(self):
         # path0 is stored for consistency check
-        return {
+        result = {
             'scheduler' : self.scheduler,
-            'tree_root' : self.tree.root,
-            'opponent_description' : self.opponent_description,
+            'tree' : self.tree.get_state(),
+            'opponent_descriptions' : self.opponent_descriptions,
             'path0' : self.scale_parameters(self.tree.parameters_for_path([0])),
+            'seed' : self.seed,
             }
+        if len(self.trees) > 1:
+            result['other_trees'] = [tree.get_state()
+                                     for tree in self.trees[1:]]
+        return result
 
     def set_status(self, status):
-        root = status['tree_root']
+        if status.get('seed') != self.seed:
+            raise CompetitionError(
+                "status file is inconsistent with control file "
+                "(seed has changed)")
+        tree_states = [status['tree']] + status.get('other_trees', [])
+        if len(tree_states) > len(self.trees):
+            raise CompetitionError(
+                "status file is inconsistent with control file "
+                "(number_of_trees has been reduced)")
         try:
-            self.tree.set_root(root)
+            for tree, tree_state in zip(self.trees, tree_states):
+                tree.set_state(tree_state)
         except ValueError:
             raise CompetitionError(
                 "status file is inconsistent with control file")
+        # Any trees added since the last run start afresh
+        for tree in self.trees[len(tree_states):]:
+            tree.new_root()
         expected_path0 = self.scale_parameters(
             self.tree.parameters_for_path([0]))
         if status['path0'] != expected_path0:
@@ -672,7 +881,7 @@ class Mcts_tuner(Competition):
                 "status file is inconsistent with control file")
         self.scheduler = status['scheduler']
         self.scheduler.rollback()
-        self.opponent_description = status['opponent_description']
+        self.opponent_descriptions = status.get('opponent_descriptions', {})
 
     def scale_parameters(self, optimiser_parameters):
         l = []
@@ -730,7 +939,7 @@ class Mcts_tuner(Competition):
         engine_parameters = self.scale_parameters(test_parameters)
         candidate = self.make_candidate('candidate', engine_parameters)
         result = []
-        for player in [candidate, self.opponent]:
+        for player in [candidate] + self.opponent_pool.players:
             check = game_jobs.Player_check()
             check.player = player
             check.board_size = self.board_size
@@ -738,13 +947,47 @@ class Mcts_tuner(Competition):
             result.append(check)
         return result
 
+    def choose_tree(self):
+        """Choose the tree to use for the next simulation.
+
+        Returns a Tree.
+
+        Treats the trees' roots like the children of a single node, choosing
+        the one with the highest UCT urgency (using the first tree's
+        exploration coefficient). Simulations in progress are counted as
+        losses, so that games started together are spread across the trees.
+
+        Ties are broken in favour of the earliest tree.
+
+        """
+        if len(self.trees) == 1:
+            return self.tree
+        in_progress = dict((tree, 0) for tree in self.trees)
+        for simulation in self.outstanding_simulations.itervalues():
+            in_progress[simulation.tree] += 1
+        stats = [(tree.root.wins, tree.root.visits + in_progress[tree])
+                 for tree in self.trees]
+        uct_numerator = (self.tree.exploration_coefficient *
+                         sqrt(log(sum(visits for (wins, visits) in stats))))
+        urgencies = [wins/visits + uct_numerator*sqrt(1/visits)
+                     for (wins, visits) in stats]
+        return self.trees[urgencies.index(max(urgencies))]
+
+    def _describe_simulation(self, simulation):
+        # Simulation description, identifying the tree if there are several
+        if len(self.trees) == 1:
+            return simulation.describe()
+        return "t%d %s" % (self.trees.index(simulation.tree),
+                           simulation.describe())
+
     def get_game(self):
         if (self.number_of_games is not None and
             self.scheduler.issued >= self.number_of_games):
             return NoGameAvailable
         game_number = self.scheduler.issue()
 
-        simulation = Simulation(self.tree)
+        simulation = Simulation(
+            self.choose_tree(), competitions.make_rng(self.seed, game_number))
         simulation.run()
         optimiser_parameters = simulation.get_parameters()
         engine_parameters = self.scale_parameters(optimiser_parameters)
@@ -754,11 +997,12 @@ class Mcts_tuner(Competition):
         job = game_jobs.Game_job()
         job.game_id = str(game_number)
         job.game_data = game_number
+        opponent = self.opponent_pool.get_opponent(game_number)
         if self.candidate_colour == 'b':
             job.player_b = candidate
-            job.player_w = self.opponent
+            job.player_w = opponent
         else:
-            job.player_b = self.opponent
+            job.player_b = opponent
             job.player_w = candidate
         job.board_size = self.board_size
         job.komi = self.komi
@@ -766,6 +1010,7 @@ class Mcts_tuner(Competition):
         job.handicap = self.handicap
         job.handicap_is_free = (self.handicap_style == 'free')
         job.use_internal_scorer = (self.scorer == 'internal')
+        job.adjudication = self.adjudication
         job.internal_scorer_handicap_compensation = \
             self.internal_scorer_handicap_compensation
         job.sgf_event = self.competition_code
@@ -775,20 +1020,25 @@ class Mcts_tuner(Competition):
 
     def process_game_result(self, response):
         self.halt_on_next_failure = False
-        self.opponent_description = response.engine_descriptions[
-            self.opponent.code].get_long_description()
         game_number = response.game_data
+        opponent = self.opponent_pool.get_opponent(game_number)
+        self.opponent_descriptions[opponent.code] = \
+            response.engine_descriptions[opponent.code].get_long_description()
         self.scheduler.fix(game_number)
         # Counting no-result as loss for the candidate
         candidate_won = (
             response.game_result.winning_colour == self.candidate_colour)
         simulation = self.outstanding_simulations.pop(game_number)
         simulation.update_stats(candidate_won)
-        self.log_history(simulation.describe())
+        self.log_history(self._describe_simulation(simulation))
         if (self.log_tree_to_history_period is not None and
             self.scheduler.fixed % self.log_tree_to_history_period == 0):
-            self.log_history(self.tree.describe())
-        return "%s %s" % (simulation.describe(),
+            if len(self.trees) == 1:
+                self.log_history(self.tree.describe())
+            else:
+                for i, tree in enumerate(self.trees):
+                    self.log_history("tree %d\n%s" % (i, tree.describe()))
+        return "%s %s" % (self._describe_simulation(simulation),
                           response.game_result.sgf_result)
 
     def process_game_error(self, job, previous_error_count):
@@ -798,7 +1048,8 @@ class Mcts_tuner(Competition):
         stop_competition = False
         retry_game = False
         game_number = job.game_data
-        del self.outstanding_simulations[game_number]
+        simulation = self.outstanding_simulations.pop(game_number)
+        simulation.abandon()
         self.scheduler.fix(game_number)
         if self.halt_on_next_failure:
             stop_competition = True
@@ -823,10 +1074,28 @@ class Mcts_tuner(Competition):
             print >>out, "%d/%d games played" % (
                 games_played, self.number_of_games)
         print >>out
-        best_simulation = self.tree.retrieve_best_parameter_simulation()
-        print >>out, "Best parameters: %s" % best_simulation.describe()
+        if len(self.trees) == 1:
+            best_simulation = self.tree.retrieve_best_parameter_simulation()
+            print >>out, "Best parameters: %s" % best_simulation.describe()
+            print >>out
+            self.tree.summarise(out, self.summary_spec)
+            return
+        # The tree with the most visits is the one choose_tree() prefers
+        best_tree = max(self.trees, key=lambda tree: tree.root.visits)
+        best_simulation = best_tree.retrieve_best_parameter_simulation()
+        print >>out, "Best parameters: %s" % (
+            self._describe_simulation(best_simulation))
+        print >>out
+        print >>out, "Best parameters for each tree:"
+        for i, tree in enumerate(self.trees):
+            wins = tree.root.wins - tree.initial_wins
+            visits = tree.root.visits - tree.initial_visits
+            print >>out, "t%d %4d/%-4d %s" % (
+                i, wins, visits, self.format_optimiser_parameters(
+                    tree.retrieve_best_parameters()))
         print >>out
-        self.tree.summarise(out, self.summary_spec)
+        print >>out, "tree %d:" % self.trees.index(best_tree)
+        best_tree.summarise(out, self.summary_spec)
 
     def write_screen_report(self, out):
         self._write_main_report(out)
@@ -835,16 +1104,23 @@ class Mcts_tuner(Competition):
             to_show = sorted(self.outstanding_simulations.iteritems())\
                       [:self.number_of_running_simulations_to_show]
             for game_id, simulation in to_show:
-                print >>out, "game %s: %s" % (game_id, simulation.describe())
+                print >>out, "game %s: %s" % (
+                    game_id, self._describe_simulation(simulation))
 
     def write_short_report(self, out):
         self.write_static_description(out)
         self._write_main_report(out)
-        if self.opponent_description:
-            print >>out, "opponent (%s): %s" % (
-                self.opponent.code, self.opponent_description)
-        else:
-            print >>out, "opponent: %s" % self.opponent.code
+        pool = self.opponent_pool
+        for opponent, weight in zip(pool.players, pool.weights):
+            if len(pool) > 1:
+                label = "%s, weight %d" % (opponent.code, weight)
+            else:
+                label = opponent.code
+            description = self.opponent_descriptions.get(opponent.code)
+            if description:
+                print >>out, "opponent (%s): %s" % (label, description)
+            else:
+                print >>out, "opponent: %s" % label
         print >>out
 
     write_full_report = write_short_report
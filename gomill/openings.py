@@ -0,0 +1,177 @@
+"""Starting positions for games, taken from SGF files."""
+
+import os
+
+from gomill import boards
+from gomill import sgf
+from gomill import sgf_grammar
+from gomill import sgf_moves
+
+
+class Opening(object):
+    """A position to start a game from.
+
+    Public attributes:
+      name         -- string (eg the SGF filename)
+      board_size   -- int
+      black_points -- list of pairs (row, col): setup stones
+      white_points -- list of pairs (row, col): setup stones
+      moves        -- list of pairs (colour, move)
+                      moves are (row, col), or None for a pass
+
+    The moves are played after the setup stones are placed. They don't have to
+    alternate in colour.
+
+    Openings are suitable for pickling.
+
+    """
+    def __init__(self, name, board_size, black_points, white_points, moves):
+        self.name = name
+        self.board_size = board_size
+        self.black_points = black_points
+        self.white_points = white_points
+        self.moves = moves
+
+    def __repr__(self):
+        return "<Opening: %s>" % self.name
+
+    def get_plays(self):
+        """Return the opening as a list of pairs (colour, move).
+
+        The setup stones come first (Black's, then White's), followed by the
+        moves.
+
+        """
+        return ([('b', point) for point in self.black_points] +
+                [('w', point) for point in self.white_points] +
+                self.moves)
+
+    def get_next_player(self):
+        """Return the colour to play after the opening."""
+        if self.moves:
+            return 'w' if self.moves[-1][0] == 'b' else 'b'
+        return 'b'
+
+    def make_board(self):
+        """Return a boards.Board showing the position after the opening."""
+        board = boards.Board(self.board_size)
+        board.apply_setup(self.black_points, self.white_points, [])
+        for colour, move in self.moves:
+            if move is not None:
+                board.play(move[0], move[1], colour)
+        return board
+
+
+def opening_from_sgf_game(sgf_game, name):
+    """Make an Opening from an Sgf_game.
+
+    Uses the root node's setup stones and the moves from the leftmost
+    variation.
+
+    Raises ValueError if the game isn't suitable (see
+    sgf_moves.get_setup_and_moves()), or if any of the moves is to an occupied
+    point.
+
+    """
+    board, moves = sgf_moves.get_setup_and_moves(sgf_game)
+    black_points = []
+    white_points = []
+    for colour, point in board.list_occupied_points():
+        if colour == 'b':
+            black_points.append(point)
+        else:
+            white_points.append(point)
+    for colour, move in moves:
+        if move is None:
+            continue
+        try:
+            board.play(move[0], move[1], colour)
+        except ValueError:
+            raise ValueError("move to occupied point")
+    return Opening(name, sgf_game.get_size(),
+                   sorted(black_points), sorted(white_points), moves)
+
+def _read_file(pathname):
+    try:
+        f = open(pathname)
+        try:
+            return f.read()
+        finally:
+            f.close()
+    except EnvironmentError, e:
+        raise ValueError("%s: %s" % (pathname, e.strerror))
+
+def read_opening(pathname, name=None):
+    """Read an Opening from an SGF file.
+
+    name -- string to use as the opening's name (default: the pathname)
+
+    Raises ValueError if the file can't be read or isn't suitable; the message
+    includes the pathname.
+
+    """
+    if name is None:
+        name = pathname
+    s = _read_file(pathname)
+    try:
+        sgf_game = sgf.Sgf_game.from_string(s)
+        return opening_from_sgf_game(sgf_game, name)
+    except ValueError, e:
+        raise ValueError("%s: %s" % (pathname, e))
+
+def _read_collection(pathname, name):
+    s = _read_file(pathname)
+    try:
+        coarse_games = sgf_grammar.parse_sgf_collection(s)
+    except ValueError, e:
+        raise ValueError("%s: %s" % (pathname, e))
+    result = []
+    for i, coarse_game in enumerate(coarse_games):
+        if len(coarse_games) == 1:
+            game_name = name
+        else:
+            game_name = "%s:%d" % (name, i+1)
+        try:
+            sgf_game = sgf.Sgf_game.from_coarse_game_tree(coarse_game)
+            result.append(opening_from_sgf_game(sgf_game, game_name))
+        except ValueError, e:
+            raise ValueError("%s: %s" % (game_name, e))
+    return result
+
+def read_openings(pathname, name=None):
+    """Read a list of Openings from an SGF file or a directory.
+
+    name -- string to use as the basis of the openings' names (default: the
+            pathname)
+
+    If the pathname is a directory, reads each file in it whose name ends with
+    '.sgf' (not searching subdirectories), in order of filename. The openings
+    are named by joining the name and the filename.
+
+    Each file may be an SGF collection containing several games, giving one
+    opening per game. If so, the openings are named like 'name:3', numbering
+    from 1.
+
+    Returns a nonempty list of Openings.
+
+    Raises ValueError if any of the files can't be read or isn't suitable, or
+    if a directory has no SGF files; the message includes the pathname (or the
+    opening's name).
+
+    """
+    if name is None:
+        name = pathname
+    if not os.path.isdir(pathname):
+        return _read_collection(pathname, name)
+    try:
+        filenames = sorted(filename for filename in os.listdir(pathname)
+                           if filename.lower().endswith(".sgf"))
+    except EnvironmentError, e:
+        raise ValueError("%s: %s" % (pathname, e.strerror))
+    if not filenames:
+        raise ValueError("%s: no .sgf files in directory" % pathname)
+    result = []
+    for filename in filenames:
+        result += _read_collection(os.path.join(pathname, filename),
+                                   os.path.join(name, filename))
+    return result
@@ -3,6 +3,7 @@
 from gomill import game_jobs
 from gomill import competitions
 from gomill import tournaments
+from gomill import stopping_rules
 from gomill.competitions import (Competition, ControlFileError)
 from gomill.settings import *
 
@@ -30,6 +31,7 @@ class Playoff(tournaments.Tournament):
         result.update({
             'Matchup' : Matchup_config,
             })
+        result.update(stopping_rules.control_file_globals)
         return result
 
 
@@ -121,6 +123,7 @@ class Playoff(tournaments.Tournament):
             specials = load_settings(self.special_settings, config)
         except ValueError, e:
             raise ControlFileError(str(e))
+        self.load_scheduling_settings(config)
 
         # map matchup_id -> Matchup
         self.matchups = {}
@@ -0,0 +1,452 @@
+"""Bradley-Terry (Elo) ratings from game results.
+
+The model is that the player taking Black wins with probability
+  1 / (1 + exp(-(r_b - r_w + h)))
+where r_b and r_w are the players' ratings and h is the advantage of playing
+Black (which covers komi and handicap being set unfairly). Jigos count as half
+a win for each player.
+
+Ratings are fitted by maximum likelihood. With numpy, this uses full Newton
+steps, with the gradient and the Fisher information matrix built from arrays
+over the distinct pairings. Without numpy, it uses cyclic Newton steps on one
+parameter at a time (each step costs time proportional to the number of
+distinct pairings, not the number of games).
+
+Confidence intervals come from the inverse of the Fisher information matrix.
+Without numpy, they are omitted when there are many players (see
+Rating_fitter.pure_python_covariance_limit).
+
+To keep the ratings finite when a player has won or lost every game, each
+player is treated as having drawn a small number of 'prior' games against an
+opponent rated zero (and the colour advantage is given a similar prior).
+Reported ratings are shifted so that their mean is zero.
+
+"""
+
+from __future__ import division
+
+from math import exp, log, sqrt
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from gomill import ascii_tables
+from gomill.stopping_rules import normal_quantile
+
+# Elo points per unit of rating on the natural-log scale
+ELO_SCALE = 400 / log(10)
+
+
+def _sigmoid(x):
+    if x >= 0:
+        return 1 / (1 + exp(-x))
+    z = exp(x)
+    return z / (1 + z)
+
+
+def invert_matrix(matrix):
+    """Invert a square matrix.
+
+    matrix -- list of lists of floats
+
+    Returns a new list of lists.
+
+    Raises ValueError if the matrix is singular.
+
+    """
+    n = len(matrix)
+    if numpy is not None:
+        try:
+            return numpy.linalg.inv(numpy.array(matrix)).tolist()
+        except numpy.linalg.LinAlgError, e:
+            raise ValueError(str(e))
+    # Gauss-Jordan elimination with partial pivoting
+    rows = [list(row) + [float(i == j) for j in xrange(n)]
+            for i, row in enumerate(matrix)]
+    for col in xrange(n):
+        pivot_row = max(xrange(col, n), key=lambda r: abs(rows[r][col]))
+        if rows[pivot_row][col] == 0:
+            raise ValueError("singular matrix")
+        rows[col], rows[pivot_row] = rows[pivot_row], rows[col]
+        pivot = rows[col]
+        factor = 1 / pivot[col]
+        pivot = rows[col] = [v * factor for v in pivot]
+        for r in xrange(n):
+            if r == col:
+                continue
+            row = rows[r]
+            f = row[col]
+            if f != 0:
+                rows[r] = [a - f*b for (a, b) in zip(row, pivot)]
+    return [row[n:] for row in rows]
+
+
+class Ratings(object):
+    """Fitted ratings.
+
+    Public attributes:
+      players                 -- list of player codes (highest rated first)
+      elo                     -- map player code -> float
+      stderr                  -- map player code -> float, or None
+      games                   -- map player code -> int
+      colour_advantage        -- float (Elo points for taking Black)
+      colour_advantage_stderr -- float, or None
+      iterations              -- int (number of iterations the fit took)
+
+    Ratings and standard errors are in Elo points. The standard errors are for
+    each rating relative to the mean rating. They are None if they weren't
+    calculated (see Rating_fitter.fit()).
+
+    """
+    def get_interval(self, player, confidence=0.95):
+        """Return a confidence interval for a player's rating.
+
+        Returns a pair of floats (lower, upper).
+
+        Raises ValueError if the standard errors weren't calculated.
+
+        """
+        if self.stderr is None:
+            raise ValueError("standard errors not available")
+        z = normal_quantile(0.5 + confidence/2)
+        elo = self.elo[player]
+        return elo - z*self.stderr[player], elo + z*self.stderr[player]
+
+    def make_table(self, confidence=0.95):
+        """Return an ascii_tables.Table describing the ratings."""
+        t = ascii_tables.Table(row_count=len(self.players))
+        t.add_heading("")
+        i = t.add_column(align='left', right_padding=3)
+        t.set_column_values(i, self.players)
+        t.add_heading("elo")
+        i = t.add_column(align='right')
+        t.set_column_values(i, ("%+.0f" % self.elo[p] for p in self.players))
+        if self.stderr is not None:
+            t.add_heading("%g%% interval" % (100 * confidence))
+            i = t.add_column(align='left', right_padding=3)
+            def interval(p):
+                lower, upper = self.get_interval(p, confidence)
+                return "[%+.0f, %+.0f]" % (lower, upper)
+            t.set_column_values(i, (interval(p) for p in self.players))
+        t.add_heading("games")
+        i = t.add_column(align='right')
+        t.set_column_values(i, (str(self.games[p]) for p in self.players))
+        return t
+
+    def write_report(self, out, confidence=0.95):
+        """Write a table of the ratings to 'out'."""
+        print >>out, "\n".join(self.make_table(confidence).render())
+        if self.colour_advantage_stderr is None:
+            print >>out, "black advantage: %+.0f" % self.colour_advantage
+            print >>out, "(confidence intervals not calculated: too many " \
+                         "players without numpy)"
+            return
+        z = normal_quantile(0.5 + confidence/2)
+        print >>out, "black advantage: %+.0f +/- %.0f" % (
+            self.colour_advantage, z*self.colour_advantage_stderr)
+
+
+class Rating_fitter(object):
+    """Fit Bradley-Terry ratings to a set of game results.
+
+    Instantiate with
+      prior_games           -- float (default 1.0)
+      fit_colour_advantage  -- bool (default True)
+
+    Call add_games() or add_result() to supply the data, then fit().
+
+    """
+    def __init__(self, prior_games=1.0, fit_colour_advantage=True):
+        self.prior_games = prior_games
+        self.fit_colour_advantage = fit_colour_advantage
+        # map (player_b, player_w) -> [black score, white score]
+        self.scores = {}
+        # map player code -> int
+        self.games = {}
+
+    def add_games(self, player_b, player_w, black_score, white_score):
+        """Add the results of games between two players.
+
+        player_b    -- player code (the player taking Black)
+        player_w    -- player code
+        black_score -- float (Black's wins, counting jigos as half)
+        white_score -- float
+
+        """
+        if player_b == player_w:
+            raise ValueError("player can't play itself")
+        scores = self.scores.get((player_b, player_w))
+        if scores is None:
+            scores = self.scores[player_b, player_w] = [0.0, 0.0]
+        scores[0] += black_score
+        scores[1] += white_score
+        count = int(round(black_score + white_score))
+        for player in (player_b, player_w):
+            self.games[player] = self.games.get(player, 0) + count
+
+    def add_result(self, game_result):
+        """Add a single game result.
+
+        game_result -- gtp_games.Game_result
+
+        Results with unknown outcome are ignored.
+
+        """
+        if game_result.is_jigo:
+            black_score = 0.5
+        elif game_result.winning_colour == 'b':
+            black_score = 1.0
+        elif game_result.winning_colour == 'w':
+            black_score = 0.0
+        else:
+            return
+        self.add_games(game_result.player_b, game_result.player_w,
+                       black_score, 1.0 - black_score)
+
+    def fit(self, tolerance=1e-9, max_iterations=1000):
+        """Fit the ratings.
+
+        Returns a Ratings object.
+
+        tolerance is the largest change in any parameter (on the natural-log
+        scale) at which the fit is considered to have converged.
+
+        Without numpy, standard errors are calculated only if there are at
+        most pure_python_covariance_limit players (otherwise the Ratings
+        object's stderr and colour_advantage_stderr are None).
+
+        """
+        players = sorted(self.games)
+        index = dict((p, i) for (i, p) in enumerate(players))
+        n = len(players)
+        # list of (black index, white index, black score, games)
+        pairs = []
+        for (player_b, player_w), (b_score, w_score) in \
+                self.scores.iteritems():
+            total = b_score + w_score
+            if total == 0:
+                continue
+            pairs.append((index[player_b], index[player_w], b_score, total))
+        pairs.sort()
+        if numpy is not None:
+            ratings, h, iterations, variances = self._fit_with_numpy(
+                n, pairs, tolerance, max_iterations)
+        else:
+            ratings, h, iterations = self._fit_by_sweeps(
+                n, pairs, tolerance, max_iterations)
+            if n <= self.pure_python_covariance_limit:
+                variances = self._get_variances(ratings, h, pairs)
+            else:
+                variances = None
+
+        mean = sum(ratings) / n if n else 0.0
+        result = Ratings()
+        result.iterations = iterations
+        result.games = self.games.copy()
+        result.elo = {}
+        for i, player in enumerate(players):
+            result.elo[player] = (ratings[i] - mean) * ELO_SCALE
+        result.players = sorted(players, key=lambda p: (-result.elo[p], p))
+        result.colour_advantage = h * ELO_SCALE
+        if variances is None:
+            result.stderr = None
+            result.colour_advantage_stderr = None
+        else:
+            rating_variances, h_variance = variances
+            result.stderr = {}
+            for i, player in enumerate(players):
+                result.stderr[player] = \
+                    sqrt(max(rating_variances[i], 0.0)) * ELO_SCALE
+            result.colour_advantage_stderr = \
+                sqrt(max(h_variance, 0.0)) * ELO_SCALE
+        return result
+
+    # Above this many players, fit() doesn't calculate standard errors
+    # without numpy (inverting the information matrix in pure Python takes
+    # time proportional to the cube of the number of players).
+    pure_python_covariance_limit = 60
+
+    def _fit_by_sweeps(self, n, pairs, tolerance, max_iterations):
+        # Pure-Python fit, using Newton steps on one parameter at a time.
+        # Returns a tuple (ratings, h, iterations)
+        # For each player, list of (opponent index, sign, player's score,
+        # games); sign is +1 if the player took Black.
+        neighbours = [[] for _ in xrange(n)]
+        for i, j, b_score, total in pairs:
+            neighbours[i].append((j, 1, b_score, total))
+            neighbours[j].append((i, -1, total - b_score, total))
+        prior = self.prior_games
+        ratings = [0.0] * n
+        h = 0.0
+        iterations = 0
+        while iterations < max_iterations:
+            iterations += 1
+            largest_step = 0.0
+            for i in xrange(n):
+                r = ratings[i]
+                p = _sigmoid(r)
+                gradient = prior * (0.5 - p)
+                curvature = prior * p * (1 - p)
+                for j, sign, score, total in neighbours[i]:
+                    p = _sigmoid(r - ratings[j] + sign*h)
+                    gradient += score - total*p
+                    curvature += total * p * (1 - p)
+                step = gradient / curvature
+                step = max(-2.0, min(2.0, step))
+                ratings[i] = r + step
+                largest_step = max(largest_step, abs(step))
+            # Moving all the ratings together affects only the prior terms;
+            # the single-player steps do this very slowly, so do it directly.
+            gradient = curvature = 0.0
+            for r in ratings:
+                p = _sigmoid(r)
+                gradient += prior * (0.5 - p)
+                curvature += prior * p * (1 - p)
+            if curvature > 0:
+                step = max(-2.0, min(2.0, gradient / curvature))
+                ratings = [r + step for r in ratings]
+                largest_step = max(largest_step, abs(step))
+            if self.fit_colour_advantage:
+                p = _sigmoid(h)
+                gradient = prior * (0.5 - p)
+                curvature = prior * p * (1 - p)
+                for i, j, b_score, total in pairs:
+                    p = _sigmoid(ratings[i] - ratings[j] + h)
+                    gradient += b_score - total*p
+                    curvature += total * p * (1 - p)
+                step = max(-2.0, min(2.0, gradient / curvature))
+                h += step
+                largest_step = max(largest_step, abs(step))
+            if largest_step < tolerance:
+                break
+        return ratings, h, iterations
+
+    def _fit_with_numpy(self, n, pairs, tolerance, max_iterations):
+        # Fit using full Newton steps, with the gradient and the information
+        # matrix built from arrays over the pairings.
+        # Returns a tuple (ratings, h, iterations, variances)
+        # The last parameter is the colour advantage.
+        prior = self.prior_games
+        size = n + 1
+        if pairs:
+            black, white, b_score, total = [
+                numpy.array(a) for a in zip(*pairs)]
+            black = black.astype(int)
+            white = white.astype(int)
+        else:
+            black = white = numpy.zeros(0, dtype=int)
+            b_score = total = numpy.zeros(0)
+
+        def sigmoid(x):
+            return 0.5 * (1.0 + numpy.tanh(0.5 * x))
+
+        def get_gradient_and_information(x):
+            ratings = x[:n]
+            h = x[n]
+            p = sigmoid(ratings[black] - ratings[white] + h)
+            residual = b_score - total * p
+            w = total * p * (1 - p)
+            p_prior = sigmoid(x)
+            gradient = prior * (0.5 - p_prior)
+            gradient[:n] += (numpy.bincount(black, residual, n) -
+                             numpy.bincount(white, residual, n))
+            info = numpy.diag(prior * p_prior * (1 - p_prior))
+            info[:n, :n] += numpy.diag(numpy.bincount(black, w, n) +
+                                       numpy.bincount(white, w, n))
+            off_diagonal = numpy.bincount(
+                numpy.concatenate((black * size + white, white * size + black)),
+                numpy.concatenate((w, w)), size * size)
+            info -= off_diagonal.reshape(size, size)
+            if self.fit_colour_advantage:
+                gradient[n] += residual.sum()
+                cross = (numpy.bincount(black, w, n) -
+                         numpy.bincount(white, w, n))
+                info[:n, n] = cross
+                info[n, :n] = cross
+                info[n, n] += w.sum()
+            else:
+                gradient[n] = 0.0
+                info[n, :] = 0.0
+                info[:, n] = 0.0
+                info[n, n] = 1.0
+            return gradient, info
+
+        x = numpy.zeros(size)
+        iterations = 0
+        while iterations < max_iterations:
+            iterations += 1
+            gradient, info = get_gradient_and_information(x)
+            step = numpy.linalg.solve(info, gradient)
+            largest_step = numpy.abs(step).max()
+            if largest_step > 2.0:
+                step *= 2.0 / largest_step
+            x += step
+            if largest_step < tolerance:
+                break
+
+        _, info = get_gradient_and_information(x)
+        covariance = numpy.linalg.inv(info)
+        rating_covariance = covariance[:n, :n]
+        if n:
+            row_means = rating_covariance.mean(axis=1)
+            # variance of r_i - mean(r)
+            rating_variances = (numpy.diag(rating_covariance) -
+                                2 * row_means + row_means.mean())
+        else:
+            rating_variances = numpy.zeros(0)
+        if self.fit_colour_advantage:
+            h_variance = covariance[n, n]
+        else:
+            h_variance = 0.0
+        return (x[:n].tolist(), float(x[n]), iterations,
+                (rating_variances.tolist(), float(h_variance)))
+
+    def _get_variances(self, ratings, h, pairs):
+        # Returns a pair (list of variances of r_i - mean(r), variance of h)
+        n = len(ratings)
+        covariance = self._get_covariance(ratings, h, pairs)
+        rating_variances = []
+        if n:
+            row_means = [sum(row[:n]) / n for row in covariance[:n]]
+            overall_mean = sum(row_means) / n
+            for i in xrange(n):
+                rating_variances.append(
+                    covariance[i][i] - 2*row_means[i] + overall_mean)
+        if self.fit_colour_advantage:
+            h_variance = covariance[n][n]
+        else:
+            h_variance = 0.0
+        return rating_variances, h_variance
+
+    def _get_covariance(self, ratings, h, pairs):
+        # Returns the inverse of the (negated) Hessian of the log-posterior.
+        # The last row and column are for the colour advantage.
+        n = len(ratings)
+        prior = self.prior_games
+        size = n + 1
+        info = [[0.0] * size for _ in xrange(size)]
+        for i in xrange(n):
+            p = _sigmoid(ratings[i])
+            info[i][i] += prior * p * (1 - p)
+        p = _sigmoid(h)
+        info[n][n] += prior * p * (1 - p)
+        for i, j, b_score, total in pairs:
+            p = _sigmoid(ratings[i] - ratings[j] + h)
+            w = total * p * (1 - p)
+            info[i][i] += w
+            info[j][j] += w
+            info[i][j] -= w
+            info[j][i] -= w
+            if self.fit_colour_advantage:
+                info[i][n] += w
+                info[n][i] += w
+                info[j][n] -= w
+                info[n][j] -= w
+                info[n][n] += w
+        if not self.fit_colour_advantage:
+            for i in xrange(n):
+                info[i][n] = info[n][i] = 0.0
+            info[n][n] = 1.0
+        return invert_matrix(info)
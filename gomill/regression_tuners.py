@@ -0,0 +1,675 @@
+"""Competitions for parameter tuning using local quadratic regression.
+
+This follows the approach of Remi Coulom's CLOP: the candidate's expected
+score is modelled as a logistic function of a quadratic in the parameters,
+fitted by weighted maximum likelihood to all the results so far. Samples
+which the model says are weak are given less weight, so the fit concentrates
+on the region around the optimum, and new samples are drawn from that region.
+
+Unlike the gomill-clop example, the regression runs in the ringmaster process,
+so games can be played in parallel: samples are proposed in batches, and the
+model is refitted (starting from the previous coefficients) whenever a new
+batch is needed.
+
+The fit uses numpy if it's available.
+
+"""
+
+from __future__ import division
+
+import random
+from math import exp, sqrt
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from gomill import compact_tracebacks
+from gomill import game_jobs
+from gomill import competitions
+from gomill import competition_schedulers
+from gomill.competitions import (
+    Competition, NoGameAvailable, CompetitionError, ControlFileError,
+    Player_config)
+from gomill.ratings import invert_matrix
+from gomill.settings import *
+from gomill.utils import format_float, format_percent
+
+
+def _sigmoid(x):
+    if x >= 0:
+        return 1 / (1 + exp(-x))
+    z = exp(x)
+    return z / (1 + z)
+
+def quadratic_features(point, correlations=True):
+    """Return the regression features for a point.
+
+    point        -- sequence of floats
+    correlations -- bool: whether to include the cross terms
+
+    Returns a list of floats: a constant 1, then the coordinates, then the
+    products of pairs of coordinates (squares only, if correlations is false).
+
+    """
+    result = [1.0]
+    result.extend(point)
+    n = len(point)
+    for i in xrange(n):
+        if correlations:
+            for j in xrange(i, n):
+                result.append(point[i] * point[j])
+        else:
+            result.append(point[i] * point[i])
+    return result
+
+def count_features(dimensions, correlations=True):
+    """Return the number of regression features for a given dimension."""
+    if correlations:
+        return 1 + dimensions + dimensions * (dimensions + 1) // 2
+    else:
+        return 1 + 2 * dimensions
+
+def fit_logistic_regression(rows, scores, weights, coefficients,
+                            prior=1.0, tolerance=1e-6, max_iterations=25):
+    """Fit a weighted logistic regression by Newton's method.
+
+    rows         -- list of feature vectors (lists of floats)
+    scores       -- list of floats (each between 0 and 1)
+    weights      -- list of nonnegative floats
+    coefficients -- list of floats: the starting point
+    prior        -- float: weight of the Gaussian prior on the coefficients
+
+    Maximises
+      sum w * (s log p + (1-s) log (1-p)) - prior * |coefficients|^2 / 2
+    where p is the sigmoid of the dot product of the row and the coefficients.
+
+    Returns a new list of floats.
+
+    The prior keeps the coefficients finite when the data doesn't determine
+    them. Starting from the previous fit, a refit after adding a few results
+    usually takes two or three iterations.
+
+    """
+    size = len(coefficients)
+    beta = list(coefficients)
+    if numpy is not None:
+        x = numpy.array(rows, dtype=float).reshape(len(rows), size)
+        s = numpy.array(scores, dtype=float)
+        w = numpy.array(weights, dtype=float)
+        identity = numpy.identity(size)
+        beta = numpy.array(beta, dtype=float)
+        for _ in xrange(max_iterations):
+            p = 1 / (1 + numpy.exp(-numpy.clip(x.dot(beta), -50, 50)))
+            gradient = x.T.dot(w * (s - p)) - prior * beta
+            hessian = (x.T * (w * p * (1 - p))).dot(x) + prior * identity
+            step = numpy.clip(numpy.linalg.solve(hessian, gradient), -2, 2)
+            beta += step
+            if numpy.abs(step).max() < tolerance:
+                break
+        return beta.tolist()
+    for _ in xrange(max_iterations):
+        gradient = [-prior * b for b in beta]
+        hessian = [[prior * (i == j) for j in xrange(size)]
+                   for i in xrange(size)]
+        for row, score, weight in zip(rows, scores, weights):
+            if weight == 0:
+                continue
+            p = _sigmoid(sum(a*b for (a, b) in zip(row, beta)))
+            residual = weight * (score - p)
+            curvature = weight * p * (1 - p)
+            for i in xrange(size):
+                gradient[i] += residual * row[i]
+                f = curvature * row[i]
+                hessian_i = hessian[i]
+                for j in xrange(i+1):
+                    hessian_i[j] += f * row[j]
+        for i in xrange(size):
+            for j in xrange(i):
+                hessian[j][i] = hessian[i][j]
+        inverse = invert_matrix(hessian)
+        largest_step = 0.0
+        for i in xrange(size):
+            step = sum(a*b for (a, b) in zip(inverse[i], gradient))
+            step = max(-2.0, min(2.0, step))
+            beta[i] += step
+            largest_step = max(largest_step, abs(step))
+        if largest_step < tolerance:
+            break
+    return beta
+
+
+parameter_settings = [
+    Setting('code', interpret_identifier),
+    Setting('min_value', interpret_float),
+    Setting('max_value', interpret_float),
+    Setting('transform', interpret_callable, default=float),
+    Setting('format', interpret_8bit_string, default=None),
+    ]
+
+class Parameter_config(Quiet_config):
+    """Parameter (ie, dimension) description for use in control files."""
+    # positional or keyword
+    positional_arguments = ('code',)
+    # keyword-only
+    keyword_arguments = tuple(setting.name for setting in parameter_settings
+                              if setting.name != 'code')
+
+class Parameter_spec(object):
+    """Internal description of a parameter spec from the configuration file.
+
+    Public attributes:
+      code          -- identifier
+      min_value     -- float
+      max_value     -- float
+      transform     -- function float -> player parameter
+      format        -- string for use with '%'
+
+    """
+    def normalise(self, v):
+        """Map an optimiser parameter to the range -1 to 1."""
+        return (2 * (v - self.min_value) /
+                (self.max_value - self.min_value) - 1)
+
+    def denormalise(self, u):
+        """Map a value in the range -1 to 1 to an optimiser parameter."""
+        return (self.min_value +
+                (u + 1) * (self.max_value - self.min_value) / 2)
+
+
+class Regression_tuner(Competition):
+    """A Competition for parameter tuning using quadratic regression.
+
+    Each game uses a fresh sample from the parameter space. The game ids are
+    the game numbers; the candidate codes are like '#7'.
+
+    Samples are proposed in batches of batch_size; the model is refitted
+    before proposing each batch if any new results have arrived. Until
+    initial_samples results are known, samples are drawn uniformly.
+
+    """
+    def __init__(self, competition_code, **kwargs):
+        Competition.__init__(self, competition_code, **kwargs)
+        self.seen_successful_game = False
+
+    def control_file_globals(self):
+        result = Competition.control_file_globals(self)
+        result.update({
+            'Parameter' : Parameter_config,
+            })
+        return result
+
+    global_settings = (Competition.global_settings +
+                       competitions.game_settings + [
+        Setting('number_of_games', allow_none(interpret_positive_int),
+                default=None),
+        Setting('candidate_colour', interpret_colour),
+        Setting('batch_size', interpret_positive_int, default=8),
+        Setting('initial_samples', allow_none(interpret_positive_int),
+                default=None),
+        Setting('locality', interpret_float, default=1.0),
+        Setting('correlations', interpret_enum('all', 'none'),
+                default='all'),
+        Setting('seed', allow_none(interpret_int), default=None),
+        ])
+
+    special_settings = [
+        Setting('opponent', interpret_identifier),
+        Setting('parameters',
+                interpret_sequence_of_quiet_configs(Parameter_config)),
+        Setting('make_candidate', interpret_callable),
+        ]
+
+    def parameter_spec_from_config(self, parameter_config):
+        """Make a Parameter_spec from a Parameter_config.
+
+        Raises ControlFileError if there is an error in the configuration.
+
+        Returns a Parameter_spec with all attributes set.
+
+        """
+        arguments = parameter_config.resolve_arguments()
+        interpreted = load_settings(parameter_settings, arguments)
+        pspec = Parameter_spec()
+        for name, value in interpreted.iteritems():
+            setattr(pspec, name, value)
+        if not pspec.min_value < pspec.max_value:
+            raise ValueError("'max_value': must be greater than min_value")
+        try:
+            transformed = pspec.transform(pspec.min_value)
+        except Exception:
+            raise ValueError(
+                "error from transform (applied to min_value)\n%s" %
+                (compact_tracebacks.format_traceback(skip=1)))
+        if pspec.format is None:
+            pspec.format = pspec.code + ":%s"
+        try:
+            pspec.format % transformed
+        except Exception:
+            raise ControlFileError("'format': invalid format string")
+        return pspec
+
+    def initialise_from_control_file(self, config):
+        Competition.initialise_from_control_file(self, config)
+
+        competitions.validate_handicap(
+            self.handicap, self.handicap_style, self.board_size)
+
+        if not self.locality > 0.0:
+            raise ControlFileError("locality: must be positive")
+
+        try:
+            specials = load_settings(self.special_settings, config)
+        except ValueError, e:
+            raise ControlFileError(str(e))
+
+        try:
+            self.opponent = self.players[specials['opponent']]
+        except KeyError:
+            raise ControlFileError(
+                "opponent: unknown player %s" % specials['opponent'])
+
+        self.parameter_specs = []
+        if not specials['parameters']:
+            raise ControlFileError("parameters: empty list")
+        seen_codes = set()
+        for i, parameter_spec in enumerate(specials['parameters']):
+            try:
+                pspec = self.parameter_spec_from_config(parameter_spec)
+            except StandardError, e:
+                code = parameter_spec.get_key()
+                if code is None:
+                    code = i
+                raise ControlFileError("parameter %s: %s" % (code, e))
+            if pspec.code in seen_codes:
+                raise ControlFileError(
+                    "duplicate parameter code: %s" % pspec.code)
+            seen_codes.add(pspec.code)
+            self.parameter_specs.append(pspec)
+
+        self.candidate_maker_fn = specials['make_candidate']
+
+        self.feature_count = count_features(
+            len(self.parameter_specs), self.correlations == 'all')
+        if self.initial_samples is None:
+            self.initial_samples = 4 * self.feature_count
+
+
+    # State attributes (*: in persistent state):
+    #  *scheduler            -- Simple_scheduler (tokens are game numbers)
+    #  *samples              -- list of pairs (optimiser parameters, score)
+    #                           score is 1, 0.5, or 0 for the candidate
+    #  *pending              -- map game number -> optimiser parameters
+    #                           (games which have been issued but not fixed)
+    #  *coefficients         -- list of floats, or None before the first fit
+    #  *samples_fitted       -- number of samples used in the latest fit
+    #  *opponent_description -- string (or None)
+    #   features             -- list of feature vectors, parallel to samples
+    #   weights              -- list of floats, parallel to samples
+    #   best_value           -- highest fitted value (logit) over the samples
+    #                           used in the latest fit
+    #   value_scale          -- scale for the weights, in logits
+    #   proposals_left       -- number of games to issue before the next
+    #                           batch
+    #   seen_successful_game -- bool (per-run state)
+
+    def _reset_derived_state(self):
+        self.features = [self._features_for(parameters)
+                         for (parameters, _) in self.samples]
+        self.proposals_left = 0
+        self._set_weights()
+
+    def set_clean_status(self):
+        self.scheduler = competition_schedulers.Simple_scheduler()
+        self.samples = []
+        self.pending = {}
+        self.coefficients = None
+        self.samples_fitted = 0
+        self.opponent_description = None
+        self._reset_derived_state()
+
+    # Can bump this to prevent people loading incompatible .status files.
+    status_format_version = 0
+
+    def get_status(self):
+        return {
+            'scheduler' : self.scheduler,
+            'samples' : self.samples,
+            'pending' : self.pending,
+            'coefficients' : self.coefficients,
+            'samples_fitted' : self.samples_fitted,
+            'opponent_description' : self.opponent_description,
+            'seed' : self.seed,
+            }
+
+    def set_status(self, status):
+        dimensions = len(self.parameter_specs)
+        for parameters, _ in status['samples'][:1]:
+            if len(parameters) != dimensions:
+                raise CompetitionError(
+                    "status file is inconsistent with control file")
+        if status.get('seed') != self.seed:
+            raise CompetitionError(
+                "status file is inconsistent with control file "
+                "(seed has changed)")
+        self.scheduler = status['scheduler']
+        self.scheduler.rollback()
+        self.samples = status['samples']
+        self.pending = status['pending']
+        self.coefficients = status['coefficients']
+        self.samples_fitted = status['samples_fitted']
+        if (self.coefficients is not None and
+            len(self.coefficients) != self.feature_count):
+            # 'correlations' has changed; the next fit starts afresh
+            self.coefficients = None
+            self.samples_fitted = 0
+        self.opponent_description = status['opponent_description']
+        self._reset_derived_state()
+
+    def _features_for(self, optimiser_parameters):
+        return quadratic_features(
+            [pspec.normalise(v) for pspec, v in
+             zip(self.parameter_specs, optimiser_parameters)],
+            self.correlations == 'all')
+
+    def _value(self, features):
+        return sum(a*b for (a, b) in zip(features, self.coefficients))
+
+    def _set_weights(self):
+        """Recalculate the sample weights from the current coefficients.
+
+        A sample's weight is exp((q - q_max) / (locality * sd)), capped at 1,
+        where q is the fitted value (in logits) at the sample, and q_max and
+        sd are the highest value and the standard deviation of the values over
+        the samples used in the fit.
+
+        Samples added since the fit are weighted in the same way, so the
+        weights are the same whether or not the ringmaster has been restarted
+        in between.
+
+        """
+        if self.coefficients is None or not self.samples_fitted:
+            self.weights = [1.0] * len(self.samples)
+            self.best_value = None
+            self.value_scale = None
+            return
+        values = [self._value(features)
+                  for features in self.features[:self.samples_fitted]]
+        n = len(values)
+        mean = sum(values) / n
+        sd = sqrt(sum((v - mean)**2 for v in values) / n)
+        self.best_value = max(values)
+        self.value_scale = self.locality * sd
+        self.weights = [self._get_weight(features)
+                        for features in self.features]
+
+    def _get_weight(self, features):
+        if self.value_scale is None or self.value_scale == 0:
+            return 1.0
+        return min(1.0, exp((self._value(features) - self.best_value) /
+                            self.value_scale))
+
+    def refit(self):
+        """Refit the model to all results so far.
+
+        Uses the weights from the previous fit, starting from the previous
+        coefficients.
+
+        """
+        if self.coefficients is None:
+            coefficients = [0.0] * self.feature_count
+        else:
+            coefficients = self.coefficients
+        self.coefficients = fit_logistic_regression(
+            self.features, [score for (_, score) in self.samples],
+            self.weights, coefficients)
+        self.samples_fitted = len(self.samples)
+        self._set_weights()
+
+    def propose_sample(self, rng=None, max_tries=1000):
+        """Choose optimiser parameters for a new game.
+
+        rng -- random.Random (default: the random module)
+
+        Points are drawn uniformly from the parameter space and accepted with
+        probability given by the weight the model assigns them; if none is
+        accepted after max_tries, the most highly weighted is used.
+
+        """
+        if rng is None:
+            rng = random
+        best = None
+        best_weight = -1.0
+        for _ in xrange(max_tries):
+            point = [rng.uniform(-1.0, 1.0) for _ in self.parameter_specs]
+            parameters = [pspec.denormalise(u) for pspec, u in
+                          zip(self.parameter_specs, point)]
+            weight = self._get_weight(self._features_for(parameters))
+            if rng.random() < weight:
+                return parameters
+            if weight > best_weight:
+                best = parameters
+                best_weight = weight
+        return best
+
+    def propose_batch(self):
+        """Start a new batch of samples, refitting if necessary."""
+        if (len(self.samples) >= self.initial_samples and
+            len(self.samples) > self.samples_fitted):
+            self.refit()
+            self.log_history("fit after %d games: %s" % (
+                len(self.samples), self.format_estimate()))
+        self.proposals_left = self.batch_size
+
+    def get_estimate(self):
+        """Return the current estimate of the best parameters.
+
+        Returns a pair (optimiser parameters, expected score), or None if the
+        model hasn't been fitted yet.
+
+        The estimate is the weighted mean of the samples.
+
+        """
+        if self.coefficients is None or not self.samples:
+            return None
+        total_weight = sum(self.weights)
+        estimate = [0.0] * len(self.parameter_specs)
+        for (parameters, _), weight in zip(self.samples, self.weights):
+            for i, v in enumerate(parameters):
+                estimate[i] += weight * v
+        estimate = [v / total_weight for v in estimate]
+        return estimate, _sigmoid(self._value(self._features_for(estimate)))
+
+    def format_estimate(self):
+        estimate = self.get_estimate()
+        if estimate is None:
+            return "--"
+        parameters, expected_score = estimate
+        return "%s (expected score %s)" % (
+            self.format_optimiser_parameters(parameters),
+            format_percent(expected_score, 1))
+
+    def transform_parameters(self, optimiser_parameters):
+        l = []
+        for pspec, v in zip(self.parameter_specs, optimiser_parameters):
+            try:
+                l.append(pspec.transform(v))
+            except Exception:
+                raise CompetitionError(
+                    "error from transform for %s\n%s" %
+                    (pspec.code, compact_tracebacks.format_traceback(skip=1)))
+        return tuple(l)
+
+    def format_engine_parameters(self, engine_parameters):
+        l = []
+        for pspec, v in zip(self.parameter_specs, engine_parameters):
+            try:
+                s = pspec.format % v
+            except Exception:
+                s = "[%s?%s]" % (pspec.code, v)
+            l.append(s)
+        return "; ".join(l)
+
+    def format_optimiser_parameters(self, optimiser_parameters):
+        return self.format_engine_parameters(self.transform_parameters(
+            optimiser_parameters))
+
+    def make_candidate(self, player_code, engine_parameters):
+        """Make a player using the specified engine parameters.
+
+        Returns a game_jobs.Player.
+
+        """
+        try:
+            candidate_config = self.candidate_maker_fn(*engine_parameters)
+        except Exception:
+            raise CompetitionError(
+                "error from make_candidate()\n%s" %
+                compact_tracebacks.format_traceback(skip=1))
+        if not isinstance(candidate_config, Player_config):
+            raise CompetitionError(
+                "make_candidate() returned %r, not Player" %
+                candidate_config)
+        try:
+            candidate = self.game_jobs_player_from_config(
+                player_code, candidate_config)
+        except Exception, e:
+            raise CompetitionError(
+                "bad player spec from make_candidate():\n"
+                "%s\nparameters were: %s" %
+                (e, self.format_engine_parameters(engine_parameters)))
+        return candidate
+
+    def get_player_checks(self):
+        engine_parameters = self.transform_parameters(
+            [pspec.denormalise(0.0) for pspec in self.parameter_specs])
+        candidate = self.make_candidate('candidate', engine_parameters)
+        result = []
+        for player in [candidate, self.opponent]:
+            check = game_jobs.Player_check()
+            check.player = player
+            check.board_size = self.board_size
+            check.komi = self.komi
+            result.append(check)
+        return result
+
+    def get_game(self):
+        if (self.number_of_games is not None and
+            self.scheduler.issued >= self.number_of_games):
+            return NoGameAvailable
+        game_number = self.scheduler.issue()
+        optimiser_parameters = self.pending.get(game_number)
+        if optimiser_parameters is None:
+            if not self.proposals_left:
+                self.propose_batch()
+            self.proposals_left -= 1
+            optimiser_parameters = self.propose_sample(
+                competitions.make_rng(self.seed, game_number))
+            self.pending[game_number] = optimiser_parameters
+        engine_parameters = self.transform_parameters(optimiser_parameters)
+        candidate = self.make_candidate(
+            "#%d" % game_number, engine_parameters)
+
+        job = game_jobs.Game_job()
+        job.game_id = str(game_number)
+        job.game_data = game_number
+        if self.candidate_colour == 'b':
+            job.player_b = candidate
+            job.player_w = self.opponent
+        else:
+            job.player_b = self.opponent
+            job.player_w = candidate
+        job.board_size = self.board_size
+        job.komi = self.komi
+        job.move_limit = self.move_limit
+        job.handicap = self.handicap
+        job.handicap_is_free = (self.handicap_style == 'free')
+        job.use_internal_scorer = (self.scorer == 'internal')
+        job.adjudication = self.adjudication
+        job.internal_scorer_handicap_compensation = \
+            self.internal_scorer_handicap_compensation
+        job.sgf_event = self.competition_code
+        job.sgf_note = ("Candidate parameters: %s" %
+                        self.format_engine_parameters(engine_parameters))
+        return job
+
+    def process_game_result(self, response):
+        self.seen_successful_game = True
+        self.opponent_description = response.engine_descriptions[
+            self.opponent.code].get_long_description()
+        game_number = response.game_data
+        self.scheduler.fix(game_number)
+        optimiser_parameters = self.pending.pop(game_number)
+        # Counting jigo or no-result as half a point for the candidate
+        winning_colour = response.game_result.winning_colour
+        if winning_colour == self.candidate_colour:
+            score = 1
+        elif winning_colour is None:
+            score = 0.5
+        else:
+            score = 0
+        self.samples.append((optimiser_parameters, score))
+        features = self._features_for(optimiser_parameters)
+        self.features.append(features)
+        if self.coefficients is None:
+            self.weights.append(1.0)
+        else:
+            self.weights.append(self._get_weight(features))
+
+    def process_game_error(self, job, previous_error_count):
+        ## If the very first game to return a response gives an error, halt.
+        ## Otherwise, retry once and halt on a second failure.
+        stop_competition = False
+        retry_game = False
+        if (not self.seen_successful_game) or (previous_error_count > 0):
+            stop_competition = True
+        else:
+            retry_game = True
+        return stop_competition, retry_game
+
+
+    def write_static_description(self, out):
+        def p(s):
+            print >>out, s
+        p("regression tuning event: %s" % self.competition_code)
+        if self.description:
+            p(self.description)
+        p("board size: %s" % self.board_size)
+        p("komi: %s" % self.komi)
+
+    def _write_main_report(self, out):
+        games_played = len(self.samples)
+        if self.number_of_games is None:
+            print >>out, "%d games played" % games_played
+        else:
+            print >>out, "%d/%d games played" % (
+                games_played, self.number_of_games)
+        if games_played:
+            print >>out, "candidate scored %s" % format_percent(
+                sum(score for (_, score) in self.samples), games_played)
+        print >>out
+        if self.coefficients is None:
+            print >>out, "no fit yet (first fit after %d games)" % (
+                self.initial_samples)
+        else:
+            print >>out, "fitted to %d games (%s weighted)" % (
+                self.samples_fitted, format_float(round(sum(self.weights))))
+            print >>out, "Estimated best parameters: %s" % (
+                self.format_estimate())
+        print >>out
+
+    def write_screen_report(self, out):
+        self._write_main_report(out)
+
+    def write_short_report(self, out):
+        self.write_static_description(out)
+        self._write_main_report(out)
+        if self.opponent_description:
+            print >>out, "opponent (%s): %s" % (
+                self.opponent.code, self.opponent_description)
+        else:
+            print >>out, "opponent: %s" % self.opponent.code
+        print >>out
+
+    write_full_report = write_short_report
@@ -0,0 +1,410 @@
+"""Compact column-based storage of tournament game results.
+
+A Results_table holds one entry per game, in a set of parallel columns. Player
+codes and matchup ids are stored once, and referred to by small integers;
+numeric columns are stdlib arrays. This takes much less memory than a list of
+Game_result objects, and selecting games is a matter of scanning a few arrays.
+
+"""
+
+from __future__ import division
+
+import csv
+from array import array
+
+try:
+    import json
+except ImportError:
+    # Python 2.5
+    json = None
+
+# Values in the 'outcome' column
+BLACK_WIN = 0
+WHITE_WIN = 1
+JIGO = 2
+UNKNOWN = 3
+
+_outcome_codes = {'b' : BLACK_WIN, 'w' : WHITE_WIN}
+_outcome_names = {
+    BLACK_WIN : 'b', WHITE_WIN : 'w', JIGO : 'jigo', UNKNOWN : 'unknown'}
+_outcome_codes_by_name = dict(
+    (name, code) for (code, name) in _outcome_names.iteritems())
+
+# Column names used for export, in order
+export_columns = (
+    'game_id', 'matchup_id', 'player_b', 'player_w', 'outcome', 'winner',
+    'margin', 'is_forfeit', 'sgf_result', 'cpu_time_b', 'cpu_time_w')
+
+_nan = float('nan')
+
+def _check_json_available():
+    if json is None:
+        raise ValueError("JSON Lines support requires Python 2.6 or later")
+
+def _is_nan(f):
+    return f != f
+
+def _parse_margin(sgf_result):
+    """Return the numeric margin from an SGF RE value, or NaN."""
+    try:
+        return float(sgf_result[2:])
+    except ValueError:
+        return _nan
+
+
+class Results_table(object):
+    """Game results stored by column.
+
+    Public attributes (treat as read-only):
+      matchup_ids -- list of matchup ids
+      players     -- list of player codes
+      game_ids    -- list of strings
+      matchups    -- array of ints (index into matchup_ids)
+      player_b    -- array of ints (index into players)
+      player_w    -- array of ints (index into players)
+      outcome     -- array of ints (BLACK_WIN, WHITE_WIN, JIGO, or UNKNOWN)
+      margin      -- array of floats (NaN if not known)
+      is_forfeit  -- array of ints (0 or 1)
+      sgf_results -- list of strings
+      cpu_time_b  -- array of floats (NaN if not known)
+      cpu_time_w  -- array of floats (NaN if not known)
+
+    All the per-game columns have the same length. Strings are shared with the
+    Game_results the table was built from (or with other tables), so they
+    don't take extra space.
+
+    Use len() to find the number of games.
+
+    """
+    def __init__(self, matchup_ids, players):
+        self.matchup_ids = list(matchup_ids)
+        self.players = list(players)
+        self._matchup_numbers = dict(
+            (matchup_id, i) for (i, matchup_id) in enumerate(self.matchup_ids))
+        self._player_numbers = dict(
+            (player, i) for (i, player) in enumerate(self.players))
+        self.game_ids = []
+        self.matchups = array('i')
+        self.player_b = array('i')
+        self.player_w = array('i')
+        self.outcome = array('b')
+        self.margin = array('d')
+        self.is_forfeit = array('b')
+        self.sgf_results = []
+        self.cpu_time_b = array('d')
+        self.cpu_time_w = array('d')
+
+    def __len__(self):
+        return len(self.game_ids)
+
+    def _get_player_number(self, player):
+        try:
+            return self._player_numbers[player]
+        except KeyError:
+            i = self._player_numbers[player] = len(self.players)
+            self.players.append(player)
+            return i
+
+    def _get_matchup_number(self, matchup_id):
+        try:
+            return self._matchup_numbers[matchup_id]
+        except KeyError:
+            i = self._matchup_numbers[matchup_id] = len(self.matchup_ids)
+            self.matchup_ids.append(matchup_id)
+            return i
+
+    def add_result(self, matchup_id, game_result):
+        """Append a game to the table.
+
+        matchup_id  -- string
+        game_result -- gtp_games.Game_result
+
+        """
+        self.game_ids.append(game_result.game_id)
+        self.matchups.append(self._get_matchup_number(matchup_id))
+        self.player_b.append(self._get_player_number(game_result.player_b))
+        self.player_w.append(self._get_player_number(game_result.player_w))
+        if game_result.is_jigo:
+            outcome = JIGO
+            margin = 0.0
+        elif game_result.winning_colour is None:
+            outcome = UNKNOWN
+            margin = _nan
+        else:
+            outcome = _outcome_codes[game_result.winning_colour]
+            margin = _parse_margin(game_result.sgf_result)
+        self.outcome.append(outcome)
+        self.margin.append(margin)
+        self.is_forfeit.append(int(bool(game_result.is_forfeit)))
+        self.sgf_results.append(game_result.sgf_result)
+        cpu_time = game_result.cpu_times.get(game_result.player_b)
+        self.cpu_time_b.append(_nan if cpu_time is None else cpu_time)
+        cpu_time = game_result.cpu_times.get(game_result.player_w)
+        self.cpu_time_w.append(_nan if cpu_time is None else cpu_time)
+
+    def add_row(self, row):
+        """Append a game described by a dict, as produced by iter_rows().
+
+        Entries other than 'game_id', 'matchup_id', 'player_b', 'player_w',
+        and 'outcome' may be missing (or None).
+
+        Raises ValueError if the row isn't valid.
+
+        """
+        try:
+            game_id = row['game_id']
+            matchup_id = row['matchup_id']
+            player_b = row['player_b']
+            player_w = row['player_w']
+            outcome_name = row['outcome']
+        except KeyError, e:
+            raise ValueError("missing '%s'" % e.args[0])
+        except TypeError:
+            raise ValueError("not an object")
+        for name, value in (('player_b', player_b), ('player_w', player_w)):
+            if not isinstance(value, basestring):
+                raise ValueError("invalid %s" % name)
+        try:
+            outcome = _outcome_codes_by_name[outcome_name]
+        except (KeyError, TypeError):
+            raise ValueError("invalid outcome: %r" % (outcome_name,))
+        def float_or_nan(name):
+            f = row.get(name)
+            if f is None:
+                return _nan
+            try:
+                return float(f)
+            except (TypeError, ValueError):
+                raise ValueError("invalid %s" % name)
+        margin = float_or_nan('margin')
+        cpu_time_b = float_or_nan('cpu_time_b')
+        cpu_time_w = float_or_nan('cpu_time_w')
+        self.game_ids.append(str(game_id))
+        self.matchups.append(self._get_matchup_number(str(matchup_id)))
+        self.player_b.append(self._get_player_number(str(player_b)))
+        self.player_w.append(self._get_player_number(str(player_w)))
+        self.outcome.append(outcome)
+        self.margin.append(margin)
+        self.is_forfeit.append(int(bool(row.get('is_forfeit'))))
+        sgf_result = row.get('sgf_result')
+        self.sgf_results.append("" if sgf_result is None else str(sgf_result))
+        self.cpu_time_b.append(cpu_time_b)
+        self.cpu_time_w.append(cpu_time_w)
+
+    def read_jsonl(self, f):
+        """Append games from a file in the format written by write_jsonl().
+
+        f -- file-like object
+
+        Blank lines are ignored.
+
+        Raises ValueError if the data isn't valid, with a message including the
+        line number (or if the json module isn't available).
+
+        """
+        _check_json_available()
+        for i, line in enumerate(f):
+            if not line.strip():
+                continue
+            try:
+                self.add_row(json.loads(line))
+            except ValueError, e:
+                raise ValueError("line %d: %s" % (i+1, e))
+
+    @classmethod
+    def from_results(cls, results, matchup_ids=None):
+        """Build a table from Game_results.
+
+        results     -- map matchup id -> list of gtp_games.Game_results
+        matchup_ids -- list of matchup ids, or None
+
+        If matchup_ids is specified, it determines the order of the matchups in
+        the table; matchups in 'results' which aren't listed come after those
+        which are.
+
+        Within a matchup, games are in the order they appear in 'results'.
+
+        """
+        if matchup_ids is None:
+            matchup_ids = []
+        table = cls([], [])
+        for matchup_id in matchup_ids:
+            table._get_matchup_number(matchup_id)
+        ordered = [m for m in matchup_ids if m in results]
+        ordered += sorted(m for m in results if m not in table._matchup_numbers)
+        for matchup_id in ordered:
+            for game_result in results[matchup_id]:
+                table.add_result(matchup_id, game_result)
+        return table
+
+    def take(self, indices):
+        """Return a new table containing the specified rows.
+
+        indices -- sequence of ints (row numbers)
+
+        The new table uses the same numbering for matchups and players.
+
+        """
+        result = Results_table(self.matchup_ids, self.players)
+        for attr in ('game_ids', 'sgf_results'):
+            column = getattr(self, attr)
+            setattr(result, attr, [column[i] for i in indices])
+        for attr, typecode in (('matchups', 'i'), ('player_b', 'i'),
+                               ('player_w', 'i'), ('outcome', 'b'),
+                               ('margin', 'd'), ('is_forfeit', 'b'),
+                               ('cpu_time_b', 'd'), ('cpu_time_w', 'd')):
+            column = getattr(self, attr)
+            setattr(result, attr, array(typecode, [column[i] for i in indices]))
+        return result
+
+    def select(self, matchup_id=None, player=None, winner=None,
+               winning_colour=None, forfeits=None,
+               min_cpu_time=None, max_cpu_time=None):
+        """Return the row numbers of games matching the specified criteria.
+
+        matchup_id     -- only games from this matchup
+        player         -- only games in which this player took part
+        winner         -- only games won by this player
+        winning_colour -- 'b', 'w', 'jigo', or 'unknown'
+        forfeits       -- True for only forfeited games, False for only
+                          games which weren't forfeited
+        min_cpu_time   -- only games where both players' CPU time is known and
+        max_cpu_time      within these bounds (seconds)
+
+        Returns a list of ints, in table order.
+
+        Each criterion is applied to the whole of the relevant columns in turn.
+
+        """
+        rows = xrange(len(self.game_ids))
+        if matchup_id is not None:
+            code = self._matchup_numbers.get(matchup_id)
+            matchups = self.matchups
+            rows = [i for i in rows if matchups[i] == code]
+        if player is not None or winner is not None:
+            player_b = self.player_b
+            player_w = self.player_w
+        if player is not None:
+            code = self._player_numbers.get(player)
+            rows = [i for i in rows
+                    if player_b[i] == code or player_w[i] == code]
+        if winning_colour is not None:
+            code = _outcome_codes_by_name[winning_colour]
+            outcome = self.outcome
+            rows = [i for i in rows if outcome[i] == code]
+        if winner is not None:
+            code = self._player_numbers.get(winner)
+            outcome = self.outcome
+            rows = [i for i in rows
+                    if (outcome[i] == BLACK_WIN and player_b[i] == code) or
+                       (outcome[i] == WHITE_WIN and player_w[i] == code)]
+        if forfeits is not None:
+            wanted = int(bool(forfeits))
+            is_forfeit = self.is_forfeit
+            rows = [i for i in rows if is_forfeit[i] == wanted]
+        if min_cpu_time is not None or max_cpu_time is not None:
+            lo = float('-inf') if min_cpu_time is None else min_cpu_time
+            hi = float('inf') if max_cpu_time is None else max_cpu_time
+            cpu_time_b = self.cpu_time_b
+            cpu_time_w = self.cpu_time_w
+            # NaN fails both comparisons
+            rows = [i for i in rows
+                    if lo <= cpu_time_b[i] <= hi and lo <= cpu_time_w[i] <= hi]
+        return list(rows)
+
+    def query(self, **kwargs):
+        """Return a new table containing the games matching the criteria.
+
+        Accepts the same keyword arguments as select().
+
+        """
+        return self.take(self.select(**kwargs))
+
+    def add_to_rating_fitter(self, fitter):
+        """Pass the games to a ratings.Rating_fitter.
+
+        Games with unknown results are left out.
+
+        """
+        players = self.players
+        scores = {}
+        for i in xrange(len(self.game_ids)):
+            outcome = self.outcome[i]
+            if outcome == UNKNOWN:
+                continue
+            key = (self.player_b[i], self.player_w[i])
+            totals = scores.get(key)
+            if totals is None:
+                totals = scores[key] = [0.0, 0.0]
+            if outcome == BLACK_WIN:
+                totals[0] += 1
+            elif outcome == WHITE_WIN:
+                totals[1] += 1
+            else:
+                totals[0] += 0.5
+                totals[1] += 0.5
+        for (player_b, player_w), (b_score, w_score) in sorted(
+                scores.iteritems()):
+            fitter.add_games(players[player_b], players[player_w],
+                             b_score, w_score)
+
+    def iter_rows(self):
+        """Yield a dict for each game, keyed by export_columns.
+
+        Values are strings, numbers, bools, or None (for unknown values).
+
+        """
+        def none_for_nan(f):
+            if _is_nan(f):
+                return None
+            return f
+        matchup_ids = self.matchup_ids
+        players = self.players
+        for i in xrange(len(self.game_ids)):
+            player_b = players[self.player_b[i]]
+            player_w = players[self.player_w[i]]
+            outcome = self.outcome[i]
+            if outcome == BLACK_WIN:
+                winner = player_b
+            elif outcome == WHITE_WIN:
+                winner = player_w
+            else:
+                winner = None
+            yield {
+                'game_id' : self.game_ids[i],
+                'matchup_id' : matchup_ids[self.matchups[i]],
+                'player_b' : player_b,
+                'player_w' : player_w,
+                'outcome' : _outcome_names[outcome],
+                'winner' : winner,
+                'margin' : none_for_nan(self.margin[i]),
+                'is_forfeit' : bool(self.is_forfeit[i]),
+                'sgf_result' : self.sgf_results[i],
+                'cpu_time_b' : none_for_nan(self.cpu_time_b[i]),
+                'cpu_time_w' : none_for_nan(self.cpu_time_w[i]),
+                }
+
+    def write_csv(self, out):
+        """Write the table to 'out' in CSV format, with a header line.
+
+        Unknown values are written as empty fields.
+
+        """
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(export_columns)
+        for row in self.iter_rows():
+            writer.writerow(["" if row[name] is None else row[name]
+                             for name in export_columns])
+
+    def write_jsonl(self, out):
+        """Write the table to 'out' in JSON Lines format (an object per game).
+
+        Unknown values are written as null.
+
+        Raises ValueError if the json module isn't available.
+
+        """
+        _check_json_available()
+        for row in self.iter_rows():
+            out.write(json.dumps(row, sort_keys=True))
+            out.write("\n")
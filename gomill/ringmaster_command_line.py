@@ -5,6 +5,7 @@ import sys
 from optparse import OptionParser
 
 from gomill import compact_tracebacks
+from gomill.ringmaster_control import ControlChannelUnavailable
 from gomill.ringmasters import (
     Ringmaster, RingmasterError, RingmasterInternalError)
 
@@ -28,13 +29,44 @@ def do_run(ringmaster, options):
         ringmaster.set_clean_status()
     if options.parallel is not None:
         ringmaster.set_parallel_worker_count(options.parallel)
+    if options.refresh_rate is not None:
+        ringmaster.set_display_refresh_rate(options.refresh_rate)
     ringmaster.run(options.max_games)
     ringmaster.report()
 
 def do_stop(ringmaster, options):
-    ringmaster.write_command("stop")
+    try:
+        ringmaster.send_control_command("stop")
+    except ControlChannelUnavailable:
+        # Maybe the running ringmaster couldn't create its control socket
+        ringmaster.write_command("stop")
+
+def _send_to_running_ringmaster(ringmaster, command):
+    try:
+        return ringmaster.send_control_command(command)
+    except ControlChannelUnavailable:
+        raise RingmasterError("competition is not running")
+
+def do_pause(ringmaster, options):
+    _send_to_running_ringmaster(ringmaster, "pause")
+
+def do_resume(ringmaster, options):
+    _send_to_running_ringmaster(ringmaster, "resume")
+
+def do_status(ringmaster, options):
+    print _send_to_running_ringmaster(ringmaster, "status")
+
+def do_jsonstatus(ringmaster, options):
+    print _send_to_running_ringmaster(ringmaster, "json")
 
 def do_show(ringmaster, options):
+    try:
+        report = ringmaster.send_control_command("report", timeout=60)
+    except (ControlChannelUnavailable, RingmasterError):
+        report = None
+    if report is not None and not report.startswith("error:"):
+        sys.stdout.write(report)
+        return
     if not ringmaster.status_file_exists():
         raise RingmasterError("no status file")
     ringmaster.load_status()
@@ -46,6 +78,22 @@ def do_report(ringmaster, options):
     ringmaster.load_status()
     ringmaster.report()
 
+def _get_results_table(ringmaster):
+    if not ringmaster.status_file_exists():
+        raise RingmasterError("no status file")
+    ringmaster.load_status()
+    return ringmaster.get_tournament_results().get_results_table()
+
+def do_csv(ringmaster, options):
+    _get_results_table(ringmaster).write_csv(sys.stdout)
+
+def do_jsonl(ringmaster, options):
+    table = _get_results_table(ringmaster)
+    try:
+        table.write_jsonl(sys.stdout)
+    except ValueError, e:
+        raise RingmasterError(str(e))
+
 def do_reset(ringmaster, options):
     ringmaster.delete_state_and_output()
 
@@ -53,23 +101,39 @@ def do_check(ringmaster, options):
     if not ringmaster.check_players(discard_stderr=False):
         return 1
 
+def do_merge(ringmaster, options):
+    if ringmaster.shard_index is not None:
+        raise RingmasterError("--shard doesn't make sense with merge")
+    shard_indices = ringmaster.merge_shards()
+    print "merged shards: %s" % " ".join(str(i) for i in shard_indices)
+    ringmaster.report()
+    ringmaster.print_status_report()
+
 def do_debugstatus(ringmaster, options):
     ringmaster.print_status()
 
 _actions = {
     "run" : do_run,
     "stop" : do_stop,
+    "pause" : do_pause,
+    "resume" : do_resume,
+    "status" : do_status,
+    "jsonstatus" : do_jsonstatus,
     "show" : do_show,
     "report" : do_report,
+    "csv" : do_csv,
+    "jsonl" : do_jsonl,
     "reset" : do_reset,
     "check" : do_check,
+    "merge" : do_merge,
     "debugstatus" : do_debugstatus,
     }
 
 
 def run(argv, ringmaster_class):
     usage = ("%prog [options] <control file> [command]\n\n"
-             "commands: run (default), stop, show, report, reset, check")
+             "commands: run (default), stop, pause, resume, status, "
+             "jsonstatus, show, report, csv, jsonl, reset, check, merge")
     parser = OptionParser(usage=usage, prog="ringmaster",
                           version=ringmaster_class.public_version)
     parser.add_option("--max-games", "-g", type="int",
@@ -80,6 +144,10 @@ def run(argv, ringmaster_class):
                       help="be silent except for warnings and errors")
     parser.add_option("--log-gtp", action="store_true",
                       help="write GTP logs")
+    parser.add_option("--refresh-rate", type="float",
+                      help="maximum number of display updates per second")
+    parser.add_option("--shard", metavar="K/N",
+                      help="act on shard K (counting from 0) of N")
     (options, args) = parser.parse_args(argv)
     if len(args) == 0:
         parser.error("no control file specified")
@@ -93,11 +161,19 @@ def run(argv, ringmaster_class):
         action = _actions[command]
     except KeyError:
         parser.error("no such command: %s" % command)
+    if options.shard is not None:
+        try:
+            shard_index, shard_count = [
+                int(s) for s in options.shard.split("/")]
+        except ValueError:
+            parser.error("--shard must be of the form K/N")
     ctl_pathname = args[0]
     try:
         if not os.path.exists(ctl_pathname):
             raise RingmasterError("control file %s not found" % ctl_pathname)
         ringmaster = ringmaster_class(ctl_pathname)
+        if options.shard is not None:
+            ringmaster.set_shard(shard_index, shard_count)
         exit_status = action(ringmaster, options)
     except RingmasterError, e:
         print >>sys.stderr, "ringmaster:", e
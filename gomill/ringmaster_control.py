@@ -0,0 +1,295 @@
+"""Control channel for running ringmasters.
+
+A running ringmaster listens on a Unix-domain socket in the competition
+directory. Clients connect, send a single command line, read the reply, and
+disconnect.
+
+The socket is served by a background thread, so the ringmaster's main loop
+never needs to make system calls to check for commands: the thread hands
+commands over through a queue, and answers the 'status' query from a
+plain-text snapshot which the main loop publishes when something changes.
+
+The 'json' query is answered by the server thread calling a function provided
+by the main loop, so that the result is generated only when a client asks for
+it (and reflects the time at which it was asked for). That function must be
+safe to call from the server thread.
+
+"""
+
+import errno
+import os
+import socket
+import threading
+from Queue import Queue, Empty
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Commands which the main loop acts on.
+queued_commands = ('stop', 'pause', 'resume')
+
+# Queries which the main loop answers (the thread waits for the reply).
+deferred_queries = ('report',)
+
+# Queries which the server thread answers from the published snapshot.
+snapshot_queries = ('status',)
+
+# Queries which the server thread answers by calling a handler function.
+live_queries = ('json',)
+
+all_commands = (queued_commands + deferred_queries + snapshot_queries +
+                live_queries)
+
+# Longest command line we'll accept from a client.
+MAX_COMMAND_LENGTH = 256
+
+
+class ControlChannelError(StandardError):
+    """Error from the control channel."""
+
+class ControlChannelUnavailable(ControlChannelError):
+    """Error indicating that there is nothing listening on the socket."""
+
+
+def is_supported():
+    """Say whether control sockets are available on this platform."""
+    return hasattr(socket, 'AF_UNIX')
+
+
+class Deferred_query(object):
+    """A query waiting for the ringmaster's main loop to answer it.
+
+    Public attributes:
+      command -- string
+
+    """
+    def __init__(self, command):
+        self.command = command
+        self._reply = None
+        self._event = threading.Event()
+
+    def answer(self, reply):
+        """Provide the reply (a string)."""
+        self._reply = reply
+        self._event.set()
+
+    def wait(self, timeout):
+        """Wait for the reply.
+
+        Returns the reply, or None if the timeout expired.
+
+        """
+        self._event.wait(timeout)
+        return self._reply
+
+
+class Control_server(object):
+    """Serve a ringmaster's control socket.
+
+    Instantiate with the socket pathname.
+
+    Commands from clients are made available as strings via get_command()
+    (for queued commands) or as Deferred_query objects (for deferred queries).
+
+    Public attributes:
+      pathname -- socket pathname
+
+    """
+
+    # How long a client waits for the main loop to answer a deferred query.
+    deferred_query_timeout = 30.0
+
+    # How often the server thread checks whether it's been asked to stop.
+    poll_interval = 0.5
+
+    def __init__(self, pathname):
+        self.pathname = pathname
+        self.socket = None
+        self.thread = None
+        self.commands = Queue()
+        self._snapshots = dict((query, "") for query in snapshot_queries)
+        self._handlers = {}
+        self._closing = False
+
+    def start(self):
+        """Create the socket and start the server thread.
+
+        Removes any stale socket left behind by a ringmaster which didn't exit
+        cleanly.
+
+        Raises ControlChannelError if the socket can't be created.
+
+        """
+        if not is_supported():
+            raise ControlChannelError("unix sockets are not available")
+        try:
+            if os.path.exists(self.pathname):
+                os.remove(self.pathname)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            if fcntl is not None:
+                # Don't let player subprocesses inherit the socket.
+                flags = fcntl.fcntl(sock.fileno(), fcntl.F_GETFD)
+                fcntl.fcntl(sock.fileno(), fcntl.F_SETFD,
+                            flags | fcntl.FD_CLOEXEC)
+            sock.bind(self.pathname)
+            sock.listen(5)
+            sock.settimeout(self.poll_interval)
+        except (EnvironmentError, socket.error), e:
+            raise ControlChannelError(str(e))
+        self.socket = sock
+        self.thread = threading.Thread(target=self._serve)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def close(self):
+        """Stop the server thread and remove the socket."""
+        if self.socket is None:
+            return
+        self._closing = True
+        self.thread.join()
+        self.thread = None
+        try:
+            self.socket.close()
+        except EnvironmentError:
+            pass
+        self.socket = None
+        try:
+            os.remove(self.pathname)
+        except EnvironmentError:
+            pass
+
+    def publish(self, query, s):
+        """Set the text returned for a snapshot query.
+
+        query -- one of snapshot_queries
+        s     -- string
+
+        """
+        self._snapshots[query] = s
+
+    def set_handler(self, query, fn):
+        """Set the function which answers a live query.
+
+        query -- one of live_queries
+        fn    -- function taking no parameters and returning a string
+
+        The function is called from the server thread.
+
+        """
+        self._handlers[query] = fn
+
+    def get_command(self):
+        """Retrieve the next command sent by a client, without blocking.
+
+        Returns a command string, a Deferred_query, or None if there are no
+        commands waiting.
+
+        """
+        try:
+            return self.commands.get_nowait()
+        except Empty:
+            return None
+
+    def wait_for_command(self, timeout):
+        """Variant of get_command() which waits up to 'timeout' seconds."""
+        try:
+            return self.commands.get(True, timeout)
+        except Empty:
+            return None
+
+    def _serve(self):
+        while not self._closing:
+            try:
+                connection, _ = self.socket.accept()
+            except socket.timeout:
+                continue
+            except (EnvironmentError, socket.error):
+                if self._closing:
+                    break
+                continue
+            try:
+                try:
+                    connection.settimeout(5.0)
+                    self._handle_connection(connection)
+                finally:
+                    connection.close()
+            except (EnvironmentError, socket.error):
+                pass
+
+    def _read_command(self, connection):
+        data = ""
+        while "\n" not in data and len(data) < MAX_COMMAND_LENGTH:
+            chunk = connection.recv(MAX_COMMAND_LENGTH)
+            if not chunk:
+                break
+            data += chunk
+        return data.split("\n", 1)[0].strip()
+
+    def _handle_connection(self, connection):
+        command = self._read_command(connection)
+        if command in snapshot_queries:
+            reply = self._snapshots[command]
+        elif command in live_queries:
+            reply = self._answer_live_query(command)
+        elif command in queued_commands:
+            self.commands.put(command)
+            reply = "ok"
+        elif command in deferred_queries:
+            query = Deferred_query(command)
+            self.commands.put(query)
+            reply = query.wait(self.deferred_query_timeout)
+            if reply is None:
+                reply = "error: no response from ringmaster"
+        else:
+            reply = "error: unknown command: %s" % command[:40]
+        connection.sendall(reply)
+
+    def _answer_live_query(self, command):
+        fn = self._handlers.get(command)
+        if fn is None:
+            return ""
+        try:
+            return fn()
+        except Exception, e:
+            return "error: %s" % e
+
+
+def send_command(pathname, command, timeout=None):
+    """Send a command to a running ringmaster and return its reply.
+
+    pathname -- pathname of the ringmaster's control socket
+    command  -- string
+    timeout  -- float (seconds) or None
+
+    Raises ControlChannelUnavailable if no ringmaster is listening.
+
+    Raises ControlChannelError if there's some other problem.
+
+    """
+    if not is_supported():
+        raise ControlChannelUnavailable("unix sockets are not available")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        if timeout is not None:
+            sock.settimeout(timeout)
+        try:
+            sock.connect(pathname)
+        except socket.error, e:
+            if e.args and e.args[0] in (errno.ENOENT, errno.ECONNREFUSED):
+                raise ControlChannelUnavailable(str(e))
+            raise ControlChannelError(str(e))
+        try:
+            sock.sendall(command + "\n")
+            chunks = []
+            while True:
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        except (EnvironmentError, socket.error), e:
+            raise ControlChannelError(str(e))
+    finally:
+        sock.close()
+    return "".join(chunks)
@@ -1,7 +1,6 @@
 """Live display for ringmasters."""
 
 import os
-import subprocess
 import sys
 from cStringIO import StringIO
 
@@ -140,41 +139,62 @@ class Clearing_presenter(Presenter):
             print s
 
     def refresh(self):
-        self.clear_screen()
+        lines = []
         for box in self.box_list:
             if not box.contents:
                 continue
             if box.heading:
-                print "= %s = " % box.heading
-            print box.layout()
+                lines.append("= %s = " % box.heading)
+            lines.append(box.layout())
             if box.name != 'warnings':
-                print
+                lines.append("")
+        self.write_screen("\n".join(lines) + "\n")
 
     def screen_height(self):
         """Return the current terminal height, or best guess."""
-        return os.environ.get("LINES", 80)
+        try:
+            return int(os.environ.get("LINES", 80))
+        except ValueError:
+            return 80
+
+    def _choose_clear_method(self):
+        try:
+            isatty = os.isatty(sys.stdout.fileno())
+        except Exception:
+            isatty = False
+        if not isatty:
+            return "delimiter"
+        if os.environ.get("TERM", "dumb") in ("dumb", "unknown"):
+            return "newlines"
+        return "ansi"
+
+    def write_screen(self, s):
+        """Replace the screen contents with the specified text.
+
+        s -- string (normally ending with a newline)
+
+        If stdout is an ANSI terminal, this overwrites the previous contents in
+        place (homing the cursor and erasing leftover text), which avoids both
+        flicker and forking a 'clear' process.
+
+        Otherwise it falls back to scrolling the old contents away (or, if
+        stdout isn't a terminal, printing a delimiter line).
 
-    def clear_screen(self):
-        """Try to clear the terminal screen (if stdout is a terminal)."""
+        """
         if self.clear_method is None:
-            try:
-                isatty = os.isatty(sys.stdout.fileno())
-            except Exception:
-                isatty = False
-            if isatty:
-                self.clear_method = "clear"
-            else:
-                self.clear_method = "delimiter"
-
-        if self.clear_method == "clear":
-            try:
-                retcode = subprocess.call("clear")
-            except Exception:
-                retcode = 1
-            if retcode != 0:
-                self.clear_method = "newlines"
-        if self.clear_method == "newlines":
-            print "\n" * (self.screen_height()+1)
-        elif self.clear_method == "delimiter":
-            print 78 * "-"
+            self.clear_method = self._choose_clear_method()
+        if self.clear_method == "ansi":
+            s = (_ANSI_HOME +
+                 s.replace("\n", _ANSI_ERASE_LINE + "\n") +
+                 _ANSI_ERASE_DOWN)
+        elif self.clear_method == "newlines":
+            s = "\n" * (self.screen_height()+1) + s
+        else:
+            s = 78 * "-" + "\n" + s
+        sys.stdout.write(s)
+        sys.stdout.flush()
+
+_ANSI_HOME = "\x1b[H"
+_ANSI_ERASE_LINE = "\x1b[K"
+_ANSI_ERASE_DOWN = "\x1b[J"
 
@@ -0,0 +1,166 @@
+"""Live status information for running ringmasters.
+
+This is the information served by the control channel's 'json' query. It's
+kept in memory and updated as each game starts and finishes, so that producing
+a snapshot doesn't require reading the state file or scanning the results.
+
+"""
+
+from __future__ import division, with_statement
+
+import threading
+
+
+class Live_status(object):
+    """Statistics describing the current ringmaster run.
+
+    games_completed and void_games cover only games which finish during this
+    run. The per-matchup and cpu-time figures also include any earlier
+    results passed to add_earlier_results().
+
+    Methods which need the current time take it as a 'now' parameter (seconds,
+    as returned by time.time()).
+
+    The ringmaster's main loop updates this object, while the control server
+    thread reads it. Each method acquires 'lock'; see get_snapshot() for what
+    the reader must do.
+
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.worker_count = 1
+        self.start_time = None
+        # Map game_id -> (player_b code, player_w code, start time)
+        self.games_in_progress = {}
+        self.games_completed = 0
+        self.void_games = 0
+        # Map matchup id -> dict with keys 'games', 'wins', 'no_winner';
+        # 'wins' maps player code -> int
+        self.matchups = {}
+        # Map player code -> dict with keys 'games' (games with known cpu
+        # time), 'total', 'mean'
+        self.cpu_times = {}
+        # Time-weighted count of games in progress, for worker utilisation
+        self._busy_seconds = 0.0
+        self._busy_since = None
+
+    def start_run(self, now, worker_count):
+        """Note that the run has started.
+
+        worker_count -- int or None (None means no worker processes)
+
+        """
+        with self.lock:
+            self.start_time = now
+            self._busy_since = now
+            self.worker_count = worker_count or 1
+
+    def _update_busy_time(self, now):
+        if self._busy_since is not None:
+            self._busy_seconds += (
+                len(self.games_in_progress) * (now - self._busy_since))
+        self._busy_since = now
+
+    def note_game_started(self, game_id, player_b, player_w, now):
+        """Note that a game has started.
+
+        player_b, player_w -- player codes
+
+        """
+        with self.lock:
+            self._update_busy_time(now)
+            self.games_in_progress[game_id] = (player_b, player_w, now)
+
+    def note_game_finished(self, game_id, matchup_id, game_result, now):
+        """Note that a game has finished and produced a result.
+
+        matchup_id  -- string (see Competition.get_matchup_id())
+        game_result -- gtp_games.Game_result
+
+        """
+        with self.lock:
+            self._update_busy_time(now)
+            self.games_in_progress.pop(game_id, None)
+            self.games_completed += 1
+            self._add_result(matchup_id, game_result)
+
+    def add_earlier_results(self, game_results):
+        """Include results from earlier runs in the per-matchup statistics.
+
+        game_results -- list of pairs (matchup id, gtp_games.Game_result)
+
+        """
+        with self.lock:
+            for matchup_id, game_result in game_results:
+                self._add_result(matchup_id, game_result)
+
+    def _add_result(self, matchup_id, game_result):
+        # Caller must hold the lock
+        stats = self.matchups.get(matchup_id)
+        if stats is None:
+            stats = self.matchups[matchup_id] = {
+                'games' : 0, 'wins' : {}, 'no_winner' : 0}
+        stats['games'] += 1
+        winner = game_result.winning_player
+        if winner is None:
+            stats['no_winner'] += 1
+        else:
+            stats['wins'][winner] = stats['wins'].get(winner, 0) + 1
+        for player_code, cpu_time in game_result.cpu_times.iteritems():
+            if cpu_time is None:
+                continue
+            totals = self.cpu_times.get(player_code)
+            if totals is None:
+                totals = self.cpu_times[player_code] = {
+                    'games' : 0, 'total' : 0.0}
+            totals['games'] += 1
+            totals['total'] += cpu_time
+            totals['mean'] = totals['total'] / totals['games']
+
+    def note_game_voided(self, game_id, now):
+        """Note that a game ended without producing a result."""
+        with self.lock:
+            self._update_busy_time(now)
+            self.games_in_progress.pop(game_id, None)
+            self.void_games += 1
+
+    def get_snapshot(self, now):
+        """Describe the run as a JSON-compatible dict.
+
+        The 'matchups' and 'cpu_times' values are this object's own
+        dictionaries (they're kept up to date as results come in, rather than
+        rebuilt for each snapshot), so the caller must hold 'lock' until it has
+        finished with the result.
+
+        """
+        with self.lock:
+            self._update_busy_time(now)
+            if self.start_time is None:
+                elapsed = None
+                utilisation = None
+            else:
+                elapsed = now - self.start_time
+                if elapsed > 0:
+                    utilisation = (self._busy_seconds /
+                                   (elapsed * self.worker_count))
+                else:
+                    utilisation = None
+            return {
+                'elapsed' : elapsed,
+                'games_completed' : self.games_completed,
+                'void_games' : self.void_games,
+                'games_in_progress' : [
+                    {'game_id' : game_id,
+                     'black' : player_b,
+                     'white' : player_w,
+                     'elapsed' : now - started}
+                    for game_id, (player_b, player_w, started)
+                    in sorted(self.games_in_progress.iteritems())],
+                'workers' : {
+                    'count' : self.worker_count,
+                    'busy' : len(self.games_in_progress),
+                    'utilisation' : utilisation,
+                    },
+                'matchups' : self.matchups,
+                'cpu_times' : self.cpu_times,
+                }
@@ -9,16 +9,27 @@ import os
 import re
 import shutil
 import sys
+import time
+from cStringIO import StringIO
 
 try:
     import fcntl
 except ImportError:
     fcntl = None
 
+try:
+    import json
+except ImportError:
+    # Python 2.5
+    json = None
+
 from gomill import compact_tracebacks
+from gomill import game_index
 from gomill import game_jobs
 from gomill import job_manager
+from gomill import ringmaster_control
 from gomill import ringmaster_presenters
+from gomill import ringmaster_status
 from gomill import terminal_input
 from gomill.settings import *
 from gomill.competitions import (
@@ -74,6 +85,16 @@ class Ringmaster(object):
     # Channel used for printing
     stdout = sys.stdout
 
+    # Default limit on live display redraws per second
+    default_display_refresh_rate = 4.0
+
+    # Minimum interval (seconds) between checks of the terminal for Ctrl-X
+    terminal_check_interval = 0.5
+
+    # How often (seconds) to check for control commands when waiting for games
+    # to finish, or while paused
+    control_poll_interval = 0.5
+
     def __init__(self, control_pathname):
         """Instantiate and initialise a Ringmaster.
 
@@ -83,37 +104,149 @@ class Ringmaster(object):
 
         """
         self.display_mode = 'clearing'
+        self.display_refresh_interval = 1.0 / self.default_display_refresh_rate
+        self.last_display_time = None
+        self.display_is_pending = False
+        self.screen_report_is_stale = True
         self.worker_count = None
         self.max_games_this_run = None
         self.presenter = None
         self.terminal_reader = None
+        self.last_terminal_check_time = None
+        self.control_server = None
+        self.paused = False
+        self.live_status = ringmaster_status.Live_status()
+        self.game_index = None
         self.stopping = False
         self.stopping_reason = None
         # Map game_id -> int
         self.game_error_counts = {}
         self.write_gtp_logs = False
+        self.shard_index = None
+        self.shard_count = None
 
         self.control_pathname = control_pathname
         self.base_directory, control_filename = os.path.split(control_pathname)
         self.competition_code, ext = os.path.splitext(control_filename)
-        if ext in (".log", ".status", ".cmd", ".hist",
+        if ext in (".log", ".status", ".cmd", ".sock", ".hist", ".index",
                    ".report", ".games", ".void", ".gtplogs"):
             raise RingmasterError("forbidden control file extension: %s" % ext)
-        stem = os.path.join(self.base_directory, self.competition_code)
+        self._set_pathnames(
+            os.path.join(self.base_directory, self.competition_code))
+
+        self.status_is_loaded = False
+        try:
+            self._load_control_file()
+        except ControlFileError, e:
+            raise RingmasterError("error in control file:\n%s" % e)
+
+    def _set_pathnames(self, stem):
+        """Set the pathnames of the competition's output files.
+
+        stem -- pathname without extension
+
+        """
         self.log_pathname = stem + ".log"
         self.status_pathname = stem + ".status"
         self.command_pathname = stem + ".cmd"
+        self.control_socket_pathname = stem + ".sock"
         self.history_pathname = stem + ".hist"
+        self.game_index_pathname = stem + ".index"
         self.report_pathname = stem + ".report"
         self.sgf_dir_pathname = stem + ".games"
         self.void_dir_pathname = stem + ".void"
         self.gtplog_dir_pathname = stem + ".gtplogs"
 
-        self.status_is_loaded = False
+    def _get_shard_stem(self, shard_index, shard_count):
+        return os.path.join(
+            self.base_directory,
+            "%s.shard%dof%d" % (self.competition_code, shard_index, shard_count))
+
+    def set_shard(self, shard_index, shard_count):
+        """Run only a share of the competition's games.
+
+        shard_index -- int (0 <= shard_index < shard_count)
+        shard_count -- int
+
+        The shard has its own state file, logs, and game records, whose names
+        include the shard index and count (eg 'xxx.shard0of4.status').
+
+        Call this before loading or resetting the competition state.
+
+        Raises RingmasterError if the arguments are out of range, or if the
+        competition type doesn't support sharding.
+
+        """
+        if shard_count < 1:
+            raise RingmasterError("shard count must be positive")
+        if not 0 <= shard_index < shard_count:
+            raise RingmasterError("shard index out of range")
         try:
-            self._load_control_file()
-        except ControlFileError, e:
-            raise RingmasterError("error in control file:\n%s" % e)
+            self.competition.set_shard(shard_index, shard_count)
+        except CompetitionError, e:
+            raise RingmasterError(e)
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self._set_pathnames(self._get_shard_stem(shard_index, shard_count))
+
+    def _find_shard_status_files(self):
+        """Find the state files of a sharded competition.
+
+        Returns a list of tuples (shard_index, shard_count, pathname).
+
+        """
+        pattern = re.compile(re.escape(self.competition_code) +
+                             r"\.shard([0-9]+)of([0-9]+)\.status$")
+        try:
+            filenames = os.listdir(self.base_directory or os.curdir)
+        except EnvironmentError, e:
+            raise RingmasterError("error reading competition directory:\n%s"
+                                  % e)
+        result = []
+        for filename in filenames:
+            m = pattern.match(filename)
+            if m is None:
+                continue
+            result.append((int(m.group(1)), int(m.group(2)),
+                           os.path.join(self.base_directory, filename)))
+        return sorted(result)
+
+    def merge_shards(self):
+        """Combine the results of a sharded competition.
+
+        Loads the state of each shard, and sets this ringmaster's competition
+        state to the combination of their results. Doesn't write a state file.
+
+        Returns a list of the shard indices found.
+
+        Raises RingmasterError if there are no shards, if they have different
+        shard counts, or if a shard's state can't be loaded.
+
+        """
+        shards = self._find_shard_status_files()
+        if not shards:
+            raise RingmasterError("no shard state files found")
+        shard_counts = set(shard_count for (_, shard_count, _) in shards)
+        if len(shard_counts) > 1:
+            raise RingmasterError(
+                "shard state files have different shard counts: %s" %
+                ", ".join(str(n) for n in sorted(shard_counts)))
+        self.set_clean_status()
+        for shard_index, shard_count, _ in shards:
+            shard_ringmaster = self.__class__(self.control_pathname)
+            shard_ringmaster.set_shard(shard_index, shard_count)
+            try:
+                shard_ringmaster.load_status()
+            except RingmasterError, e:
+                raise RingmasterError("error loading shard %d:\n%s" %
+                                      (shard_index, e))
+            try:
+                self.competition.merge_shard(shard_ringmaster.competition)
+            except NotImplementedError:
+                raise RingmasterError(
+                    "competition type does not support sharding")
+            self.void_game_count += shard_ringmaster.void_game_count
+        return [shard_index for (shard_index, _, _) in shards]
 
     def set_stdout(self, f):
         """Set the ringmaster's standard output.
@@ -235,12 +368,21 @@ class Ringmaster(object):
         elif competition_type == "allplayall":
             from gomill import allplayalls
             return allplayalls.Allplayall
+        elif competition_type == "gauntlet":
+            from gomill import gauntlets
+            return gauntlets.Gauntlet
         elif competition_type == "ce_tuner":
             from gomill import cem_tuners
             return cem_tuners.Cem_tuner
         elif competition_type == "mc_tuner":
             from gomill import mcts_tuners
             return mcts_tuners.Mcts_tuner
+        elif competition_type == "spsa_tuner":
+            from gomill import spsa_tuners
+            return spsa_tuners.Spsa_tuner
+        elif competition_type == "regression_tuner":
+            from gomill import regression_tuners
+            return regression_tuners.Regression_tuner
         else:
             raise ValueError
 
@@ -356,6 +498,21 @@ class Ringmaster(object):
             raise RingmasterError("unknown presenter type: %s" % presenter_code)
         self.display_mode = presenter_code
 
+    def set_display_refresh_rate(self, rate):
+        """Limit how often the live display is redrawn.
+
+        rate -- maximum number of redraws per second (float), or None
+
+        None means redraw after every game start and game result.
+
+        """
+        if rate is None:
+            self.display_refresh_interval = None
+        elif rate <= 0:
+            raise RingmasterError("display refresh rate must be positive")
+        else:
+            self.display_refresh_interval = 1.0 / rate
+
     def _initialise_presenter(self):
         self.presenter = self._presenter_classes[self.display_mode]()
 
@@ -363,6 +520,101 @@ class Ringmaster(object):
         self.terminal_reader = terminal_input.Terminal_reader()
         self.terminal_reader.initialise()
 
+    def _initialise_control_server(self):
+        """Start serving the control socket.
+
+        If the socket can't be created, logs a message and leaves
+        control_server None (the ringmaster falls back to polling the command
+        file).
+
+        """
+        server = ringmaster_control.Control_server(
+            self.control_socket_pathname)
+        server.set_handler('json', self.get_live_status_json)
+        try:
+            server.start()
+        except ringmaster_control.ControlChannelError, e:
+            self.log("can't create control socket; using command file:\n%s"
+                     % e)
+            return
+        self.control_server = server
+
+    def _close_control_server(self):
+        if self.control_server is not None:
+            self.control_server.close()
+            self.control_server = None
+
+    def _make_game_index(self):
+        # For overriding in the testsuite
+        return game_index.Game_index(self.game_index_pathname)
+
+    def _open_game_index(self):
+        """Open the game index, bringing it up to date if necessary.
+
+        The index is rebuilt if the number of games it holds doesn't match the
+        competition state (which can happen if the ringmaster was interrupted,
+        or the index was deleted).
+
+        If sqlite3 isn't available, leaves game_index None.
+
+        If there's an error, logs it and leaves game_index None.
+
+        """
+        if not game_index.is_supported():
+            return
+        index = self._make_game_index()
+        try:
+            index.open()
+            game_results = self.competition.get_game_results()
+            if (game_results is not None and
+                index.count_games() != len(game_results)):
+                self.log("rebuilding game index")
+                index.replace_all(
+                    game_index.Indexed_game.from_game_result(
+                        matchup_id, game_result,
+                        self._get_indexed_sgf_filename(game_result.game_id))
+                    for (matchup_id, game_result) in game_results)
+        except game_index.GameIndexError, e:
+            self.warn("error opening game index:\n%s" % e)
+            try:
+                index.close()
+            except game_index.GameIndexError:
+                pass
+            return
+        self.game_index = index
+
+    def _close_game_index(self):
+        if self.game_index is not None:
+            try:
+                self.game_index.close()
+            except game_index.GameIndexError, e:
+                self.warn("error closing game index:\n%s" % e)
+            self.game_index = None
+
+    def _get_indexed_sgf_filename(self, game_id):
+        if not self.record_games:
+            return None
+        return self.get_sgf_filename(game_id)
+
+    def _index_game(self, response):
+        """Add a completed game to the game index.
+
+        If there's an error, stops maintaining the index (it will be rebuilt
+        next time the competition is run).
+
+        """
+        if self.game_index is None:
+            return
+        try:
+            self.game_index.add_game(game_index.Indexed_game.from_game_result(
+                self.competition.get_matchup_id(response),
+                response.game_result,
+                self._get_indexed_sgf_filename(response.game_id)))
+        except game_index.GameIndexError, e:
+            self.warn("error writing game index; no longer updating it:\n%s"
+                      % e)
+            self._close_game_index()
+
     def get_sgf_filename(self, game_id):
         """Return the sgf filename given a game id."""
         return "%s.sgf" % game_id
@@ -474,6 +726,28 @@ class Ringmaster(object):
         except EnvironmentError, e:
             raise RingmasterError("error writing command file:\n%s" % e)
 
+    def send_control_command(self, command, timeout=10.0):
+        """Send a command to the running ringmaster for this competition.
+
+        command -- string (see ringmaster_control.all_commands)
+        timeout -- float (seconds) or None (default 10 seconds)
+
+        Returns the reply (a string).
+
+        Raises ringmaster_control.ControlChannelUnavailable if there's no
+        ringmaster listening.
+
+        Raises RingmasterError if there's some other error.
+
+        """
+        try:
+            return ringmaster_control.send_command(
+                self.control_socket_pathname, command, timeout)
+        except ringmaster_control.ControlChannelUnavailable:
+            raise
+        except ringmaster_control.ControlChannelError, e:
+            raise RingmasterError("error from control socket:\n%s" % e)
+
     def get_tournament_results(self):
         """Provide access to the tournament's results.
 
@@ -482,14 +756,43 @@ class Ringmaster(object):
         Raises RingmasterError if the competition state isn't loaded, or if the
         competition isn't a tournament.
 
+        If the competition has an up-to-date game index, the Tournament_results
+        object uses it for queries.
+
         """
         if not self.status_is_loaded:
             raise RingmasterError("status is not loaded")
         try:
-            return self.competition.get_tournament_results()
+            return self.competition.get_tournament_results(
+                self._get_game_index_for_reading())
         except NotImplementedError:
             raise RingmasterError("competition is not a tournament")
 
+    def _get_game_index_for_reading(self):
+        """Open the existing game index, if it's usable.
+
+        Returns a Game_index, or None if the index doesn't exist or is out of
+        date.
+
+        """
+        if self.game_index is not None:
+            return self.game_index
+        if (not game_index.is_supported() or
+            not os.path.exists(self.game_index_pathname)):
+            return None
+        game_results = self.competition.get_game_results()
+        if game_results is None:
+            return None
+        index = self._make_game_index()
+        try:
+            index.open(create=False)
+            if index.count_games() == len(game_results):
+                return index
+            index.close()
+        except game_index.GameIndexError:
+            pass
+        return None
+
     def report(self):
         """Write the full competition report to the report file."""
         f = open(self.report_pathname, "w")
@@ -514,43 +817,134 @@ class Ringmaster(object):
         self.stopping_reason = reason
         self.log("halting competition: %s" % reason)
 
-    def _update_display(self):
-        """Redisplay the 'live' competition description.
+    def _get_time(self):
+        # For overriding in the testsuite
+        return time.time()
 
-        Does nothing in quiet mode.
+    def _get_status_lines(self):
+        """Describe the state of the run.
+
+        Returns a list of strings.
+
+        This is used for the live display and for the control channel's
+        'status' query.
 
         """
-        if self.presenter.shows_warnings_only:
-            return
-        def p(s):
-            self.say('status', s)
-        self.presenter.clear('status')
+        result = []
         if self.stopping:
             if self.worker_count is None or not self.games_in_progress:
-                p("halting: %s" % self.stopping_reason)
+                result.append("halting: %s" % self.stopping_reason)
+            else:
+                result.append("waiting for workers to finish: %s" %
+                              self.stopping_reason)
+        elif self.paused:
+            if self.games_in_progress:
+                result.append("pausing: waiting for games in progress")
             else:
-                p("waiting for workers to finish: %s" %
-                  self.stopping_reason)
+                result.append("paused")
         if self.games_in_progress:
             if self.worker_count is None:
                 gms = "game"
             else:
                 gms = "%d games" % len(self.games_in_progress)
-            p("%s in progress: %s" %
-              (gms, " ".join(sorted(self.games_in_progress))))
-        if not self.stopping:
-            if self.max_games_this_run is not None:
-                p("will start at most %d more games in this run" %
-                  self.max_games_this_run)
-            if self.terminal_reader.is_enabled():
-                p("(Ctrl-X to halt gracefully)")
-
-        self.presenter.clear('screen_report')
-        sr = self.presenter.get_stream('screen_report')
-        if self.void_game_count > 0:
-            print >>sr, "%d void games; see log file." % self.void_game_count
-        self.competition.write_screen_report(sr)
-        sr.close()
+            result.append("%s in progress: %s" %
+                          (gms, " ".join(sorted(self.games_in_progress))))
+        if not self.stopping and self.max_games_this_run is not None:
+            result.append("will start at most %d more games in this run" %
+                          self.max_games_this_run)
+        return result
+
+    def _initialise_live_status(self):
+        """Set up live_status for a new run.
+
+        Includes the results of games from earlier runs, if the competition
+        keeps them.
+
+        """
+        self.live_status = ringmaster_status.Live_status()
+        game_results = self.competition.get_game_results()
+        if game_results is not None:
+            self.live_status.add_earlier_results(game_results)
+        self.live_status.start_run(self._get_time(), self.worker_count)
+
+    def get_live_status(self):
+        """Describe the state of the run as a JSON-compatible dict.
+
+        The result shares dictionaries with self.live_status; see
+        Live_status.get_snapshot().
+
+        """
+        result = self.live_status.get_snapshot(self._get_time())
+        result['competition'] = self.competition_code
+        result['competition_type'] = self.competition_type
+        result['paused'] = self.paused
+        result['stopping'] = self.stopping
+        result['stopping_reason'] = self.stopping_reason
+        result['total_void_games'] = self.void_game_count
+        result['max_games_this_run'] = self.max_games_this_run
+        return result
+
+    def get_live_status_json(self):
+        """Describe the state of the run as a JSON object (a string).
+
+        This answers the control channel's 'json' query; it's called from the
+        control server thread.
+
+        """
+        if json is None:
+            return "error: json status requires Python 2.6 or later"
+        with self.live_status.lock:
+            return json.dumps(self.get_live_status(), sort_keys=True)
+
+    def _publish_status(self):
+        """Update the text returned for the control channel's 'status' query.
+
+        """
+        if self.control_server is not None:
+            self.control_server.publish(
+                'status', "\n".join(self._get_status_lines()))
+
+    def _update_display(self, force=False):
+        """Redisplay the 'live' competition description.
+
+        force -- bool (default False)
+
+        Unless 'force' is true, this does nothing (except note that a redraw is
+        pending) if the display was last redrawn less than
+        display_refresh_interval seconds ago.
+
+        The competition's screen report is regenerated only if a game result
+        has come in since it was last generated.
+
+        Does nothing in quiet mode.
+
+        """
+        if self.presenter.shows_warnings_only:
+            return
+        now = self._get_time()
+        if (not force and
+            self.display_refresh_interval is not None and
+            self.last_display_time is not None and
+            now - self.last_display_time < self.display_refresh_interval):
+            self.display_is_pending = True
+            return
+        self.last_display_time = now
+        self.display_is_pending = False
+        self.presenter.clear('status')
+        for s in self._get_status_lines():
+            self.say('status', s)
+        if not self.stopping and self.terminal_reader.is_enabled():
+            self.say('status', "(Ctrl-X to halt gracefully)")
+
+        if self.screen_report_is_stale:
+            self.presenter.clear('screen_report')
+            sr = self.presenter.get_stream('screen_report')
+            if self.void_game_count > 0:
+                print >>sr, "%d void games; see log file." % (
+                    self.void_game_count)
+            self.competition.write_screen_report(sr)
+            sr.close()
+            self.screen_report_is_stale = False
 
         self.presenter.refresh()
 
@@ -574,21 +968,48 @@ class Ringmaster(object):
     def get_job(self):
         """Job supply function for the job manager."""
         job = self._get_job()
-        self._update_display()
+        self._publish_status()
+        self._update_display(force=(job is job_manager.NoJobAvailable))
         return job
 
-    def _get_job(self):
-        """Main implementation of get_job()."""
+    def process_idle(self):
+        """Idle function for the job manager.
 
-        if self.stopping:
-            return job_manager.NoJobAvailable
+        Acts on commands from the control channel, and makes sure that any
+        throttled display redraw is done eventually.
 
-        if self.terminal_reader.stop_was_requested():
+        Returns True if get_job() may now have a game to offer (because the
+        competition has been resumed).
+
+        """
+        was_paused = self.paused
+        if self._check_control_commands():
+            self._update_display(force=True)
+        elif self.display_is_pending:
+            self._update_display()
+        return was_paused and not self.paused
+
+    def _terminal_stop_was_requested(self):
+        """Check for Ctrl-X, at most once per terminal_check_interval."""
+        now = self._get_time()
+        if (self.last_terminal_check_time is not None and
+            now - self.last_terminal_check_time < self.terminal_check_interval):
+            return False
+        self.last_terminal_check_time = now
+        return self.terminal_reader.stop_was_requested()
+
+    def _check_terminal(self):
+        if self._terminal_stop_was_requested():
             self._halt_competition("stop instruction received from terminal")
             if self.presenter.shows_warnings_only:
                 self.terminal_reader.acknowledge()
-            return job_manager.NoJobAvailable
 
+    def _check_command_file(self):
+        """Check for a command in the command file.
+
+        This is used only if the control socket isn't available.
+
+        """
         try:
             if os.path.exists(self.command_pathname):
                 command = open(self.command_pathname).read()
@@ -598,9 +1019,84 @@ class Ringmaster(object):
                         os.remove(self.command_pathname)
                     except EnvironmentError, e:
                         self.warn("error removing .cmd file:\n%s" % e)
-                    return job_manager.NoJobAvailable
         except EnvironmentError, e:
             self.warn("error reading .cmd file:\n%s" % e)
+
+    def _answer_control_query(self, query):
+        """Return the reply to a control channel query."""
+        if query == 'report':
+            out = StringIO()
+            self.competition.write_short_report(out)
+            return out.getvalue()
+        raise RingmasterInternalError("unhandled control query: %s" % query)
+
+    def _process_control_command(self, command):
+        """Act on a command from the control channel.
+
+        command -- string or ringmaster_control.Deferred_query
+
+        """
+        if isinstance(command, ringmaster_control.Deferred_query):
+            command.answer(self._answer_control_query(command.command))
+        elif command == 'stop':
+            if not self.stopping:
+                self._halt_competition("stop command received")
+        elif command == 'pause':
+            if not self.paused:
+                self.paused = True
+                self.log("pausing competition")
+        elif command == 'resume':
+            if self.paused:
+                self.paused = False
+                self.log("resuming competition")
+
+    def _check_control_commands(self):
+        """Act on any commands waiting on the control channel.
+
+        Returns True if there were any.
+
+        """
+        if self.control_server is None:
+            return False
+        seen_command = False
+        while True:
+            command = self.control_server.get_command()
+            if command is None:
+                break
+            self._process_control_command(command)
+            seen_command = True
+        if seen_command:
+            self._publish_status()
+        return seen_command
+
+    def _wait_while_paused(self):
+        """Wait for a control command (or Ctrl-X) while paused."""
+        self._update_display(force=True)
+        command = self.control_server.wait_for_command(
+            self.control_poll_interval)
+        if command is not None:
+            self._process_control_command(command)
+            self._check_control_commands()
+        self._check_terminal()
+
+    def _get_job(self):
+        """Main implementation of get_job()."""
+
+        if self.stopping:
+            return job_manager.NoJobAvailable
+
+        self._check_control_commands()
+        if not self.stopping:
+            self._check_terminal()
+        if not self.stopping and self.control_server is None:
+            self._check_command_file()
+        while self.paused and not self.stopping:
+            if self.games_in_progress:
+                return job_manager.NoJobAvailable
+            self._wait_while_paused()
+        if self.stopping:
+            return job_manager.NoJobAvailable
+
         if self.max_games_this_run is not None:
             if self.max_games_this_run == 0:
                 self._halt_competition("max-games reached for this run")
@@ -617,7 +1113,11 @@ class Ringmaster(object):
                 raise RingmasterInternalError(
                     "duplicate game id: %s" % job.game_id)
             self._prepare_job(job)
+            if self.competition.screen_report_shows_games_in_progress:
+                self.screen_report_is_stale = True
         self.games_in_progress[job.game_id] = job
+        self.live_status.note_game_started(
+            job.game_id, job.player_b.code, job.player_w.code, self._get_time())
         start_msg = "starting game %s: %s (b) vs %s (w)" % (
             job.game_id, job.player_b.code, job.player_w.code)
         self.log(start_msg)
@@ -634,8 +1134,14 @@ class Ringmaster(object):
         for log_entry in response.log_entries:
             self.log(log_entry)
         result_description = self.competition.process_game_result(response)
+        self.screen_report_is_stale = True
         del self.games_in_progress[response.game_id]
+        self._index_game(response)
+        self.live_status.note_game_finished(
+            response.game_id, self.competition.get_matchup_id(response),
+            response.game_result, self._get_time())
         self.write_status()
+        self._publish_status()
         if result_description is None:
             result_description = response.game_result.describe()
         self.say('results', "game %s: %s" % (
@@ -646,6 +1152,8 @@ class Ringmaster(object):
         self.warn("game %s -- %s" % (
             job.game_id, message))
         self.void_game_count += 1
+        self.live_status.note_game_voided(job.game_id, self._get_time())
+        self.screen_report_is_stale = True
         previous_error_count = self.game_error_counts.get(job.game_id, 0)
         stop_competition, retry_game = \
             self.competition.process_game_error(job, previous_error_count)
@@ -658,6 +1166,7 @@ class Ringmaster(object):
             if previous_error_count != 0:
                 del self.game_error_counts[job.game_id]
         self.write_status()
+        self._publish_status()
         if stop_competition and not self.stopping:
             # No need to log: _halt competition will do so
             self.say('warnings', "halting run due to void games")
@@ -670,7 +1179,7 @@ class Ringmaster(object):
 
         Returns when max_games have been played in this run, when the
         Competition is over, or when a 'stop' command is received via the
-        command file.
+        control socket (or the command file).
 
         """
         def now():
@@ -690,19 +1199,28 @@ class Ringmaster(object):
 
         self._initialise_presenter()
         self._initialise_terminal_reader()
+        self._initialise_control_server()
+        self._open_game_index()
 
         allow_mp = (self.worker_count is not None)
         self.log("run started at %s with max_games %s" % (now(), max_games))
         if allow_mp:
             self.log("using %d worker processes" % self.worker_count)
         self.max_games_this_run = max_games
-        self._update_display()
+        self._initialise_live_status()
+        self._publish_status()
+        self._update_display(force=True)
+        idle_interval = self.display_refresh_interval
+        if self.control_server is not None:
+            idle_interval = min(idle_interval or self.control_poll_interval,
+                                self.control_poll_interval)
         try:
             job_manager.run_jobs(
                 job_source=self,
                 allow_mp=allow_mp, max_workers=self.worker_count,
                 passed_exceptions=[RingmasterError, CompetitionError,
-                                   RingmasterInternalError])
+                                   RingmasterInternalError],
+                idle_interval=idle_interval)
         except KeyboardInterrupt:
             self.log("run interrupted at %s" % now())
             log_games_in_progress()
@@ -720,6 +1238,9 @@ class Ringmaster(object):
             self.log(compact_tracebacks.format_traceback())
             log_games_in_progress()
             raise
+        finally:
+            self._close_control_server()
+            self._close_game_index()
         self.log("run finished at %s" % now())
         self._close_files()
 
@@ -733,7 +1254,9 @@ class Ringmaster(object):
             self.log_pathname,
             self.status_pathname,
             self.command_pathname,
+            self.control_socket_pathname,
             self.history_pathname,
+            self.game_index_pathname,
             self.report_pathname,
             ]:
             if os.path.exists(pathname):
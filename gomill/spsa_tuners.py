@@ -0,0 +1,522 @@
+"""Competitions for parameter tuning using SPSA.
+
+SPSA is simultaneous perturbation stochastic approximation: each iteration
+perturbs every parameter at once, by a random sign times the current
+perturbation size, and plays one game with the parameters moved each way.
+The difference in the two results gives an estimate of the gradient along the
+perturbation, which is used to move the parameters.
+
+"""
+
+from __future__ import division
+
+import random
+
+from gomill import compact_tracebacks
+from gomill import game_jobs
+from gomill import competitions
+from gomill import competition_schedulers
+from gomill.competitions import (
+    Competition, NoGameAvailable, CompetitionError, ControlFileError,
+    Player_config)
+from gomill.settings import *
+from gomill.utils import format_float
+
+
+class Pair(object):
+    """A pair of games played with opposite perturbations.
+
+    Public attributes:
+      iteration        -- int (the pair number, counting from 0)
+      delta            -- list of ints (+1 or -1, one per dimension)
+      plus_parameters  -- optimiser parameters for the '+' candidate
+      minus_parameters -- optimiser parameters for the '-' candidate
+      results          -- list of two scores ('+' game, '-' game)
+                          1, 0.5, or 0 for the candidate; None if not known
+
+    Pairs are suitable for pickling.
+
+    """
+    def __init__(self, iteration, delta, plus_parameters, minus_parameters):
+        self.iteration = iteration
+        self.delta = delta
+        self.plus_parameters = plus_parameters
+        self.minus_parameters = minus_parameters
+        self.results = [None, None]
+
+    def __getstate__(self):
+        return (self.iteration, self.delta, self.plus_parameters,
+                self.minus_parameters, self.results)
+
+    def __setstate__(self, state):
+        (self.iteration, self.delta, self.plus_parameters,
+         self.minus_parameters, self.results) = state
+
+    def is_complete(self):
+        """Say whether both games' results are known."""
+        return None not in self.results
+
+
+parameter_settings = [
+    Setting('code', interpret_identifier),
+    Setting('initial_value', interpret_float),
+    Setting('perturbation', interpret_float),
+    Setting('min_value', allow_none(interpret_float), default=None),
+    Setting('max_value', allow_none(interpret_float), default=None),
+    Setting('transform', interpret_callable, default=float),
+    Setting('format', interpret_8bit_string, default=None),
+    ]
+
+class Parameter_config(Quiet_config):
+    """Parameter (ie, dimension) description for use in control files."""
+    # positional or keyword
+    positional_arguments = ('code',)
+    # keyword-only
+    keyword_arguments = tuple(setting.name for setting in parameter_settings
+                              if setting.name != 'code')
+
+class Parameter_spec(object):
+    """Internal description of a parameter spec from the configuration file.
+
+    Public attributes:
+      code          -- identifier
+      initial_value -- float
+      perturbation  -- float
+      min_value     -- float or None
+      max_value     -- float or None
+      transform     -- function float -> player parameter
+      format        -- string for use with '%'
+
+    """
+    def clip(self, v):
+        """Restrict an optimiser parameter to the permitted range."""
+        if self.min_value is not None and v < self.min_value:
+            return self.min_value
+        if self.max_value is not None and v > self.max_value:
+            return self.max_value
+        return v
+
+
+class Spsa_tuner(Competition):
+    """A Competition for parameter tuning using SPSA.
+
+    Iteration k plays two games: game number 2k uses the '+' candidate and
+    game number 2k+1 uses the '-' candidate. The game ids are the game
+    numbers; the candidate codes are like '#7+'.
+
+    Iterations are started as workers become free, so several may be in
+    progress at once. Each iteration's perturbation is applied to the
+    parameters as they were when it started, and its update is applied to the
+    parameters as they are when its second game finishes.
+
+    """
+    def __init__(self, competition_code, **kwargs):
+        Competition.__init__(self, competition_code, **kwargs)
+        self.seen_successful_game = False
+
+    def control_file_globals(self):
+        result = Competition.control_file_globals(self)
+        result.update({
+            'Parameter' : Parameter_config,
+            })
+        return result
+
+    global_settings = (Competition.global_settings +
+                       competitions.game_settings + [
+        Setting('number_of_iterations', allow_none(interpret_positive_int),
+                default=None),
+        Setting('candidate_colour', interpret_colour),
+        Setting('learning_rate', interpret_float),
+        Setting('stability_constant', interpret_float, default=0.0),
+        Setting('alpha', interpret_float, default=0.602),
+        Setting('gamma', interpret_float, default=0.101),
+        Setting('trajectory_interval', interpret_positive_int, default=100),
+        Setting('seed', allow_none(interpret_int), default=None),
+        ])
+
+    special_settings = [
+        Setting('opponent', interpret_identifier),
+        Setting('parameters',
+                interpret_sequence_of_quiet_configs(Parameter_config)),
+        Setting('make_candidate', interpret_callable),
+        ]
+
+    def parameter_spec_from_config(self, parameter_config):
+        """Make a Parameter_spec from a Parameter_config.
+
+        Raises ControlFileError if there is an error in the configuration.
+
+        Returns a Parameter_spec with all attributes set.
+
+        """
+        arguments = parameter_config.resolve_arguments()
+        interpreted = load_settings(parameter_settings, arguments)
+        pspec = Parameter_spec()
+        for name, value in interpreted.iteritems():
+            setattr(pspec, name, value)
+        if not pspec.perturbation > 0.0:
+            raise ValueError("'perturbation': must be positive")
+        if pspec.clip(pspec.initial_value) != pspec.initial_value:
+            raise ValueError("'initial_value': out of range")
+        try:
+            transformed = pspec.transform(pspec.initial_value)
+        except Exception:
+            raise ValueError(
+                "error from transform (applied to initial_value)\n%s" %
+                (compact_tracebacks.format_traceback(skip=1)))
+        if pspec.format is None:
+            pspec.format = pspec.code + ":%s"
+        try:
+            pspec.format % transformed
+        except Exception:
+            raise ControlFileError("'format': invalid format string")
+        return pspec
+
+    def initialise_from_control_file(self, config):
+        Competition.initialise_from_control_file(self, config)
+
+        competitions.validate_handicap(
+            self.handicap, self.handicap_style, self.board_size)
+
+        if not self.learning_rate > 0.0:
+            raise ControlFileError("learning_rate: must be positive")
+        if self.stability_constant < 0.0:
+            raise ControlFileError("stability_constant: must not be negative")
+
+        try:
+            specials = load_settings(self.special_settings, config)
+        except ValueError, e:
+            raise ControlFileError(str(e))
+
+        try:
+            self.opponent = self.players[specials['opponent']]
+        except KeyError:
+            raise ControlFileError(
+                "opponent: unknown player %s" % specials['opponent'])
+
+        self.parameter_specs = []
+        if not specials['parameters']:
+            raise ControlFileError("parameters: empty list")
+        seen_codes = set()
+        for i, parameter_spec in enumerate(specials['parameters']):
+            try:
+                pspec = self.parameter_spec_from_config(parameter_spec)
+            except StandardError, e:
+                code = parameter_spec.get_key()
+                if code is None:
+                    code = i
+                raise ControlFileError("parameter %s: %s" % (code, e))
+            if pspec.code in seen_codes:
+                raise ControlFileError(
+                    "duplicate parameter code: %s" % pspec.code)
+            seen_codes.add(pspec.code)
+            self.parameter_specs.append(pspec)
+
+        self.candidate_maker_fn = specials['make_candidate']
+
+
+    # State attributes (*: in persistent state):
+    #  *scheduler            -- Simple_scheduler (tokens are game numbers)
+    #  *parameters           -- current optimiser parameters (list of floats)
+    #  *pairs                -- map iteration number -> Pair
+    #                           (only iterations which haven't finished)
+    #  *iterations_completed -- int
+    #  *trajectory           -- list of pairs
+    #                           (iterations completed, optimiser parameters)
+    #                           recorded every trajectory_interval iterations
+    #  *opponent_description -- string (or None)
+    #   seen_successful_game -- bool (per-run state)
+
+    def set_clean_status(self):
+        self.scheduler = competition_schedulers.Simple_scheduler()
+        self.parameters = [pspec.initial_value
+                           for pspec in self.parameter_specs]
+        self.pairs = {}
+        self.iterations_completed = 0
+        self.trajectory = [(0, list(self.parameters))]
+        self.opponent_description = None
+
+    # Can bump this to prevent people loading incompatible .status files.
+    status_format_version = 0
+
+    def get_status(self):
+        return {
+            'scheduler' : self.scheduler,
+            'parameters' : self.parameters,
+            'pairs' : self.pairs,
+            'iterations_completed' : self.iterations_completed,
+            'trajectory' : self.trajectory,
+            'opponent_description' : self.opponent_description,
+            'seed' : self.seed,
+            }
+
+    def set_status(self, status):
+        if len(status['parameters']) != len(self.parameter_specs):
+            raise CompetitionError(
+                "status file is inconsistent with control file")
+        if status.get('seed') != self.seed:
+            raise CompetitionError(
+                "status file is inconsistent with control file "
+                "(seed has changed)")
+        self.scheduler = status['scheduler']
+        self.scheduler.rollback()
+        self.parameters = status['parameters']
+        self.pairs = status['pairs']
+        self.iterations_completed = status['iterations_completed']
+        self.trajectory = status['trajectory']
+        self.opponent_description = status['opponent_description']
+
+    def transform_parameters(self, optimiser_parameters):
+        l = []
+        for pspec, v in zip(self.parameter_specs, optimiser_parameters):
+            try:
+                l.append(pspec.transform(v))
+            except Exception:
+                raise CompetitionError(
+                    "error from transform for %s\n%s" %
+                    (pspec.code, compact_tracebacks.format_traceback(skip=1)))
+        return tuple(l)
+
+    def format_engine_parameters(self, engine_parameters):
+        l = []
+        for pspec, v in zip(self.parameter_specs, engine_parameters):
+            try:
+                s = pspec.format % v
+            except Exception:
+                s = "[%s?%s]" % (pspec.code, v)
+            l.append(s)
+        return "; ".join(l)
+
+    def format_optimiser_parameters(self, optimiser_parameters):
+        return self.format_engine_parameters(self.transform_parameters(
+            optimiser_parameters))
+
+    def make_candidate(self, player_code, engine_parameters):
+        """Make a player using the specified engine parameters.
+
+        Returns a game_jobs.Player.
+
+        """
+        try:
+            candidate_config = self.candidate_maker_fn(*engine_parameters)
+        except Exception:
+            raise CompetitionError(
+                "error from make_candidate()\n%s" %
+                compact_tracebacks.format_traceback(skip=1))
+        if not isinstance(candidate_config, Player_config):
+            raise CompetitionError(
+                "make_candidate() returned %r, not Player" %
+                candidate_config)
+        try:
+            candidate = self.game_jobs_player_from_config(
+                player_code, candidate_config)
+        except Exception, e:
+            raise CompetitionError(
+                "bad player spec from make_candidate():\n"
+                "%s\nparameters were: %s" %
+                (e, self.format_engine_parameters(engine_parameters)))
+        return candidate
+
+    def get_player_checks(self):
+        engine_parameters = self.transform_parameters(
+            [pspec.initial_value for pspec in self.parameter_specs])
+        candidate = self.make_candidate('candidate', engine_parameters)
+        result = []
+        for player in [candidate, self.opponent]:
+            check = game_jobs.Player_check()
+            check.player = player
+            check.board_size = self.board_size
+            check.komi = self.komi
+            result.append(check)
+        return result
+
+    def get_perturbations(self, iteration):
+        """Return the perturbation sizes for the specified iteration.
+
+        Returns a list of floats, one per parameter.
+
+        """
+        factor = (iteration + 1) ** self.gamma
+        return [pspec.perturbation / factor for pspec in self.parameter_specs]
+
+    def get_step_size(self, iteration):
+        """Return the gain 'a_k' for the specified iteration."""
+        return (self.learning_rate /
+                (self.stability_constant + iteration + 1) ** self.alpha)
+
+    def start_pair(self, iteration):
+        """Choose a perturbation and make the Pair for a new iteration.
+
+        If the 'seed' setting is set, the perturbation depends only on the seed
+        and the iteration number.
+
+        """
+        rng = competitions.make_rng(self.seed, iteration) or random
+        delta = [rng.choice((-1, 1)) for _ in self.parameter_specs]
+        plus_parameters = []
+        minus_parameters = []
+        for pspec, v, c, d in zip(self.parameter_specs, self.parameters,
+                                  self.get_perturbations(iteration), delta):
+            plus_parameters.append(pspec.clip(v + c*d))
+            minus_parameters.append(pspec.clip(v - c*d))
+        pair = Pair(iteration, delta, plus_parameters, minus_parameters)
+        self.pairs[iteration] = pair
+        return pair
+
+    def finish_pair(self, pair):
+        """Update the parameters using a completed Pair's results.
+
+        The estimated gradient for parameter i is
+          (plus_result - minus_result) / (2 * c_k,i * delta_i)
+        and the parameter moves by a_k * c_i**2 times this, where c_i is the
+        parameter's 'perturbation' setting. So the learning rate is
+        dimensionless.
+
+        """
+        k = pair.iteration
+        difference = pair.results[0] - pair.results[1]
+        step_size = self.get_step_size(k)
+        new_parameters = []
+        for pspec, v, c_k, d in zip(self.parameter_specs, self.parameters,
+                                    self.get_perturbations(k), pair.delta):
+            gradient = difference / (2 * c_k * d)
+            new_parameters.append(pspec.clip(
+                v + step_size * pspec.perturbation**2 * gradient))
+        self.parameters = new_parameters
+        del self.pairs[k]
+        self.iterations_completed += 1
+        if self.iterations_completed % self.trajectory_interval == 0:
+            self.trajectory.append(
+                (self.iterations_completed, list(self.parameters)))
+
+    def get_game(self):
+        if (self.number_of_iterations is not None and
+            self.scheduler.issued >= 2 * self.number_of_iterations):
+            return NoGameAvailable
+        game_number = self.scheduler.issue()
+        iteration, side = divmod(game_number, 2)
+        pair = self.pairs.get(iteration)
+        if pair is None:
+            pair = self.start_pair(iteration)
+        if side == 0:
+            optimiser_parameters = pair.plus_parameters
+        else:
+            optimiser_parameters = pair.minus_parameters
+        engine_parameters = self.transform_parameters(optimiser_parameters)
+        candidate = self.make_candidate(
+            "#%d%s" % (iteration, "+-"[side]), engine_parameters)
+
+        job = game_jobs.Game_job()
+        job.game_id = str(game_number)
+        job.game_data = game_number
+        if self.candidate_colour == 'b':
+            job.player_b = candidate
+            job.player_w = self.opponent
+        else:
+            job.player_b = self.opponent
+            job.player_w = candidate
+        job.board_size = self.board_size
+        job.komi = self.komi
+        job.move_limit = self.move_limit
+        job.handicap = self.handicap
+        job.handicap_is_free = (self.handicap_style == 'free')
+        job.use_internal_scorer = (self.scorer == 'internal')
+        job.adjudication = self.adjudication
+        job.internal_scorer_handicap_compensation = \
+            self.internal_scorer_handicap_compensation
+        job.sgf_event = self.competition_code
+        job.sgf_note = ("Candidate parameters: %s" %
+                        self.format_engine_parameters(engine_parameters))
+        return job
+
+    def process_game_result(self, response):
+        self.seen_successful_game = True
+        self.opponent_description = response.engine_descriptions[
+            self.opponent.code].get_long_description()
+        game_number = response.game_data
+        self.scheduler.fix(game_number)
+        iteration, side = divmod(game_number, 2)
+        pair = self.pairs[iteration]
+        # Counting jigo or no-result as half a point for the candidate
+        winning_colour = response.game_result.winning_colour
+        if winning_colour == self.candidate_colour:
+            score = 1
+        elif winning_colour is None:
+            score = 0.5
+        else:
+            score = 0
+        pair.results[side] = score
+        if pair.is_complete():
+            self.finish_pair(pair)
+            self.log_history("%d %s-%s -> %s" % (
+                iteration, format_float(pair.results[0]),
+                format_float(pair.results[1]),
+                self.format_optimiser_parameters(self.parameters)))
+
+    def process_game_error(self, job, previous_error_count):
+        ## If the very first game to return a response gives an error, halt.
+        ## Otherwise, retry once and halt on a second failure.
+        stop_competition = False
+        retry_game = False
+        if (not self.seen_successful_game) or (previous_error_count > 0):
+            stop_competition = True
+        else:
+            retry_game = True
+        return stop_competition, retry_game
+
+
+    def write_static_description(self, out):
+        def p(s):
+            print >>out, s
+        p("SPSA tuning event: %s" % self.competition_code)
+        if self.description:
+            p(self.description)
+        p("board size: %s" % self.board_size)
+        p("komi: %s" % self.komi)
+
+    def write_trajectory(self, out, limit=None):
+        """Write the recorded parameter values.
+
+        limit -- maximum number of (most recent) entries to show
+
+        """
+        trajectory = self.trajectory
+        if limit is not None:
+            trajectory = trajectory[-limit:]
+        for iterations, optimiser_parameters in trajectory:
+            print >>out, "%6d %s" % (
+                iterations, self.format_optimiser_parameters(
+                    optimiser_parameters))
+
+    def _write_main_report(self, out):
+        if self.number_of_iterations is None:
+            print >>out, "%d iterations completed" % self.iterations_completed
+        else:
+            print >>out, "%d/%d iterations completed" % (
+                self.iterations_completed, self.number_of_iterations)
+        if self.pairs:
+            print >>out, "%d in progress" % len(self.pairs)
+        print >>out
+        print >>out, "Current parameters: %s" % (
+            self.format_optimiser_parameters(self.parameters))
+        print >>out
+
+    def write_screen_report(self, out):
+        self._write_main_report(out)
+        print >>out, "trajectory (recent):"
+        self.write_trajectory(out, limit=10)
+
+    def write_short_report(self, out):
+        self.write_static_description(out)
+        self._write_main_report(out)
+        print >>out, "trajectory:"
+        self.write_trajectory(out)
+        print >>out
+        if self.opponent_description:
+            print >>out, "opponent (%s): %s" % (
+                self.opponent.code, self.opponent_description)
+        else:
+            print >>out, "opponent: %s" % self.opponent.code
+        print >>out
+
+    write_full_report = write_short_report
@@ -0,0 +1,318 @@
+"""Rules for stopping tournament matchups early.
+
+A stopping rule looks at a matchup's results so far (from player_1's point of
+view: wins, jigos, and losses) and says whether the matchup has been decided.
+
+"""
+
+from __future__ import division
+
+from math import log, sqrt
+
+from gomill.settings import *
+
+
+class Sprt_config(Quiet_config):
+    """SPRT stopping rule description for use in control files."""
+    # positional or keyword
+    positional_arguments = ('elo0', 'elo1')
+    # keyword-only
+    keyword_arguments = ('alpha', 'beta')
+    type_name = "SPRT"
+
+class Confidence_config(Quiet_config):
+    """Fixed-confidence stopping rule description for use in control files."""
+    # positional or keyword
+    positional_arguments = ('confidence',)
+    # keyword-only
+    keyword_arguments = ('min_games',)
+    type_name = "Confidence_stop"
+
+# Names to make available in control files
+control_file_globals = {
+    'SPRT' : Sprt_config,
+    'Confidence_stop' : Confidence_config,
+    }
+
+sprt_settings = [
+    Setting('elo0', interpret_float),
+    Setting('elo1', interpret_float),
+    Setting('alpha', interpret_float, default=0.05),
+    Setting('beta', interpret_float, default=0.05),
+    ]
+
+confidence_settings = [
+    Setting('confidence', interpret_float, default=0.95),
+    Setting('min_games', interpret_positive_int, default=100),
+    ]
+
+
+def score_and_variance(wins, jigos, losses):
+    """Return player_1's mean score per game, and its per-game variance."""
+    n = wins + jigos + losses
+    score = (wins + 0.5*jigos) / n
+    variance = (wins * (1.0 - score)**2 +
+                jigos * (0.5 - score)**2 +
+                losses * score**2) / n
+    return score, variance
+
+def pentanomial_score_and_variance(counts):
+    """Return player_1's mean score per game, and its per-game variance, from
+    game pair results.
+
+    counts -- sequence of 5 ints: numbers of game pairs in which player_1
+              scored 0, 0.5, 1, 1.5, and 2 points
+
+    The variance is the variance of the pair scores, scaled to be comparable
+    with score_and_variance() (so that dividing by the number of games gives
+    the variance of the mean score). When games within a pair are positively
+    correlated (eg, they start from the same opening), this is smaller than
+    the variance calculated from the individual games.
+
+    """
+    pairs = sum(counts)
+    score = sum(i * n for (i, n) in enumerate(counts)) / (4 * pairs)
+    pair_variance = sum(n * (i/4 - score)**2
+                        for (i, n) in enumerate(counts)) / pairs
+    return score, 2 * pair_variance
+
+def expected_score(elo):
+    """Return the expected score for an Elo difference."""
+    return 1 / (1 + 10**(-elo / 400))
+
+def _polynomial(coefficients, x):
+    # coefficients are in increasing order of power
+    result = 0.0
+    for c in reversed(coefficients):
+        result = result * x + c
+    return result
+
+# Coefficients for normal_quantile(), from Wichura's algorithm AS241
+_central_num = (
+    3.387132872796366608, 133.14166789178437745, 1971.5909503065514427,
+    13731.693765509461125, 45921.953931549871457, 67265.770927008700853,
+    33430.575583588128105, 2509.0809287301226727)
+_central_den = (
+    1.0, 42.313330701600911252, 687.1870074920579083,
+    5394.1960214247511077, 21213.794301586595867, 39307.89580009271061,
+    28729.085735721942674, 5226.495278852545925)
+_intermediate_num = (
+    1.42343711074968357734, 4.6303378461565452959, 5.7694972214606914055,
+    3.64784832476320460504, 1.27045825245236838258, 0.24178072517745061177,
+    0.0227238449892691845833, 7.7454501427834140764e-4)
+_intermediate_den = (
+    1.0, 2.05319162663775882187, 1.6763848301838038494,
+    0.68976733498510000455, 0.14810397642748007459,
+    0.0151986665636164571966, 5.475938084995344946e-4,
+    1.05075007164441684324e-9)
+_tail_num = (
+    6.6579046435011037772, 5.4637849111641143699, 1.7848265399172913358,
+    0.29656057182850489123, 0.026532189526576123093,
+    0.0012426609473880784386, 2.71155556874348757815e-5,
+    2.01033439929228813265e-7)
+_tail_den = (
+    1.0, 0.59983220655588793769, 0.13692988092273580531,
+    0.0148753612908506148525, 7.868691311456132591e-4,
+    1.8463183175100546818e-5, 1.4215117583164458887e-7,
+    2.04426310338993978564e-15)
+
+def normal_quantile(p):
+    """Return z such that a standard normal variable is below z with
+    probability p (0 < p < 1).
+
+    This uses Wichura's rational approximations (algorithm AS241), which are
+    accurate to about 1 part in 10**16.
+
+    """
+    q = p - 0.5
+    if abs(q) <= 0.425:
+        r = 0.180625 - q*q
+        return (q * _polynomial(_central_num, r) /
+                _polynomial(_central_den, r))
+    if q < 0:
+        r = p
+    else:
+        r = 1.0 - p
+    r = sqrt(-log(r))
+    if r <= 5.0:
+        r -= 1.6
+        z = (_polynomial(_intermediate_num, r) /
+             _polynomial(_intermediate_den, r))
+    else:
+        r -= 5.0
+        z = _polynomial(_tail_num, r) / _polynomial(_tail_den, r)
+    if q < 0:
+        z = -z
+    return z
+
+
+class Stopping_rule(object):
+    """Abstract base class for stopping rules."""
+
+    def check(self, wins, jigos, losses, player_1, player_2,
+              pentanomial=None):
+        """Say whether the matchup has been decided.
+
+        wins, jigos, losses -- ints (from player_1's point of view)
+        player_1, player_2  -- player codes (used in the description)
+        pentanomial         -- list of 5 ints, or None
+
+        Returns a string describing the decision, or None to continue.
+
+        If the games are played in pairs, 'pentanomial' gives the numbers of
+        complete pairs in which player_1 scored 0, 0.5, 1, 1.5, and 2 points;
+        the rule then uses those rather than the individual game results.
+
+        """
+        raise NotImplementedError
+
+    def describe(self, wins, jigos, losses, pentanomial=None):
+        """Return a one-line description of the rule and its current state."""
+        raise NotImplementedError
+
+
+def _get_score_and_variance(wins, jigos, losses, pentanomial):
+    # Returns (number of games, score, variance)
+    if pentanomial is not None and sum(pentanomial):
+        score, variance = pentanomial_score_and_variance(pentanomial)
+        if variance == 0.0:
+            # Count an extra lost pair and won pair, as for single games.
+            pentanomial = list(pentanomial)
+            pentanomial[0] += 1
+            pentanomial[4] += 1
+            score, variance = pentanomial_score_and_variance(pentanomial)
+        return 2 * sum(pentanomial), score, variance
+    n = wins + jigos + losses
+    score, variance = score_and_variance(wins, jigos, losses)
+    if variance == 0.0:
+        score, variance = score_and_variance(wins+1, jigos, losses+1)
+        n += 2
+    return n, score, variance
+
+
+class Sprt_rule(Stopping_rule):
+    """Sequential probability ratio test on the Elo difference.
+
+    Instantiate with
+      elo0  -- float (Elo difference for the null hypothesis)
+      elo1  -- float (Elo difference for the alternative hypothesis)
+      alpha -- float (false positive rate)
+      beta  -- float (false negative rate)
+
+    Elo differences are player_1's strength relative to player_2.
+
+    The log-likelihood ratio uses the normal approximation to the
+    distribution of the mean score (so jigos are handled naturally). While
+    every game has had the same outcome the observed variance is zero, so an
+    extra win and loss are counted to keep the ratio finite (or, for game
+    pairs, an extra lost pair and won pair).
+
+    """
+    def __init__(self, elo0, elo1, alpha, beta):
+        if not elo1 > elo0:
+            raise ValueError("elo1 must be greater than elo0")
+        for name, value in (('alpha', alpha), ('beta', beta)):
+            if not 0.0 < value < 0.5:
+                raise ValueError("%s must be between 0 and 0.5" % name)
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.alpha = alpha
+        self.beta = beta
+        self.lower_bound = log(beta / (1 - alpha))
+        self.upper_bound = log((1 - beta) / alpha)
+
+    def llr(self, wins, jigos, losses, pentanomial=None):
+        """Return the log-likelihood ratio of H1 to H0."""
+        if wins + jigos + losses == 0:
+            return 0.0
+        n, score, variance = _get_score_and_variance(
+            wins, jigos, losses, pentanomial)
+        s0 = expected_score(self.elo0)
+        s1 = expected_score(self.elo1)
+        return n * (s1 - s0) * (2*score - s0 - s1) / (2 * variance)
+
+    def check(self, wins, jigos, losses, player_1, player_2,
+              pentanomial=None):
+        llr = self.llr(wins, jigos, losses, pentanomial)
+        if llr >= self.upper_bound:
+            return "H1 accepted: %s at least %g Elo stronger than %s" % (
+                player_1, self.elo1, player_2)
+        if llr <= self.lower_bound:
+            return "H0 accepted: %s at most %g Elo stronger than %s" % (
+                player_1, self.elo0, player_2)
+        return None
+
+    def describe(self, wins, jigos, losses, pentanomial=None):
+        return ("SPRT elo0=%g elo1=%g alpha=%g beta=%g: "
+                "LLR %.2f (bounds %.2f, %.2f)" % (
+                    self.elo0, self.elo1, self.alpha, self.beta,
+                    self.llr(wins, jigos, losses, pentanomial),
+                    self.lower_bound, self.upper_bound))
+
+
+class Confidence_rule(Stopping_rule):
+    """Stop when one player is better at a fixed confidence level.
+
+    Instantiate with
+      confidence -- float (eg 0.95)
+      min_games  -- int
+
+    The matchup is decided when at least min_games have been played, and the
+    (two-sided, normal-approximation) confidence interval for player_1's mean
+    score excludes 0.5.
+
+    """
+    def __init__(self, confidence, min_games):
+        if not 0.0 < confidence < 1.0:
+            raise ValueError("confidence must be between 0 and 1")
+        self.confidence = confidence
+        self.min_games = min_games
+        self.z = normal_quantile(0.5 + confidence/2)
+
+    def _interval(self, wins, jigos, losses, pentanomial):
+        if pentanomial is not None and sum(pentanomial):
+            n = 2 * sum(pentanomial)
+            score, variance = pentanomial_score_and_variance(pentanomial)
+        else:
+            n = wins + jigos + losses
+            score, variance = score_and_variance(wins, jigos, losses)
+        return score, self.z * sqrt(variance / n)
+
+    def check(self, wins, jigos, losses, player_1, player_2,
+              pentanomial=None):
+        n = wins + jigos + losses
+        if n < self.min_games:
+            return None
+        score, margin = self._interval(wins, jigos, losses, pentanomial)
+        if score - margin > 0.5:
+            better, worse = player_1, player_2
+        elif score + margin < 0.5:
+            better, worse = player_2, player_1
+        else:
+            return None
+        return "%s stronger than %s at %g%% confidence" % (
+            better, worse, 100 * self.confidence)
+
+    def describe(self, wins, jigos, losses, pentanomial=None):
+        s = "confidence stop %g%% (min %d games)" % (
+            100 * self.confidence, self.min_games)
+        if wins + jigos + losses == 0:
+            return s
+        score, margin = self._interval(wins, jigos, losses, pentanomial)
+        return s + ": score %.3f +/- %.3f" % (score, margin)
+
+
+def interpret_stopping_rule(v):
+    """Interpreter for the 'stopping_rule' matchup setting.
+
+    Accepts an SPRT or Confidence_stop config object, and returns a
+    Stopping_rule.
+
+    """
+    if isinstance(v, Sprt_config):
+        interpreted = load_settings(sprt_settings, v.resolve_arguments())
+        return Sprt_rule(**interpreted)
+    if isinstance(v, Confidence_config):
+        interpreted = load_settings(confidence_settings, v.resolve_arguments())
+        return Confidence_rule(**interpreted)
+    raise ValueError("not a SPRT or Confidence_stop")
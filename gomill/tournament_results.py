@@ -2,7 +2,14 @@
 
 from __future__ import division
 
+from collections import defaultdict
+from math import sqrt
+
 from gomill import ascii_tables
+from gomill import ratings
+from gomill import stopping_rules
+from gomill.results_tables import Results_table
+from gomill.game_index import Indexed_game
 from gomill.utils import format_float, format_percent
 from gomill.common import colour_name
 
@@ -21,11 +28,16 @@ class Matchup_description(object):
       handicap_style  -- 'fixed' or 'free'
       move_limit      -- int
       scorer          -- 'internal' or 'players'
+      adjudication    -- gameplay.Adjudication or None
       number_of_games -- int or None
+      paired_games    -- bool
 
     If alternating is False, player_1 plays black and player_2 plays white;
     otherwise they alternate.
 
+    If paired_games is True, games are played in pairs with colours swapped
+    (and the same opening, if there is an opening book).
+
     player_1 and player_2 are always different.
 
     """
@@ -51,11 +63,22 @@ class Tournament_results(object):
     matchup corresponding to a series of games which have the same players and
     settings. Each matchup has an id, which is a short string.
 
+    If a game_index.Game_index is provided, find_games() and get_game() use it
+    rather than scanning the results.
+
+    If a map matchup id -> Matchup_stats_accumulator is provided,
+    get_matchup_stats() uses it rather than scanning the results.
+
     """
-    def __init__(self, matchup_list, results):
+    def __init__(self, matchup_list, results, game_index=None,
+                 stats_accumulators=None):
         self.matchup_list = matchup_list
         self.results = results
         self.matchups = dict((m.id, m) for m in matchup_list)
+        self.game_index = game_index
+        self.stats_accumulators = stats_accumulators
+        self._results_table = None
+        self._results_table_game_count = None
 
     def get_matchup_ids(self):
         """Return a list of all matchup ids, in definition order."""
@@ -83,6 +106,120 @@ class Tournament_results(object):
         """
         return self.results[matchup_id][:]
 
+    def has_game_index(self):
+        """Say whether find_games() and get_game() are using a game index."""
+        return self.game_index is not None
+
+    def find_games(self, matchup_id=None, player=None, winner=None,
+                   forfeits_only=False):
+        """Find games matching the specified criteria.
+
+        matchup_id    -- only games from this matchup
+        player        -- only games in which this player took part
+        winner        -- only games won by this player
+        forfeits_only -- bool: only forfeited games
+
+        Returns a list of game_index.Indexed_games.
+
+        If there's no game index, the Indexed_games' sgf_filename attributes
+        are None.
+
+        May raise game_index.GameIndexError.
+
+        """
+        if self.game_index is not None:
+            return self.game_index.find_games(
+                matchup_id, player, winner, forfeits_only)
+        if matchup_id is None:
+            matchup_ids = self.get_matchup_ids()
+        elif matchup_id in self.results:
+            matchup_ids = [matchup_id]
+        else:
+            matchup_ids = []
+        result = []
+        for m_id in matchup_ids:
+            for game_result in self.results[m_id]:
+                if (player is not None and
+                    player not in (game_result.player_b, game_result.player_w)):
+                    continue
+                if winner is not None and game_result.winning_player != winner:
+                    continue
+                if forfeits_only and not game_result.is_forfeit:
+                    continue
+                result.append(Indexed_game.from_game_result(m_id, game_result))
+        return result
+
+    def get_game(self, game_id):
+        """Find the game with the specified id.
+
+        Returns a game_index.Indexed_game, or None if there's no such game.
+
+        May raise game_index.GameIndexError.
+
+        """
+        if self.game_index is not None:
+            return self.game_index.get_game(game_id)
+        for matchup_id in self.get_matchup_ids():
+            for game_result in self.results[matchup_id]:
+                if game_result.game_id == game_id:
+                    return Indexed_game.from_game_result(
+                        matchup_id, game_result)
+        return None
+
+    def get_results_table(self):
+        """Return all the game results in column form.
+
+        Returns a results_tables.Results_table (which should be treated as
+        read-only).
+
+        Matchups are in definition order (followed by any which are no longer
+        in the control file); games within a matchup are in the order their
+        results were recorded.
+
+        The table is built the first time this is called, and rebuilt if more
+        results have come in since (the results are only ever added to, so the
+        number of games is enough to tell whether the table is up to date).
+
+        """
+        game_count = sum(len(l) for l in self.results.itervalues())
+        if (self._results_table is None or
+            game_count != self._results_table_game_count):
+            self._results_table = Results_table.from_results(
+                self.results, self.get_matchup_ids())
+            self._results_table_game_count = game_count
+        return self._results_table
+
+    def query_games(self, **kwargs):
+        """Return the games matching the specified criteria.
+
+        Accepts the keyword arguments described in Results_table.select().
+
+        Returns a new results_tables.Results_table.
+
+        """
+        return self.get_results_table().query(**kwargs)
+
+    def get_ratings(self, prior_games=1.0, fit_colour_advantage=True):
+        """Fit Elo (Bradley-Terry) ratings to the results of all matchups.
+
+        prior_games          -- float
+        fit_colour_advantage -- bool
+
+        Returns a ratings.Ratings object.
+
+        See ratings.Rating_fitter for the meaning of the parameters.
+
+        """
+        fitter = ratings.Rating_fitter(prior_games, fit_colour_advantage)
+        if self.stats_accumulators is not None:
+            for accumulator in self.stats_accumulators.itervalues():
+                accumulator.add_to_rating_fitter(fitter)
+        else:
+            for results in self.results.itervalues():
+                for game_result in results:
+                    fitter.add_result(game_result)
+        return fitter.fit()
+
     def get_matchup_stats(self, matchup_id):
         """Return statistics for the specified matchup.
 
@@ -90,6 +227,9 @@ class Tournament_results(object):
 
         """
         matchup = self.matchups[matchup_id]
+        if self.stats_accumulators is not None:
+            return self.stats_accumulators[matchup_id].make_matchup_stats(
+                matchup.player_1, matchup.player_2)
         ms = Matchup_stats(self.results[matchup_id],
                            matchup.player_1, matchup.player_2)
         ms.calculate_colour_breakdown()
@@ -115,14 +255,21 @@ class Matchup_stats(object):
       forfeits_1  -- int (number of games)
       forfeits_2  -- int (number of games)
       unknown     -- int (number of games)
+      pentanomial -- list of 5 ints, or None
 
     scores are multiples of 0.5 (as there may be jigos).
 
+    If the games were played in pairs (see the paired_games matchup setting),
+    and the statistics were calculated from a Matchup_stats_accumulator,
+    pentanomial gives the numbers of complete pairs in which player_1 scored 0,
+    0.5, 1, 1.5, and 2 points. Otherwise it's None.
+
     """
     def __init__(self, results, player_1, player_2):
         self._results = results
         self.player_1 = player_1
         self.player_2 = player_2
+        self.pentanomial = None
 
         self.total = len(results)
 
@@ -217,6 +364,163 @@ class Matchup_stats(object):
             self.average_time_2 = None
 
 
+class Matchup_stats_accumulator(object):
+    """Running totals for the results of a single matchup.
+
+    Call add_result() for each game result; make_matchup_stats() then produces
+    the same statistics as Matchup_stats, without examining the individual
+    results.
+
+    Matchup_stats_accumulators are suitable for pickling.
+
+    """
+    def __init__(self):
+        self.total = 0
+        self.jigos = 0
+        self.unknown = 0
+        # Map player code -> int
+        self.wins = defaultdict(int)
+        self.forfeit_wins = defaultdict(int)
+        # Map colour -> int
+        self.colour_wins = defaultdict(int)
+        # Map (player code, colour) -> int
+        self.played = defaultdict(int)
+        self.player_colour_wins = defaultdict(int)
+        # Map player code -> jigos with that player taking Black
+        self.black_jigos = defaultdict(int)
+        # Map player code -> float / int (games with known time)
+        self.cpu_time_totals = defaultdict(float)
+        self.cpu_time_counts = defaultdict(int)
+        # Map pair number -> Game_result (first-reported game of the pair)
+        self.unpaired_results = {}
+        # Map player code -> list of 5 ints (numbers of complete game pairs in
+        # which the player scored 0, 0.5, 1, 1.5, 2 points)
+        self.pentanomial = {}
+
+    def add_result(self, result, pair_number=None):
+        """Add a game result to the totals.
+
+        result      -- gtp_games.Game_result
+        pair_number -- int or None
+
+        If the matchup's games are played in pairs, pass the same pair_number
+        for both games of each pair. Pairs where either game has an unknown
+        result aren't counted in the pentanomial totals.
+
+        """
+        if pair_number is not None:
+            self._add_to_pair(pair_number, result)
+        self.total += 1
+        if result.is_jigo:
+            self.jigos += 1
+            self.black_jigos[result.player_b] += 1
+        if result.is_unknown:
+            self.unknown += 1
+        self.played[result.player_b, 'b'] += 1
+        self.played[result.player_w, 'w'] += 1
+        if result.winning_colour is not None:
+            self.colour_wins[result.winning_colour] += 1
+        winner = result.winning_player
+        if winner is not None:
+            self.wins[winner] += 1
+            if result.is_forfeit:
+                self.forfeit_wins[winner] += 1
+            self.player_colour_wins[winner, result.winning_colour] += 1
+        for player_code, cpu_time in result.cpu_times.iteritems():
+            if cpu_time is not None:
+                self.cpu_time_totals[player_code] += cpu_time
+                self.cpu_time_counts[player_code] += 1
+
+    def _add_to_pair(self, pair_number, result):
+        other = self.unpaired_results.pop(pair_number, None)
+        if other is None:
+            self.unpaired_results[pair_number] = result
+            return
+        if result.is_unknown or other.is_unknown:
+            return
+        def points(r, player):
+            if r.is_jigo:
+                return 1
+            if r.winning_player == player:
+                return 2
+            return 0
+        for player in set(result.players.itervalues()):
+            counts = self.pentanomial.get(player)
+            if counts is None:
+                counts = self.pentanomial[player] = [0] * 5
+            counts[points(result, player) + points(other, player)] += 1
+
+    def make_matchup_stats(self, player_1, player_2):
+        """Return a Matchup_stats object with all statistics set.
+
+        player_1 -- player code
+        player_2 -- player code
+
+        """
+        ms = Matchup_stats([], player_1, player_2)
+        ms._results = None
+        js = ms._jigo_score = 0.5 * self.jigos
+        ms.total = self.total
+        ms.unknown = self.unknown
+        ms.wins_1 = self.wins.get(player_1, 0) + js
+        ms.wins_2 = self.wins.get(player_2, 0) + js
+        ms.forfeits_1 = self.forfeit_wins.get(player_2, 0)
+        ms.forfeits_2 = self.forfeit_wins.get(player_1, 0)
+        pentanomial = self.pentanomial.get(player_1)
+        if pentanomial is not None:
+            ms.pentanomial = pentanomial[:]
+
+        ms.played_1b = self.played.get((player_1, 'b'), 0)
+        ms.played_1w = self.played.get((player_1, 'w'), 0)
+        ms.played_2b = self.played.get((player_2, 'b'), 0)
+        ms.played_y2 = self.played.get((player_2, 'w'), 0)
+        if ms.played_1w == 0 and ms.played_2b == 0:
+            ms.alternating = False
+            ms.colour_1 = 'b'
+            ms.colour_2 = 'w'
+        elif ms.played_1b == 0 and ms.played_y2 == 0:
+            ms.alternating = False
+            ms.colour_1 = 'w'
+            ms.colour_2 = 'b'
+        else:
+            ms.alternating = True
+            ms.wins_b = self.colour_wins.get('b', 0) + js
+            ms.wins_w = self.colour_wins.get('w', 0) + js
+            ms.wins_1b = self.player_colour_wins.get((player_1, 'b'), 0) + js
+            ms.wins_1w = self.player_colour_wins.get((player_1, 'w'), 0) + js
+            ms.wins_2b = self.player_colour_wins.get((player_2, 'b'), 0) + js
+            ms.wins_2w = self.player_colour_wins.get((player_2, 'w'), 0) + js
+
+        for player, attr in ((player_1, 'average_time_1'),
+                             (player_2, 'average_time_2')):
+            count = self.cpu_time_counts.get(player, 0)
+            if count:
+                setattr(ms, attr, self.cpu_time_totals.get(player, 0) / count)
+            else:
+                setattr(ms, attr, None)
+        return ms
+
+    def add_to_rating_fitter(self, fitter):
+        """Pass the totals to a ratings.Rating_fitter.
+
+        Games with unknown results are left out.
+
+        """
+        players = set(player for (player, colour) in self.played)
+        for player_b in players:
+            for player_w in players:
+                if player_w == player_b:
+                    continue
+                js = 0.5 * self.black_jigos.get(player_b, 0)
+                black_score = (
+                    self.player_colour_wins.get((player_b, 'b'), 0) + js)
+                white_score = (
+                    self.player_colour_wins.get((player_w, 'w'), 0) + js)
+                if black_score or white_score:
+                    fitter.add_games(
+                        player_b, player_w, black_score, white_score)
+
+
 def make_matchup_stats_table(ms):
     """Produce an ascii table showing matchup statistics.
 
@@ -307,4 +611,22 @@ def write_matchup_summary(out, matchup, ms):
 
     p(matchup.describe_details())
     p("\n".join(make_matchup_stats_table(ms).render()))
+    if ms.pentanomial is not None:
+        write_pentanomial_summary(out, ms)
+
+
+def write_pentanomial_summary(out, ms):
+    """Write a description of game-pair results to 'out'.
+
+    ms -- Matchup_stats with pentanomial set
+
+    """
+    pairs = sum(ms.pentanomial)
+    score, variance = stopping_rules.pentanomial_score_and_variance(
+        ms.pentanomial)
+    margin = 1.96 * sqrt(variance / (2 * pairs))
+    print >>out, ("%d game pairs; %s scored 0, 0.5, 1, 1.5, 2: %s" %
+                  (pairs, ms.player_1, " ".join(map(str, ms.pentanomial))))
+    print >>out, ("%s paired score: %.1f%% +/- %.1f%%" %
+                  (ms.player_1, 100 * score, 100 * margin))
 
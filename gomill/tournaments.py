@@ -1,11 +1,14 @@
 """Common code for all tournament types."""
 
 from collections import defaultdict
+from math import sqrt
 
 from gomill import game_jobs
 from gomill import competition_schedulers
 from gomill import tournament_results
 from gomill import competitions
+from gomill import stopping_rules
+from gomill import openings
 from gomill.competitions import (
     Competition, NoGameAvailable, CompetitionError, ControlFileError)
 from gomill.settings import *
@@ -15,6 +18,19 @@ from gomill.utils import format_percent
 matchup_settings = competitions.game_settings + [
     Setting('alternating', interpret_bool, default=False),
     Setting('number_of_games', allow_none(interpret_int), default=None),
+    Setting('stopping_rule',
+            allow_none(stopping_rules.interpret_stopping_rule),
+            default=None),
+    Setting('opening_book',
+            allow_none(interpret_sequence_of(interpret_8bit_string)),
+            default=None),
+    Setting('paired_games', interpret_bool, default=False),
+    ]
+
+# Tournament-wide settings controlling how games are shared between matchups
+scheduling_settings = [
+    Setting('adaptive_scheduling', interpret_bool, default=False),
+    Setting('target_precision', allow_none(interpret_float), default=None),
     ]
 
 
@@ -25,6 +41,8 @@ class Matchup(tournament_results.Matchup_description):
 
     Additional attributes:
       event_description -- string to show as sgf event
+      openings          -- list of openings.Openings (empty if there's no
+                           opening book)
 
     Instantiate with
       matchup_id -- identifier
@@ -62,6 +80,11 @@ class Matchup(tournament_results.Matchup_description):
 
         competitions.validate_handicap(
             self.handicap, self.handicap_style, self.board_size)
+        if self.paired_games and not self.alternating:
+            raise ControlFileError("paired_games requires alternating")
+        if self.opening_book is not None and self.handicap is not None:
+            raise ControlFileError("can't use both handicap and opening_book")
+        self.openings = []
 
         if name is None:
             name = "%s v %s" % (self.player_1, self.player_2)
@@ -76,6 +99,26 @@ class Matchup(tournament_results.Matchup_description):
     def make_game_id(self, game_number):
         return self._game_id_template % (self.id, game_number)
 
+    def get_pair_number(self, game_number):
+        """Return the pair number for a game, or None if not playing pairs."""
+        if not self.paired_games:
+            return None
+        return game_number // 2
+
+    def get_opening(self, game_number):
+        """Return the opening for a game, or None if there's no opening book.
+
+        Openings are used in turn, starting again from the first when the book
+        is exhausted. If games are paired, both games of a pair use the same
+        opening.
+
+        """
+        if not self.openings:
+            return None
+        if self.paired_games:
+            game_number //= 2
+        return self.openings[game_number % len(self.openings)]
+
 
 class Ghost_matchup(object):
     """Dummy Matchup object for matchups which have gone from the control file.
@@ -91,6 +134,8 @@ class Ghost_matchup(object):
         self.player_2 = player_2
         self.name = "%s v %s" % (player_1, player_2)
         self.number_of_games = None
+        self.stopping_rule = None
+        self.paired_games = False
 
     def describe_details(self):
         return "?? (missing from control file)"
@@ -100,10 +145,38 @@ class Tournament(Competition):
     """A Competition based on a number of matchups.
 
     """
+    # Used if the control file doesn't set adaptive_scheduling
+    default_adaptive_scheduling = False
+
     def __init__(self, competition_code, **kwargs):
         Competition.__init__(self, competition_code, **kwargs)
         self.working_matchups = set()
         self.probationary_matchups = set()
+        self.shard_index = 0
+        self.shard_count = 1
+        self.adaptive_scheduling = False
+        self.target_precision = None
+        self._opening_cache = None
+
+    def load_scheduling_settings(self, config):
+        """Read the scheduling settings from the control file.
+
+        Raises ControlFileError if they're invalid.
+
+        """
+        try:
+            settings = load_settings(scheduling_settings, config)
+        except ValueError, e:
+            raise ControlFileError(str(e))
+        target_precision = settings['target_precision']
+        if target_precision is not None and not 0 < target_precision < 0.5:
+            raise ControlFileError(
+                "'target_precision': must be between 0 and 0.5")
+        if 'adaptive_scheduling' in config:
+            self.adaptive_scheduling = settings['adaptive_scheduling']
+        else:
+            self.adaptive_scheduling = self.default_adaptive_scheduling
+        self.target_precision = target_precision
 
     def make_matchup(self, matchup_id, player_1, player_2, parameters,
                      name=None):
@@ -115,10 +188,45 @@ class Tournament(Competition):
 
         """
         try:
-            return Matchup(matchup_id, player_1, player_2, parameters, name,
-                           event_code=self.competition_code)
+            matchup = Matchup(matchup_id, player_1, player_2, parameters, name,
+                              event_code=self.competition_code)
         except ValueError, e:
             raise ControlFileError(str(e))
+        if matchup.opening_book is not None:
+            matchup.openings = self._load_opening_book(matchup.opening_book)
+            for opening in matchup.openings:
+                if opening.board_size != matchup.board_size:
+                    raise ControlFileError(
+                        "opening_book: %s: wrong board size" % opening.name)
+        return matchup
+
+    def _load_opening_book(self, pathnames):
+        """Read the openings from a list of SGF files or directories.
+
+        Each file or directory is read only once, even if several matchups use
+        it.
+
+        Returns a list of openings.Openings.
+
+        Raises ControlFileError if a file can't be read or isn't suitable.
+
+        """
+        if self._opening_cache is None:
+            self._opening_cache = {}
+        result = []
+        for pathname in pathnames:
+            book = self._opening_cache.get(pathname)
+            if book is None:
+                try:
+                    book = openings.read_openings(
+                        self.resolve_pathname(pathname), name=pathname)
+                except ValueError, e:
+                    raise ControlFileError("opening_book: %s" % e)
+                self._opening_cache[pathname] = book
+            result += book
+        if not result:
+            raise ControlFileError("opening_book: empty list")
+        return result
 
 
     # State attributes (*: in persistent state):
@@ -132,6 +240,11 @@ class Tournament(Competition):
     #       (matchups which failed to complete their last game)
     #   ghost_matchups        -- map matchup id -> Ghost_matchup
     #       (matchups which have been removed from the control file)
+    #   stats_accumulators    -- map matchup id -> Matchup_stats_accumulator
+    #       (derived from results)
+    #   stopped_matchups      -- map matchup id -> string
+    #       (matchups stopped by their stopping rule, with the decision;
+    #        derived from results)
 
     def _check_results(self):
         """Check that the current results are consistent with the control file.
@@ -177,16 +290,148 @@ class Tournament(Competition):
 
     def _set_scheduler_groups(self):
         self.scheduler.set_groups(
-            [(m.id, m.number_of_games) for m in self.matchup_list] +
+            [(m.id, 0 if m.id in self.stopped_matchups else m.number_of_games)
+             for m in self.matchup_list] +
             [(id, 0) for id in self.ghost_matchups])
 
+    def _get_score_interval(self, matchup_id):
+        """Return player_1's mean score and a 95% confidence half-width.
+
+        This counts an extra win and loss for each player, so that it is
+        defined from the start.
+
+        Returns a pair of floats (score, half_width).
+
+        """
+        matchup = self.matchups[matchup_id]
+        accumulator = self.stats_accumulators[matchup_id]
+        wins = accumulator.wins.get(matchup.player_1, 0) + 1
+        losses = accumulator.wins.get(matchup.player_2, 0) + 1
+        jigos = accumulator.jigos
+        score, variance = stopping_rules.score_and_variance(
+            wins, jigos, losses)
+        return score, 1.96 * sqrt(variance / (wins + jigos + losses))
+
+    def _get_scheduling_weight(self, matchup_id):
+        """Return the weight to use for a matchup in adaptive scheduling.
+
+        This is the half-width of the matchup's score interval (see
+        _get_score_interval()). It's scaled down if the interval is clear of
+        one half, so that matchups near a decision get more games.
+
+        (Matchups which have reached target_precision are stopped, so their
+        weight doesn't matter.)
+
+        """
+        score, half_width = self._get_score_interval(matchup_id)
+        distance = abs(score - 0.5)
+        if distance > half_width:
+            return half_width * half_width / distance
+        return half_width
+
+    def _set_scheduler_weights(self):
+        if not self.adaptive_scheduling:
+            return
+        for matchup in self.matchup_list:
+            self.scheduler.set_weight(
+                matchup.id, self._get_scheduling_weight(matchup.id))
+
+    # Shards take each matchup's game numbers two at a time, so that colours
+    # still alternate within a shard, and both games of a pair (see
+    # paired_games) are played by the same shard.
+    shard_block_size = 2
+
+    def set_shard(self, shard_index, shard_count):
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+
+    def _set_stats_accumulators(self):
+        # This also sets stopped_matchups, applying the stopping rules after
+        # each result in turn (as happened when the games were played).
+        self.stats_accumulators = defaultdict(
+            tournament_results.Matchup_stats_accumulator)
+        self.stopped_matchups = {}
+        for matchup_id, results in self.results.iteritems():
+            accumulator = self.stats_accumulators[matchup_id]
+            for result in results:
+                accumulator.add_result(
+                    result, self._get_pair_number(matchup_id, result))
+                self._check_stopping_rule(matchup_id)
+
+    def _get_pair_number(self, matchup_id, game_result):
+        """Return the pair number for a game, or None if not playing pairs.
+
+        The game number is recovered from the game id.
+
+        """
+        matchup = self.matchups.get(matchup_id)
+        if matchup is None or not matchup.paired_games:
+            return None
+        try:
+            game_number = int(game_result.game_id.rpartition("_")[2])
+        except (AttributeError, ValueError):
+            return None
+        return matchup.get_pair_number(game_number)
+
+    def _check_stopping_rule(self, matchup_id):
+        """Apply the matchup's stopping rule (if it has one).
+
+        With adaptive scheduling, this also stops a matchup once its score
+        interval is no wider than target_precision.
+
+        Returns the decision (a string) if this stops the matchup, otherwise
+        None.
+
+        Matchups which have already been stopped are left alone.
+
+        """
+        if matchup_id in self.stopped_matchups:
+            return None
+        matchup = self.matchups.get(matchup_id)
+        if matchup is None:
+            return None
+        decision = None
+        if matchup.stopping_rule is not None:
+            accumulator = self.stats_accumulators[matchup_id]
+            decision = matchup.stopping_rule.check(
+                accumulator.wins.get(matchup.player_1, 0),
+                accumulator.jigos,
+                accumulator.wins.get(matchup.player_2, 0),
+                matchup.player_1, matchup.player_2,
+                self._get_pentanomial(matchup))
+        if (decision is None and self.adaptive_scheduling and
+            self.target_precision is not None):
+            score, half_width = self._get_score_interval(matchup_id)
+            if half_width <= self.target_precision:
+                decision = ("reached target precision (+/- %.1f%%)" %
+                            (half_width * 100))
+        if decision is not None:
+            self.stopped_matchups[matchup_id] = decision
+        return decision
+
+    def _get_pentanomial(self, matchup):
+        # Returns the pair results from player_1's point of view, or None
+        if not matchup.paired_games:
+            return None
+        return self.stats_accumulators[matchup.id].pentanomial.get(
+            matchup.player_1)
+
+    def _get_matchup_stats(self, matchup_id, player_1, player_2):
+        """Return a Matchup_stats object (with all statistics set)."""
+        return self.stats_accumulators[matchup_id].make_matchup_stats(
+            player_1, player_2)
+
     def set_clean_status(self):
         self.results = defaultdict(list)
+        self._set_stats_accumulators()
         self.engine_names = {}
         self.engine_descriptions = {}
-        self.scheduler = competition_schedulers.Group_scheduler()
+        self.scheduler = competition_schedulers.Group_scheduler(
+            stride=self.shard_count, offset=self.shard_index,
+            block_size=self.shard_block_size)
         self.ghost_matchups = {}
         self._set_scheduler_groups()
+        self._set_scheduler_weights()
 
     def get_status(self):
         return {
@@ -199,14 +444,38 @@ class Tournament(Competition):
     def set_status(self, status):
         self.results = status['results']
         self._check_results()
+        self._set_stats_accumulators()
         self._set_ghost_matchups()
         self.scheduler = status['scheduler']
         self._set_scheduler_groups()
+        if (self.scheduler.stride != self.shard_count or
+            self.scheduler.offset != self.shard_index):
+            raise CompetitionError(
+                "status is for a different shard (%d of %d)" %
+                (self.scheduler.offset, self.scheduler.stride))
+        if (self.shard_count != 1 and
+            self.scheduler.block_size != self.shard_block_size):
+            raise CompetitionError(
+                "status uses an old shard layout; please reset the shards")
+        self._set_scheduler_weights()
         self.scheduler.rollback()
         self.engine_names = status['engine_names']
         self.engine_descriptions = status['engine_descriptions']
 
 
+    def merge_shard(self, shard):
+        for matchup_id, results in shard.results.iteritems():
+            self.results[matchup_id].extend(results)
+            accumulator = self.stats_accumulators[matchup_id]
+            for result in results:
+                accumulator.add_result(
+                    result, self._get_pair_number(matchup_id, result))
+            self._check_stopping_rule(matchup_id)
+        self.engine_names.update(shard.engine_names)
+        self.engine_descriptions.update(shard.engine_descriptions)
+        self._set_ghost_matchups()
+
+
     def get_game(self):
         matchup_id, game_number = self.scheduler.issue()
         if matchup_id is None:
@@ -232,6 +501,8 @@ class Tournament(Competition):
         job.internal_scorer_handicap_compensation = \
             matchup.internal_scorer_handicap_compensation
         job.sgf_event = matchup.event_description
+        job.opening = matchup.get_opening(game_number)
+        job.adjudication = matchup.adjudication
         return job
 
     def process_game_result(self, response):
@@ -246,7 +517,30 @@ class Tournament(Competition):
         self.probationary_matchups.discard(matchup_id)
         self.scheduler.fix(matchup_id, game_number)
         self.results[matchup_id].append(response.game_result)
+        pair_number = None
+        matchup = self.matchups.get(matchup_id)
+        if matchup is not None:
+            pair_number = matchup.get_pair_number(game_number)
+        self.stats_accumulators[matchup_id].add_result(
+            response.game_result, pair_number)
         self.log_history("%7s %s" % (game_id, response.game_result.describe()))
+        decision = self._check_stopping_rule(matchup_id)
+        if decision is not None:
+            self.log_event("matchup %s stopped early: %s" %
+                           (matchup_id, decision))
+            self._set_scheduler_groups()
+        if self.adaptive_scheduling and matchup_id in self.matchups:
+            self.scheduler.set_weight(
+                matchup_id, self._get_scheduling_weight(matchup_id))
+
+    def get_matchup_id(self, response):
+        matchup_id, game_number = response.game_data
+        return matchup_id
+
+    def get_game_results(self):
+        return [(matchup_id, game_result)
+                for matchup_id, results in self.results.iteritems()
+                for game_result in results]
 
     def process_game_error(self, job, previous_error_count):
         # ignoring previous_error_count, as we can consider all jobs for the
@@ -262,10 +556,10 @@ class Tournament(Competition):
             retry_game = True
         return stop_competition, retry_game
 
-    def write_matchup_report(self, out, matchup, results):
+    def write_matchup_report(self, out, matchup):
         """Write the summary block for the specified matchup to 'out'
 
-        results -- nonempty list of Game_results
+        The matchup must have at least one result.
 
         """
         # The control file might have changed since the results were recorded.
@@ -275,11 +569,19 @@ class Tournament(Competition):
         # that isn't available any other way, but we look to the results where
         # we can.
 
-        ms = tournament_results.Matchup_stats(
-            results, matchup.player_1, matchup.player_2)
-        ms.calculate_colour_breakdown()
-        ms.calculate_time_stats()
+        ms = self._get_matchup_stats(
+            matchup.id, matchup.player_1, matchup.player_2)
         tournament_results.write_matchup_summary(out, matchup, ms)
+        if matchup.stopping_rule is not None:
+            accumulator = self.stats_accumulators[matchup.id]
+            print >>out, matchup.stopping_rule.describe(
+                accumulator.wins.get(matchup.player_1, 0),
+                accumulator.jigos,
+                accumulator.wins.get(matchup.player_2, 0),
+                self._get_pentanomial(matchup))
+        decision = self.stopped_matchups.get(matchup.id)
+        if decision is not None:
+            print >>out, "stopped early: %s" % decision
 
     def write_matchup_reports(self, out):
         """Write summary blocks for all live matchups to 'out'.
@@ -289,14 +591,13 @@ class Tournament(Competition):
         """
         first = True
         for matchup in self.matchup_list:
-            results = self.results[matchup.id]
-            if not results:
+            if not self.results[matchup.id]:
                 continue
             if first:
                 first = False
             else:
                 print >>out
-            self.write_matchup_report(out, matchup, results)
+            self.write_matchup_report(out, matchup)
 
     def write_ghost_matchup_reports(self, out):
         """Write summary blocks for all ghost matchups to 'out'.
@@ -306,15 +607,15 @@ class Tournament(Competition):
         """
         for matchup_id, matchup in sorted(self.ghost_matchups.iteritems()):
             print >>out
-            results = self.results[matchup_id]
-            self.write_matchup_report(out, matchup, results)
+            self.write_matchup_report(out, matchup)
 
     def write_player_descriptions(self, out):
         """Write descriptions of all players to 'out'."""
         for code, description in sorted(self.engine_descriptions.items()):
             print >>out, ("player %s: %s" % (code, description))
 
-    def get_tournament_results(self):
+    def get_tournament_results(self, game_index=None):
         return tournament_results.Tournament_results(
-            self.matchup_list, self.results)
+            self.matchup_list, self.results, game_index,
+            self.stats_accumulators)
 
@@ -95,6 +95,10 @@ def setup(app):
                         indextemplate='pair: %s; All-play-all tournament setting',
                         objname="All-play-all tournament setting")
 
+    app.add_object_type('gt-setting', 'gt-setting',
+                        indextemplate='pair: %s; Gauntlet tournament setting',
+                        objname="Gauntlet tournament setting")
+
     app.add_object_type('mc-setting', 'mc-setting',
                         indextemplate='pair: %s; Monte Carlo tuner setting',
                         objname="Monte Carlo tuner setting")
@@ -103,6 +107,14 @@ def setup(app):
                         indextemplate='pair: %s; cross-entropy tuner setting',
                         objname="Cross-entropy tuner setting")
 
+    app.add_object_type('sp-setting', 'sp-setting',
+                        indextemplate='pair: %s; SPSA tuner setting',
+                        objname="SPSA tuner setting")
+
+    app.add_object_type('rg-setting', 'rg-setting',
+                        indextemplate='pair: %s; regression tuner setting',
+                        objname="Regression tuner setting")
+
     app.add_crossref_type('setting-cls', 'setting-cls',
                           indextemplate='single: %s',
                           objname="Control file object")
@@ -119,6 +131,14 @@ def setup(app):
                           indextemplate='single: %s',
                           objname="Control file object")
 
+    app.add_crossref_type('sp-setting-cls', 'sp-setting-cls',
+                          indextemplate='single: %s',
+                          objname="Control file object")
+
+    app.add_crossref_type('rg-setting-cls', 'rg-setting-cls',
+                          indextemplate='single: %s',
+                          objname="Control file object")
+
 
 if _sphinx_is_v1x0:
     # Undo undesirable sphinx code that auto-adds 'xref' class to literals
@@ -10,21 +10,19 @@ from optparse import OptionParser
 from gomill.common import opponent_of
 from gomill.ringmasters import Ringmaster, RingmasterError
 
-def show_result(matchup, result, filename):
+def show_result(matchup, game, filename):
     print "%s: %s forfeited game %s" % (
-        matchup.name, result.losing_player, filename)
+        matchup.name, game.losing_player, filename)
 
 def find_forfeits(ringmaster):
     ringmaster.load_status()
     tournament_results = ringmaster.get_tournament_results()
-    matchup_ids = tournament_results.get_matchup_ids()
-    for matchup_id in matchup_ids:
-        matchup = tournament_results.get_matchup(matchup_id)
-        results = tournament_results.get_matchup_results(matchup_id)
-        for result in results:
-            if result.is_forfeit:
-                filename = ringmaster.get_sgf_filename(result.game_id)
-                show_result(matchup, result, filename)
+    # This uses the competition's game index if there is one.
+    for game in tournament_results.find_games(forfeits_only=True):
+        matchup = tournament_results.get_matchup(game.matchup_id)
+        filename = (game.sgf_filename or
+                    ringmaster.get_sgf_filename(game.game_id))
+        show_result(matchup, game, filename)
 
 
 _description = """\
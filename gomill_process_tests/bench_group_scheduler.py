@@ -0,0 +1,46 @@
+"""Micro-benchmark for Group_scheduler with many groups.
+
+This simulates the scheduler's use in a large all-play-all (10,000 matchups),
+with a few games in progress at a time.
+
+Run with the gomill package on PYTHONPATH, eg from the top-level directory:
+  PYTHONPATH=. python gomill_process_tests/bench_group_scheduler.py
+
+"""
+
+import sys
+import time
+
+from gomill import competition_schedulers
+
+GROUP_COUNT = 10000
+ISSUE_COUNT = 50000
+WORKERS = 8
+
+def run(weighted):
+    sc = competition_schedulers.Group_scheduler()
+    sc.set_groups([("%05d" % i, 20) for i in xrange(GROUP_COUNT)])
+    in_progress = []
+    start = time.time()
+    for i in xrange(ISSUE_COUNT):
+        token = sc.issue()
+        if token == (None, None):
+            break
+        in_progress.append(token)
+        if len(in_progress) >= WORKERS:
+            group_code, game_number = in_progress.pop(0)
+            sc.fix(group_code, game_number)
+            if weighted:
+                sc.set_weight(group_code, 1.0 / (1 + game_number))
+    elapsed = time.time() - start
+    return elapsed
+
+def main(argv):
+    for weighted in (False, True):
+        elapsed = run(weighted)
+        print "%d groups, %d issues%s: %.2fs (%.1f us per issue)" % (
+            GROUP_COUNT, ISSUE_COUNT, (" with weights" if weighted else ""),
+            elapsed, 1e6 * elapsed / ISSUE_COUNT)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
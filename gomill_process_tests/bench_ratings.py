@@ -0,0 +1,59 @@
+"""Micro-benchmark for fitting Elo ratings to a large all-play-all.
+
+Each pair of players plays 20 games. The fit is timed with numpy (if it's
+installed) and with the pure-Python fallback.
+
+Run with the gomill package on PYTHONPATH, eg from the top-level directory:
+  PYTHONPATH=. python gomill_process_tests/bench_ratings.py [player count ...]
+
+"""
+
+import sys
+import time
+
+from gomill import ratings
+
+DEFAULT_PLAYER_COUNTS = [50, 100, 200, 300]
+
+def make_fitter(player_count):
+    fitter = ratings.Rating_fitter()
+    codes = ["p%03d" % i for i in xrange(player_count)]
+    for i in xrange(player_count):
+        for j in xrange(i+1, player_count):
+            wins = 5 + min(5, (j - i) // 20)
+            fitter.add_games(codes[i], codes[j], wins, 10 - wins)
+            fitter.add_games(codes[j], codes[i], 11 - wins, wins - 1)
+    return fitter
+
+def run(fitter, use_numpy):
+    saved_numpy = ratings.numpy
+    try:
+        if not use_numpy:
+            ratings.numpy = None
+        start = time.time()
+        r = fitter.fit()
+        elapsed = time.time() - start
+    finally:
+        ratings.numpy = saved_numpy
+    return elapsed, (r.stderr is not None)
+
+def main(argv):
+    if argv:
+        player_counts = [int(s) for s in argv]
+    else:
+        player_counts = DEFAULT_PLAYER_COUNTS
+    modes = [False]
+    if ratings.numpy is not None:
+        modes.insert(0, True)
+    else:
+        print "numpy not available"
+    for player_count in player_counts:
+        fitter = make_fitter(player_count)
+        for use_numpy in modes:
+            elapsed, has_errors = run(fitter, use_numpy)
+            print "%d players, %s: %.2fs%s" % (
+                player_count, ("numpy" if use_numpy else "pure Python"),
+                elapsed, ("" if has_errors else " (no error bars)"))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -24,11 +24,12 @@ def make_tests(suite):
 
 
 def check_short_report(tc, comp,
-                       expected_grid, expected_matchups, expected_players,
+                       expected_grid, expected_ratings,
+                       expected_matchups, expected_players,
                        competition_name="testcomp"):
     """Check that an allplayall's short report is as expected."""
-    expected = ("allplayall: %s\n\n%s\n%s\n%s\n" %
-                (competition_name, expected_grid,
+    expected = ("allplayall: %s\n\n%s\n%s\n%s\n%s\n" %
+                (competition_name, expected_grid, expected_ratings,
                  expected_matchups, expected_players))
     tc.assertMultiLineEqual(competition_test_support.get_short_report(comp),
                             expected)
@@ -196,6 +197,14 @@ def test_play(tc):
     B t2 0-1         0-0
     C t3 0.5-0.5 0-0
     """)
+    expected_ratings = dedent("""\
+    ratings:
+         elo  95% interval   games
+    t1    +66 [-345, +476]       2
+    t3    +66 [-345, +476]       1
+    t2   -131 [-573, +311]       1
+    black advantage: +64 +/- 572
+    """)
     expected_matchups = dedent("""\
     t1 v t2 (1 games)
     board size: 13   komi: 7.5
@@ -217,7 +226,8 @@ def test_play(tc):
     testdescription
     """)
     fx.check_screen_report(expected_grid)
-    fx.check_short_report(expected_grid, expected_matchups, expected_players)
+    fx.check_short_report(expected_grid, expected_ratings,
+                          expected_matchups, expected_players)
 
     avb_results = fx.comp.get_tournament_results().get_matchup_results('AvB')
     tc.assertEqual(avb_results, [response1.game_result])
@@ -3,6 +3,8 @@
 from __future__ import with_statement, division
 
 import cPickle as pickle
+import random
+from cStringIO import StringIO
 from textwrap import dedent
 
 from gomill import cem_tuners
@@ -10,7 +12,7 @@ from gomill.game_jobs import Game_job, Game_job_result
 from gomill.gtp_games import Game_result
 from gomill.cem_tuners import Parameter_config
 from gomill.competitions import (
-    Player_config, CompetitionError, ControlFileError)
+    Player_config, NoGameAvailable, CompetitionError, ControlFileError)
 from gomill.gtp_controller import Engine_description
 
 from gomill_tests import gomill_test_support
@@ -223,3 +225,338 @@ def test_play(tc):
 
     tc.assertEqual(comp.wins, [1, 0.5, 0, 0])
 
+
+def test_steady_state(tc):
+    def make_response(job, winner):
+        result = Game_result.from_score(winner, 0 if winner is None else 2)
+        result.set_players({'b' : job.player_b.code, 'w' : 'opp'})
+        response = Game_job_result()
+        response.game_id = job.game_id
+        response.game_result = result
+        response.engine_descriptions = {}
+        response.game_data = job.game_data
+        return response
+
+    config = default_config()
+    config['steady_state'] = True
+    config['batch_size'] = 2
+    config['samples_per_generation'] = 3
+    config['number_of_generations'] = 2
+    comp = cem_tuners.Cem_tuner('cemtest')
+    comp.initialise_from_control_file(config)
+    comp.set_clean_status()
+
+    jobs = [comp.get_game() for _ in xrange(5)]
+    tc.assertListEqual([job.game_id for job in jobs],
+                       ['g0#0r0', 'g0#0r1', 'g0#1r0', 'g0#1r1', 'g0#2r0'])
+    tc.assertEqual(comp.wins, {0 : 0, 1 : 0, 2 : 0})
+    # The first game is a straggler; the others finish
+    for job in jobs[1:]:
+        comp.process_game_result(make_response(job, 'b'))
+    tc.assertEqual(comp.wins, {0 : 1, 2 : 1})
+    tc.assertEqual(len(comp.finished_samples), 1)
+    tc.assertEqual(comp.finished_samples[0][:2], (2, 'g0#1'))
+
+    status = pickle.loads(pickle.dumps(comp.get_status()))
+    comp2 = cem_tuners.Cem_tuner('cemtest')
+    comp2.initialise_from_control_file(config)
+    comp2.set_status(status)
+    tc.assertEqual(comp2.wins, {0 : 1, 2 : 1})
+    tc.assertEqual(sorted(comp2.candidates), [0, 2])
+    tc.assertEqual(comp2.candidates[2].code, 'g0#2')
+    # Rolled back: the unfinished games are issued again
+    tc.assertListEqual([comp2.get_game().game_id for _ in xrange(3)],
+                       ['g0#0r0', 'g0#2r1', 'g0#3r0'])
+
+    # No barrier: new samples keep coming while g0#0 is unfinished
+    more_jobs = [comp.get_game() for _ in xrange(3)]
+    tc.assertListEqual([job.game_id for job in more_jobs],
+                       ['g0#2r1', 'g0#3r0', 'g0#3r1'])
+    for job in more_jobs[:2]:
+        comp.process_game_result(make_response(job, 'w'))
+    tc.assertEqual(comp.generation, 0)
+    comp.process_game_result(make_response(jobs[0], None))
+    tc.assertEqual(comp.generation, 1)
+    tc.assertEqual(comp.finished_samples, [])
+    tc.assertEqual(comp.wins, {3 : 0})
+    job4 = comp.get_game()
+    tc.assertEqual(job4.game_id, 'g1#4r0')
+
+    # After the final update, started candidates finish but no more start
+    last_jobs = [comp.get_game() for _ in xrange(4)]
+    tc.assertListEqual([job.game_id for job in last_jobs],
+                       ['g1#4r1', 'g1#5r0', 'g1#5r1', 'g1#6r0'])
+    for job in [more_jobs[2], job4] + last_jobs[:3]:
+        comp.process_game_result(make_response(job, 'b'))
+    tc.assertEqual(comp.generation, 2)
+    tc.assertEqual(comp.finished_samples, [])
+    job6 = comp.get_game()
+    tc.assertEqual(job6.game_id, 'g1#6r1')
+    tc.assertIs(comp.get_game(), NoGameAvailable)
+    for job in [last_jobs[3], job6]:
+        comp.process_game_result(make_response(job, 'b'))
+    tc.assertEqual(comp.generation, 2)
+    tc.assertEqual([t[:2] for t in comp.finished_samples], [(2, 'g1#6')])
+    tc.assertIs(comp.get_game(), NoGameAvailable)
+    out = StringIO()
+    comp.write_screen_report(out)
+    tc.assertIn("samples finished after the final update (not used): 1",
+                out.getvalue())
+
+    config['steady_state'] = False
+    comp3 = cem_tuners.Cem_tuner('cemtest')
+    comp3.initialise_from_control_file(config)
+    tc.assertRaisesRegexp(
+        CompetitionError, "steady_state has changed",
+        comp3.set_status, pickle.loads(pickle.dumps(comp.get_status())))
+
+def test_score_bounds(tc):
+    tc.assertEqual(cem_tuners.score_bounds(0, 0, 0.05, 'hoeffding'),
+                   (0.0, 1.0))
+    lower, upper = cem_tuners.score_bounds(5, 10, 0.05, 'hoeffding')
+    tc.assertAlmostEqual(lower, 0.5 - 0.4294694, places=6)
+    tc.assertAlmostEqual(upper, 0.5 + 0.4294694, places=6)
+    lower, upper = cem_tuners.score_bounds(10, 10, 0.05, 'hoeffding')
+    tc.assertAlmostEqual(lower, 1 - 0.4294694, places=6)
+    tc.assertEqual(upper, 1.0)
+    # Bernstein is tighter near the extremes, looser in the middle
+    tc.assertGreater(cem_tuners.score_bounds(0, 100, 0.05, 'bernstein')[1],
+                     0.0)
+    tc.assertLess(cem_tuners.score_bounds(0, 100, 0.05, 'bernstein')[1],
+                  cem_tuners.score_bounds(0, 100, 0.05, 'hoeffding')[1])
+    tc.assertGreater(cem_tuners.score_bounds(50, 100, 0.05, 'bernstein')[1],
+                     cem_tuners.score_bounds(50, 100, 0.05, 'hoeffding')[1])
+
+def test_racing(tc):
+    def make_response(job, winner):
+        result = Game_result.from_score(winner, 2)
+        result.set_players({'b' : job.player_b.code, 'w' : 'opp'})
+        response = Game_job_result()
+        response.game_id = job.game_id
+        response.game_result = result
+        response.engine_descriptions = {}
+        response.game_data = job.game_data
+        return response
+
+    config = default_config()
+    config['racing'] = 'hoeffding'
+    config['batch_size'] = 40
+    config['number_of_generations'] = 2
+    comp = cem_tuners.Cem_tuner('cemtest')
+    comp.initialise_from_control_file(config)
+    comp.set_clean_status()
+    history = []
+    comp.set_history_logger(history.append)
+
+    # Candidate 1 always wins; the others always lose
+    games_played = 0
+    stopped = None
+    while comp.generation == 0:
+        job = comp.get_game()
+        candidate_number = job.game_data[0]
+        winner = 'b' if candidate_number == 1 else 'w'
+        comp.process_game_result(make_response(job, winner))
+        games_played += 1
+        if stopped is None and comp.stopped:
+            stopped = comp.stopped.copy()
+            # Candidate 0 is stopped as soon as candidate 1 has 18 wins
+            tc.assertEqual(stopped, {0 : 18})
+            status = pickle.loads(pickle.dumps(comp.get_status()))
+            comp2 = cem_tuners.Cem_tuner('cemtest')
+            comp2.initialise_from_control_file(config)
+            comp2.set_status(status)
+            tc.assertEqual(comp2.stopped, stopped)
+            tc.assertNotEqual(comp2.get_game().game_data[0], 0)
+    # Candidates 2 and 3 were stopped after their next game
+    tc.assertEqual(games_played, 40 + 3 * 18)
+    tc.assertEqual(comp.stopped, {})
+    results = history[2].split("\n")
+    tc.assertRegexpMatches(results[0], r"^g0#1\* .* 40$")
+    for line in results[1:]:
+        tc.assertRegexpMatches(line, r"^g0#[023]- .*  0$")
+
+    config['steady_state'] = True
+    comp3 = cem_tuners.Cem_tuner('cemtest')
+    tc.assertRaisesRegexp(
+        ControlFileError, "racing: not supported in steady-state mode",
+        comp3.initialise_from_control_file, config)
+
+def test_cholesky(tc):
+    matrix = [[4.0, 2.0, 0.4],
+              [2.0, 2.0, 0.6],
+              [0.4, 0.6, 1.0]]
+    factor = cem_tuners.cholesky(matrix)
+    for i in xrange(3):
+        for j in xrange(i+1, 3):
+            tc.assertEqual(factor[i][j], 0.0)
+        for j in xrange(3):
+            tc.assertAlmostEqual(
+                sum(factor[i][k] * factor[j][k] for k in xrange(3)),
+                matrix[i][j])
+    # singular
+    factor = cem_tuners.cholesky([[1.0, 1.0], [1.0, 1.0]])
+    tc.assertAlmostEqual(factor[0][0], 1.0)
+    tc.assertAlmostEqual(factor[1][0], 1.0)
+    tc.assertAlmostEqual(factor[1][1], 0.0)
+    tc.assertEqual(cem_tuners.cholesky([[0.0, 0.0], [0.0, 0.0]]),
+                   [[0.0, 0.0], [0.0, 0.0]])
+
+def test_covariance_distribution(tc):
+    distribution = cem_tuners.Covariance_distribution(
+        [1.0, -2.0], [[4.0, 1.8], [1.8, 1.0]])
+    tc.assertEqual(distribution.format(), " 1.00~4.00 -2.00~1.00")
+    tc.assertEqual(distribution.get_means(), [1.0, -2.0])
+    tc.assertAlmostEqual(distribution.get_correlations()[0][1], 0.9)
+    random.seed(1234)
+    samples = [distribution.get_sample() for _ in xrange(4000)]
+    means = [sum(s[i] for s in samples) / len(samples) for i in (0, 1)]
+    tc.assertAlmostEqual(means[0], 1.0, places=1)
+    tc.assertAlmostEqual(means[1], -2.0, places=1)
+    cov = sum((s[0]-means[0]) * (s[1]-means[1])
+              for s in samples) / len(samples)
+    tc.assertAlmostEqual(cov, 1.8, places=1)
+
+def test_update_covariance_distribution(tc):
+    distribution = cem_tuners.make_distribution(
+        [0.0, 0.0], [1.0, 1.0], full_covariance=True)
+    tc.assertEqual(distribution.covariance, [[1.0, 0.0], [0.0, 1.0]])
+    elites = [[1.0, 1.0], [3.0, 3.0]]
+    new = cem_tuners.update_distribution(distribution, elites, 0.5)
+    tc.assertIsInstance(new, cem_tuners.Covariance_distribution)
+    tc.assertEqual(new.means, [1.0, 1.0])
+    # elite covariance about the old mean is [[5, 5], [5, 5]]
+    tc.assertEqual(new.covariance, [[3.0, 2.5], [2.5, 3.0]])
+
+    diagonal = cem_tuners.make_distribution(
+        [0.0, 0.0], [1.0, 1.0], full_covariance=False)
+    tc.assertIsInstance(diagonal, cem_tuners.Distribution)
+    new = cem_tuners.update_distribution(diagonal, elites, 0.5)
+    tc.assertEqual(new.parameters, [(1.0, 1.0), (1.0, 1.0)])
+
+def test_full_covariance_setting(tc):
+    config = default_config()
+    config['covariance'] = 'full'
+    comp = cem_tuners.Cem_tuner('cemtest')
+    comp.initialise_from_control_file(config)
+    comp.set_clean_status()
+    tc.assertIsInstance(comp.distribution,
+                        cem_tuners.Covariance_distribution)
+    tc.assertEqual(comp.distribution.covariance,
+                   [[1.0, 0.0], [0.0, 1000.0]])
+    tc.assertMultiLineEqual(
+        comp.format_distribution(comp.distribution), dedent("""\
+        axa 0.500; axb 50.0
+         0.50~1.00 50.00~1000.00
+        correlations:
+         1.00  0.00
+         0.00  1.00"""))
+    comp.distribution = cem_tuners.Covariance_distribution(
+        [0.5, 50.0], [[1.0, 3.0], [3.0, 1000.0]])
+    status = pickle.loads(pickle.dumps(comp.get_status()))
+    tc.assertEqual(status['covariance'], 'full')
+
+    comp2 = cem_tuners.Cem_tuner('cemtest')
+    comp2.initialise_from_control_file(config)
+    comp2.set_status(status)
+    tc.assertEqual(comp2.distribution.covariance,
+                   [[1.0, 3.0], [3.0, 1000.0]])
+
+    # Changing the setting converts the stored distribution
+    config['covariance'] = 'diagonal'
+    comp3 = cem_tuners.Cem_tuner('cemtest')
+    comp3.initialise_from_control_file(config)
+    comp3.set_status(status)
+    tc.assertEqual(comp3.distribution.parameters,
+                   [(0.5, 1.0), (50.0, 1000.0)])
+    config['covariance'] = 'full'
+    comp4 = cem_tuners.Cem_tuner('cemtest')
+    comp4.initialise_from_control_file(config)
+    comp4.set_status(pickle.loads(pickle.dumps(comp3.get_status())))
+    tc.assertEqual(comp4.distribution.covariance,
+                   [[1.0, 0.0], [0.0, 1000.0]])
+
+    config['covariance'] = 'sparse'
+    comp5 = cem_tuners.Cem_tuner('cemtest')
+    tc.assertRaisesRegexp(
+        ControlFileError, "'covariance': unknown value",
+        comp5.initialise_from_control_file, config)
+
+def test_seed(tc):
+    config = default_config()
+    config['seed'] = 7
+    comp = cem_tuners.Cem_tuner('cemtest')
+    comp.initialise_from_control_file(config)
+    comp.set_clean_status()
+    comp2 = cem_tuners.Cem_tuner('cemtest')
+    comp2.initialise_from_control_file(config)
+    comp2.set_clean_status()
+    tc.assertEqual(comp2.sample_parameters, comp.sample_parameters)
+    tc.assertEqual(len(set(map(tuple, comp.sample_parameters))), 4)
+    comp.generation = 1
+    comp.reset_for_new_generation()
+    tc.assertNotEqual(comp2.sample_parameters, comp.sample_parameters)
+
+    status = pickle.loads(pickle.dumps(comp.get_status()))
+    tc.assertEqual(status['seed'], 7)
+    config['seed'] = 8
+    comp3 = cem_tuners.Cem_tuner('cemtest')
+    comp3.initialise_from_control_file(config)
+    tc.assertRaisesRegexp(
+        CompetitionError, r"\(seed has changed\)",
+        comp3.set_status, status)
+
+    config['seed'] = 7
+    config['steady_state'] = True
+    comp4 = cem_tuners.Cem_tuner('cemtest')
+    comp4.initialise_from_control_file(config)
+    comp4.set_clean_status()
+    comp5 = cem_tuners.Cem_tuner('cemtest')
+    comp5.initialise_from_control_file(config)
+    comp5.set_clean_status()
+    tc.assertEqual(comp4.start_sample(), 0)
+    comp5.start_sample()
+    tc.assertEqual(comp5.sample_parameters, comp4.sample_parameters)
+
+def test_opponent_pool(tc):
+    config = default_config()
+    config['players']['opp2'] = Player_config("test2")
+    del config['opponent']
+    config['opponents'] = {'opp' : 1, 'opp2' : 1}
+    config['batch_size'] = 4
+    comp = cem_tuners.Cem_tuner('cemtest')
+    comp.initialise_from_control_file(config)
+    comp.set_clean_status()
+    tc.assertEqual([check.player.code for check in comp.get_player_checks()],
+                   ['candidate', 'opp', 'opp2'])
+    opponents = {}
+    while True:
+        job = comp.get_game()
+        if job is cem_tuners.NoGameAvailable:
+            break
+        candidate_number = job.game_data[0]
+        opponents.setdefault(candidate_number, []).append(job.player_w.code)
+    # Every candidate plays each opponent equally often
+    tc.assertEqual(len(opponents), 4)
+    for codes in opponents.values():
+        tc.assertEqual(sorted(codes), ['opp', 'opp', 'opp2', 'opp2'])
+
+    config['opponents'] = {'opp' : 1, 'nonex' : 1}
+    comp2 = cem_tuners.Cem_tuner('cemtest')
+    tc.assertRaisesRegexp(
+        ControlFileError, "opponents: unknown player nonex",
+        comp2.initialise_from_control_file, config)
+
+    # Batch sizes which can't be shared out exactly are rejected
+    config['opponents'] = {'opp' : 2, 'opp2' : 4}
+    config['batch_size'] = 4
+    comp3 = cem_tuners.Cem_tuner('cemtest')
+    tc.assertRaisesRegexp(
+        ControlFileError, "batch_size: must be a multiple of 3",
+        comp3.initialise_from_control_file, config)
+    config['batch_size'] = 6
+    comp4 = cem_tuners.Cem_tuner('cemtest')
+    comp4.initialise_from_control_file(config)
+    comp4.set_clean_status()
+    codes = [comp4.get_game().player_w.code for _ in xrange(12)]
+    tc.assertEqual(sorted(codes[:6]), ['opp'] * 2 + ['opp2'] * 4)
+    tc.assertEqual(sorted(codes[6:]), ['opp'] * 2 + ['opp2'] * 4)
@@ -1,6 +1,7 @@
 """Tests for competition_schedulers.py"""
 
 import cPickle as pickle
+import random
 
 from gomill import competition_schedulers
 
@@ -93,6 +94,214 @@ def test_grouped(tc):
         ('m2', 10),
         ])
     tc.assertFalse(sc.all_fixed())
+    tc.assertFalse(sc.is_group_fixed('m1'))
+    tc.assertEqual(sc.get_counts('m1'), (4, 1))
     for token in issued:
         sc.fix(*token)
+    tc.assertEqual(sc.get_counts('m1'), (4, 4))
     tc.assertTrue(sc.all_fixed())
+    tc.assertTrue(sc.is_group_fixed('m1'))
+    tc.assertFalse(sc.is_group_fixed('m2'))
+
+def test_grouped_weights(tc):
+    sc = competition_schedulers.Group_scheduler()
+    def issue(n):
+        return [sc.issue() for _ in xrange(n)]
+    sc.set_groups([('m1', None), ('m2', None), ('m3', 2)])
+    sc.set_weight('m1', 3.0)
+    sc.set_weight('m3', 0)
+    tc.assertListEqual(issue(6), [
+        ('m1', 0),
+        ('m2', 0),
+        ('m1', 1),
+        ('m1', 2),
+        ('m1', 3),
+        ('m2', 1),
+        ])
+    sc.set_weight('m1', None)
+    sc.set_weight('m2', 0.0)
+    tc.assertListEqual(issue(3), [
+        ('m1', 4),
+        ('m1', 5),
+        ('m1', 6),
+        ])
+    # Zero-weight groups are used when nothing else is available
+    sc.set_groups([('m2', 3), ('m3', 2)])
+    tc.assertListEqual(issue(4), [
+        ('m3', 0),
+        ('m3', 1),
+        ('m2', 2),
+        (None, None),
+        ])
+    # weights aren't pickled
+    sc2 = pickle.loads(pickle.dumps(sc))
+    tc.assertEqual(sc2.weights, {})
+
+def test_grouped_random_operations(tc):
+    # Check the priority queue against a simple search of all groups
+    rng = random.Random(1234)
+    sc = competition_schedulers.Group_scheduler()
+    limits = dict(("g%02d" % i, rng.choice([None, 3, 10, 30]))
+                  for i in range(25))
+    sc.set_groups(sorted(limits.items()))
+    weights = {}
+    issued = dict((code, 0) for code in limits)
+    outstanding = set()
+    def expected_issue():
+        candidates = []
+        for code, limit in limits.iteritems():
+            if limit is not None and issued[code] >= limit:
+                continue
+            weight = weights.get(code, 1.0)
+            if weight <= 0:
+                key = (True, issued[code])
+            else:
+                key = (False, float(issued[code]) / weight)
+            candidates.append((key, code))
+        if not candidates:
+            return None
+        return min(candidates)[1]
+    for i in xrange(2000):
+        r = rng.random()
+        if r < 0.1:
+            code = rng.choice(sorted(limits))
+            weight = rng.choice([None, 0, 0.5, 1.0, 2.5])
+            sc.set_weight(code, weight)
+            if weight is None:
+                weights.pop(code, None)
+            else:
+                weights[code] = weight
+        elif r < 0.12:
+            sc.rollback()
+            for code, number in outstanding:
+                issued[code] -= 1
+            outstanding = set()
+        elif r < 0.3 and outstanding:
+            token = rng.choice(sorted(outstanding))
+            sc.fix(*token)
+            outstanding.remove(token)
+        else:
+            expected = expected_issue()
+            code, number = sc.issue()
+            tc.assertEqual(code, expected)
+            if code is not None:
+                issued[code] += 1
+                outstanding.add((code, number))
+        if i == 1000:
+            sc = pickle.loads(pickle.dumps(sc))
+            for code in weights:
+                sc.set_weight(code, weights[code])
+
+def test_simple_stride(tc):
+    sc = competition_schedulers.Simple_scheduler(stride=3, offset=1)
+    def issue(n):
+        result = [sc.issue() for _ in xrange(n)]
+        sc._check_consistent()
+        return result
+    tc.assertListEqual(issue(3), [1, 4, 7])
+    sc.fix(4)
+    sc.rollback()
+    sc._check_consistent()
+    tc.assertEqual(sc.issued, 1)
+    tc.assertEqual(sc.fixed, 1)
+    sc = pickle.loads(pickle.dumps(sc))
+    sc._check_consistent()
+    tc.assertEqual(sc.issued, 1)
+    tc.assertEqual(sc.fixed, 1)
+    tc.assertListEqual(issue(3), [1, 7, 10])
+
+def test_simple_block_size(tc):
+    sc = competition_schedulers.Simple_scheduler(
+        stride=3, offset=1, block_size=2)
+    def issue(n):
+        result = [sc.issue() for _ in xrange(n)]
+        sc._check_consistent()
+        return result
+    tc.assertListEqual(issue(5), [2, 3, 8, 9, 14])
+    sc.fix(3)
+    sc.fix(8)
+    sc = pickle.loads(pickle.dumps(sc))
+    sc._check_consistent()
+    tc.assertEqual(sc.block_size, 2)
+    sc.rollback()
+    tc.assertEqual(sc.issued, 2)
+    tc.assertListEqual(issue(3), [2, 9, 14])
+    tc.assertListEqual(issue(2), [15, 20])
+    # Sharded schedulers from before block_size was supported
+    sc2 = competition_schedulers.Simple_scheduler.__new__(
+        competition_schedulers.Simple_scheduler)
+    sc2.__setstate__((7, set([4]), set(), 3, 1))
+    tc.assertEqual(sc2.block_size, 1)
+    tc.assertEqual(sc2.issued, 2)
+    # block_size makes no difference if there's only one shard
+    sc3 = competition_schedulers.Simple_scheduler(block_size=2)
+    tc.assertEqual(len(sc3.__getstate__()), 3)
+
+def test_simple_pickle_format(tc):
+    # Unsharded schedulers still pickle in the original format
+    sc = competition_schedulers.Simple_scheduler()
+    sc.issue()
+    tc.assertEqual(len(sc.__getstate__()), 3)
+    sc2 = competition_schedulers.Simple_scheduler.__new__(
+        competition_schedulers.Simple_scheduler)
+    sc2.__setstate__((2, set([1]), set()))
+    tc.assertEqual((sc2.stride, sc2.offset), (1, 0))
+    tc.assertEqual(sc2.issued, 2)
+    tc.assertEqual(sc2.fixed, 1)
+    gs = competition_schedulers.Group_scheduler()
+    tc.assertEqual(len(gs.__getstate__()), 2)
+
+def test_grouped_sharded(tc):
+    shards = [competition_schedulers.Group_scheduler(stride=3, offset=i)
+              for i in range(3)]
+    issued = []
+    for sc in shards:
+        sc.set_groups([('m1', 5), ('m2', 2)])
+        while True:
+            token = sc.issue()
+            if token == (None, None):
+                break
+            issued.append(token)
+            sc.fix(*token)
+        tc.assertTrue(sc.all_fixed())
+    tc.assertListEqual(sorted(issued), [
+        ('m1', 0), ('m1', 1), ('m1', 2), ('m1', 3), ('m1', 4),
+        ('m2', 0), ('m2', 1),
+        ])
+    sc = pickle.loads(pickle.dumps(shards[1]))
+    tc.assertEqual((sc.stride, sc.offset), (3, 1))
+    tc.assertEqual(sc.allocators['m1'].stride, 3)
+    tc.assertTrue(sc.all_fixed())
+
+def test_grouped_sharded_blocks(tc):
+    shards = [competition_schedulers.Group_scheduler(
+                  stride=2, offset=i, block_size=2)
+              for i in range(2)]
+    issued = []
+    for sc in shards:
+        sc.set_groups([('m1', 7)])
+        tokens = []
+        while True:
+            token = sc.issue()
+            if token == (None, None):
+                break
+            tokens.append(token[1])
+            sc.fix(*token)
+        tc.assertTrue(sc.all_fixed())
+        issued.append(tokens)
+    tc.assertListEqual(issued, [[0, 1, 4, 5], [2, 3, 6]])
+    sc = pickle.loads(pickle.dumps(shards[1]))
+    tc.assertEqual(sc.block_size, 2)
+    tc.assertEqual(sc.allocators['m1'].block_size, 2)
+    tc.assertTrue(sc.all_fixed())
+
+def test_count_shard_tokens(tc):
+    count = competition_schedulers.count_shard_tokens
+    tc.assertEqual([count(10, 3, i) for i in range(3)], [4, 3, 3])
+    tc.assertEqual([count(2, 3, i) for i in range(3)], [1, 1, 0])
+    tc.assertEqual(count(0, 3, 0), 0)
+    tc.assertIsNone(count(None, 3, 1))
+    tc.assertEqual(count(7, 1, 0), 7)
+    tc.assertEqual([count(7, 2, i, 2) for i in range(2)], [4, 3])
+    tc.assertEqual([count(11, 3, i, 2) for i in range(3)], [4, 4, 3])
+    tc.assertEqual(count(1, 2, 1, 2), 0)
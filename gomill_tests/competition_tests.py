@@ -163,3 +163,62 @@ def test_player_gtp_aliases(tc):
     tc.assertDictEqual(comp.players['t1'].gtp_aliases,
                        {'foo' : 'bar', 'baz' : 'quux'})
 
+
+def test_make_rng(tc):
+    tc.assertIsNone(competitions.make_rng(None, 3))
+    rng1 = competitions.make_rng(42, 3)
+    rng2 = competitions.make_rng(42, 3)
+    tc.assertIsNot(rng1, rng2)
+    l1 = [rng1.random() for _ in xrange(5)]
+    tc.assertEqual([rng2.random() for _ in xrange(5)], l1)
+    tc.assertNotEqual(
+        [competitions.make_rng(42, 4).random() for _ in xrange(5)], l1)
+    tc.assertNotEqual(
+        [competitions.make_rng(43, 3).random() for _ in xrange(5)], l1)
+    tc.assertNotEqual(
+        [competitions.make_rng(42, 3, 0).random() for _ in xrange(5)], l1)
+
+def test_opponent_pool(tc):
+    comp = competitions.Competition('test')
+    comp.initialise_from_control_file({
+        'players' : {
+            'p1' : Player_config("cmd1"),
+            'p2' : Player_config("cmd2"),
+            'p3' : Player_config("cmd3"),
+            },
+        })
+    players = comp.players
+
+    pool = competitions.make_opponent_pool(players, 'p2', None)
+    tc.assertEqual(len(pool), 1)
+    tc.assertEqual(pool.cycle_length, 1)
+    tc.assertEqual([pool.get_opponent(i).code for i in xrange(3)],
+                   ['p2', 'p2', 'p2'])
+
+    pool = competitions.make_opponent_pool(
+        players, None, [('p1', 2), ('p2', 4), ('p3', 2)])
+    tc.assertEqual(len(pool), 3)
+    tc.assertEqual(pool.weights, [2, 4, 2])
+    tc.assertEqual(pool.cycle_length, 4)
+    tc.assertEqual([pool.get_opponent(i).code for i in xrange(8)],
+                   ['p2', 'p1', 'p3', 'p2', 'p2', 'p1', 'p3', 'p2'])
+    tc.assertIs(pool.get_player('p3'), players['p3'])
+    tc.assertIsNone(pool.get_player('nonex'))
+
+    pool = competitions.make_opponent_pool(
+        players, None, [('p1', 1), ('p2', 3)])
+    codes = [pool.get_opponent(i).code for i in xrange(100)]
+    tc.assertEqual(codes.count('p1'), 25)
+    # No run of four games misses either opponent
+    for i in xrange(96):
+        tc.assertIn('p1', codes[i:i+4])
+
+    def check(opponent, opponents, message):
+        tc.assertRaisesRegexp(
+            ControlFileError, message,
+            competitions.make_opponent_pool, players, opponent, opponents)
+    check(None, None, "'opponent' not specified")
+    check(None, [], "opponents: empty map")
+    check('p1', [('p2', 1)], "opponent: can't be used together")
+    check('nonex', None, "opponent: unknown player nonex")
+    check(None, [('p1', 1), ('nonex', 1)], "opponents: unknown player nonex")
@@ -0,0 +1,100 @@
+"""Tests for game_index.py"""
+
+import os
+
+from gomill_tests import gomill_test_support
+
+from gomill import game_index
+from gomill.game_index import Game_index, GameIndexError, Indexed_game
+from gomill.gtp_games import Game_result
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+
+def make_result(game_id, winner, is_forfeit=False):
+    if winner is None:
+        result = Game_result.from_score(None, 0)
+    else:
+        result = Game_result.from_score(winner, 1.5)
+    result.set_players({'b' : "p1", 'w' : "p2"})
+    if is_forfeit:
+        result.is_forfeit = True
+    result.game_id = game_id
+    result.cpu_times['p1'] = 2.5
+    return result
+
+def make_index(tc, pathname=":memory:"):
+    if not game_index.is_supported():
+        tc.skipTest("sqlite3 not available")
+    index = Game_index(pathname)
+    index.open()
+    tc.addCleanup(index.close)
+    return index
+
+def test_add_and_query(tc):
+    index = make_index(tc)
+    tc.assertEqual(index.count_games(), 0)
+    index.add_game(Indexed_game.from_game_result(
+        "0", make_result("0_0", 'b'), "0_0.sgf"))
+    index.add_game(Indexed_game.from_game_result(
+        "0", make_result("0_1", 'w', is_forfeit=True), "0_1.sgf"))
+    index.add_game(Indexed_game.from_game_result(
+        "1", make_result("1_0", None)))
+    tc.assertEqual(index.count_games(), 3)
+
+    game = index.get_game("0_1")
+    tc.assertEqual(game.game_id, "0_1")
+    tc.assertEqual(game.matchup_id, "0")
+    tc.assertEqual(game.player_b, "p1")
+    tc.assertEqual(game.player_w, "p2")
+    tc.assertEqual(game.winning_player, "p2")
+    tc.assertEqual(game.losing_player, "p1")
+    tc.assertEqual(game.sgf_result, "W+1.5")
+    tc.assertIs(game.is_forfeit, True)
+    tc.assertEqual(game.sgf_filename, "0_1.sgf")
+    tc.assertEqual(game.cpu_times, {'p1' : 2.5, 'p2' : None})
+    tc.assertIsNone(index.get_game("0_2"))
+
+    def ids(games):
+        return [game.game_id for game in games]
+    tc.assertEqual(ids(index.find_games()), ["0_0", "0_1", "1_0"])
+    tc.assertEqual(ids(index.find_games(matchup_id="0")), ["0_0", "0_1"])
+    tc.assertEqual(ids(index.find_games(player="p2")), ["0_0", "0_1", "1_0"])
+    tc.assertEqual(ids(index.find_games(player="p3")), [])
+    tc.assertEqual(ids(index.find_games(winner="p1")), ["0_0"])
+    tc.assertEqual(ids(index.find_games(forfeits_only=True)), ["0_1"])
+    tc.assertEqual(ids(index.find_games(matchup_id="1", winner="p1")), [])
+
+def test_replace(tc):
+    index = make_index(tc)
+    index.add_game(Indexed_game.from_game_result(
+        "0", make_result("0_0", 'b')))
+    index.add_game(Indexed_game.from_game_result(
+        "0", make_result("0_0", 'w')))
+    tc.assertEqual(index.count_games(), 1)
+    tc.assertEqual(index.get_game("0_0").winning_player, "p2")
+    index.replace_all(
+        Indexed_game.from_game_result("0", make_result(game_id, 'b'))
+        for game_id in ["0_3", "0_4"])
+    tc.assertEqual([game.game_id for game in index.find_games()],
+                   ["0_3", "0_4"])
+
+def test_persistence(tc):
+    pathname = os.path.join(tc.sandbox(), "test.index")
+    index = make_index(tc, pathname)
+    index.add_game(Indexed_game.from_game_result(
+        "0", make_result("0_0", 'b')))
+    index.close()
+    index2 = Game_index(pathname)
+    index2.open(create=False)
+    tc.addCleanup(index2.close)
+    tc.assertEqual(index2.get_game("0_0").winning_player, "p1")
+
+def test_open_without_create(tc):
+    if not game_index.is_supported():
+        tc.skipTest("sqlite3 not available")
+    pathname = os.path.join(tc.sandbox(), "test.index")
+    index = Game_index(pathname)
+    tc.assertRaises(GameIndexError, index.open, create=False)
+    tc.assertIsNone(index.connection)
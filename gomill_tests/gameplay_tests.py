@@ -6,6 +6,7 @@ from gomill.common import opponent_of, move_from_vertex, format_vertex
 from gomill import ascii_boards
 from gomill import boards
 from gomill import gameplay
+from gomill import openings
 
 from gomill_tests import test_framework
 from gomill_tests import gomill_test_support
@@ -28,6 +29,7 @@ class Game_fixture(object):
         self.tc.assertIs(self.game.seen_resignation, False)
         self.tc.assertIs(self.game.seen_claim, False)
         self.tc.assertIs(self.game.seen_forfeit, False)
+        self.tc.assertIs(self.game.seen_adjudication, False)
         self.tc.assertIs(self.game.hit_move_limit, False)
         self.tc.assertIsNone(self.game.winner)
         self.tc.assertIsNone(self.game.forfeit_reason)
@@ -39,6 +41,7 @@ class Game_fixture(object):
             'seen_resignation',
             'seen_claim',
             'seen_forfeit',
+            'seen_adjudication',
             'hit_move_limit',
             ]:
             if reason == expected_reason:
@@ -204,6 +207,16 @@ def test_game_record_forfeit(tc):
     tc.assertEqual(fx.game.winner, 'w')
     tc.assertEqual(fx.game.forfeit_reason, "no good reason")
 
+def test_game_record_adjudication(tc):
+    fx = Game_fixture(tc)
+    fx.game.record_move('b', (2, 3))
+    fx.check_not_over()
+    fx.game.record_adjudication('w')
+    fx.check_over('seen_adjudication')
+    tc.assertEqual(fx.game.winner, 'w')
+    tc.assertRaisesRegexp(gameplay.GameStateError, r"^game is already over$",
+                          fx.game.record_adjudication, 'b')
+
 DIAGRAM2 = """\
 9  .  .  .  .  .  .  .  .  #
 8  .  .  .  .  .  .  .  .  .
@@ -395,6 +408,13 @@ def test_result_from_unscored_game(tc):
     tc.assertRaisesRegexp(
         ValueError, "^game is passed out$",
         gameplay.Result.from_unscored_game, game3)
+    game4 = gameplay.Game(boards.Board(19))
+    game4.record_adjudication('w')
+    result = gameplay.Result.from_unscored_game(game4)
+    tc.assertEqual(result.sgf_result, "W+")
+    tc.assertEqual(result.detail, "adjudicated")
+    tc.assertIs(result.is_adjudicated, True)
+    tc.assertIs(gameplay.Result.from_unscored_game(game1).is_adjudicated, False)
 
 def test_result_from_game_score(tc):
     gs = gameplay.Game_score('b', 1)
@@ -441,6 +461,8 @@ class Testing_backend(gameplay.Backend):
       log             -- list of strings describing all operations run
       score_to_return -- the Game_score object returned by score_game()
       board_scored    -- a copy of the board passed in to score_game()
+      estimates       -- list of Game_scores (or Nones) to be returned by
+                         successive estimate_score() calls
 
       (score_to_return has white winning by 99)
 
@@ -461,6 +483,7 @@ class Testing_backend(gameplay.Backend):
         self.score_to_return = gameplay.Game_score("w", 99)
         self.log = []
         self.board_scored = None
+        self.estimates = []
         self.reject_vertex = None
         self.reject_as_error = False
 
@@ -479,6 +502,11 @@ class Testing_backend(gameplay.Backend):
         self.log.append("notify_fixed_handicap: %r %r %r" %
                         (colour, handicap, points))
 
+    def notify_opening(self, colour, plays):
+        self.log.append("notify_opening: %r %s" % (
+            colour, " ".join("%s/%s" % (c, format_vertex(move))
+                             for (c, move) in plays)))
+
     def _action_for_vertex(self, vertex):
         if vertex in ('resign', 'claim'):
             return vertex, None
@@ -517,6 +545,12 @@ class Testing_backend(gameplay.Backend):
         self.board_scored = board.copy()
         return self.score_to_return
 
+    def estimate_score(self, board):
+        self.log.append("estimate_score")
+        if not self.estimates:
+            return None
+        return self.estimates.pop(0)
+
     def get_last_move_comment(self, colour):
         self.log.append("get_last_move_comment <- %s" % (colour,))
         if colour in self.enabled_get_last_move_comment:
@@ -1144,6 +1178,103 @@ def test_game_runner_fixed_handicap(tc):
 (;FF[4]AB[cc][cg][gc]AP[gomill:VER]CA[UTF-8]DT[***]GM[1]HA[3]KM[11]RE[W+99]SZ[9];W[ci];B[di];W[tt];B[tt])
 """)
 
+def test_game_runner_opening(tc):
+    fx = Game_runner_fixture(
+        tc, size=9,
+        moves=[('w', 'C1'), ('b', 'D1')])
+    opening = openings.Opening(
+        "test-opening", 9, [(8, 0)], [(8, 8)], [('b', (7, 0)), ('b', None)])
+    fx.game_runner.prepare()
+    tc.assertRaisesRegexp(
+        ValueError, "opening is for the wrong board size",
+        fx.game_runner.set_opening,
+        openings.Opening("small", 5, [], [], []))
+    fx.game_runner.set_opening(opening)
+    tc.assertRaises(gameplay.GameRunnerStateError,
+                    fx.game_runner.set_handicap, 3, is_free=False)
+    fx.game_runner.run()
+    tc.assertEqual(fx.backend.log[:4], [
+        "start_new_game: size=9, komi=11.0",
+        "notify_opening: 'b' b/A9 w/J9 b/A8 b/pass",
+        "notify_opening: 'w' b/A9 w/J9 b/A8 b/pass",
+        "get_move <- w: move/C1",
+        ])
+    tc.assertBoardEqual(
+        fx.backend.board_scored,
+        dedent("""
+        9  #  .  .  .  .  .  .  .  o
+        8  #  .  .  .  .  .  .  .  .
+        7  .  .  .  .  .  .  .  .  .
+        6  .  .  .  .  .  .  .  .  .
+        5  .  .  .  .  .  .  .  .  .
+        4  .  .  .  .  .  .  .  .  .
+        3  .  .  .  .  .  .  .  .  .
+        2  .  .  .  .  .  .  .  .  .
+        1  .  .  o  #  .  .  .  .  .
+           A  B  C  D  E  F  G  H  J
+        """).strip())
+    tc.assertEqual(
+        [(c, format_vertex(m))
+         for (c, m, comment) in fx.game_runner.get_moves()],
+        [('w', 'C1'), ('b', 'D1'), ('w', 'pass'), ('b', 'pass')])
+    tc.assertEqual(fx.sgf_string(), """\
+(;FF[4]AB[aa]AP[gomill:VER]AW[ia]CA[UTF-8]DT[***]GM[1]KM[11]RE[W+99]SZ[9];B[ab];B[tt]C[end of opening test-opening];W[ci];B[di];W[tt];B[tt])
+""")
+
+def test_adjudication_settings(tc):
+    adjudication = gameplay.Adjudication(10, min_moves=50, interval=5)
+    tc.assertEqual(adjudication.checks, 3)
+    tc.assertEqual([n for n in range(70) if adjudication.is_check_due(n)],
+                   [50, 55, 60, 65])
+    tc.assertRaisesRegexp(ValueError, "margin must be positive",
+                          gameplay.Adjudication, 0)
+    tc.assertRaisesRegexp(ValueError, "interval must be positive",
+                          gameplay.Adjudication, 5, interval=0)
+
+def test_game_runner_adjudication(tc):
+    fx = Game_runner_fixture(
+        tc, moves=[('b', 'A1'), ('w', 'A5'), ('b', 'B1'), ('w', 'B5'),
+                   ('b', 'C1'), ('w', 'C5'), ('b', 'D1'), ('w', 'D5')])
+    fx.game_runner.set_adjudication(
+        gameplay.Adjudication(5, min_moves=2, interval=2, checks=2))
+    fx.backend.estimates = [
+        gameplay.Game_score('b', 10),
+        gameplay.Game_score('b', 3),
+        gameplay.Game_score('w', 20),
+        gameplay.Game_score('w', 6),
+        ]
+    fx.run_game()
+    tc.assertEqual(fx.backend.log.count("estimate_score"), 4)
+    tc.assertEqual(fx.backend.log[-3:], [
+        "notify_move -> b D5",
+        "estimate_score",
+        "end_game",
+        ])
+    tc.assertEqual(len(fx.game_runner.get_moves()), 8)
+    tc.assertIsNone(fx.game_runner.get_game_score())
+    result = fx.game_runner.result
+    tc.assertEqual(result.sgf_result, 'W+')
+    tc.assertEqual(result.detail, "adjudicated")
+    tc.assertIs(result.is_adjudicated, True)
+
+def test_game_runner_adjudication_no_decision(tc):
+    fx = Game_runner_fixture(
+        tc, moves=[('b', 'A1'), ('w', 'A5'), ('b', 'B1'), ('w', 'B5')])
+    fx.game_runner.set_adjudication(
+        gameplay.Adjudication(5, min_moves=1, interval=1, checks=2))
+    fx.backend.estimates = [
+        gameplay.Game_score('b', 10),
+        None,
+        gameplay.Game_score('b', 10),
+        gameplay.Game_score(None, 0),
+        gameplay.Game_score('b', 10),
+        ]
+    fx.run_game()
+    # the game is passed out before a second successive check
+    tc.assertEqual(fx.backend.log.count("estimate_score"), 5)
+    tc.assertEqual(fx.game_runner.result.sgf_result, 'W+99')
+    tc.assertIs(fx.game_runner.result.is_adjudicated, False)
+
 def test_game_runner_free_handicap(tc):
     class _Backend(Testing_backend):
         def get_free_handicap(self, handicap):
@@ -0,0 +1,233 @@
+"""Tests for gauntlets.py"""
+
+from __future__ import with_statement
+
+import os
+
+from gomill import gauntlets
+from gomill.competitions import (
+    Player_config, NoGameAvailable, CompetitionError, ControlFileError)
+from gomill.results_tables import Results_table
+from gomill.stopping_rules import Sprt_config
+
+from gomill_tests import competition_test_support
+from gomill_tests import gomill_test_support
+from gomill_tests.competition_test_support import (
+    fake_response, check_screen_report)
+from gomill_tests.results_tables_tests import make_result
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+
+class Gauntlet_fixture(object):
+    """Fixture setting up a Gauntlet.
+
+    attributes:
+      comp       -- Gauntlet
+
+    """
+    def __init__(self, tc, config=None, base_directory=None):
+        if config is None:
+            config = default_config()
+        self.tc = tc
+        self.comp = gauntlets.Gauntlet('testcomp')
+        if base_directory is not None:
+            self.comp.set_base_directory(base_directory)
+        self.comp.initialise_from_control_file(config)
+        self.comp.set_clean_status()
+
+    def check_screen_report(self, expected):
+        """Check that the screen report is as expected."""
+        check_screen_report(self.tc, self.comp, expected)
+
+
+def default_config():
+    return {
+        'players' : {
+            'new' : Player_config("new"),
+            'r1' : Player_config("ref1"),
+            'r2' : Player_config("ref2"),
+            'r3' : Player_config("ref3"),
+            },
+        'board_size' : 13,
+        'komi' : 7.5,
+        'candidates' : ['new'],
+        'references' : ['r1', 'r2', 'r3'],
+        }
+
+def write_reference_results(tc, filename, games):
+    """Write a JSON Lines results file in the test sandbox.
+
+    games -- list of (player_b, player_w, winner)
+
+    Returns the pathname.
+
+    """
+    table = Results_table([], [])
+    for i, (player_b, player_w, winner) in enumerate(games):
+        table.add_result('old', make_result(
+            'old_%d' % i, player_b, player_w, winner))
+    pathname = os.path.join(tc.sandbox(), filename)
+    with open(pathname, "w") as f:
+        table.write_jsonl(f)
+    return pathname
+
+
+def test_default_config(tc):
+    fx = Gauntlet_fixture(tc)
+    comp = fx.comp
+    tr = comp.get_tournament_results()
+    tc.assertListEqual(tr.get_matchup_ids(), ['Av1', 'Av2', 'Av3'])
+    m = tr.get_matchup('Av2')
+    tc.assertEqual(m.player_1, 'new')
+    tc.assertEqual(m.player_2, 'r2')
+    tc.assertEqual(m.board_size, 13)
+    tc.assertEqual(m.komi, 7.5)
+    tc.assertEqual(m.number_of_games, None)
+    tc.assertIs(m.alternating, True)
+    tc.assertIs(m.handicap, None)
+    tc.assertIs(m.stopping_rule, None)
+    tc.assertIs(comp.adaptive_scheduling, True)
+    tc.assertEqual(len(comp.get_player_checks()), 4)
+
+def test_basic_config(tc):
+    config = default_config()
+    config['games_per_opponent'] = 20
+    config['stopping_rule'] = Sprt_config(-10, 10)
+    config['adaptive_scheduling'] = False
+    config['players']['new2'] = Player_config("new2")
+    config['candidates'].append('new2')
+    fx = Gauntlet_fixture(tc, config)
+    comp = fx.comp
+    tc.assertListEqual(
+        [m.id for m in comp.matchup_list],
+        ['Av1', 'Av2', 'Av3', 'Bv1', 'Bv2', 'Bv3'])
+    m = comp.matchups['Bv3']
+    tc.assertEqual(m.player_1, 'new2')
+    tc.assertEqual(m.number_of_games, 20)
+    tc.assertEqual(m.stopping_rule.elo1, 10)
+    tc.assertIs(comp.adaptive_scheduling, False)
+    tc.assertEqual(comp.count_games_expected(), 120)
+    tc.assertEqual(comp.get_game().game_id, 'Av1_00')
+
+def test_bad_config(tc):
+    def check(key, value, message):
+        config = default_config()
+        config[key] = value
+        comp = gauntlets.Gauntlet('test')
+        tc.assertRaisesRegexp(
+            ControlFileError, message,
+            comp.initialise_from_control_file, config)
+    check('candidates', [], "candidates: empty list")
+    check('references', ['r1', 'nonex'], "references: unknown player nonex")
+    check('references', ['r1', 'new'], "duplicate player: new")
+    check('reference_games', -1, "reference_games: must not be negative")
+
+def test_play(tc):
+    config = default_config()
+    config['games_per_opponent'] = 2
+    config['adaptive_scheduling'] = False
+    fx = Gauntlet_fixture(tc, config)
+    comp = fx.comp
+    jobs = [comp.get_game() for _ in range(6)]
+    tc.assertEqual([job.game_id for job in jobs],
+                   ['Av1_0', 'Av2_0', 'Av3_0', 'Av1_1', 'Av2_1', 'Av3_1'])
+    tc.assertEqual(jobs[3].player_b.code, 'r1')
+    tc.assertIs(comp.get_game(), NoGameAvailable)
+    for job, winner in zip(jobs, ['b', 'b', 'w', 'b', None, 'w']):
+        comp.process_game_result(fake_response(job, winner))
+    fx.check_screen_report("""\
+6/6 games played
+
+       1   2       3
+A new 1-1 1.5-0.5 1-1
+
+1 r1
+2 r2
+3 r3
+""")
+    tc.assertEqual(comp.get_ratings().players[0], 'new')
+    competition_test_support.check_round_trip(tc, comp, config)
+
+def test_stopping_rule(tc):
+    config = default_config()
+    config['references'] = ['r1']
+    config['stopping_rule'] = Sprt_config(0, 100)
+    fx = Gauntlet_fixture(tc, config)
+    comp = fx.comp
+    while True:
+        job = comp.get_game()
+        if job is NoGameAvailable:
+            break
+        comp.process_game_result(fake_response(
+            job, 'b' if job.player_b.code == 'new' else 'w'))
+    fx.check_screen_report("""\
+6/6 games played
+
+       1
+A new 6-0*
+
+1 r1
+* stopped early
+""")
+
+def test_reference_results(tc):
+    write_reference_results(tc, "refs.jsonl", [
+        ('r1', 'r2', 'b'),
+        ('r2', 'r1', 'w'),
+        ('r1', 'r3', 'unknown'),
+        ('new', 'r1', 'b'),
+        ('r3', 'r2', 'b'),
+        ])
+    config = default_config()
+    config['games_per_opponent'] = 4
+    config['reference_results'] = ["refs.jsonl", "missing.jsonl"]
+    config['reference_games'] = 2
+    fx = Gauntlet_fixture(tc, config, base_directory=tc.sandbox())
+    comp = fx.comp
+    tc.assertEqual(len(comp.stored_results), 3)
+    tc.assertEqual(comp.stored_game_counts,
+                   {('r1', 'r2') : 2, ('r2', 'r3') : 1})
+    tc.assertListEqual(
+        [(m.id, m.number_of_games) for m in comp.matchup_list],
+        [('Av1', 4), ('Av2', 4), ('Av3', 4),
+         ('1v2', 0), ('1v3', 2), ('2v3', 1)])
+    tc.assertEqual(comp.count_games_expected(), 15)
+    ratings = comp.get_ratings()
+    tc.assertEqual(ratings.games, {'r1' : 2, 'r2' : 3, 'r3' : 1})
+    tc.assertEqual(ratings.players[0], 'r1')
+    report = competition_test_support.get_short_report(comp)
+    tc.assertIn("3 reference games from stored results\n", report)
+    tc.assertIn("ratings:\n", report)
+
+def test_reference_results_bad_file(tc):
+    pathname = os.path.join(tc.sandbox(), "bad.jsonl")
+    with open(pathname, "w") as f:
+        f.write("{}\n")
+    config = default_config()
+    config['reference_results'] = [pathname]
+    comp = gauntlets.Gauntlet('test')
+    tc.assertRaisesRegexp(
+        ControlFileError,
+        "reference_results: .*bad.jsonl: line 1: missing 'game_id'",
+        comp.initialise_from_control_file, config)
+
+def test_changed_references(tc):
+    fx = Gauntlet_fixture(tc)
+    comp = fx.comp
+    comp.process_game_result(fake_response(comp.get_game(), 'b'))
+    status = comp.get_status()
+    config = default_config()
+    config['references'] = ['r2', 'r1', 'r3']
+    comp2 = gauntlets.Gauntlet('testcomp')
+    comp2.initialise_from_control_file(config)
+    tc.assertRaisesRegexp(
+        CompetitionError, "references have changed in the control file",
+        comp2.set_status, status)
+    config['references'] = ['r1', 'r2', 'r3', 'new2']
+    config['players']['new2'] = Player_config("new2")
+    comp3 = gauntlets.Gauntlet('testcomp')
+    comp3.initialise_from_control_file(config)
+    comp3.set_status(status)
+    tc.assertEqual(comp3.count_games_played(), 1)
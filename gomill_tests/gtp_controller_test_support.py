@@ -61,10 +61,12 @@ class Testing_gtp_channel(gtp_controller.Linebased_gtp_channel):
       engine    -- the engine it was instantiated with
       is_closed -- bool (closed() has been called without a forced error)
 
-    This raises an error if sent two commands without requesting a response in
-    between, or if asked for a response when no command was sent since the last
-    response. (GTP permits stacking up commands, but Gtp_controller should never
-    do it, so we want to report it). Similarly we reject empty command lines.
+    This raises an error if asked for a response when no command was sent since
+    the last response. Similarly we reject empty command lines.
+
+    GTP permits stacking up commands (Gtp_controller does it only in
+    do_commands()); this is supported by holding the responses until they're
+    requested.
 
     Unlike Internal_gtp_channel, this runs the command at the point when it is
     sent.
@@ -99,8 +101,6 @@ class Testing_gtp_channel(gtp_controller.Linebased_gtp_channel):
     def send_command_line(self, command):
         if self.is_closed:
             raise SupporterError("channel is closed")
-        if self.stored_response != "":
-            raise SupporterError("two commands in a row")
         if self.session_is_ended:
             if self.engine_exit_breaks_commands:
                 raise GtpChannelClosed("engine has closed the command channel")
@@ -111,10 +111,10 @@ class Testing_gtp_channel(gtp_controller.Linebased_gtp_channel):
         if self.fail_command and command.startswith(self.fail_command):
             self.fail_command = None
             raise GtpTransportError("forced failure for send_command_line")
-        self.stored_response, self.session_is_ended = \
-            self.engine.handle_line(command)
-        if self.stored_response is None:
+        response, self.session_is_ended = self.engine.handle_line(command)
+        if response is None:
             raise SupporterError("empty command line")
+        self.stored_response += response
 
     def get_response_line(self):
         if self.is_closed:
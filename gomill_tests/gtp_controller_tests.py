@@ -239,10 +239,13 @@ def test_testing_gtp_channel_sequencing(tc):
     tc.assertRaisesRegexp(
         SupporterError, "response request without command",
         channel.get_response)
-    channel.send_command("test", [])
+    channel.send_command("known_command", ["test"])
+    channel.send_command("known_command", ["xyzzy"])
+    tc.assertEqual(channel.get_response(), (False, "true"))
+    tc.assertEqual(channel.get_response(), (False, "false"))
     tc.assertRaisesRegexp(
-        SupporterError, "two commands in a row",
-        channel.send_command, "test", [])
+        SupporterError, "response request without command",
+        channel.get_response)
 
 def test_testing_gtp_force_error(tc):
     engine = gtp_engine_fixtures.get_test_engine()
@@ -369,6 +372,41 @@ def test_controller_response_protocol_error(tc):
     tc.assertTrue(controller.channel_is_bad)
     tc.assertListEqual(controller.retrieve_error_messages(), [])
 
+def test_controller_do_commands(tc):
+    channel = gtp_engine_fixtures.get_test_channel()
+    controller = Gtp_controller(channel, 'player test')
+    tc.assertEqual(
+        controller.do_commands([("test",), ("known_command", "test")]),
+        ["test response", "true"])
+    tc.assertEqual(controller.do_commands([]), [])
+    with tc.assertRaises(BadGtpResponse) as ar:
+        controller.do_commands([("test",), ("error",), ("multiline",)])
+    tc.assertEqual(
+        str(ar.exception),
+        "failure response from 'error' to player test:\n"
+        "normal error")
+    tc.assertEqual(ar.exception.gtp_command, "error")
+    # all the responses were read
+    tc.assertEqual(controller.do_command("test"), "test response")
+    tc.assertRaisesRegexp(
+        ValueError, "bad command or argument: 'bad argument'",
+        controller.do_commands, [("test",), ("test", "bad argument")])
+    tc.assertEqual(controller.do_command("test"), "test response")
+    tc.assertFalse(controller.channel_is_bad)
+
+def test_controller_do_commands_transport_error(tc):
+    channel = gtp_engine_fixtures.get_test_channel()
+    controller = Gtp_controller(channel, 'player test')
+    tc.assertEqual(controller.do_command("test"), "test response")
+    channel.fail_command = "known_command"
+    with tc.assertRaises(GtpTransportError) as ar:
+        controller.do_commands([("test",), ("known_command", "test")])
+    tc.assertEqual(
+        str(ar.exception),
+        "transport error sending 'known_command test' to player test:\n"
+        "forced failure for send_command_line")
+    tc.assertTrue(controller.channel_is_bad)
+
 def test_controller_close(tc):
     channel = gtp_engine_fixtures.get_test_channel()
     controller = Gtp_controller(channel, 'player test')
@@ -985,6 +1023,25 @@ def test_game_controller_cautious_mode_send_command(tc):
         "transport error sending 'list_commands' to player one:\n"
         "forced failure for send_command_line")
 
+def test_game_controller_send_commands(tc):
+    channel1 = gtp_engine_fixtures.get_test_channel()
+    controller1 = Gtp_controller(channel1, 'player one')
+    channel2 = gtp_engine_fixtures.get_test_channel()
+    controller2 = Gtp_controller(channel2, 'player two')
+    gc = gtp_controller.Game_controller('one', 'two')
+    gc.set_player_controller('b', controller1)
+    gc.set_player_controller('w', controller2)
+    tc.assertEqual(gc.send_commands('b', [("test",), ("known_command", "x")]),
+                   ["test response", "false"])
+    gc.set_cautious_mode(True)
+    channel2.fail_command = "known_command"
+    with tc.assertRaises(BadGtpResponse) as ar:
+        gc.send_commands('w', [("test",), ("known_command", "x")])
+    tc.assertEqual(
+        str(ar.exception),
+        "late low-level error from player two")
+    gc.close_players()
+
 def test_game_controller_leave_cautious_mode(tc):
     channel1 = gtp_engine_fixtures.get_test_channel()
     controller1 = Gtp_controller(channel1, 'player one')
@@ -6,8 +6,10 @@ import cPickle as pickle
 from textwrap import dedent
 
 from gomill import boards
+from gomill import gameplay
 from gomill import gtp_controller
 from gomill import gtp_games
+from gomill import openings
 from gomill import sgf
 from gomill.common import format_vertex
 from gomill.gtp_controller import GtpChannelError, GtpChannelClosed
@@ -718,6 +720,56 @@ def test_move_limit_exact(tc):
         ('b', 'pass'), ('w', 'pass'),
         ])
 
+def test_adjudication_internal_scorer(tc):
+    fx = Gtp_game_fixture(tc)
+    fx.game.use_internal_scorer()
+    fx.game.set_adjudication(
+        gameplay.Adjudication(10, min_moves=0, interval=2, checks=1))
+    fx.game.prepare()
+    fx.game.run()
+    # The area score is zero until both columns are complete
+    tc.assertEqual(len(fx.game.get_moves()), 18)
+    tc.assertEqual(fx.game.result.sgf_result, "B+")
+    tc.assertEqual(fx.game.result.winning_player, 'one')
+    tc.assertIs(fx.game.result.is_adjudicated, True)
+    tc.assertIs(fx.game.result.is_unknown, False)
+    tc.assertEqual(fx.game.result.describe(), "one beat two B+ (adjudicated)")
+    tc.assertIsNone(fx.game.get_game_score())
+    result2 = pickle.loads(pickle.dumps(fx.game.result))
+    tc.assertIs(result2.is_adjudicated, True)
+
+def test_adjudication_players_score(tc):
+    fx = Gtp_game_fixture(tc)
+    calls = []
+    def handle_final_score_b(args):
+        calls.append(len(fx.game.get_moves()))
+        return "W+30.5"
+    def handle_final_score_w(args):
+        calls.append(len(fx.game.get_moves()))
+        return "W+25"
+    # The scorers agree on the winner, so the smaller margin is used
+    fx.engine_b.add_command('final_score', handle_final_score_b)
+    fx.engine_w.add_command('final_score', handle_final_score_w)
+    fx.game.allow_scorer('b')
+    fx.game.allow_scorer('w')
+    fx.game.set_adjudication(
+        gameplay.Adjudication(20, min_moves=4, interval=2, checks=2))
+    fx.game.prepare()
+    fx.game.run()
+    tc.assertEqual(calls, [4, 4, 6, 6])
+    tc.assertEqual(len(fx.game.get_moves()), 6)
+    tc.assertEqual(fx.game.result.sgf_result, "W+")
+    tc.assertEqual(fx.game.result.detail, "adjudicated")
+
+def test_adjudication_unscored_game(tc):
+    fx = Gtp_game_fixture(tc)
+    fx.game.set_adjudication(
+        gameplay.Adjudication(1, min_moves=0, interval=1, checks=1))
+    fx.game.prepare()
+    fx.game.run()
+    tc.assertEqual(len(fx.game.get_moves()), 20)
+    tc.assertIs(fx.game.result.is_adjudicated, False)
+
 def test_make_sgf(tc):
     class Named_player(gtp_engine_fixtures.Test_player):
         def get_handlers(self):
@@ -869,6 +921,38 @@ def test_fixed_handicap_bad_engine(tc):
         "^bad response from fixed_handicap command to two: C3 G3 C7$",
         fx.game.set_handicap, 3, is_free=False)
 
+def test_opening(tc):
+    play_calls = {'b' : [], 'w' : []}
+    def make_handle_play(colour):
+        def handle_play(args):
+            play_calls[colour].append(" ".join(args))
+        return handle_play
+    fx = Gtp_game_fixture(tc)
+    fx.engine_b.add_command('play', make_handle_play('b'))
+    fx.engine_w.add_command('play', make_handle_play('w'))
+    opening = openings.Opening(
+        "test", 9, [(8, 0)], [(8, 8)], [('b', (7, 0))])
+    fx.game.prepare()
+    fx.game.set_opening(opening)
+    tc.assertEqual(play_calls['b'], ["b A9", "w J9", "b A8"])
+    tc.assertEqual(play_calls['w'], ["b A9", "w J9", "b A8"])
+    fx.game.run()
+    tc.assertEqual(fx.game.get_moves()[0][:2], ('w', (0, 6)))
+    root = fx.sgf_root()
+    tc.assertEqual(map(format_vertex, root.get("AB")), ["A9"])
+    tc.assertEqual(map(format_vertex, root.get("AW")), ["J9"])
+    tc.assertEqual(root[0].get_move(), ('b', (7, 0)))
+
+def test_opening_rejected(tc):
+    fx = Gtp_game_fixture(tc)
+    fx.engine_w.force_error('play')
+    fx.game.prepare()
+    tc.assertRaisesRegexp(
+        gtp_controller.BadGtpResponse,
+        "failure response from 'play b A9' to player two",
+        fx.game.set_opening,
+        openings.Opening("test", 9, [(8, 0)], [], []))
+
 def test_free_handicap(tc):
     fh_calls = []
     def handle_place_free_handicap(args):
@@ -992,6 +1076,17 @@ def test_game_result_cpu_time_pickle_compatibility(tc):
     result2 = pickle.loads(pickle.dumps(result))
     tc.assertEqual(result2.cpu_times, {'one' : 33.5, 'two' : None})
 
+def test_game_result_adjudicated_pickle_compatibility(tc):
+    fx = Gtp_game_fixture(tc)
+    fx.game.prepare()
+    fx.game.run()
+    result = fx.game.result
+    # Gomill 0.8 state has no is_adjudicated
+    result2 = gtp_games.Game_result.__new__(gtp_games.Game_result)
+    result2.__setstate__(result.__getstate__()[:8])
+    tc.assertIs(result2.is_adjudicated, False)
+    tc.assertEqual(result2.describe(), result.describe())
+
 
 def test_cautious_mode_setting(tc):
     fx = Gtp_game_fixture(tc)
@@ -455,6 +455,131 @@ def test_play(tc):
                    "status file is inconsistent with control file")
 
 
+def test_tree_state(tc):
+    def make_tree(splits):
+        return mcts_tuners.Tree(
+            splits=splits,
+            max_depth=3,
+            exploration_coefficient=0.5,
+            initial_visits=10,
+            initial_wins=5,
+            parameter_formatter=str,
+            )
+    tree = make_tree([2, 3])
+    tree.new_root()
+    tc.assertEqual(tree.node_count, 7)
+    tc.assertIsNone(tree.root.children[0].children)
+    random.seed(1234)
+    for i in range(50):
+        simulation = mcts_tuners.Simulation(tree)
+        simulation.run()
+        simulation.update_stats(candidate_won=(i % 3 == 0))
+    tc.assertEqual(tree.root.visits, 60)
+    tc.assertEqual(tree.root.wins, 22)
+    tc.assertEqual(sum(node.visits-10 for node in tree.root.children), 50)
+    expanded = [node for node in tree.root.children
+                if node.children is not None]
+    tc.assertTrue(expanded)
+    tc.assertEqual(tree.node_count % 6, 1)
+    tc.assertEqual(
+        sum(child.visits-10 for child in expanded[0].children),
+        expanded[0].visits-11)
+
+    state = pickle.loads(pickle.dumps(tree.get_state(), protocol=-1))
+    tree2 = make_tree([2, 3])
+    tree2.set_state(state)
+    tc.assertEqual(tree2.node_count, tree.node_count)
+    tc.assertEqual(tree2.describe(), tree.describe())
+    tc.assertEqual(tree2.retrieve_best_parameters(),
+                   tree.retrieve_best_parameters())
+    simulation = mcts_tuners.Simulation(tree2)
+    simulation.run()
+    simulation.update_stats(candidate_won=True)
+    tc.assertEqual(tree2.root.visits, 61)
+    tc.assertEqual(tree.root.visits, 60)
+
+    tc.assertRaisesRegexp(ValueError, "wrong branching factor",
+                          make_tree([2, 2]).set_state, state)
+    tc.assertRaisesRegexp(ValueError, "inconsistent arrays",
+                          make_tree([2, 3]).set_state,
+                          state[:3] + (state[3][:-4],))
+    tc.assertRaisesRegexp(ValueError, "bad array length",
+                          make_tree([2, 3]).set_state,
+                          state[:3] + (state[3][:-1],))
+    tc.assertRaisesRegexp(ValueError, "bad tree state",
+                          make_tree([2, 3]).set_state, None)
+
+
+def test_virtual_loss(tc):
+    tree = mcts_tuners.Tree(
+        splits=[2, 2],
+        max_depth=1,
+        exploration_coefficient=0.5,
+        initial_visits=10,
+        initial_wins=5,
+        parameter_formatter=str,
+        virtual_loss=3,
+        )
+    tree.new_root()
+    simulations = []
+    for i in range(4):
+        simulation = mcts_tuners.Simulation(tree)
+        simulation.run()
+        simulations.append(simulation)
+    # Each outstanding simulation pushes the next one to a different child
+    tc.assertItemsEqual([sim.choice_path for sim in simulations],
+                        [[0], [1], [2], [3]])
+    tc.assertEqual(tree.root.virtual_visits, 12)
+    tc.assertEqual([node.virtual_visits for node in tree.root.children],
+                   [3, 3, 3, 3])
+    tc.assertAlmostEqual(tree.root.children[0].value, 5/13)
+    simulations[0].update_stats(candidate_won=True)
+    simulations[1].abandon()
+    node0 = tree.root.children[simulations[0].choice_path[0]]
+    node1 = tree.root.children[simulations[1].choice_path[0]]
+    tc.assertEqual((node0.wins, node0.visits, node0.virtual_visits),
+                   (6, 11, 0))
+    tc.assertAlmostEqual(node0.value, 6/11)
+    tc.assertEqual((node1.wins, node1.visits, node1.virtual_visits),
+                   (5, 10, 0))
+    tc.assertAlmostEqual(node1.value, 0.5)
+    tc.assertEqual(tree.root.virtual_visits, 6)
+    tree2 = mcts_tuners.Tree(
+        splits=[2, 2],
+        max_depth=1,
+        exploration_coefficient=0.5,
+        initial_visits=10,
+        initial_wins=5,
+        parameter_formatter=str,
+        virtual_loss=3,
+        )
+    tree2.set_state(tree.get_state())
+    tc.assertEqual(tree2.root.virtual_visits, 0)
+    tc.assertEqual(tree2.root.children[0].virtual_visits, 0)
+    tc.assertAlmostEqual(tree2.root.value, 6/11)
+
+def test_virtual_loss_game_error(tc):
+    config = default_config()
+    config['virtual_loss'] = 1.5
+    comp = mcts_tuners.Mcts_tuner('mctstest')
+    comp.initialise_from_control_file(config)
+    comp.set_clean_status()
+    tc.assertEqual(comp.tree.virtual_loss, 1.5)
+    job1 = comp.get_game()
+    job2 = comp.get_game()
+    tc.assertNotEqual(job1.sgf_note, job2.sgf_note)
+    tc.assertEqual(comp.tree.root.virtual_visits, 3)
+    comp.process_game_error(job1, 0)
+    tc.assertEqual(comp.tree.root.virtual_visits, 1.5)
+    tc.assertEqual(comp.tree.root.visits, 10)
+
+    config['virtual_loss'] = -1
+    comp2 = mcts_tuners.Mcts_tuner('mctstest')
+    tc.assertRaisesRegexp(
+        ControlFileError, "virtual_loss: must not be negative",
+        comp2.initialise_from_control_file, config)
+
+
 def _disabled_test_tree_run(tc):
     # Something like this test can be useful when changing the tree code,
     # if you want to verify that you're not changing behaviour.
@@ -481,3 +606,162 @@ def _disabled_test_tree_run(tc):
     tc.assertEqual(tree.retrieve_best_parameters(),
                    [0.609375, 0.68930041152263366])
 
+
+def test_multiple_trees(tc):
+    def make_response(job, winner):
+        result = Game_result.from_score(winner, 8.5)
+        result.set_players({'b' : 'opp', 'w' : job.player_w.code})
+        response = Game_job_result()
+        response.game_id = job.game_id
+        response.game_result = result
+        response.engine_descriptions = {
+            'opp' : Engine_description("opp engine", "v1.2.3", None),
+            }
+        response.game_data = job.game_data
+        return response
+
+    config = default_config()
+    config['number_of_trees'] = 3
+    comp = mcts_tuners.Mcts_tuner('mctstest')
+    comp.initialise_from_control_file(config)
+    comp.set_clean_status()
+    tc.assertEqual(len(comp.trees), 3)
+    tc.assertIs(comp.tree, comp.trees[0])
+    tc.assertIsNot(comp.trees[0].rng, comp.trees[1].rng)
+
+    # Games started together are spread across the trees
+    jobs = [comp.get_game() for _ in xrange(3)]
+    tc.assertEqual(
+        [comp.trees.index(comp.outstanding_simulations[i].tree)
+         for i in xrange(3)],
+        [0, 1, 2])
+
+    # Tree 1 wins; the others lose
+    for job in jobs:
+        winner = 'w' if job.game_data == 1 else 'b'
+        comp.process_game_result(make_response(job, winner))
+    tc.assertEqual([tree.root.visits for tree in comp.trees], [11, 11, 11])
+    tc.assertEqual([tree.root.wins for tree in comp.trees], [5, 6, 5])
+    job = comp.get_game()
+    tc.assertIs(comp.outstanding_simulations[3].tree, comp.trees[1])
+    comp.process_game_result(make_response(job, 'w'))
+
+    report = competition_test_support.get_short_report(comp)
+    tc.assertIn("Best parameters: t1 rsn@ ", report)
+    tc.assertIn("Best parameters for each tree:\n"
+                "t0    0/1    rsn@ ", report)
+    tc.assertIn("\nt1    2/2    rsn@ ", report)
+    tc.assertIn("\ntree 1:\nmost visited at depth 1\n", report)
+
+    status = pickle.loads(pickle.dumps(comp.get_status()))
+    tc.assertEqual(len(status['other_trees']), 2)
+    comp2 = mcts_tuners.Mcts_tuner('mctstest')
+    comp2.initialise_from_control_file(config)
+    comp2.set_status(status)
+    tc.assertEqual([tree.root.wins for tree in comp2.trees], [5, 7, 5])
+
+    # Adding a tree is allowed; it starts afresh
+    config['number_of_trees'] = 4
+    comp3 = mcts_tuners.Mcts_tuner('mctstest')
+    comp3.initialise_from_control_file(config)
+    comp3.set_status(status)
+    tc.assertEqual([tree.root.visits for tree in comp3.trees],
+                   [11, 12, 11, 10])
+
+    config['number_of_trees'] = 2
+    comp4 = mcts_tuners.Mcts_tuner('mctstest')
+    comp4.initialise_from_control_file(config)
+    tc.assertRaisesRegexp(
+        CompetitionError, r"\(number_of_trees has been reduced\)",
+        comp4.set_status, status)
+
+def test_seed(tc):
+    def make_response(job, winner):
+        result = Game_result.from_score(winner, 8.5)
+        result.set_players({'b' : 'opp', 'w' : job.player_w.code})
+        response = Game_job_result()
+        response.game_id = job.game_id
+        response.game_result = result
+        response.engine_descriptions = {
+            'opp' : Engine_description("opp engine", "v1.2.3", None),
+            }
+        response.game_data = job.game_data
+        return response
+
+    config = default_config()
+    config['seed'] = 7
+    def run(comp):
+        comp.initialise_from_control_file(config)
+        comp.set_clean_status()
+        notes = []
+        for i in xrange(20):
+            job = comp.get_game()
+            notes.append(job.sgf_note)
+            winner = 'w' if i % 3 else 'b'
+            comp.process_game_result(make_response(job, winner))
+        return notes
+    comp = mcts_tuners.Mcts_tuner('mctstest')
+    comp2 = mcts_tuners.Mcts_tuner('mctstest')
+    tc.assertEqual(run(comp2), run(comp))
+
+    status = pickle.loads(pickle.dumps(comp.get_status()))
+    tc.assertEqual(status['seed'], 7)
+    del config['seed']
+    comp3 = mcts_tuners.Mcts_tuner('mctstest')
+    comp3.initialise_from_control_file(config)
+    tc.assertRaisesRegexp(
+        CompetitionError, r"\(seed has changed\)",
+        comp3.set_status, status)
+
+def test_opponent_pool(tc):
+    def make_response(job, winner):
+        result = Game_result.from_score(winner, 8.5)
+        result.set_players({'b' : job.player_b.code, 'w' : job.player_w.code})
+        response = Game_job_result()
+        response.game_id = job.game_id
+        response.game_result = result
+        response.engine_descriptions = {
+            job.player_b.code : Engine_description(
+                "%s engine" % job.player_b.code, "v1.2.3", None),
+            }
+        response.game_data = job.game_data
+        return response
+
+    config = default_config()
+    config['players']['opp2'] = Player_config("test2")
+    del config['opponent']
+    config['opponents'] = {'opp' : 1, 'opp2' : 2}
+    comp = mcts_tuners.Mcts_tuner('mctstest')
+    comp.initialise_from_control_file(config)
+    comp.set_clean_status()
+    tc.assertEqual([check.player.code for check in comp.get_player_checks()],
+                   ['candidate', 'opp', 'opp2'])
+
+    jobs = [comp.get_game() for _ in xrange(6)]
+    tc.assertEqual([job.player_b.code for job in jobs],
+                   ['opp2', 'opp', 'opp2', 'opp2', 'opp', 'opp2'])
+    tc.assertEqual([job.player_w.code for job in jobs[:2]], ['#0', '#1'])
+    comp.process_game_result(make_response(jobs[1], 'w'))
+    tc.assertEqual(comp.tree.root.visits, 11)
+    tc.assertEqual(comp.tree.root.wins, 6)
+
+    report = competition_test_support.get_short_report(comp)
+    tc.assertIn("opponent (opp, weight 1): opp engine:v1.2.3\n"
+                "opponent: opp2, weight 2\n", report)
+
+    status = pickle.loads(pickle.dumps(comp.get_status()))
+    comp2 = mcts_tuners.Mcts_tuner('mctstest')
+    comp2.initialise_from_control_file(config)
+    comp2.set_status(status)
+    tc.assertEqual(comp2.opponent_descriptions,
+                   {'opp' : "opp engine:v1.2.3"})
+    # The unfinished first game is issued again against the same opponent
+    job0b = comp2.get_game()
+    tc.assertEqual(job0b.game_id, '0')
+    tc.assertEqual(job0b.player_b.code, 'opp2')
+
+    config['opponent'] = 'opp'
+    comp3 = mcts_tuners.Mcts_tuner('mctstest')
+    tc.assertRaisesRegexp(
+        ControlFileError, "opponent: can't be used together with 'opponents'",
+        comp3.initialise_from_control_file, config)
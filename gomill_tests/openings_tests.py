@@ -0,0 +1,108 @@
+"""Tests for openings.py"""
+
+from __future__ import with_statement
+
+import os
+
+from gomill_tests import gomill_test_support
+
+from gomill import openings
+from gomill import sgf
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+
+SAMPLE_SGF = """\
+(;FF[4]GM[1]SZ[9]AB[ai][bh]AW[fc];W[ee];B[dg];W[];B[ef])
+"""
+
+def test_opening_from_sgf_game(tc):
+    sgf_game = sgf.Sgf_game.from_string(SAMPLE_SGF)
+    opening = openings.opening_from_sgf_game(sgf_game, "sample")
+    tc.assertEqual(opening.name, "sample")
+    tc.assertEqual(opening.board_size, 9)
+    tc.assertEqual(opening.black_points, [(0, 0), (1, 1)])
+    tc.assertEqual(opening.white_points, [(6, 5)])
+    tc.assertEqual(opening.moves,
+                   [('w', (4, 4)), ('b', (2, 3)), ('w', None), ('b', (3, 4))])
+    tc.assertEqual(opening.get_plays()[:4],
+                   [('b', (0, 0)), ('b', (1, 1)), ('w', (6, 5)),
+                    ('w', (4, 4))])
+    tc.assertEqual(opening.get_next_player(), 'w')
+    tc.assertBoardEqual(opening.make_board(), """\
+9  .  .  .  .  .  .  .  .  .
+8  .  .  .  .  .  .  .  .  .
+7  .  .  .  .  .  o  .  .  .
+6  .  .  .  .  .  .  .  .  .
+5  .  .  .  .  o  .  .  .  .
+4  .  .  .  .  #  .  .  .  .
+3  .  .  .  #  .  .  .  .  .
+2  .  #  .  .  .  .  .  .  .
+1  #  .  .  .  .  .  .  .  .
+   A  B  C  D  E  F  G  H  J
+""")
+
+def test_opening_empty(tc):
+    sgf_game = sgf.Sgf_game(19)
+    opening = openings.opening_from_sgf_game(sgf_game, "empty")
+    tc.assertEqual(opening.get_plays(), [])
+    tc.assertEqual(opening.get_next_player(), 'b')
+
+def test_opening_occupied_point(tc):
+    sgf_game = sgf.Sgf_game.from_string("(;SZ[9]AB[ai];W[ai])")
+    tc.assertRaisesRegexp(ValueError, "move to occupied point",
+                          openings.opening_from_sgf_game, sgf_game, "bad")
+
+def test_read_opening(tc):
+    pathname = os.path.join(tc.sandbox(), "sample.sgf")
+    with open(pathname, "w") as f:
+        f.write(SAMPLE_SGF)
+    opening = openings.read_opening(pathname)
+    tc.assertEqual(opening.name, pathname)
+    tc.assertEqual(len(opening.moves), 4)
+    tc.assertEqual(openings.read_opening(pathname, "x").name, "x")
+    tc.assertRaisesRegexp(
+        ValueError, "^%s: No such file or directory$" % (pathname + "x"),
+        openings.read_opening, pathname + "x")
+    with open(pathname, "w") as f:
+        f.write("(;SZ[9]")
+    tc.assertRaisesRegexp(
+        ValueError, "^%s: " % pathname,
+        openings.read_opening, pathname)
+
+def test_read_openings_collection(tc):
+    pathname = os.path.join(tc.sandbox(), "collection.sgf")
+    with open(pathname, "w") as f:
+        f.write("(;SZ[9];B[ee])\n(;SZ[9]AB[aa])\n(;SZ[9];B[cc];W[gg])\n")
+    book = openings.read_openings(pathname, "coll")
+    tc.assertEqual([opening.name for opening in book],
+                   ["coll:1", "coll:2", "coll:3"])
+    tc.assertEqual(book[2].moves, [('b', (6, 2)), ('w', (2, 6))])
+    tc.assertEqual(book[1].black_points, [(8, 0)])
+    with open(pathname, "w") as f:
+        f.write("(;SZ[9];B[ee])\n(;SZ[9]AB[aa];B[aa])\n")
+    tc.assertRaisesRegexp(
+        ValueError, "^%s:2: move to occupied point$" % pathname,
+        openings.read_openings, pathname)
+
+def test_read_openings_directory(tc):
+    sandbox = tc.sandbox()
+    book_dir = os.path.join(sandbox, "book")
+    os.mkdir(book_dir)
+    for filename, contents in [
+        ("b.sgf", "(;SZ[9];B[ee])"),
+        ("a.SGF", "(;SZ[9];B[cc])(;SZ[9];B[gg])"),
+        ("notes.txt", "ignored"),
+        ]:
+        with open(os.path.join(book_dir, filename), "w") as f:
+            f.write(contents)
+    book = openings.read_openings(book_dir, "book")
+    tc.assertEqual([opening.name for opening in book],
+                   ["book/a.SGF:1", "book/a.SGF:2", "book/b.sgf"])
+    tc.assertEqual(book[2].moves, [('b', (4, 4))])
+    empty_dir = os.path.join(sandbox, "empty")
+    os.mkdir(empty_dir)
+    tc.assertRaisesRegexp(
+        ValueError, "^%s: no .sgf files in directory$" % empty_dir,
+        openings.read_openings, empty_dir)
@@ -2,17 +2,21 @@
 
 from __future__ import with_statement
 
+import os
 from textwrap import dedent
 import cPickle as pickle
 
 from gomill import competitions
 from gomill import playoffs
+from gomill import stopping_rules
+from gomill import tournament_results
 from gomill.gtp_controller import Engine_description
 from gomill.gtp_games import Game_result
 from gomill.game_jobs import Game_job, Game_job_result
 from gomill.competitions import (
     Player_config, NoGameAvailable, CompetitionError, ControlFileError)
 from gomill.playoffs import Matchup_config
+from gomill.stopping_rules import Sprt_config, Confidence_config
 
 from gomill_tests import competition_test_support
 from gomill_tests import gomill_test_support
@@ -347,6 +351,349 @@ def test_play_many(tc):
     tc.assertEqual(ms.wins_1, 2)
     tc.assertEqual(ms.wins_b, 2)
 
+def test_find_games(tc):
+    fx = Playoff_fixture(tc)
+    jobs = [fx.comp.get_game() for _ in range(4)]
+    for job, winner in zip(jobs, ['b', 'b', 'b', None]):
+        fx.comp.process_game_result(fake_response(job, winner))
+    tr = fx.comp.get_tournament_results()
+    tc.assertIs(tr.has_game_index(), False)
+    def ids(games):
+        return sorted(game.game_id for game in games)
+    tc.assertEqual(ids(tr.find_games()), ['0_0', '0_1', '0_2', '0_3'])
+    tc.assertEqual(ids(tr.find_games(matchup_id='0')),
+                   ['0_0', '0_1', '0_2', '0_3'])
+    tc.assertEqual(ids(tr.find_games(matchup_id='1')), [])
+    tc.assertEqual(ids(tr.find_games(winner='t1')), ['0_0', '0_2'])
+    tc.assertEqual(ids(tr.find_games(player='t2', winner='t2')), ['0_1'])
+    tc.assertEqual(ids(tr.find_games(forfeits_only=True)), [])
+    game = tr.get_game('0_1')
+    tc.assertEqual(game.matchup_id, '0')
+    tc.assertEqual(game.player_b, 't2')
+    tc.assertEqual(game.winning_player, 't2')
+    tc.assertIsNone(game.sgf_filename)
+    tc.assertIsNone(tr.get_game('0_9'))
+
+def test_matchup_stats_accumulator(tc):
+    # Check the incremental statistics against the list-based calculation
+    fx = Playoff_fixture(tc)
+    outcomes = ['b', 'w', None, 'unknown', 'b', 'b', 'w', 'forfeit']
+    for i in range(40):
+        job = fx.comp.get_game()
+        outcome = outcomes[(i * 3) % len(outcomes)]
+        if outcome == 'forfeit':
+            response = fake_response(job, 'w')
+            response.game_result.is_forfeit = True
+        else:
+            response = fake_response(job, outcome)
+        if i % 5:
+            response.game_result.cpu_times[job.player_b.code] = i * 0.7
+        if i % 3:
+            response.game_result.cpu_times[job.player_w.code] = i * 1.3
+        fx.comp.process_game_result(response)
+
+    results = fx.comp.get_tournament_results().get_matchup_results('0')
+    def public_attributes(ms):
+        return dict((k, v) for (k, v) in ms.__dict__.iteritems()
+                    if not k.startswith("_"))
+    for player_1, player_2 in [('t1', 't2'), ('t2', 't1')]:
+        expected = tournament_results.Matchup_stats(
+            results, player_1, player_2)
+        expected.calculate_colour_breakdown()
+        expected.calculate_time_stats()
+        ms = fx.comp.stats_accumulators['0'].make_matchup_stats(
+            player_1, player_2)
+        tc.assertEqual(public_attributes(ms), public_attributes(expected))
+    tc.assertEqual(expected.alternating, True)
+    tc.assertGreater(expected.forfeits_1 + expected.forfeits_2, 0)
+    tc.assertGreater(expected.unknown, 0)
+
+    # Reloaded status gives the same statistics
+    comp2 = competition_test_support.check_round_trip(
+        tc, fx.comp, default_config())
+    tc.assertEqual(
+        public_attributes(
+            comp2.get_tournament_results().get_matchup_stats('0')),
+        public_attributes(
+            fx.comp.get_tournament_results().get_matchup_stats('0')))
+
+def test_stopping_rule(tc):
+    config = default_config()
+    config['matchups'] = [
+        Matchup_config('t1', 't2', number_of_games=100,
+                       stopping_rule=Sprt_config(0, 50)),
+        Matchup_config('t2', 't1', number_of_games=12, id='x'),
+        ]
+    fx = Playoff_fixture(tc, config)
+    events = []
+    fx.comp.set_event_logger(events.append)
+    issued = []
+    while True:
+        job = fx.comp.get_game()
+        if job is NoGameAvailable:
+            break
+        issued.append(job.game_id)
+        fx.comp.process_game_result(fake_response(job, 'b'))
+    # Matchup 0 stops after 9 wins for t1; 'x' continues to its limit.
+    tc.assertEqual(sum(1 for s in issued if s.startswith("0_")), 9)
+    tc.assertEqual(sum(1 for s in issued if s.startswith("x_")), 12)
+    tc.assertEqual(events, [
+        "matchup 0 stopped early: "
+        "H1 accepted: t1 at least 50 Elo stronger than t2"])
+    tc.assertEqual(fx.comp.stopped_matchups.keys(), ['0'])
+    tc.assertMultiLineEqual(
+        competition_test_support.get_screen_report(fx.comp).split("\n\n")[0],
+        dedent("""\
+        t1 v t2 (9/100 games)
+        board size: 13   komi: 7.5
+             wins
+        t1      9 100.00%   (black)
+        t2      0   0.00%   (white)
+        SPRT elo0=0 elo1=50 alpha=0.05 beta=0.05: LLR 3.55 (bounds -2.94, 2.94)
+        stopped early: H1 accepted: t1 at least 50 Elo stronger than t2"""))
+
+    comp2 = competition_test_support.check_round_trip(tc, fx.comp, config)
+    tc.assertEqual(comp2.stopped_matchups, fx.comp.stopped_matchups)
+    tc.assertIs(comp2.get_game(), NoGameAvailable)
+
+def test_stopping_rule_default(tc):
+    config = default_config()
+    config['stopping_rule'] = Confidence_config(0.9, min_games=5)
+    fx = Playoff_fixture(tc, config)
+    tc.assertIsInstance(fx.comp.matchups['0'].stopping_rule,
+                        stopping_rules.Confidence_rule)
+    config['stopping_rule'] = 3
+    with tc.assertRaises(ControlFileError) as ar:
+        Playoff_fixture(tc, config)
+    tc.assertEqual(str(ar.exception),
+                   "'stopping_rule': not a SPRT or Confidence_stop")
+
+def test_paired_games(tc):
+    config = default_config()
+    config['matchups'] = [
+        Matchup_config('t1', 't2', alternating=True, paired_games=True,
+                       number_of_games=6),
+        ]
+    fx = Playoff_fixture(tc, config)
+    jobs = [fx.comp.get_game() for _ in range(5)]
+    # t1 wins the first pair twice, and shares the second
+    for job, winner in zip(jobs, ['b', 'w', 'b', 'b', 'w']):
+        fx.comp.process_game_result(fake_response(job, winner))
+    ms = fx.comp.get_tournament_results().get_matchup_stats('0')
+    tc.assertEqual(ms.pentanomial, [0, 0, 1, 0, 1])
+    fx.check_screen_report(dedent("""\
+    t1 v t2 (5/6 games)
+    board size: 13   komi: 7.5
+         wins              black        white
+    t1      3 60.00%       2 66.67%     1 50.00%
+    t2      2 40.00%       1 50.00%     1 33.33%
+                           3 60.00%     2 40.00%
+    2 game pairs; t1 scored 0, 0.5, 1, 1.5, 2: 0 0 1 0 1
+    t1 paired score: 75.0% +/- 34.6%
+    """))
+
+    comp2 = competition_test_support.check_round_trip(tc, fx.comp, config)
+    tc.assertEqual(
+        comp2.get_tournament_results().get_matchup_stats('0').pentanomial,
+        [0, 0, 1, 0, 1])
+
+def test_paired_games_bad_config(tc):
+    config = default_config()
+    config['matchups'] = [
+        Matchup_config('t1', 't2', alternating=False, paired_games=True),
+        ]
+    comp = playoffs.Playoff('test')
+    tc.assertRaisesRegexp(
+        ControlFileError, "matchup 0: paired_games requires alternating",
+        comp.initialise_from_control_file, config)
+
+def test_sharded_paired_games(tc):
+    config = default_config()
+    config['matchups'] = [
+        Matchup_config('t1', 't2', alternating=True, paired_games=True,
+                       number_of_games=10),
+        ]
+    shards = []
+    for shard_index in (0, 1):
+        comp = playoffs.Playoff('testcomp')
+        comp.initialise_from_control_file(config)
+        comp.set_shard(shard_index, 2)
+        comp.set_clean_status()
+        shards.append(comp)
+    jobs = [[], []]
+    for shard_index, comp in enumerate(shards):
+        while True:
+            job = comp.get_game()
+            if job is NoGameAvailable:
+                break
+            jobs[shard_index].append(job)
+    # Each shard plays whole pairs, with colours alternating
+    tc.assertEqual([job.game_id for job in jobs[0]],
+                   ['0_0', '0_1', '0_4', '0_5', '0_8', '0_9'])
+    tc.assertEqual([job.game_id for job in jobs[1]],
+                   ['0_2', '0_3', '0_6', '0_7'])
+    for shard_jobs in jobs:
+        tc.assertEqual([job.player_b.code for job in shard_jobs],
+                       ['t1', 't2'] * (len(shard_jobs) // 2))
+    for shard_index, comp in enumerate(shards):
+        for job in jobs[shard_index]:
+            comp.process_game_result(fake_response(job, 'b'))
+    tc.assertEqual(
+        shards[0].get_tournament_results().get_matchup_stats('0').pentanomial,
+        [0, 0, 3, 0, 0])
+    tc.assertEqual(
+        shards[1].get_tournament_results().get_matchup_stats('0').pentanomial,
+        [0, 0, 2, 0, 0])
+
+    status = pickle.loads(pickle.dumps(shards[1].get_status()))
+    comp2 = playoffs.Playoff('testcomp')
+    comp2.initialise_from_control_file(config)
+    comp2.set_shard(1, 2)
+    comp2.set_status(status)
+    tc.assertIs(comp2.get_game(), NoGameAvailable)
+    # Status files from before shards used blocks of two are refused
+    status['scheduler'].block_size = 1
+    comp3 = playoffs.Playoff('testcomp')
+    comp3.initialise_from_control_file(config)
+    comp3.set_shard(1, 2)
+    tc.assertRaisesRegexp(CompetitionError, "old shard layout",
+                          comp3.set_status, status)
+
+def test_opening_book(tc):
+    sandbox = tc.sandbox()
+    for filename, sgf in [("a.sgf", "(;SZ[13];B[gg])"),
+                          ("b.sgf", "(;SZ[13];B[dd];W[jj])"),
+                          ("small.sgf", "(;SZ[9];B[ee])")]:
+        with open(os.path.join(sandbox, filename), "w") as f:
+            f.write(sgf)
+    config = default_config()
+    config['matchups'] = [
+        Matchup_config('t1', 't2', alternating=True, paired_games=True,
+                       opening_book=["a.sgf", "b.sgf"]),
+        Matchup_config('t2', 't1', alternating=True,
+                       opening_book=["b.sgf"]),
+        ]
+    comp = playoffs.Playoff('testcomp')
+    comp.set_base_directory(sandbox)
+    comp.initialise_from_control_file(config)
+    comp.set_clean_status()
+    tc.assertIs(comp.matchups['0'].openings[1], comp.matchups['1'].openings[0])
+    jobs = [comp.get_game() for _ in range(10)]
+    tc.assertEqual(
+        [(job.game_id, job.opening.name) for job in jobs if job.opening],
+        [('0_0', 'a.sgf'), ('1_0', 'b.sgf'), ('0_1', 'a.sgf'),
+         ('1_1', 'b.sgf'), ('0_2', 'b.sgf'), ('1_2', 'b.sgf'),
+         ('0_3', 'b.sgf'), ('1_3', 'b.sgf'), ('0_4', 'a.sgf'),
+         ('1_4', 'b.sgf')])
+    tc.assertEqual(jobs[0].opening.moves, [('b', (6, 6))])
+
+    def check_error(opening_book, message, handicap=None):
+        config['matchups'] = [
+            Matchup_config('t1', 't2', opening_book=opening_book,
+                           handicap=handicap)]
+        comp = playoffs.Playoff('testcomp')
+        comp.set_base_directory(sandbox)
+        tc.assertRaisesRegexp(
+            ControlFileError, message,
+            comp.initialise_from_control_file, config)
+    check_error(["small.sgf"], "matchup 0: opening_book: small.sgf: "
+                "wrong board size")
+    check_error(["missing.sgf"], "matchup 0: opening_book: .*missing.sgf: "
+                "No such file or directory")
+    check_error([], "matchup 0: opening_book: empty list")
+    check_error(["a.sgf"], "matchup 0: can't use both handicap and "
+                "opening_book", handicap=2)
+
+def test_adjudication_setting(tc):
+    config = default_config()
+    config['adjudication'] = competitions.Adjudication_config(30, checks=2)
+    fx = Playoff_fixture(tc, config)
+    adjudication = fx.comp.matchups['0'].adjudication
+    tc.assertEqual((adjudication.margin, adjudication.min_moves,
+                    adjudication.interval, adjudication.checks),
+                   (30, 100, 10, 2))
+    tc.assertIs(fx.comp.get_game().adjudication, adjudication)
+    tc.assertIs(
+        fx.comp.control_file_globals()['Adjudicate'],
+        competitions.Adjudication_config)
+
+    def check_error(value, message):
+        config['adjudication'] = value
+        with tc.assertRaises(ControlFileError) as ar:
+            Playoff_fixture(tc, config)
+        tc.assertEqual(str(ar.exception), message)
+    check_error(30, "'adjudication': not an Adjudicate")
+    check_error(competitions.Adjudication_config(-5),
+                "'adjudication': margin must be positive")
+    check_error(competitions.Adjudication_config(5, interval=0),
+                "'adjudication': 'interval': must be positive integer")
+
+def test_adaptive_scheduling(tc):
+    config = default_config()
+    config['players']['t3'] = Player_config("test3")
+    config['matchups'] = [
+        Matchup_config('t1', 't2', id='lop'),
+        Matchup_config('t1', 't3', id='even'),
+        ]
+    config['adaptive_scheduling'] = True
+    fx = Playoff_fixture(tc, config)
+    # 'lop' is won by black every time; 'even' alternates winners
+    for i in range(100):
+        job = fx.comp.get_game()
+        matchup_id, game_number = job.game_data
+        if matchup_id == 'lop' or game_number % 2 == 0:
+            winner = 'b'
+        else:
+            winner = 'w'
+        fx.comp.process_game_result(fake_response(job, winner))
+    played = dict((m, len(fx.comp.results[m])) for m in ('lop', 'even'))
+    tc.assertEqual(played['lop'] + played['even'], 100)
+    tc.assertLess(played['lop'], 20)
+    tc.assertIn('lop', fx.comp.scheduler.weights)
+
+    comp2 = competition_test_support.check_round_trip(tc, fx.comp, config)
+    tc.assertEqual(comp2.scheduler.weights, fx.comp.scheduler.weights)
+
+def test_adaptive_scheduling_target(tc):
+    config = default_config()
+    config['adaptive_scheduling'] = True
+    config['target_precision'] = 0.3
+    config['players']['t3'] = Player_config("test3")
+    config['matchups'] = [
+        Matchup_config('t1', 't2', id='even', alternating=True,
+                       number_of_games=50),
+        Matchup_config('t1', 't3', id='lop', number_of_games=50),
+        ]
+    fx = Playoff_fixture(tc, config)
+    # In 'even' the players win alternately, so the score interval narrows to
+    # the target after 9 games; 'lop' is won by black every time.
+    played = 0
+    while True:
+        job = fx.comp.get_game()
+        if job is NoGameAvailable:
+            break
+        fx.comp.process_game_result(fake_response(job, 'b'))
+        played += 1
+    tc.assertEqual(len(fx.comp.results['even']), 9)
+    tc.assertLess(played, 100)
+    tc.assertEqual(played, sum(len(l) for l in fx.comp.results.values()))
+    tc.assertItemsEqual(fx.comp.stopped_matchups.keys(), ['even', 'lop'])
+    tc.assertEqual(fx.comp.stopped_matchups['even'],
+                   "reached target precision (+/- 29.4%)")
+    report = competition_test_support.get_screen_report(fx.comp)
+    tc.assertIn("stopped early: reached target precision", report)
+
+    # The decision is recovered when reloading state
+    comp2 = competition_test_support.check_round_trip(tc, fx.comp, config)
+    tc.assertEqual(comp2.stopped_matchups, fx.comp.stopped_matchups)
+    tc.assertIs(comp2.get_game(), NoGameAvailable)
+
+    config['target_precision'] = 0.5
+    with tc.assertRaises(ControlFileError) as ar:
+        Playoff_fixture(tc, config)
+    tc.assertEqual(str(ar.exception),
+                   "'target_precision': must be between 0 and 0.5")
+
 def test_jigo_reporting(tc):
     fx = Playoff_fixture(tc)
 
@@ -0,0 +1,163 @@
+"""Tests for ratings.py"""
+
+from math import log
+from cStringIO import StringIO
+
+from gomill_tests import gomill_test_support
+
+from gomill import ratings
+from gomill.gtp_games import Game_result
+from gomill.tournament_results import (
+    Tournament_results, Matchup_stats_accumulator)
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+
+def test_invert_matrix(tc):
+    matrix = [[4.0, 7.0, 2.0], [3.0, 6.0, 1.0], [2.0, 5.0, 3.0]]
+    inverse = ratings.invert_matrix(matrix)
+    for i in range(3):
+        for j in range(3):
+            tc.assertAlmostEqual(
+                sum(matrix[i][k] * inverse[k][j] for k in range(3)),
+                float(i == j))
+    tc.assertRaises(ValueError, ratings.invert_matrix,
+                    [[1.0, 2.0], [2.0, 4.0]])
+
+def test_two_players(tc):
+    fitter = ratings.Rating_fitter(prior_games=0.0001)
+    # p1 scores 3-1 with each colour, so there's no colour advantage
+    fitter.add_games('p1', 'p2', 30, 10)
+    fitter.add_games('p2', 'p1', 10, 30)
+    r = fitter.fit()
+    tc.assertEqual(r.players, ['p1', 'p2'])
+    tc.assertEqual(r.games, {'p1' : 80, 'p2' : 80})
+    tc.assertAlmostEqual(r.elo['p1'] - r.elo['p2'],
+                         log(3) * ratings.ELO_SCALE, 2)
+    tc.assertAlmostEqual(r.elo['p1'], -r.elo['p2'])
+    tc.assertAlmostEqual(r.colour_advantage, 0.0, 4)
+    # stderr of the difference is sqrt(1/(n p (1-p))) = sqrt(1/15)
+    tc.assertAlmostEqual(2 * r.stderr['p1'],
+                         (1/15.0) ** 0.5 * ratings.ELO_SCALE, 1)
+    lower, upper = r.get_interval('p1')
+    tc.assertAlmostEqual(upper - r.elo['p1'], 1.96 * r.stderr['p1'], 2)
+
+def test_colour_advantage(tc):
+    fitter = ratings.Rating_fitter(prior_games=0.0001)
+    # Black wins 3 games in 4, whoever takes it
+    fitter.add_games('p1', 'p2', 30, 10)
+    fitter.add_games('p2', 'p1', 30, 10)
+    r = fitter.fit()
+    tc.assertAlmostEqual(r.elo['p1'], r.elo['p2'])
+    tc.assertAlmostEqual(r.colour_advantage, log(3) * ratings.ELO_SCALE, 2)
+
+def test_prior_keeps_ratings_finite(tc):
+    fitter = ratings.Rating_fitter()
+    fitter.add_games('p1', 'p2', 5, 0)
+    fitter.add_games('p2', 'p3', 5, 0)
+    r = fitter.fit()
+    tc.assertEqual(r.players, ['p1', 'p2', 'p3'])
+    tc.assertLess(r.elo['p1'], 1000)
+    tc.assertAlmostEqual(sum(r.elo.values()), 0.0)
+
+def test_report(tc):
+    fitter = ratings.Rating_fitter(fit_colour_advantage=False)
+    fitter.add_games('p1', 'p2', 3, 1)
+    fitter.add_games('p2', 'p1', 1, 3)
+    r = fitter.fit()
+    tc.assertEqual(r.colour_advantage, 0.0)
+    lines = r.make_table().render()
+    tc.assertEqual(lines[0].split(), ['elo', '95%', 'interval', 'games'])
+    tc.assertEqual(lines[1].split()[0], 'p1')
+    tc.assertEqual(lines[2].split()[-1], '8')
+
+def make_large_fitter(player_count):
+    # Every pair plays 20 games, 10 with each colour
+    fitter = ratings.Rating_fitter()
+    codes = ["p%03d" % i for i in xrange(player_count)]
+    for i in xrange(player_count):
+        for j in xrange(i+1, player_count):
+            wins = 5 + min(5, (j - i) // 20)
+            fitter.add_games(codes[i], codes[j], wins, 10 - wins)
+            fitter.add_games(codes[j], codes[i], 11 - wins, wins - 1)
+    return fitter
+
+def fit_without_numpy(fitter):
+    saved_numpy = ratings.numpy
+    try:
+        ratings.numpy = None
+        return fitter.fit()
+    finally:
+        ratings.numpy = saved_numpy
+
+def test_fit_numpy_matches_pure_python(tc):
+    if ratings.numpy is None:
+        tc.skipTest("numpy not available")
+    fitter = make_large_fitter(12)
+    r1 = fitter.fit()
+    r2 = fit_without_numpy(fitter)
+    tc.assertEqual(r2.players, r1.players)
+    for player in r1.players:
+        tc.assertAlmostEqual(r2.elo[player], r1.elo[player], 4)
+        tc.assertAlmostEqual(r2.stderr[player], r1.stderr[player], 4)
+    tc.assertAlmostEqual(r2.colour_advantage, r1.colour_advantage, 4)
+    tc.assertAlmostEqual(r2.colour_advantage_stderr,
+                         r1.colour_advantage_stderr, 4)
+
+def test_fit_without_numpy(tc):
+    fitter = make_large_fitter(12)
+    r2 = fit_without_numpy(fitter)
+    fitter.pure_python_covariance_limit = 11
+    r3 = fit_without_numpy(fitter)
+
+    # Lower-numbered players win more often
+    elos = [r2.elo[player] for player in r2.players]
+    tc.assertEqual(elos, sorted(elos, reverse=True))
+    tc.assertAlmostEqual(sum(elos), 0.0)
+    tc.assertIsNotNone(r2.stderr)
+    tc.assertIsNotNone(r2.colour_advantage_stderr)
+
+    # Above the limit, the pure-Python fit omits the error bars
+    tc.assertEqual(r3.elo, r2.elo)
+    tc.assertIsNone(r3.stderr)
+    tc.assertIsNone(r3.colour_advantage_stderr)
+    tc.assertRaises(ValueError, r3.get_interval, 'p000')
+    lines = r3.make_table().render()
+    tc.assertEqual(lines[0].split(), ['elo', 'games'])
+    out = StringIO()
+    r3.write_report(out)
+    tc.assertRegexpMatches(out.getvalue(), "\nblack advantage: [-+][0-9]+\n")
+    tc.assertIn("(confidence intervals not calculated", out.getvalue())
+
+def make_result(player_b, player_w, winner):
+    if winner is None:
+        result = Game_result.from_score(None, 0)
+    elif winner == 'unknown':
+        result = Game_result.from_score(None, None, "no score reported")
+    else:
+        result = Game_result.from_score(winner, 1.5)
+    result.set_players({'b' : player_b, 'w' : player_w})
+    return result
+
+def test_accumulators_match_results(tc):
+    outcomes = ['b', 'w', None, 'unknown', 'b', 'b', 'w']
+    results = {'m1' : [], 'm2' : []}
+    accumulators = {'m1' : Matchup_stats_accumulator(),
+                    'm2' : Matchup_stats_accumulator()}
+    for i in range(40):
+        for matchup_id, players in (('m1', ('a', 'b')), ('m2', ('b', 'c'))):
+            if i % 3:
+                players = players[::-1]
+            result = make_result(players[0], players[1],
+                                 outcomes[(i * 5) % len(outcomes)])
+            results[matchup_id].append(result)
+            accumulators[matchup_id].add_result(result)
+    r1 = Tournament_results([], results).get_ratings()
+    r2 = Tournament_results([], results, None, accumulators).get_ratings()
+    tc.assertEqual(r1.players, r2.players)
+    tc.assertEqual(r1.games, r2.games)
+    for player in r1.players:
+        tc.assertAlmostEqual(r1.elo[player], r2.elo[player])
+        tc.assertAlmostEqual(r1.stderr[player], r2.stderr[player])
+    tc.assertAlmostEqual(r1.colour_advantage, r2.colour_advantage)
@@ -0,0 +1,298 @@
+"""Tests for regression_tuners.py"""
+
+from __future__ import with_statement, division
+
+import cPickle as pickle
+import random
+
+from gomill import regression_tuners
+from gomill.game_jobs import Game_job, Game_job_result
+from gomill.gtp_games import Game_result
+from gomill.regression_tuners import Parameter_config
+from gomill.competitions import (
+    Player_config, CompetitionError, ControlFileError, NoGameAvailable)
+from gomill.gtp_controller import Engine_description
+
+from gomill_tests import gomill_test_support
+from gomill_tests import competition_test_support
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+def simple_make_candidate(*args):
+    return Player_config("cand " + " ".join(map(str, args)))
+
+def default_config():
+    return {
+        'board_size' : 13,
+        'komi' : 7.5,
+        'players' : {
+            'opp' : Player_config("test"),
+            },
+        'candidate_colour' : 'w',
+        'opponent' : 'opp',
+        'parameters' : [
+            Parameter_config(
+                'resign_at',
+                min_value = 0.0,
+                max_value = 0.5,
+                format = "rsn@ %.2f"),
+            Parameter_config(
+                'playouts',
+                min_value = 1000,
+                max_value = 5000,
+                transform = int,
+                format = "pl %d"),
+            ],
+        'batch_size' : 3,
+        'initial_samples' : 4,
+        'make_candidate' : simple_make_candidate,
+        }
+
+def make_response(job, winner):
+    result = Game_result.from_score(winner, 1.5)
+    result.set_players({'b' : job.player_b.code, 'w' : job.player_w.code})
+    response = Game_job_result()
+    response.game_id = job.game_id
+    response.game_result = result
+    response.engine_descriptions = {
+        'opp' : Engine_description("opp engine", "v1.2.3", None),
+        }
+    response.game_data = job.game_data
+    return response
+
+
+def test_quadratic_features(tc):
+    tc.assertEqual(regression_tuners.quadratic_features([2.0, 3.0]),
+                   [1.0, 2.0, 3.0, 4.0, 6.0, 9.0])
+    tc.assertEqual(regression_tuners.quadratic_features([2.0, 3.0], False),
+                   [1.0, 2.0, 3.0, 4.0, 9.0])
+    tc.assertEqual(regression_tuners.count_features(2), 6)
+    tc.assertEqual(regression_tuners.count_features(2, False), 5)
+    tc.assertEqual(regression_tuners.count_features(4), 15)
+
+def test_fit_logistic_regression(tc):
+    # True model: logit p = 1 - 2 x^2
+    rows = []
+    scores = []
+    for i in xrange(21):
+        x = i/10 - 1
+        p = regression_tuners._sigmoid(1 - 2*x*x)
+        rows += [[1.0, x, x*x]] * 2
+        # fractional scores give the exact expected values
+        scores += [p, p]
+    weights = [1.0] * len(rows)
+    beta = regression_tuners.fit_logistic_regression(
+        rows, scores, weights, [0.0, 0.0, 0.0], prior=1e-9)
+    tc.assertAlmostEqual(beta[0], 1.0, places=4)
+    tc.assertAlmostEqual(beta[1], 0.0, places=4)
+    tc.assertAlmostEqual(beta[2], -2.0, places=4)
+    # Warm start gives the same answer
+    beta2 = regression_tuners.fit_logistic_regression(
+        rows, scores, weights, [0.9, 0.1, -1.8], prior=1e-9)
+    for a, b in zip(beta, beta2):
+        tc.assertAlmostEqual(a, b, places=4)
+    # Zero-weighted rows are ignored
+    beta3 = regression_tuners.fit_logistic_regression(
+        rows + [[1.0, 0.0, 0.0]] * 5, scores + [0.0] * 5,
+        weights + [0.0] * 5, [0.0, 0.0, 0.0], prior=1e-9)
+    for a, b in zip(beta, beta3):
+        tc.assertAlmostEqual(a, b, places=4)
+
+def test_parameter_config(tc):
+    comp = regression_tuners.Regression_tuner('rgtest')
+    comp.initialise_from_control_file(default_config())
+    tc.assertEqual([pspec.code for pspec in comp.parameter_specs],
+                   ['resign_at', 'playouts'])
+    tc.assertEqual(comp.format_optimiser_parameters((0.25, 1234.5)),
+                   "rsn@ 0.25; pl 1234")
+    tc.assertEqual(comp.feature_count, 6)
+    tc.assertEqual(comp.locality, 1.0)
+    pspec = comp.parameter_specs[1]
+    tc.assertEqual(pspec.normalise(1000), -1.0)
+    tc.assertEqual(pspec.normalise(4000), 0.5)
+    tc.assertEqual(pspec.denormalise(0.5), 4000)
+
+    config = default_config()
+    del config['initial_samples']
+    config['correlations'] = 'none'
+    comp2 = regression_tuners.Regression_tuner('rgtest')
+    comp2.initialise_from_control_file(config)
+    tc.assertEqual(comp2.feature_count, 5)
+    tc.assertEqual(comp2.initial_samples, 20)
+
+def test_bad_config(tc):
+    def check(key, value, message):
+        config = default_config()
+        config[key] = value
+        comp = regression_tuners.Regression_tuner('rgtest')
+        tc.assertRaisesRegexp(
+            ControlFileError, message,
+            comp.initialise_from_control_file, config)
+    check('locality', 0, "locality: must be positive")
+    check('correlations', 'some', "'correlations': unknown value")
+    check('opponent', 'nonex', "opponent: unknown player nonex")
+    check('parameters', [], "parameters: empty list")
+    check('parameters', [Parameter_config('p', min_value=1, max_value=1)],
+          "parameter p: 'max_value': must be greater than min_value")
+
+def test_play(tc):
+    random.seed(1234)
+    comp = regression_tuners.Regression_tuner('rgtest')
+    config = default_config()
+    config['number_of_games'] = 12
+    comp.initialise_from_control_file(config)
+    comp.set_clean_status()
+    tc.assertIsNone(comp.get_estimate())
+
+    job0 = comp.get_game()
+    tc.assertIsInstance(job0, Game_job)
+    tc.assertEqual(job0.game_id, '0')
+    tc.assertEqual(job0.player_b.code, 'opp')
+    tc.assertEqual(job0.player_w.code, '#0')
+    tc.assertEqual(job0.board_size, 13)
+    tc.assertEqual(job0.komi, 7.5)
+    tc.assertEqual(job0.sgf_event, 'rgtest')
+    # a batch of three was proposed
+    tc.assertEqual(comp.proposals_left, 2)
+    resign_at, playouts = comp.pending[0]
+    tc.assertTrue(0.0 <= resign_at <= 0.5)
+    tc.assertTrue(1000 <= playouts <= 5000)
+    tc.assertEqual(job0.player_w.cmd_args[1:],
+                   [str(resign_at), str(int(playouts))])
+
+    # Candidate wins when resign_at is low
+    def play(job):
+        resign_at, playouts = comp.pending[job.game_data]
+        if resign_at < 0.25:
+            winner = 'w'
+        else:
+            winner = 'b'
+        comp.process_game_result(make_response(job, winner))
+
+    jobs = [comp.get_game() for _ in xrange(3)]
+    play(job0)
+    for job in jobs:
+        play(job)
+    tc.assertIsNone(comp.coefficients)
+    tc.assertEqual(len(comp.samples), 4)
+    # The rest of the second batch was proposed before any results arrived
+    job4 = comp.get_game()
+    tc.assertIsNone(comp.coefficients)
+    play(job4)
+    job5 = comp.get_game()
+    tc.assertEqual(comp.proposals_left, 0)
+    # The next batch is proposed after a fit
+    job6 = comp.get_game()
+    tc.assertEqual(comp.samples_fitted, 5)
+    tc.assertEqual(len(comp.coefficients), 6)
+    tc.assertEqual(len(comp.weights), 5)
+    tc.assertEqual(max(comp.weights), 1.0)
+    play(job6)
+    tc.assertEqual(len(comp.weights), 6)
+
+    status = pickle.loads(pickle.dumps(comp.get_status()))
+    comp2 = regression_tuners.Regression_tuner('rgtest')
+    comp2.initialise_from_control_file(config)
+    comp2.set_status(status)
+    tc.assertEqual(comp2.samples, comp.samples)
+    tc.assertEqual(comp2.coefficients, comp.coefficients)
+    tc.assertEqual(comp2.weights, comp.weights)
+    # The unfinished game is issued again, with the same parameters
+    job5b = comp2.get_game()
+    tc.assertEqual(job5b.game_id, '5')
+    tc.assertEqual(job5b.sgf_note, job5.sgf_note)
+
+    play(job5)
+    while True:
+        job = comp.get_game()
+        if job is NoGameAvailable:
+            break
+        play(job)
+    tc.assertEqual(len(comp.samples), 12)
+    tc.assertEqual(comp.pending, {})
+    estimate, expected_score = comp.get_estimate()
+    tc.assertTrue(estimate[0] < 0.25)
+    tc.assertTrue(expected_score > 0.5)
+
+    report = competition_test_support.get_short_report(comp)
+    tc.assertIn("12/12 games played\n", report)
+    tc.assertIn("Estimated best parameters: rsn@ ", report)
+    tc.assertIn("opponent (opp): opp engine:v1.2.3\n", report)
+
+def test_status_mismatch(tc):
+    comp = regression_tuners.Regression_tuner('rgtest')
+    comp.initialise_from_control_file(default_config())
+    comp.set_clean_status()
+    comp.process_game_result(make_response(comp.get_game(), 'w'))
+    status = pickle.loads(pickle.dumps(comp.get_status()))
+    config = default_config()
+    del config['parameters'][1]
+    comp2 = regression_tuners.Regression_tuner('rgtest')
+    comp2.initialise_from_control_file(config)
+    tc.assertRaisesRegexp(
+        CompetitionError, "status file is inconsistent with control file",
+        comp2.set_status, status)
+
+def test_correlations_changed(tc):
+    comp = regression_tuners.Regression_tuner('rgtest')
+    comp.initialise_from_control_file(default_config())
+    comp.set_clean_status()
+    for _ in xrange(5):
+        comp.process_game_result(make_response(comp.get_game(), 'w'))
+    comp.refit()
+    status = pickle.loads(pickle.dumps(comp.get_status()))
+    config = default_config()
+    config['correlations'] = 'none'
+    comp2 = regression_tuners.Regression_tuner('rgtest')
+    comp2.initialise_from_control_file(config)
+    comp2.set_status(status)
+    tc.assertIsNone(comp2.coefficients)
+    comp2.refit()
+    tc.assertEqual(len(comp2.coefficients), 5)
+
+def test_game_error(tc):
+    comp = regression_tuners.Regression_tuner('rgtest')
+    comp.initialise_from_control_file(default_config())
+    comp.set_clean_status()
+    job = comp.get_game()
+    tc.assertEqual(comp.process_game_error(job, 0), (True, False))
+    comp.process_game_result(make_response(comp.get_game(), 'b'))
+    tc.assertEqual(comp.process_game_error(job, 0), (False, True))
+    tc.assertEqual(comp.process_game_error(job, 1), (True, False))
+
+def test_seed(tc):
+    config = default_config()
+    config['seed'] = 7
+    def run(comp):
+        comp.initialise_from_control_file(config)
+        comp.set_clean_status()
+        for _ in xrange(9):
+            job = comp.get_game()
+            resign_at, playouts = comp.pending[job.game_data]
+            comp.process_game_result(
+                make_response(job, 'w' if resign_at < 0.25 else 'b'))
+        return comp.samples
+    comp = regression_tuners.Regression_tuner('rgtest')
+    comp2 = regression_tuners.Regression_tuner('rgtest')
+    tc.assertEqual(run(comp2), run(comp))
+    tc.assertEqual(comp2.coefficients, comp.coefficients)
+
+    # The parameters depend only on the seed, the game number, and the fit
+    job = comp.get_game()
+    tc.assertEqual(comp.samples_fitted, 9)
+    status = pickle.loads(pickle.dumps(comp.get_status()))
+    del status['pending'][job.game_data]
+    comp3 = regression_tuners.Regression_tuner('rgtest')
+    comp3.initialise_from_control_file(config)
+    comp3.set_status(status)
+    job3 = comp3.get_game()
+    tc.assertEqual(job3.game_id, job.game_id)
+    tc.assertEqual(comp3.pending[job3.game_data], comp.pending[job.game_data])
+
+    config['seed'] = None
+    comp4 = regression_tuners.Regression_tuner('rgtest')
+    comp4.initialise_from_control_file(config)
+    tc.assertRaisesRegexp(
+        CompetitionError, r"\(seed has changed\)",
+        comp4.set_status, status)
@@ -0,0 +1,193 @@
+"""Tests for results_tables.py"""
+
+from cStringIO import StringIO
+import json
+
+from gomill_tests import gomill_test_support
+
+from gomill import results_tables
+from gomill.gtp_games import Game_result
+from gomill.results_tables import Results_table
+from gomill.tournament_results import Tournament_results
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+
+def make_result(game_id, player_b, player_w, winner, margin=1.5,
+                cpu_time_b=None, cpu_time_w=None):
+    if winner == 'unknown':
+        result = Game_result.from_score(None, None, "no score reported")
+    elif winner is None:
+        result = Game_result.from_score(None, 0)
+    else:
+        result = Game_result.from_score(winner, margin)
+    result.set_players({'b' : player_b, 'w' : player_w})
+    result.game_id = game_id
+    result.cpu_times[player_b] = cpu_time_b
+    result.cpu_times[player_w] = cpu_time_w
+    return result
+
+def make_results():
+    forfeit = make_result('0_3', 'p2', 'p1', 'w', None)
+    forfeit.is_forfeit = True
+    return {
+        '0' : [
+            make_result('0_0', 'p1', 'p2', 'b', 1.5, 10.0, 12.0),
+            make_result('0_1', 'p2', 'p1', 'b', 3.5, 20.0, 8.0),
+            make_result('0_2', 'p1', 'p2', None, None, 5.0, None),
+            forfeit,
+            ],
+        '1' : [
+            make_result('1_0', 'p1', 'p3', 'w', None, 1.0, 2.0),
+            make_result('1_1', 'p1', 'p3', 'unknown', None, 30.0, 40.0),
+            ],
+        }
+
+def test_from_results(tc):
+    table = Results_table.from_results(make_results(), ['1', '0'])
+    tc.assertEqual(len(table), 6)
+    tc.assertEqual(table.matchup_ids, ['1', '0'])
+    tc.assertEqual(table.game_ids, ['1_0', '1_1', '0_0', '0_1', '0_2', '0_3'])
+    tc.assertEqual(table.players, ['p1', 'p3', 'p2'])
+    tc.assertEqual(list(table.matchups), [0, 0, 1, 1, 1, 1])
+    tc.assertEqual(list(table.player_b), [0, 0, 0, 2, 0, 2])
+    tc.assertEqual(list(table.outcome), [
+        results_tables.WHITE_WIN, results_tables.UNKNOWN,
+        results_tables.BLACK_WIN, results_tables.BLACK_WIN,
+        results_tables.JIGO, results_tables.WHITE_WIN])
+    tc.assertEqual(list(table.is_forfeit), [0, 0, 0, 0, 0, 1])
+    tc.assertEqual(table.margin[2], 1.5)
+    tc.assertEqual(table.margin[4], 0.0)
+    tc.assertNotEqual(table.margin[0], table.margin[0])
+    tc.assertEqual(table.sgf_results[0], "W+")
+    tc.assertNotEqual(table.cpu_time_w[4], table.cpu_time_w[4])
+
+def test_select(tc):
+    table = Results_table.from_results(make_results(), ['0', '1'])
+    def ids(**kwargs):
+        return [table.game_ids[i] for i in table.select(**kwargs)]
+    tc.assertEqual(ids(), ['0_0', '0_1', '0_2', '0_3', '1_0', '1_1'])
+    tc.assertEqual(ids(matchup_id='1'), ['1_0', '1_1'])
+    tc.assertEqual(ids(matchup_id='nonesuch'), [])
+    tc.assertEqual(ids(player='p3'), ['1_0', '1_1'])
+    tc.assertEqual(ids(winner='p1'), ['0_0', '0_3'])
+    tc.assertEqual(ids(winner='p2', matchup_id='0'), ['0_1'])
+    tc.assertEqual(ids(winning_colour='w'), ['0_3', '1_0'])
+    tc.assertEqual(ids(winning_colour='jigo'), ['0_2'])
+    tc.assertEqual(ids(winning_colour='unknown'), ['1_1'])
+    tc.assertEqual(ids(forfeits=True), ['0_3'])
+    tc.assertEqual(ids(forfeits=False, player='p2'), ['0_0', '0_1', '0_2'])
+    tc.assertEqual(ids(min_cpu_time=5.0), ['0_0', '0_1', '1_1'])
+    tc.assertEqual(ids(max_cpu_time=12.0), ['0_0', '1_0'])
+    tc.assertEqual(ids(min_cpu_time=5, max_cpu_time=30), ['0_0', '0_1'])
+
+def test_query(tc):
+    table = Results_table.from_results(make_results(), ['0', '1'])
+    subset = table.query(player='p1', winning_colour='b')
+    tc.assertEqual(subset.game_ids, ['0_0', '0_1'])
+    tc.assertEqual(list(subset.cpu_time_b), [10.0, 20.0])
+    tc.assertEqual(subset.players, table.players)
+    tc.assertIsNot(subset.players, table.players)
+    tc.assertEqual(table.query(winner='p3').game_ids, ['1_0'])
+    tc.assertEqual(len(table.query(winner='p3', player='p2')), 0)
+
+def test_write_csv(tc):
+    table = Results_table.from_results(make_results(), ['0', '1'])
+    out = StringIO()
+    table.query(matchup_id='0').write_csv(out)
+    tc.assertMultiLineEqual(out.getvalue(), (
+        "game_id,matchup_id,player_b,player_w,outcome,winner,margin,"
+        "is_forfeit,sgf_result,cpu_time_b,cpu_time_w\n"
+        "0_0,0,p1,p2,b,p1,1.5,False,B+1.5,10.0,12.0\n"
+        "0_1,0,p2,p1,b,p2,3.5,False,B+3.5,20.0,8.0\n"
+        "0_2,0,p1,p2,jigo,,0.0,False,0,5.0,\n"
+        "0_3,0,p2,p1,w,p1,,True,W+,,\n"))
+
+def test_write_jsonl(tc):
+    table = Results_table.from_results(make_results(), ['0', '1'])
+    out = StringIO()
+    table.write_jsonl(out)
+    lines = out.getvalue().splitlines()
+    tc.assertEqual(len(lines), 6)
+    tc.assertEqual(json.loads(lines[5]), {
+        'game_id' : '1_1', 'matchup_id' : '1',
+        'player_b' : 'p1', 'player_w' : 'p3',
+        'outcome' : 'unknown', 'winner' : None, 'margin' : None,
+        'is_forfeit' : False, 'sgf_result' : '?',
+        'cpu_time_b' : 30.0, 'cpu_time_w' : 40.0,
+        })
+
+def test_read_jsonl(tc):
+    table = Results_table.from_results(make_results(), ['0', '1'])
+    out = StringIO()
+    table.write_jsonl(out)
+    table2 = Results_table([], [])
+    table2.read_jsonl(StringIO(out.getvalue() + "\n"))
+    tc.assertEqual(list(table2.iter_rows()), list(table.iter_rows()))
+    tc.assertEqual(table2.players, table.players)
+
+def test_read_jsonl_errors(tc):
+    table = Results_table([], [])
+    tc.assertRaisesRegexp(
+        ValueError, "line 1: not an object",
+        table.read_jsonl, StringIO("[]\n"))
+    tc.assertRaisesRegexp(
+        ValueError, "line 2: missing 'outcome'",
+        table.read_jsonl, StringIO(
+            '\n{"game_id": "1", "matchup_id": "0", '
+            '"player_b": "p1", "player_w": "p2"}\n'))
+    tc.assertRaisesRegexp(
+        ValueError, "line 1: invalid outcome: u'x'",
+        table.read_jsonl, StringIO(
+            '{"game_id": "1", "matchup_id": "0", '
+            '"player_b": "p1", "player_w": "p2", "outcome": "x"}\n'))
+    tc.assertRaisesRegexp(
+        ValueError, "line 1: Expecting object",
+        table.read_jsonl, StringIO("{\n"))
+    tc.assertEqual(len(table), 0)
+
+def test_jsonl_without_json_module(tc):
+    table = Results_table.from_results(make_results(), ['0', '1'])
+    saved_json = results_tables.json
+    try:
+        results_tables.json = None
+        tc.assertRaisesRegexp(
+            ValueError, "JSON Lines support requires Python 2.6 or later",
+            table.write_jsonl, StringIO())
+        tc.assertRaisesRegexp(
+            ValueError, "JSON Lines support requires Python 2.6 or later",
+            table.read_jsonl, StringIO("{}\n"))
+    finally:
+        results_tables.json = saved_json
+
+class Fake_fitter(object):
+    def __init__(self):
+        self.calls = []
+    def add_games(self, *args):
+        self.calls.append(args)
+
+def test_add_to_rating_fitter(tc):
+    table = Results_table.from_results(make_results(), ['0', '1'])
+    fitter = Fake_fitter()
+    table.add_to_rating_fitter(fitter)
+    tc.assertEqual(fitter.calls, [
+        ('p1', 'p2', 1.5, 0.5),
+        ('p1', 'p3', 0.0, 1.0),
+        ('p2', 'p1', 1.0, 1.0),
+        ])
+
+def test_tournament_results_query(tc):
+    results = make_results()
+    tr = Tournament_results([], results)
+    table = tr.get_results_table()
+    tc.assertIs(tr.get_results_table(), table)
+    tc.assertEqual(len(table), 6)
+    tc.assertEqual(tr.query_games(winner='p1').game_ids, ['0_0', '0_3'])
+    # The table follows results which arrive later
+    results['0'].append(make_result('0_4', 'p1', 'p2', 'b', 0.5))
+    tc.assertEqual(len(tr.get_results_table()), 7)
+    tc.assertEqual(tr.query_games(winner='p1').game_ids,
+                   ['0_0', '0_3', '0_4'])
+    results['2'] = [make_result('2_0', 'p2', 'p3', 'w', 0.5)]
+    tc.assertEqual(tr.query_games(winner='p3').game_ids, ['1_0', '2_0'])
@@ -0,0 +1,95 @@
+"""Tests for ringmaster_control.py."""
+
+import os
+import threading
+
+from gomill_tests import gomill_test_support
+
+from gomill import ringmaster_control
+from gomill.ringmaster_control import (
+    Control_server, ControlChannelUnavailable, send_command)
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+
+def start_server(tc):
+    if not ringmaster_control.is_supported():
+        tc.skipTest("unix sockets not available")
+    pathname = os.path.join(tc.sandbox(), "test.sock")
+    server = Control_server(pathname)
+    server.poll_interval = 0.05
+    server.start()
+    tc.addCleanup(server.close)
+    return server
+
+def test_roundtrip(tc):
+    server = start_server(tc)
+    pathname = server.pathname
+    tc.assertTrue(os.path.exists(pathname))
+    tc.assertEqual(send_command(pathname, "status", 5), "")
+    tc.assertEqual(send_command(pathname, "json", 5), "")
+    server.publish('status', "paused\nsome games")
+    server.set_handler('json', lambda: '{"paused": true}')
+    tc.assertEqual(send_command(pathname, "status", 5), "paused\nsome games")
+    tc.assertEqual(send_command(pathname, "json", 5), '{"paused": true}')
+    tc.assertIsNone(server.get_command())
+    tc.assertEqual(send_command(pathname, "pause", 5), "ok")
+    tc.assertEqual(send_command(pathname, "stop", 5), "ok")
+    tc.assertEqual(server.get_command(), "pause")
+    tc.assertEqual(server.wait_for_command(5), "stop")
+    tc.assertIsNone(server.get_command())
+    tc.assertEqual(send_command(pathname, "xyzzy", 5),
+                   "error: unknown command: xyzzy")
+    server.close()
+    tc.assertFalse(os.path.exists(pathname))
+
+def test_live_query(tc):
+    server = start_server(tc)
+    calls = []
+    def handler():
+        calls.append(None)
+        if len(calls) == 2:
+            raise ValueError("no status")
+        return '{"calls": %d}' % len(calls)
+    server.set_handler('json', handler)
+    tc.assertEqual(calls, [])
+    tc.assertEqual(send_command(server.pathname, "json", 5), '{"calls": 1}')
+    tc.assertEqual(send_command(server.pathname, "json", 5),
+                   "error: no status")
+    tc.assertEqual(send_command(server.pathname, "json", 5), '{"calls": 3}')
+
+def test_deferred_query(tc):
+    server = start_server(tc)
+    replies = []
+    def client():
+        replies.append(send_command(server.pathname, "report", 5))
+    thread = threading.Thread(target=client)
+    thread.start()
+    query = server.wait_for_command(5)
+    tc.assertIsInstance(query, ringmaster_control.Deferred_query)
+    tc.assertEqual(query.command, "report")
+    query.answer("the report")
+    thread.join(5)
+    tc.assertEqual(replies, ["the report"])
+
+def test_deferred_query_timeout(tc):
+    server = start_server(tc)
+    server.deferred_query_timeout = 0.05
+    tc.assertEqual(send_command(server.pathname, "report", 5),
+                   "error: no response from ringmaster")
+
+def test_stale_socket(tc):
+    server = start_server(tc)
+    pathname = server.pathname
+    server.close()
+    open(pathname, "w").close()
+    server2 = Control_server(pathname)
+    server2.start()
+    tc.addCleanup(server2.close)
+    tc.assertEqual(send_command(pathname, "pause", 5), "ok")
+
+def test_unavailable(tc):
+    pathname = os.path.join(tc.sandbox(), "missing.sock")
+    tc.assertRaises(ControlChannelUnavailable,
+                    send_command, pathname, "status", 5)
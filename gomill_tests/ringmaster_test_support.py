@@ -11,6 +11,7 @@ class Test_presenter(ringmaster_presenters.Presenter):
     def __init__(self):
         ringmaster_presenters.Presenter.__init__(self)
         self.channels = defaultdict(list)
+        self.refresh_count = 0
 
     shows_warnings_only = False
 
@@ -21,7 +22,7 @@ class Test_presenter(ringmaster_presenters.Presenter):
         self.channels[channel].append(s)
 
     def refresh(self):
-        pass
+        self.refresh_count += 1
 
     def recent_messages(self, channel):
         """Retrieve messages sent since the channel was last cleared.
@@ -35,7 +36,8 @@ class Test_presenter(ringmaster_presenters.Presenter):
 class Testing_ringmaster(ringmasters.Ringmaster):
     """Variant of ringmaster suitable for use in tests.
 
-    This doesn't read from or write to the filesystem.
+    This doesn't read from or write to the filesystem (the game index is kept
+    in memory).
 
     (If you're testing run(), make sure record_games is False, and either
     stderr_to_log is False, or else discard_stderr is True for each player.)
@@ -56,6 +58,9 @@ class Testing_ringmaster(ringmasters.Ringmaster):
         self._test_status = None
         self._written_status = None
         ringmasters.Ringmaster.__init__(self, '/nonexistent/ctl/test.ctl')
+        # Tests which want to look at the game index can set this to a pathname
+        # in a sandbox.
+        self.game_index_pathname = ":memory:"
         self.set_stdout(StringIO())
 
     _presenter_classes = {
@@ -70,6 +75,11 @@ class Testing_ringmaster(ringmasters.Ringmaster):
         # Don't want to close the StringIOs
         pass
 
+    def _initialise_control_server(self):
+        # Tests which want a control server install one themselves (see
+        # Ringmaster_fixture.enable_control_channel()).
+        pass
+
     def _read_control_file(self):
         return self._control_file_contents
 
@@ -1,5 +1,8 @@
 """Tests for ringmaster.py."""
 
+from __future__ import with_statement
+
+import json
 import os
 import re
 from textwrap import dedent
@@ -10,7 +13,11 @@ from gomill_tests import ringmaster_test_support
 from gomill_tests import gtp_engine_fixtures
 from gomill_tests.playoff_tests import fake_response
 
-from gomill.ringmasters import RingmasterError
+from gomill import game_index
+from gomill import job_manager
+from gomill import ringmaster_control
+from gomill import ringmasters
+from gomill.ringmasters import Ringmaster, RingmasterError
 
 def make_tests(suite):
     suite.addTests(gomill_test_support.make_simple_tests(globals()))
@@ -65,6 +72,17 @@ class Ringmaster_fixture(object):
         self.ringmaster._initialise_presenter()
         self.ringmaster._initialise_terminal_reader()
 
+    def enable_control_channel(self):
+        """Give the ringmaster a control server which doesn't use a socket.
+
+        Returns the Control_server; send it commands using commands.put().
+
+        """
+        server = ringmaster_control.Control_server("/nonexistent/ctl/test.sock")
+        server.set_handler('json', self.ringmaster.get_live_status_json)
+        self.ringmaster.control_server = server
+        return server
+
     def get_job(self):
         """Initialise the ringmaster, and call get_job() once."""
         self.initialise_clean()
@@ -327,6 +345,35 @@ def test_run(tc):
         "  0_001 p1 beat p2 B+10.5\n"
         "  0_002 p1 beat p2 B+10.5\n")
 
+def test_run_game_index(tc):
+    if not game_index.is_supported():
+        tc.skipTest("sqlite3 not available")
+    fx = Ringmaster_fixture(tc, playoff_ctl)
+    fx.ringmaster.game_index_pathname = os.path.join(tc.sandbox(), "test.index")
+    fx.initialise_clean()
+    fx.ringmaster.run(max_games=2)
+    tc.assertListEqual(fx.messages('warnings'), [])
+    tr = fx.ringmaster.get_tournament_results()
+    tc.assertIs(tr.has_game_index(), True)
+    games = tr.find_games(winner='p1')
+    tc.assertEqual([game.game_id for game in games], ["0_000", "0_001"])
+    tc.assertEqual(games[0].matchup_id, "0")
+    tc.assertIsNone(games[0].sgf_filename)
+    tc.assertEqual(games[0].cpu_times, {'p1' : 546.2, 'p2' : 567.2})
+    tr.game_index.close()
+
+    # An index which doesn't match the competition state is rebuilt.
+    fx2 = Ringmaster_fixture(tc, playoff_ctl)
+    fx2.ringmaster.game_index_pathname = fx.ringmaster.game_index_pathname
+    fx2.initialise_clean()
+    tc.assertIs(fx2.ringmaster.get_tournament_results().has_game_index(),
+                False)
+    fx2.ringmaster.run(max_games=1)
+    tc.assertIn("rebuilding game index\n", fx2.get_log())
+    tr2 = fx2.ringmaster.get_tournament_results()
+    tc.assertEqual([game.game_id for game in tr2.find_games()], ["0_000"])
+    tr2.game_index.close()
+
 def test_run_allplayall(tc):
     fx = Ringmaster_fixture(tc, allplayall_ctl)
     fx.initialise_clean()
@@ -360,6 +407,228 @@ def test_run_allplayall(tc):
         "  AvB_1 p2 beat p1 B+10.5\n"
         "  AvB_2 p1 beat p2 B+10.5\n")
 
+def test_display_throttling(tc):
+    fx = Ringmaster_fixture(tc, playoff_ctl)
+    clock = [1000.0]
+    fx.ringmaster._get_time = lambda: clock[0]
+    fx.ringmaster.set_display_refresh_rate(2)
+    fx.initialise_clean()
+    presenter = fx.ringmaster.presenter
+    report_calls = []
+    original_write_screen_report = fx.ringmaster.competition.write_screen_report
+    def write_screen_report(out):
+        report_calls.append(None)
+        original_write_screen_report(out)
+    fx.ringmaster.competition.write_screen_report = write_screen_report
+
+    fx.ringmaster._update_display()
+    tc.assertEqual(presenter.refresh_count, 1)
+    tc.assertEqual(len(report_calls), 1)
+    job = fx.ringmaster.get_job()
+    tc.assertEqual(presenter.refresh_count, 1)
+    tc.assertIs(fx.ringmaster.display_is_pending, True)
+    clock[0] += 0.6
+    fx.ringmaster.process_idle()
+    tc.assertEqual(presenter.refresh_count, 2)
+    tc.assertIs(fx.ringmaster.display_is_pending, False)
+    # No results yet, so the screen report wasn't regenerated
+    tc.assertEqual(len(report_calls), 1)
+    fx.ringmaster.process_idle()
+    tc.assertEqual(presenter.refresh_count, 2)
+
+    fx.ringmaster.process_response(fake_response(job, 'b'))
+    clock[0] += 0.6
+    fx.ringmaster._update_display()
+    tc.assertEqual(presenter.refresh_count, 3)
+    tc.assertEqual(len(report_calls), 2)
+    tc.assertEqual(fx.messages('screen_report')[0].split("\n")[0],
+                   "p1 v p2 (1/400 games)")
+
+    fx.ringmaster._update_display(force=True)
+    tc.assertEqual(presenter.refresh_count, 4)
+    tc.assertEqual(len(report_calls), 2)
+
+    fx.ringmaster.set_display_refresh_rate(None)
+    fx.ringmaster._update_display()
+    tc.assertEqual(presenter.refresh_count, 5)
+    tc.assertRaisesRegexp(RingmasterError,
+                          "display refresh rate must be positive",
+                          fx.ringmaster.set_display_refresh_rate, 0)
+
+def test_control_stop(tc):
+    fx = Ringmaster_fixture(tc, playoff_ctl)
+    fx.initialise_clean()
+    server = fx.enable_control_channel()
+    job1 = fx.ringmaster.get_job()
+    tc.assertEqual(job1.game_id, "0_000")
+    server.commands.put('stop')
+    tc.assertIs(fx.ringmaster.get_job(), job_manager.NoJobAvailable)
+    tc.assertEqual(server._snapshots['status'],
+                   "halting: stop command received\n"
+                   "game in progress: 0_000")
+    fx.ringmaster.process_response(fake_response(job1, 'b'))
+    tc.assertEqual(server._snapshots['status'], "halting: stop command received")
+    tc.assertMultiLineEqual(
+        fx.get_log(),
+        "starting game 0_000: p1 (b) vs p2 (w)\n"
+        "halting competition: stop command received\n"
+        "response from game 0_000\n")
+
+def test_control_pause(tc):
+    fx = Ringmaster_fixture(tc, playoff_ctl)
+    fx.initialise_clean()
+    server = fx.enable_control_channel()
+    job1 = fx.ringmaster.get_job()
+    server.commands.put('pause')
+    tc.assertIs(fx.ringmaster.get_job(), job_manager.NoJobAvailable)
+    tc.assertIs(fx.ringmaster.paused, True)
+    tc.assertEqual(server._snapshots['status'].split("\n")[0],
+                   "pausing: waiting for games in progress")
+    fx.ringmaster.process_response(fake_response(job1, 'b'))
+    tc.assertEqual(server._snapshots['status'], "paused")
+    tc.assertIs(fx.ringmaster.process_idle(), False)
+    server.commands.put('resume')
+    tc.assertIs(fx.ringmaster.process_idle(), True)
+    tc.assertIs(fx.ringmaster.paused, False)
+    job2 = fx.ringmaster.get_job()
+    tc.assertEqual(job2.game_id, "0_001")
+    tc.assertMultiLineEqual(
+        fx.get_log(),
+        "starting game 0_000: p1 (b) vs p2 (w)\n"
+        "pausing competition\n"
+        "response from game 0_000\n"
+        "resuming competition\n"
+        "starting game 0_001: p1 (b) vs p2 (w)\n")
+
+def test_control_report(tc):
+    fx = Ringmaster_fixture(tc, playoff_ctl)
+    fx.initialise_clean()
+    server = fx.enable_control_channel()
+    job1 = fx.ringmaster.get_job()
+    fx.ringmaster.process_response(fake_response(job1, 'b'))
+    query = ringmaster_control.Deferred_query('report')
+    server.commands.put(query)
+    fx.ringmaster.process_idle()
+    tc.assertEqual(query.wait(0).split("\n")[:2],
+                   ["playoff: test", "gomill_tests playoff."])
+
+def test_live_status(tc):
+    fx = Ringmaster_fixture(tc, playoff_ctl)
+    clock = [1000.0]
+    fx.ringmaster._get_time = lambda: clock[0]
+    fx.ringmaster.set_parallel_worker_count(2)
+    fx.initialise_clean()
+    server = fx.enable_control_channel()
+    fx.ringmaster.live_status.start_run(clock[0], 2)
+    job1 = fx.ringmaster.get_job()
+    clock[0] += 10
+    job2 = fx.ringmaster.get_job()
+    clock[0] += 10
+    response1 = fake_response(job1, 'b')
+    response1.game_result.cpu_times = {'p1' : 3.0, 'p2' : None}
+    fx.ringmaster.process_response(response1)
+    clock[0] += 5
+    status = json.loads(server._answer_live_query('json'))
+    tc.assertEqual(status['competition'], "test")
+    tc.assertEqual(status['games_completed'], 1)
+    tc.assertEqual(status['elapsed'], 25.0)
+    tc.assertEqual(status['games_in_progress'], [
+        {'game_id' : "0_001", 'black' : "p1", 'white' : "p2",
+         'elapsed' : 15.0}])
+    tc.assertEqual(status['matchups'], {
+        '0' : {'games' : 1, 'wins' : {'p1' : 1}, 'no_winner' : 0}})
+    tc.assertEqual(status['cpu_times'], {
+        'p1' : {'games' : 1, 'total' : 3.0, 'mean' : 3.0}})
+    tc.assertEqual(status['workers'],
+                   {'count' : 2, 'busy' : 1, 'utilisation' : 0.7})
+    fx.ringmaster.process_error_response(job2, "forced error")
+    clock[0] += 15
+    status = fx.ringmaster.get_live_status()
+    tc.assertEqual(status['games_in_progress'], [])
+    tc.assertEqual(status['void_games'], 1)
+    tc.assertEqual(status['total_void_games'], 1)
+    tc.assertEqual(status['workers']['utilisation'], 0.4375)
+
+def test_live_status_after_restart(tc):
+    fx1 = Ringmaster_fixture(tc, playoff_ctl)
+    fx1.initialise_clean()
+    fx1.ringmaster.run(max_games=2)
+    state = fx1.get_written_state()
+
+    fx2 = Ringmaster_fixture(tc, playoff_ctl)
+    fx2.initialise_with_state(state)
+    fx2.ringmaster.run(max_games=1)
+    status = fx2.ringmaster.get_live_status()
+    # The counts for this run start from zero, but the per-matchup figures
+    # include the earlier games
+    tc.assertEqual(status['games_completed'], 1)
+    tc.assertEqual(status['matchups']['0']['games'], 3)
+    stats = status['matchups']['0']
+    tc.assertEqual(sum(stats['wins'].values()) + stats['no_winner'], 3)
+
+def test_live_status_without_json_module(tc):
+    fx = Ringmaster_fixture(tc, playoff_ctl)
+    fx.initialise_clean()
+    server = fx.enable_control_channel()
+    saved_json = ringmasters.json
+    try:
+        ringmasters.json = None
+        tc.assertEqual(server._answer_live_query('json'),
+                       "error: json status requires Python 2.6 or later")
+    finally:
+        ringmasters.json = saved_json
+
+def test_shards(tc):
+    ctl_pathname = os.path.join(tc.sandbox(), "test.ctl")
+    with open(ctl_pathname, "w") as f:
+        f.write(playoff_ctl)
+    for shard_index in (0, 1):
+        ringmaster = Ringmaster(ctl_pathname)
+        ringmaster.set_shard(shard_index, 2)
+        tc.assertEqual(
+            ringmaster.status_pathname,
+            os.path.join(tc.sandbox(), "test.shard%dof2.status" % shard_index))
+        ringmaster.set_clean_status()
+        for i in range(4):
+            job = ringmaster.competition.get_game()
+            ringmaster.competition.process_game_result(
+                fake_response(job, 'b'))
+        ringmaster.void_game_count = shard_index + 1
+        ringmaster.write_status()
+
+    ringmaster = Ringmaster(ctl_pathname)
+    tc.assertEqual(ringmaster.merge_shards(), [0, 1])
+    tc.assertEqual(ringmaster.void_game_count, 3)
+    tr = ringmaster.get_tournament_results()
+    tc.assertEqual(
+        sorted(result.game_id for result in tr.get_matchup_results('0')),
+        ["0_000", "0_001", "0_002", "0_003", "0_004", "0_005", "0_006",
+         "0_007"])
+    tc.assertEqual(tr.get_matchup_stats('0').wins_1, 8)
+
+    # A shard's own state can be reloaded
+    ringmaster = Ringmaster(ctl_pathname)
+    ringmaster.set_shard(1, 2)
+    ringmaster.load_status()
+    tc.assertEqual(ringmaster.competition.get_game().game_id, "0_010")
+
+def test_shards_errors(tc):
+    fx = Ringmaster_fixture(tc, playoff_ctl)
+    tc.assertRaisesRegexp(RingmasterError, "shard index out of range",
+                          fx.ringmaster.set_shard, 2, 2)
+    tc.assertRaisesRegexp(RingmasterError, "shard count must be positive",
+                          fx.ringmaster.set_shard, 0, 0)
+    fx2 = Ringmaster_fixture(tc, mcts_ctl)
+    tc.assertRaisesRegexp(RingmasterError,
+                          "competition type does not support sharding",
+                          fx2.ringmaster.set_shard, 0, 2)
+    ctl_pathname = os.path.join(tc.sandbox(), "test.ctl")
+    with open(ctl_pathname, "w") as f:
+        f.write(playoff_ctl)
+    ringmaster = Ringmaster(ctl_pathname)
+    tc.assertRaisesRegexp(RingmasterError, "no shard state files found",
+                          ringmaster.merge_shards)
+
 def test_check_players_fail(tc):
     fx = Ringmaster_fixture(tc, playoff_ctl, [
         "players['p2'] = Player('test fail=startup')"
@@ -12,6 +12,7 @@ test_modules = [
     'sgf_properties_tests',
     'sgf_tests',
     'sgf_moves_tests',
+    'openings_tests',
     'gameplay_tests',
     'gtp_engine_tests',
     'gtp_state_tests',
@@ -19,13 +20,21 @@ test_modules = [
     'gtp_proxy_tests',
     'gtp_game_tests',
     'game_job_tests',
+    'game_index_tests',
     'setting_tests',
+    'stopping_rules_tests',
+    'ratings_tests',
+    'results_tables_tests',
+    'gauntlet_tests',
     'competition_scheduler_tests',
     'competition_tests',
     'playoff_tests',
     'allplayall_tests',
     'mcts_tuner_tests',
     'cem_tuner_tests',
+    'spsa_tuner_tests',
+    'regression_tuner_tests',
+    'ringmaster_control_tests',
     'ringmaster_tests',
     ]
 
@@ -0,0 +1,242 @@
+"""Tests for spsa_tuners.py"""
+
+from __future__ import with_statement, division
+
+import cPickle as pickle
+
+from gomill import spsa_tuners
+from gomill.game_jobs import Game_job, Game_job_result
+from gomill.gtp_games import Game_result
+from gomill.spsa_tuners import Parameter_config
+from gomill.competitions import (
+    Player_config, CompetitionError, ControlFileError, NoGameAvailable)
+from gomill.gtp_controller import Engine_description
+
+from gomill_tests import gomill_test_support
+from gomill_tests import competition_test_support
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+def simple_make_candidate(*args):
+    if -1 in args:
+        raise ValueError("oops")
+    return Player_config("cand " + " ".join(map(str, args)))
+
+def default_config():
+    return {
+        'board_size' : 13,
+        'komi' : 7.5,
+        'players' : {
+            'opp' : Player_config("test"),
+            },
+        'candidate_colour' : 'w',
+        'opponent' : 'opp',
+        'parameters' : [
+            Parameter_config(
+                'resign_at',
+                initial_value = 0.5,
+                perturbation = 0.1,
+                min_value = 0.0,
+                max_value = 0.55,
+                format = "rsn@ %.2f"),
+            Parameter_config(
+                'playouts',
+                initial_value = 1000,
+                perturbation = 100,
+                transform = int,
+                format = "pl %d"),
+            ],
+        'learning_rate' : 1.0,
+        'alpha' : 1.0,
+        'gamma' : 0.0,
+        'trajectory_interval' : 2,
+        'number_of_iterations' : 3,
+        'make_candidate' : simple_make_candidate,
+        }
+
+def make_response(job, winner):
+    if winner is None:
+        result = Game_result.from_score(None, 0)
+    else:
+        result = Game_result.from_score(winner, 1.5)
+    result.set_players({'b' : job.player_b.code, 'w' : job.player_w.code})
+    response = Game_job_result()
+    response.game_id = job.game_id
+    response.game_result = result
+    response.engine_descriptions = {
+        'opp' : Engine_description("opp engine", "v1.2.3", None),
+        }
+    response.game_data = job.game_data
+    return response
+
+
+def test_parameter_config(tc):
+    comp = spsa_tuners.Spsa_tuner('spsatest')
+    comp.initialise_from_control_file(default_config())
+    tc.assertEqual([pspec.code for pspec in comp.parameter_specs],
+                   ['resign_at', 'playouts'])
+    tc.assertEqual(comp.format_optimiser_parameters((0.25, 1234.5)),
+                   "rsn@ 0.25; pl 1234")
+    tc.assertEqual(comp.stability_constant, 0.0)
+
+    def check(parameter_config, message):
+        tc.assertRaisesRegexp(
+            ValueError, message,
+            comp.parameter_spec_from_config, parameter_config)
+    check(Parameter_config('p', initial_value=1, perturbation=0),
+          "'perturbation': must be positive")
+    check(Parameter_config('p', initial_value=1, perturbation=1,
+                           max_value=0.5),
+          "'initial_value': out of range")
+    tc.assertRaisesRegexp(
+        ControlFileError, "'format': invalid format string",
+        comp.parameter_spec_from_config,
+        Parameter_config('p', initial_value=1, perturbation=1,
+                         format="nopct"))
+
+def test_bad_config(tc):
+    def check(key, value, message):
+        config = default_config()
+        config[key] = value
+        comp = spsa_tuners.Spsa_tuner('spsatest')
+        tc.assertRaisesRegexp(
+            ControlFileError, message,
+            comp.initialise_from_control_file, config)
+    check('learning_rate', 0, "learning_rate: must be positive")
+    check('stability_constant', -1,
+          "stability_constant: must not be negative")
+    check('opponent', 'nonex', "opponent: unknown player nonex")
+    check('parameters', [], "parameters: empty list")
+
+def test_gains(tc):
+    config = default_config()
+    config['alpha'] = 0.5
+    config['gamma'] = 0.5
+    config['stability_constant'] = 2.0
+    comp = spsa_tuners.Spsa_tuner('spsatest')
+    comp.initialise_from_control_file(config)
+    tc.assertAlmostEqual(comp.get_step_size(0), 1/3**0.5)
+    tc.assertAlmostEqual(comp.get_step_size(1), 0.5)
+    c = comp.get_perturbations(3)
+    tc.assertAlmostEqual(c[0], 0.05)
+    tc.assertAlmostEqual(c[1], 50)
+
+def test_play(tc):
+    comp = spsa_tuners.Spsa_tuner('spsatest')
+    config = default_config()
+    comp.initialise_from_control_file(config)
+    comp.set_clean_status()
+
+    job0 = comp.get_game()
+    tc.assertIsInstance(job0, Game_job)
+    tc.assertEqual(job0.game_id, '0')
+    tc.assertEqual(job0.player_b.code, 'opp')
+    tc.assertEqual(job0.player_w.code, '#0+')
+    tc.assertEqual(job0.board_size, 13)
+    tc.assertEqual(job0.komi, 7.5)
+    tc.assertEqual(job0.sgf_event, 'spsatest')
+    job1 = comp.get_game()
+    tc.assertEqual(job1.player_w.code, '#0-')
+    pair = comp.pairs[0]
+    delta = pair.delta
+    # resign_at is clipped to max_value
+    tc.assertEqual(pair.plus_parameters,
+                   [min(0.5 + 0.1*delta[0], 0.55), 1000 + 100*delta[1]])
+    tc.assertEqual(pair.minus_parameters,
+                   [min(0.5 - 0.1*delta[0], 0.55), 1000 - 100*delta[1]])
+    tc.assertEqual(job0.player_w.cmd_args[1:],
+                   [str(v) for v in (pair.plus_parameters[0],
+                                     int(pair.plus_parameters[1]))])
+
+    # Two iterations in progress at once
+    job2 = comp.get_game()
+    tc.assertEqual(job2.player_w.code, '#1+')
+    tc.assertItemsEqual(comp.pairs.keys(), [0, 1])
+
+    comp.process_game_result(make_response(job1, 'b'))
+    tc.assertEqual(comp.parameters, [0.5, 1000])
+    tc.assertEqual(comp.pairs[0].results, [None, 0])
+    comp.process_game_result(make_response(job0, 'w'))
+    # a_0 = 1, c_0 = c; moves by c_i * delta_i / 2
+    tc.assertEqual(comp.iterations_completed, 1)
+    tc.assertAlmostEqual(comp.parameters[0], 0.5 + 0.05*delta[0])
+    tc.assertAlmostEqual(comp.parameters[1], 1000 + 50*delta[1])
+    tc.assertItemsEqual(comp.pairs.keys(), [1])
+
+    status = pickle.loads(pickle.dumps(comp.get_status()))
+    comp2 = spsa_tuners.Spsa_tuner('spsatest')
+    comp2.initialise_from_control_file(config)
+    comp2.set_status(status)
+    tc.assertEqual(comp2.parameters, comp.parameters)
+    tc.assertEqual(comp2.pairs[1].delta, comp.pairs[1].delta)
+    # The unfinished game from iteration 1 is issued again, with the same
+    # perturbation
+    job2b = comp2.get_game()
+    tc.assertEqual(job2b.game_id, '2')
+    tc.assertEqual(job2b.sgf_note, job2.sgf_note)
+
+    job3 = comp.get_game()
+    comp.process_game_result(make_response(job2, None))
+    comp.process_game_result(make_response(job3, None))
+    tc.assertEqual(comp.iterations_completed, 2)
+    tc.assertEqual(len(comp.trajectory), 2)
+    tc.assertEqual(comp.trajectory[1], (2, comp.parameters))
+    jobs = [comp.get_game(), comp.get_game()]
+    tc.assertIs(comp.get_game(), NoGameAvailable)
+    for job in jobs:
+        comp.process_game_result(make_response(job, 'b'))
+    tc.assertEqual(comp.iterations_completed, 3)
+    tc.assertEqual(comp.pairs, {})
+
+    report = competition_test_support.get_short_report(comp)
+    tc.assertIn("3/3 iterations completed\n", report)
+    tc.assertIn("trajectory:\n     0 rsn@ 0.50; pl 1000\n", report)
+    tc.assertIn("opponent (opp): opp engine:v1.2.3\n", report)
+
+def test_status_mismatch(tc):
+    comp = spsa_tuners.Spsa_tuner('spsatest')
+    comp.initialise_from_control_file(default_config())
+    comp.set_clean_status()
+    status = pickle.loads(pickle.dumps(comp.get_status()))
+    config = default_config()
+    del config['parameters'][1]
+    comp2 = spsa_tuners.Spsa_tuner('spsatest')
+    comp2.initialise_from_control_file(config)
+    tc.assertRaisesRegexp(
+        CompetitionError, "status file is inconsistent with control file",
+        comp2.set_status, status)
+
+def test_game_error(tc):
+    comp = spsa_tuners.Spsa_tuner('spsatest')
+    comp.initialise_from_control_file(default_config())
+    comp.set_clean_status()
+    job = comp.get_game()
+    tc.assertEqual(comp.process_game_error(job, 0), (True, False))
+    comp.process_game_result(make_response(comp.get_game(), 'b'))
+    tc.assertEqual(comp.process_game_error(job, 0), (False, True))
+    tc.assertEqual(comp.process_game_error(job, 1), (True, False))
+
+def test_seed(tc):
+    config = default_config()
+    config['number_of_iterations'] = None
+    config['seed'] = 7
+    def deltas(comp):
+        for _ in xrange(20):
+            comp.get_game()
+        return [comp.pairs[i].delta for i in xrange(10)]
+    comp = spsa_tuners.Spsa_tuner('spsatest')
+    comp.initialise_from_control_file(config)
+    comp.set_clean_status()
+    comp2 = spsa_tuners.Spsa_tuner('spsatest')
+    comp2.initialise_from_control_file(config)
+    comp2.set_clean_status()
+    tc.assertEqual(deltas(comp2), deltas(comp))
+
+    status = pickle.loads(pickle.dumps(comp.get_status()))
+    config['seed'] = 8
+    comp3 = spsa_tuners.Spsa_tuner('spsatest')
+    comp3.initialise_from_control_file(config)
+    tc.assertRaisesRegexp(
+        CompetitionError, r"\(seed has changed\)",
+        comp3.set_status, status)
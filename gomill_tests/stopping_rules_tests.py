@@ -0,0 +1,124 @@
+"""Tests for stopping_rules.py"""
+
+from gomill_tests import gomill_test_support
+
+from gomill import stopping_rules
+from gomill.stopping_rules import (
+    Sprt_config, Confidence_config, Sprt_rule, Confidence_rule)
+
+def make_tests(suite):
+    suite.addTests(gomill_test_support.make_simple_tests(globals()))
+
+
+def test_normal_quantile(tc):
+    tc.assertAlmostEqual(stopping_rules.normal_quantile(0.5), 0.0)
+    tc.assertAlmostEqual(stopping_rules.normal_quantile(0.975), 1.959964, 5)
+    tc.assertAlmostEqual(stopping_rules.normal_quantile(0.05), -1.644854, 5)
+    tc.assertAlmostEqual(stopping_rules.normal_quantile(0.1), -1.281552, 5)
+    tc.assertAlmostEqual(stopping_rules.normal_quantile(0.999), 3.090232, 5)
+    tc.assertAlmostEqual(stopping_rules.normal_quantile(1e-10), -6.361341, 5)
+    tc.assertAlmostEqual(stopping_rules.normal_quantile(1e-30),
+                         -11.464024, 5)
+    for p in (0.01, 0.3, 0.45):
+        tc.assertAlmostEqual(stopping_rules.normal_quantile(p),
+                             -stopping_rules.normal_quantile(1.0 - p), 10)
+
+def test_expected_score(tc):
+    tc.assertAlmostEqual(stopping_rules.expected_score(0), 0.5)
+    tc.assertAlmostEqual(stopping_rules.expected_score(400), 10.0/11)
+    tc.assertAlmostEqual(stopping_rules.expected_score(-400), 1.0/11)
+
+def test_sprt(tc):
+    rule = Sprt_rule(0, 50, 0.05, 0.05)
+    tc.assertAlmostEqual(rule.lower_bound, -2.944439, 5)
+    tc.assertAlmostEqual(rule.upper_bound, 2.944439, 5)
+    tc.assertEqual(rule.llr(0, 0, 0), 0.0)
+    tc.assertAlmostEqual(rule.llr(60, 10, 40), 1.980507, 5)
+    # the llr scales with the number of games at a fixed score
+    tc.assertAlmostEqual(rule.llr(600, 100, 400), 19.80507, 4)
+    tc.assertIsNone(rule.check(60, 10, 40, 'p1', 'p2'))
+    tc.assertEqual(rule.check(600, 100, 400, 'p1', 'p2'),
+                   "H1 accepted: p1 at least 50 Elo stronger than p2")
+    tc.assertEqual(rule.check(500, 0, 500, 'p1', 'p2'),
+                   "H0 accepted: p1 at most 0 Elo stronger than p2")
+    # identical outcomes don't give an infinite llr
+    tc.assertIsNone(rule.check(3, 0, 0, 'p1', 'p2'))
+    tc.assertIsNotNone(rule.check(10, 0, 0, 'p1', 'p2'))
+    tc.assertEqual(
+        rule.describe(60, 10, 40),
+        "SPRT elo0=0 elo1=50 alpha=0.05 beta=0.05: "
+        "LLR 1.98 (bounds -2.94, 2.94)")
+
+def test_pentanomial_score_and_variance(tc):
+    score, variance = stopping_rules.pentanomial_score_and_variance(
+        [1, 2, 4, 2, 1])
+    tc.assertAlmostEqual(score, 0.5)
+    tc.assertAlmostEqual(variance, 0.15)
+    score, variance = stopping_rules.pentanomial_score_and_variance(
+        [0, 0, 3, 0, 1])
+    tc.assertAlmostEqual(score, 0.625)
+    tc.assertAlmostEqual(variance, 2 * (3 * 0.125**2 + 0.375**2) / 4)
+
+def test_sprt_pentanomial(tc):
+    rule = Sprt_rule(0, 50, 0.05, 0.05)
+    # 20 pairs: each pair is a win and a loss, or a win and a jigo
+    pentanomial = [0, 0, 14, 6, 0]
+    # Pairs vary less than independent games would, so the evidence is
+    # stronger.
+    tc.assertGreater(rule.llr(20, 6, 14, pentanomial), rule.llr(20, 6, 14))
+    score, variance = stopping_rules.pentanomial_score_and_variance(
+        pentanomial)
+    s0 = stopping_rules.expected_score(0)
+    s1 = stopping_rules.expected_score(50)
+    tc.assertAlmostEqual(rule.llr(20, 6, 14, pentanomial),
+                         40 * (s1 - s0) * (2*score - s0 - s1) / (2*variance))
+    # with every pair the same, an extra lost pair and won pair are counted
+    tc.assertAlmostEqual(rule.llr(5, 0, 5, [0, 0, 5, 0, 0]),
+                         rule.llr(6, 0, 6, [1, 0, 5, 0, 1]))
+    # an empty pentanomial is ignored
+    tc.assertEqual(rule.llr(20, 6, 14, [0, 0, 0, 0, 0]),
+                   rule.llr(20, 6, 14))
+    tc.assertIn("LLR %.2f" % rule.llr(20, 6, 14, pentanomial),
+                rule.describe(20, 6, 14, pentanomial))
+
+def test_confidence_pentanomial(tc):
+    rule = Confidence_rule(0.95, 10)
+    tc.assertIsNone(rule.check(23, 4, 13, 'p1', 'p2'))
+    tc.assertEqual(rule.check(23, 4, 13, 'p1', 'p2', [0, 1, 10, 6, 3]),
+                   "p1 stronger than p2 at 95% confidence")
+
+def test_sprt_bad_parameters(tc):
+    tc.assertRaises(ValueError, Sprt_rule, 10, 0, 0.05, 0.05)
+    tc.assertRaises(ValueError, Sprt_rule, 0, 10, 0, 0.05)
+    tc.assertRaises(ValueError, Sprt_rule, 0, 10, 0.05, 0.6)
+
+def test_confidence(tc):
+    rule = Confidence_rule(0.95, 20)
+    tc.assertIsNone(rule.check(15, 0, 4, 'p1', 'p2'))
+    tc.assertEqual(rule.check(15, 0, 5, 'p1', 'p2'),
+                   "p1 stronger than p2 at 95% confidence")
+    tc.assertEqual(rule.check(5, 0, 15, 'p1', 'p2'),
+                   "p2 stronger than p1 at 95% confidence")
+    tc.assertIsNone(rule.check(12, 0, 8, 'p1', 'p2'))
+    tc.assertEqual(rule.describe(0, 0, 0),
+                   "confidence stop 95% (min 20 games)")
+    tc.assertEqual(rule.describe(15, 0, 5),
+                   "confidence stop 95% (min 20 games): "
+                   "score 0.750 +/- 0.190")
+    tc.assertRaises(ValueError, Confidence_rule, 1.5, 20)
+
+def test_interpret_stopping_rule(tc):
+    interpret = stopping_rules.interpret_stopping_rule
+    rule = interpret(Sprt_config(-5, 5, alpha=0.1))
+    tc.assertIsInstance(rule, Sprt_rule)
+    tc.assertEqual((rule.elo0, rule.elo1, rule.alpha, rule.beta),
+                   (-5, 5, 0.1, 0.05))
+    rule = interpret(Confidence_config(0.99))
+    tc.assertIsInstance(rule, Confidence_rule)
+    tc.assertEqual((rule.confidence, rule.min_games), (0.99, 100))
+    tc.assertRaisesRegexp(ValueError, "elo1 must be greater than elo0",
+                          interpret, Sprt_config(5, 5))
+    tc.assertRaisesRegexp(ValueError, "'elo1' not specified",
+                          interpret, Sprt_config(5))
+    tc.assertRaisesRegexp(ValueError, "not a SPRT or Confidence_stop",
+                          interpret, 3)